@@ -0,0 +1,31 @@
+"""add reconciliation indexes
+
+Revision ID: 3c9d4e7a1f28
+Revises: 7b3e52f0c9a4
+Create Date: 2026-10-17 14:05:31.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d4e7a1f28'
+down_revision: Union[str, Sequence[str], None] = '7b3e52f0c9a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_matches_internal_transaction_id'), 'matches', ['internal_transaction_id'], unique=False)
+    op.create_index(op.f('ix_matches_external_transaction_id'), 'matches', ['external_transaction_id'], unique=False)
+    op.create_index('ix_transactions_source_type_id', 'transactions', ['source_type', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_source_type_id', table_name='transactions')
+    op.drop_index(op.f('ix_matches_external_transaction_id'), table_name='matches')
+    op.drop_index(op.f('ix_matches_internal_transaction_id'), table_name='matches')
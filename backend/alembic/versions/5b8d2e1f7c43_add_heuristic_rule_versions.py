@@ -0,0 +1,45 @@
+"""add heuristic rule versions
+
+Revision ID: 5b8d2e1f7c43
+Revises: 8e2a6f4d1b07
+Create Date: 2026-10-17 21:06:31.448120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8d2e1f7c43'
+down_revision: Union[str, Sequence[str], None] = '8e2a6f4d1b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('heuristic_rule_versions',
+    sa.Column('version', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('rule_id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.Column('severity', sa.String(), nullable=False),
+    sa.Column('logic', sa.String(), nullable=False),
+    sa.Column('enabled', sa.Boolean(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.Column('created_by', sa.Uuid(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('version')
+    )
+    op.create_index(op.f('ix_heuristic_rule_versions_rule_id'), 'heuristic_rule_versions', ['rule_id'], unique=False)
+    op.add_column('analysis_results', sa.Column('rule_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('analysis_results', 'rule_version')
+    op.drop_index(op.f('ix_heuristic_rule_versions_rule_id'), table_name='heuristic_rule_versions')
+    op.drop_table('heuristic_rule_versions')
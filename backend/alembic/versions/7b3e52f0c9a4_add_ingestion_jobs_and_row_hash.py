@@ -0,0 +1,59 @@
+"""add ingestion jobs and transaction row hash
+
+Revision ID: 7b3e52f0c9a4
+Revises: d41e7a9c2b10
+Create Date: 2026-10-17 11:40:08.215637
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e52f0c9a4'
+down_revision: Union[str, Sequence[str], None] = 'd41e7a9c2b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_jobs',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('subject_id', sa.Uuid(), nullable=False),
+    sa.Column('file_id', sa.String(), nullable=False),
+    sa.Column('file_sha256', sa.String(length=64), nullable=False),
+    sa.Column('bank_name', sa.String(), nullable=False),
+    sa.Column('mapping', sa.JSON(), nullable=False),
+    sa.Column('batch_size', sa.Integer(), nullable=False),
+    # processingstatus already exists (evidence.processing_status)
+    sa.Column('status', postgresql.ENUM('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', name='processingstatus', create_type=False), nullable=False),
+    sa.Column('last_committed_batch', sa.Integer(), nullable=False),
+    sa.Column('rows_inserted', sa.Integer(), nullable=False),
+    sa.Column('rows_skipped', sa.Integer(), nullable=False),
+    sa.Column('rows_duplicate', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_by', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingestion_jobs_subject_id'), 'ingestion_jobs', ['subject_id'], unique=False)
+    op.create_index(op.f('ix_ingestion_jobs_file_sha256'), 'ingestion_jobs', ['file_sha256'], unique=False)
+
+    op.add_column('transactions', sa.Column('row_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_transactions_row_hash'), 'transactions', ['row_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transactions_row_hash'), table_name='transactions')
+    op.drop_column('transactions', 'row_hash')
+
+    op.drop_index(op.f('ix_ingestion_jobs_file_sha256'), table_name='ingestion_jobs')
+    op.drop_index(op.f('ix_ingestion_jobs_subject_id'), table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
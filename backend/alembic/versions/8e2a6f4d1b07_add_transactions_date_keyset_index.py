@@ -0,0 +1,27 @@
+"""add transactions date keyset index
+
+Revision ID: 8e2a6f4d1b07
+Revises: d41f7c2b9e65
+Create Date: 2026-10-17 18:20:47.905311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2a6f4d1b07'
+down_revision: Union[str, Sequence[str], None] = 'd41f7c2b9e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transactions_source_type_date_id', 'transactions', ['source_type', 'date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_source_type_date_id', table_name='transactions')
@@ -0,0 +1,27 @@
+"""add transactions subject keyset index
+
+Revision ID: a4f7c9e2d6b1
+Revises: 5b8d2e1f7c43
+Create Date: 2026-10-17 23:42:18.230517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f7c9e2d6b1'
+down_revision: Union[str, Sequence[str], None] = '5b8d2e1f7c43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transactions_subject_id_id', 'transactions', ['subject_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_subject_id_id', table_name='transactions')
@@ -0,0 +1,37 @@
+"""add column mapping cache
+
+Revision ID: d41e7a9c2b10
+Revises: 5994161dc89c
+Create Date: 2026-10-17 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41e7a9c2b10'
+down_revision: Union[str, Sequence[str], None] = '5994161dc89c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('column_mapping_cache',
+    sa.Column('header_signature', sa.String(length=64), nullable=False),
+    sa.Column('headers', sa.JSON(), nullable=False),
+    sa.Column('mapping', sa.JSON(), nullable=False),
+    sa.Column('confirmed', sa.Boolean(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('header_signature')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('column_mapping_cache')
@@ -0,0 +1,64 @@
+"""add reconciliation blocks
+
+Revision ID: d41f7c2b9e65
+Revises: 3c9d4e7a1f28
+Create Date: 2026-10-17 16:42:09.217604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f7c2b9e65'
+down_revision: Union[str, Sequence[str], None] = '3c9d4e7a1f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reconciliation_blocks',
+    sa.Column('transaction_id', sa.Uuid(), nullable=False),
+    sa.Column('tenant_id', sa.Uuid(), nullable=True),
+    sa.Column('source_type', postgresql.ENUM('INTERNAL', 'EXTERNAL', name='transactionsourcetype', create_type=False), nullable=False),
+    sa.Column('amount_unit', sa.Integer(), nullable=False),
+    sa.Column('date_ordinal', sa.Integer(), nullable=False),
+    sa.Column('pending', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.create_index('ix_reconciliation_blocks_lookup', 'reconciliation_blocks', ['tenant_id', 'source_type', 'amount_unit', 'date_ordinal'], unique=False)
+    op.create_index('ix_reconciliation_blocks_pending', 'reconciliation_blocks', ['tenant_id', 'pending'], unique=False)
+
+    # Existing unmatched transactions form the initial candidate pool; they
+    # were covered by full runs, so none start pending
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        """
+        INSERT INTO reconciliation_blocks
+            (transaction_id, tenant_id, source_type, amount_unit, date_ordinal, pending)
+        SELECT t.id, s.tenant_id, t.source_type, FLOOR(t.amount),
+               (t.date::date - DATE '0001-01-01') + 1, false
+        FROM transactions t
+        JOIN subjects s ON s.id = t.subject_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM matches m WHERE m.internal_transaction_id = t.id
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM matches m WHERE m.external_transaction_id = t.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reconciliation_blocks_pending', table_name='reconciliation_blocks')
+    op.drop_index('ix_reconciliation_blocks_lookup', table_name='reconciliation_blocks')
+    op.drop_table('reconciliation_blocks')
@@ -4,12 +4,13 @@ from jose import jwt, JWTError
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from typing import Iterable
 import uuid
 
 from app.core import security
 from app.core.config import settings
 from app.db.session import get_db
-from app.db.models import User
+from app.db.models import Subject, User
 from app.schemas.token import TokenPayload
 
 # Mock user constants for development mode
@@ -18,6 +19,9 @@ MOCK_USER_EMAIL = "dev@example.com"
 MOCK_USER_NAME = "Development User"
 MOCK_USER_ROLE = "admin"
 
+# Subject ids per ownership query, well below driver parameter limits
+SUBJECT_CHUNK_SIZE = 10_000
+
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token",
     auto_error=not settings.DISABLE_AUTH  # Don't auto-error if auth is disabled
@@ -110,3 +114,30 @@ async def verify_subject_access(
     # Logic to verify existence or specific ownership could go here
     # For now, we rely on the endpoint to check existence for 404s
     return None
+
+
+async def verify_subjects_in_tenant(
+    db: AsyncSession, current_user: User, subject_ids: Iterable[uuid.UUID]
+) -> None:
+    """
+    Raise 404 when any of the stored subjects belongs to another tenant
+    than the caller's, as if it did not exist. Callers without a tenant
+    see every subject.
+    """
+    tenant_id = getattr(current_user, "tenant_id", None)
+    if tenant_id is None:
+        return
+    subject_ids = list(dict.fromkeys(subject_ids))
+    for start in range(0, len(subject_ids), SUBJECT_CHUNK_SIZE):
+        foreign = await db.scalar(
+            select(Subject.id)
+            .where(
+                Subject.id.in_(subject_ids[start : start + SUBJECT_CHUNK_SIZE]),
+                Subject.tenant_id.is_distinct_from(tenant_id),
+            )
+            .limit(1)
+        )
+        if foreign is not None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Subject not found"
+            )
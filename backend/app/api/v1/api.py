@@ -23,6 +23,7 @@ from app.api.v1.endpoints import (
     tenant,
     monitoring,
     events,
+    scoring,
 )
 
 api_router = APIRouter()
@@ -61,3 +62,4 @@ api_router.include_router(predictive.router, prefix="/predictive", tags=["predic
 api_router.include_router(tenant.router, tags=["tenant"])
 api_router.include_router(monitoring.router, tags=["monitoring"])
 api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(scoring.router, prefix="/scoring", tags=["scoring"])
@@ -1,6 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict
 from datetime import datetime, timedelta
+from uuid import UUID
+from app.api import deps
 from app.schemas.analysis import (
     RiskForecastRequest,
     RiskForecast,
@@ -9,13 +12,19 @@ from app.schemas.analysis import (
     CommunityResult,
     CentralityResult,
     AnalysisResult,
+    HeuristicRule,
+    HeuristicRuleRevision,
+    HeuristicRuleSet,
 )
+from app.core.rbac import require_admin
 from app.services.heuristic_engine import HeuristicEngine
+from app.services.rule_compiler import RuleCompileError
+from app.services.rule_features import RuleFeatureService
+from app.services.rule_store import rule_store
 from app.services.risk_forecast import RiskForecastService
 from app.services.graph_analytics import GraphAnalyticsService
 
 # In a real app, these services would be injected via dependency injection
-heuristic_engine = HeuristicEngine()
 risk_service = RiskForecastService()
 graph_service = GraphAnalyticsService()
 
@@ -23,32 +32,106 @@ router = APIRouter()
 
 
 @router.post("/evaluate/{subject_id}", response_model=AnalysisResult)
-async def evaluate_subject(subject_id: str, context: Dict):
+async def evaluate_subject(
+    subject_id: str, context: Dict, db: AsyncSession = Depends(deps.get_db)
+):
     """
     Evaluates heuristic rules for a subject given a transaction context.
     """
     # 1. Run Heuristics
+    heuristic_engine = await rule_store.engine(db)
     triggered_rules = heuristic_engine.evaluate_transaction(context)
 
-    # Calculate simple risk score aggregator (demo logic)
-    base_score = 10
-    for rule in triggered_rules:
-        if rule.severity == "critical":
-            base_score += 50
-        elif rule.severity == "high":
-            base_score += 25
-        elif rule.severity == "medium":
-            base_score += 10
-        elif rule.severity == "low":
-            base_score += 5
+    return AnalysisResult(
+        subject_id=subject_id,
+        risk_score=HeuristicEngine.risk_score(triggered_rules),
+        triggered_rules=triggered_rules,
+        rule_version=heuristic_engine.version,
+    )
+
 
-    risk_score = min(100, base_score)
+@router.post("/evaluate/{subject_id}/transactions", response_model=AnalysisResult)
+async def evaluate_subject_transactions(
+    subject_id: UUID,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Evaluates heuristic rules over every stored transaction of a subject,
+    with rolling-window features computed from its history.
+    """
+    await deps.verify_subjects_in_tenant(db, current_user, [subject_id])
+    heuristic_engine = await rule_store.engine(db)
+    scored = await RuleFeatureService.score_subject(
+        db, subject_id, engine=heuristic_engine
+    )
+    triggered_rules = RuleFeatureService.summarize(scored)
 
     return AnalysisResult(
-        subject_id=subject_id, risk_score=risk_score, triggered_rules=triggered_rules
+        subject_id=str(subject_id),
+        risk_score=HeuristicEngine.risk_score(triggered_rules),
+        triggered_rules=triggered_rules,
+        rule_version=heuristic_engine.version,
     )
 
 
+@router.get("/rules", response_model=HeuristicRuleSet)
+async def list_rules(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    The active heuristic rules and their rule set version.
+    """
+    version, rules = await rule_store.load(db)
+    return HeuristicRuleSet(version=version, rules=rules)
+
+
+@router.put("/rules/{rule_id}", response_model=HeuristicRuleRevision)
+async def save_rule(
+    rule_id: str,
+    rule: HeuristicRule,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(require_admin),
+):
+    """
+    Creates or changes a rule as a new revision; every process picks it up.
+    """
+    try:
+        return await rule_store.save_rule(
+            db, rule.model_copy(update={"id": rule_id}), user_id=current_user.id
+        )
+    except RuleCompileError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rule logic: {e}")
+
+
+@router.delete("/rules/{rule_id}", response_model=HeuristicRuleRevision)
+async def delete_rule(
+    rule_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(require_admin),
+):
+    """
+    Removes a rule from the active set; its history is kept.
+    """
+    revision = await rule_store.delete_rule(db, rule_id, user_id=current_user.id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return revision
+
+
+@router.get("/rules/{rule_id}/history", response_model=List[HeuristicRuleRevision])
+async def rule_history(
+    rule_id: str,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Stored revisions of a rule, newest first.
+    """
+    return await rule_store.history(db, rule_id)
+
+
 @router.post("/forecast", response_model=RiskForecast)
 async def forecast_risk(request: RiskForecastRequest):
     """
@@ -1,22 +1,39 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from app.api import deps
 from app.services.ingestion import IngestionService
+from app.services.ingestion_jobs import IngestionJobService
+from app.services.job_queue import job_queue
+from app.workers.ingestion_worker import PROCESS_MAPPED_JOB, UPLOAD_JOB
+from app.services.bank_formats import bank_format_registry
+from app.services.upload_session import check_file_id, jobs_dir, stage_for_job
 from app.schemas import transaction as schemas
+import asyncio
 import os
+import shutil
+import uuid
 
+# Staged uploads are read by the ingestion worker, so API and worker
+# processes must share this directory
 UPLOAD_DIR = "/tmp/simple378_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(jobs_dir(UPLOAD_DIR), exist_ok=True)
+
+
+def _stage_upload(file_obj, file_path: str) -> None:
+    with open(file_path, "wb") as out:
+        shutil.copyfileobj(file_obj, out)
 
 
 class UploadInitResponse(BaseModel):
     file_id: str
     headers: List[str]
     suggested_mapping: Dict[str, str]
+    mapping_source: str = "ai"  # "cache" when matched by header signature
+    row_count: Optional[int] = None
 
 
 class PreviewRequest(BaseModel):
@@ -24,12 +41,55 @@ class PreviewRequest(BaseModel):
     mapping: Dict[str, str]
     limit: int = 5
 
+    _check_file_id = field_validator("file_id")(check_file_id)
+
 
 class ProcessMappedRequest(BaseModel):
     file_id: str
     mapping: Dict[str, str]
     subject_id: UUID
     bank_name: str
+    batch_size: Optional[int] = Field(default=None, ge=1, le=50000)
+
+    _check_file_id = field_validator("file_id")(check_file_id)
+
+
+class RejectedRow(BaseModel):
+    row: int
+    reason: str
+
+
+class StreamUploadResponse(BaseModel):
+    upload_id: str
+    inserted: int
+    skipped: int
+    duplicates: int = 0
+    rejected: List[RejectedRow] = []
+
+
+class IngestionJobResponse(BaseModel):
+    id: UUID
+    subject_id: UUID
+    file_id: str
+    file_sha256: str
+    bank_name: str
+    status: str
+    batch_size: int
+    last_committed_batch: int
+    rows_inserted: int
+    rows_skipped: int
+    rows_duplicate: int
+    error: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class QueuedJobResponse(BaseModel):
+    job_id: str
+    status: str
+    upload_id: Optional[str] = None  # Id used in WebSocket progress events
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
 
 
 class AutoMapRequest(BaseModel):
@@ -46,35 +106,85 @@ class ColumnMapping(BaseModel):
 router = APIRouter()
 
 
-@router.post("/upload", response_model=List[schemas.Transaction])
+@router.post("/upload", response_model=QueuedJobResponse, status_code=202)
 async def upload_transactions(
     subject_id: UUID = Form(...),
     bank_name: str = Form(...),
     file: UploadFile = File(...),
-    db: AsyncSession = Depends(deps.get_db),
     current_user=Depends(deps.verify_active_analyst),
 ):
     """
     Upload a CSV file of transactions for a specific subject and bank.
+
+    The file is staged and imported by the ingestion worker; poll
+    `/queue/{job_id}` or listen for `upload_progress` WebSocket events.
     """
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
-    content = await file.read()
+    upload_id = str(uuid.uuid4())
+    file_path = os.path.join(jobs_dir(UPLOAD_DIR), f"{upload_id}.csv")
+    try:
+        await asyncio.to_thread(_stage_upload, file.file, file_path)
+        job = await job_queue.enqueue(
+            UPLOAD_JOB,
+            {
+                "file_path": file_path,
+                "upload_id": upload_id,
+                "subject_id": str(subject_id),
+                "bank_name": bank_name,
+                "filename": file.filename,
+                "user_id": str(current_user.id),
+            },
+        )
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=500, detail=f"Failed to queue file: {str(e)}")
+
+    return QueuedJobResponse(job_id=job.id, status=job.status, upload_id=upload_id)
+
+
+@router.post("/upload/stream", response_model=StreamUploadResponse)
+async def upload_transactions_stream(
+    subject_id: UUID = Form(...),
+    bank_name: str = Form(...),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.verify_active_analyst),
+):
+    """
+    Stream a large CSV file of transactions into the database in batches.
+    Progress is reported over WebSocket as `upload_progress` events.
+    """
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
     try:
-        transactions = await IngestionService.process_csv(
+        return await IngestionService.process_csv_stream(
             db=db,
-            file_content=content,
+            file_obj=file.file,
             bank_name=bank_name,
             subject_id=subject_id,
             filename=file.filename,
+            total_bytes=file.size,
+            user_id=str(current_user.id),
         )
-        return transactions
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
 
 
+@router.get("/bank-formats", response_model=List[str])
+async def list_bank_formats(current_user=Depends(deps.verify_active_analyst)):
+    """
+    List the bank statement formats accepted as `bank_name` on upload.
+    Unknown names fall back to header auto-detection.
+    """
+    return bank_format_registry.names()
+
+
 @router.post("/auto-map", response_model=List[ColumnMapping])
 async def auto_map_columns(
     request: AutoMapRequest, current_user=Depends(deps.verify_active_analyst)
@@ -127,17 +237,20 @@ async def create_transactions_batch(
 
 @router.post("/upload-init", response_model=UploadInitResponse)
 async def init_upload(
-    file: UploadFile = File(...), current_user=Depends(deps.verify_active_analyst)
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.verify_active_analyst),
 ):
     """
-    Step 1: Upload file, detect headers, and get AI mapping suggestions.
+    Step 1: Upload file, detect headers, and get mapping suggestions
+    (from the header-signature cache, or AI for unseen headers).
     """
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
     try:
         response = await IngestionService.init_upload(
-            file_obj=file.file, filename=file.filename, upload_dir=UPLOAD_DIR
+            file_obj=file.file, filename=file.filename, upload_dir=UPLOAD_DIR, db=db
         )
         return UploadInitResponse(**response)
     except Exception as e:
@@ -169,28 +282,103 @@ async def preview_mapping(
         raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
 
 
-@router.post("/process-mapped")
+@router.post("/process-mapped", response_model=QueuedJobResponse, status_code=202)
 async def process_mapped(
     request: ProcessMappedRequest,
-    db: AsyncSession = Depends(deps.get_db),
     current_user=Depends(deps.verify_active_analyst),
 ):
     """
     Step 3: Process the full file with confirmed mapping.
+
+    Runs in the ingestion worker; progress is reported over WebSocket.
     """
-    try:
-        transactions = await IngestionService.process_mapped_file(
-            db=db,
-            file_id=request.file_id,
-            mapping=request.mapping,
-            subject_id=request.subject_id,
-            bank_name=request.bank_name,
-            upload_dir=UPLOAD_DIR,
-            user_id=str(current_user.id),
-        )
-        return {"status": "success", "count": len(transactions)}
+    # Out of reach of the hourly upload cleanup while queued or resumable
+    staged_dir = await asyncio.to_thread(stage_for_job, UPLOAD_DIR, request.file_id)
+    if staged_dir is None:
+        raise HTTPException(status_code=404, detail="File not found or expired")
+
+    job = await job_queue.enqueue(
+        PROCESS_MAPPED_JOB,
+        {
+            "file_id": request.file_id,
+            "mapping": request.mapping,
+            "subject_id": str(request.subject_id),
+            "bank_name": request.bank_name,
+            "upload_dir": staged_dir,
+            "user_id": str(current_user.id),
+            "batch_size": request.batch_size,
+        },
+    )
+    return QueuedJobResponse(
+        job_id=job.id, status=job.status, upload_id=request.file_id
+    )
+
+
+@router.get("/queue/{job_id}", response_model=QueuedJobResponse)
+async def get_queued_job(
+    job_id: str,
+    current_user=Depends(deps.verify_active_analyst),
+):
+    """
+    Status and result of a queued upload or mapped-file import.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return QueuedJobResponse(
+        job_id=job.id,
+        status=job.status,
+        upload_id=job.payload.get("upload_id") or job.payload.get("file_id"),
+        result=job.result,
+        error=job.error,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.verify_active_analyst),
+):
+    """
+    Status and checkpoint of a mapped-file import.
+    """
+    job = await IngestionJobService.get(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
 
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise e
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+@router.post(
+    "/jobs/{job_id}/resume", response_model=QueuedJobResponse, status_code=202
+)
+async def resume_ingestion_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.verify_active_analyst),
+):
+    """
+    Resume an interrupted import after its last committed batch.
+    """
+    job = await IngestionJobService.get(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    staged_dir = await asyncio.to_thread(stage_for_job, UPLOAD_DIR, job.file_id)
+    if staged_dir is None:
+        raise HTTPException(status_code=410, detail="Staged file has expired")
+
+    queued = await job_queue.enqueue(
+        PROCESS_MAPPED_JOB,
+        {
+            "file_id": job.file_id,
+            "mapping": job.mapping,
+            "subject_id": str(job.subject_id),
+            "bank_name": job.bank_name,
+            "upload_dir": staged_dir,
+            "user_id": str(current_user.id),
+            "batch_size": job.batch_size,
+        },
+    )
+    return QueuedJobResponse(
+        job_id=queued.id, status=queued.status, upload_id=job.file_id
+    )
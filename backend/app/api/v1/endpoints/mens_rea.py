@@ -1,14 +1,87 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from app.api import deps
 from app.schemas import mens_rea as schemas
 from app.db import models as db_models
+from app.services.job_queue import job_queue
+from app.workers.ingestion_worker import MENS_REA_BATCH_JOB
 from app.services.detectors.structuring import StructuringDetector
 from app.services.detectors.velocity import VelocityDetector
 from app.services.detectors.mirroring import MirroringDetector
 
 router = APIRouter()
 
+# Roles that may queue analyses of other tenants
+ADMIN_ROLES = ("admin", "superadmin")
+# Subject ids per ownership query, well below driver parameter limits
+SUBJECT_CHUNK_SIZE = 10_000
+
+
+@router.post("/batch", response_model=schemas.MensReaBatchJob, status_code=202)
+async def analyze_batch(
+    request: schemas.MensReaBatchRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.verify_active_analyst),
+):
+    """
+    Queue Mens Rea analysis of every subject of a tenant, or of a list of
+    subjects; poll `/batch/{job_id}` for the summary.
+
+    Analysts of a tenant can only analyze their own tenant and its
+    subjects; admins can pass any tenant.
+    """
+    if (request.tenant_id is None) == (request.subject_ids is None):
+        raise HTTPException(
+            status_code=400, detail="Pass either tenant_id or subject_ids"
+        )
+    tenant_id = current_user.tenant_id
+    if request.tenant_id is not None:
+        if (
+            tenant_id
+            and request.tenant_id != tenant_id
+            and current_user.role not in ADMIN_ROLES
+        ):
+            raise HTTPException(
+                status_code=403, detail="Not allowed to analyze another tenant"
+            )
+        payload = {"tenant_id": str(request.tenant_id)}
+    else:
+        subject_ids = list(dict.fromkeys(request.subject_ids))
+        if tenant_id:
+            owned = 0
+            for start in range(0, len(subject_ids), SUBJECT_CHUNK_SIZE):
+                result = await db.execute(
+                    select(db_models.Subject.id).where(
+                        db_models.Subject.id.in_(
+                            subject_ids[start : start + SUBJECT_CHUNK_SIZE]
+                        ),
+                        db_models.Subject.tenant_id == tenant_id,
+                    )
+                )
+                owned += len(result.all())
+            if owned != len(subject_ids):
+                raise HTTPException(status_code=404, detail="Subject not found")
+        payload = {"subject_ids": [str(s) for s in subject_ids]}
+    job = await job_queue.enqueue(MENS_REA_BATCH_JOB, payload)
+    return schemas.MensReaBatchJob(job_id=job.id, status=job.status)
+
+
+@router.get("/batch/{job_id}", response_model=schemas.MensReaBatchJob)
+async def get_batch(
+    job_id: str,
+    current_user=Depends(deps.verify_active_analyst),
+):
+    """
+    Status and summary of a batched analysis.
+    """
+    job = await job_queue.get(job_id)
+    if job is None or job.kind != MENS_REA_BATCH_JOB:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return schemas.MensReaBatchJob(
+        job_id=job.id, status=job.status, result=job.result, error=job.error
+    )
+
 
 @router.post("/{subject_id}", response_model=schemas.AnalysisResult)
 async def analyze_subject(
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy import or_, tuple_
+from sqlalchemy.orm import aliased
+from typing import List, Literal, Optional, Dict, Any, Tuple
 from pydantic import BaseModel
+from datetime import datetime
+import base64
+import json
 import uuid
 
 from app.api import deps
 from app.db.models import Transaction, Match, TransactionSourceType, MatchStatus
 from app.services.reconciliation import ReconciliationService
+from app.services.reconciliation_index import ReconciliationIndexService
 
 router = APIRouter()
 
@@ -21,85 +27,226 @@ class MatchRequest(BaseModel):
 class AutoMatchRequest(BaseModel):
     threshold: Optional[float] = 0.8
     date_buffer_days: Optional[int] = 3
+    strategy: Literal["ai", "rules", "vectorized", "assignment", "hybrid"] = "ai"
+
+
+# Transactions per page of /transactions; the stream reads pages of the max
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+TRANSACTION_STATUSES = ["unmatched"] + [
+    status.value for status in MatchStatus if status != MatchStatus.UNMATCHED
+]
+
+
+def _encode_cursor(row) -> str:
+    raw = json.dumps({"date": row.date.isoformat(), "id": str(row.id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data["date"]), uuid.UUID(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_filters(
+    source: str, status: Optional[str]
+) -> Tuple[TransactionSourceType, Optional[str]]:
+    try:
+        source_type = TransactionSourceType(source.lower())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid source type")
+    if status is not None and status.lower() not in TRANSACTION_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid match status")
+    return source_type, status.lower() if status else None
+
+
+def _transactions_query(
+    source_type: TransactionSourceType,
+    status: Optional[str],
+    after: Optional[Tuple[datetime, uuid.UUID]],
+    limit: int,
+):
+    """
+    One page of transactions with their match, newest first.
+
+    Keyset on (date, id) descending, served by the (source_type, date, id)
+    index, so every page costs the same however deep it is. A transaction
+    with several matches is listed once, with a settled match ahead of an
+    unmatched one and the newest first; a status filter lists transactions
+    with any match of that status and shows that match.
+    """
+    if source_type == TransactionSourceType.INTERNAL:
+        own, counterpart = "internal_transaction_id", "external_transaction_id"
+    else:
+        own, counterpart = "external_transaction_id", "internal_transaction_id"
+
+    # The shown match of each row, picked like a LATERAL ... LIMIT 1
+    candidate = aliased(Match)
+    shown = (
+        select(candidate.id)
+        .where(getattr(candidate, own) == Transaction.id)
+        .order_by(
+            candidate.status == MatchStatus.UNMATCHED,
+            candidate.created_at.desc(),
+            candidate.id.desc(),
+        )
+        .limit(1)
+    )
+    if status not in (None, "unmatched"):
+        shown = shown.where(candidate.status == MatchStatus(status))
+
+    query = (
+        select(
+            Transaction.id,
+            Transaction.date,
+            Transaction.description,
+            Transaction.amount,
+            Transaction.source_bank,
+            Match.status.label("match_status"),
+            Match.confidence.label("match_confidence"),
+            getattr(Match, counterpart).label("matched_with"),
+        )
+        .outerjoin(Match, Match.id == shown.scalar_subquery())
+        .where(Transaction.source_type == source_type)
+    )
+    if status == "unmatched":
+        query = query.where(
+            or_(Match.id.is_(None), Match.status == MatchStatus.UNMATCHED)
+        )
+    elif status is not None:
+        query = query.where(Match.id.is_not(None))
+    if after is not None:
+        query = query.where(tuple_(Transaction.date, Transaction.id) < after)
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit)
+
+
+def _serialize_transaction(row, source_type: TransactionSourceType) -> Dict[str, Any]:
+    status = "unmatched"
+    confidence = None
+    if row.match_status is not None:
+        status = row.match_status.value
+        confidence = float(row.match_confidence) if row.match_confidence else 1.0
+
+    return {
+        "id": str(row.id),
+        "date": row.date.isoformat() if row.date else None,
+        "description": row.description or "",
+        "amount": float(row.amount) if row.amount else 0.0,
+        "account": row.source_bank,
+        "category": "Uncategorized",  # Placeholder until Category model exists
+        "source": source_type.value,
+        "matchStatus": status,
+        "matchedWith": str(row.matched_with) if row.matched_with else None,
+        "confidence": confidence,
+    }
+
+
+async def _stream_pages(
+    bind,
+    source_type: TransactionSourceType,
+    status: Optional[str],
+    after: Optional[Tuple[datetime, uuid.UUID]],
+):
+    """
+    Every matching transaction from `after` on, serialized a keyset page at
+    a time so memory stays flat for any ledger size.
+    """
+    async with AsyncSession(bind) as stream_db:
+        while True:
+            result = await stream_db.execute(
+                _transactions_query(source_type, status, after, MAX_PAGE_SIZE)
+            )
+            rows = result.all()
+            if rows:
+                yield [_serialize_transaction(row, source_type) for row in rows]
+            if len(rows) < MAX_PAGE_SIZE:
+                return
+            after = (rows[-1].date, rows[-1].id)
 
 
 @router.get("/transactions", response_model=List[Dict[str, Any]])
 async def get_transactions(
+    response: Response,
     source: str = Query(..., description="internal or external"),
+    status: Optional[str] = Query(
+        None, description="Match status filter: " + ", ".join(TRANSACTION_STATUSES)
+    ),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor value from the previous page"
+    ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description=f"Page size; {DEFAULT_PAGE_SIZE} when only a cursor is given",
+    ),
     db: AsyncSession = Depends(deps.get_db),
     current_user=Depends(deps.get_current_user),
 ):
     """
-    Get transactions with match status.
+    Get transactions with match status, newest first.
+
+    With `limit` or `cursor` one page is returned, and when more rows follow
+    the `X-Next-Cursor` response header holds the cursor for the next page.
+    Without either, every transaction is streamed as one JSON array, which
+    keeps clients that never follow the cursor seeing the whole ledger.
     """
-    try:
-        source_type = TransactionSourceType(source.lower())
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid source type")
+    source_type, status = _parse_filters(source, status)
+    after = _decode_cursor(cursor) if cursor else None
 
-    # Fetch transactions of the requested source
-    result = await db.execute(
-        select(Transaction)
-        .where(Transaction.source_type == source_type)
-        .order_by(Transaction.date.desc())
-    )
-    transactions = result.scalars().all()
-
-    # Create lookup map
-    match_map = {}
-
-    if transactions:
-        tx_ids = [tx.id for tx in transactions]
-
-        # Optimize: Only fetch matches for the retrieved transactions
-        if source_type == TransactionSourceType.INTERNAL:
-            stmt = select(Match).where(Match.internal_transaction_id.in_(tx_ids))
-        else:
-            stmt = select(Match).where(Match.external_transaction_id.in_(tx_ids))
-
-        matches_result = await db.execute(stmt)
-        matches = matches_result.scalars().all()
-
-        # Build map
-        for m in matches:
-            if source_type == TransactionSourceType.INTERNAL:
-                match_map[m.internal_transaction_id] = m
-            else:
-                match_map[m.external_transaction_id] = m
-
-    response = []
-    for tx in transactions:
-        match = match_map.get(tx.id)
-
-        status = "unmatched"
-        matched_with = None
-        confidence = None
-
-        if match:
-            status = match.status.value
-            confidence = float(match.confidence) if match.confidence else 1.0
-            # Get the ID of the counterpart
-            if source_type == TransactionSourceType.INTERNAL:
-                matched_with = str(match.external_transaction_id)
-            else:
-                matched_with = str(match.internal_transaction_id)
-
-        response.append(
-            {
-                "id": str(tx.id),
-                "date": tx.date.isoformat() if tx.date else None,
-                "description": tx.description or "",
-                "amount": float(tx.amount) if tx.amount else 0.0,
-                "account": tx.source_bank,
-                "category": "Uncategorized",  # Placeholder until Category model exists
-                "source": source_type.value,
-                "matchStatus": status,
-                "matchedWith": matched_with,
-                "confidence": confidence,
-            }
-        )
+    # Dependencies with yield exit before the body is sent, so streams read
+    # through their own session on the same engine
+    bind = db.bind
+    if limit is None and cursor is None:
+
+        async def array():
+            separator = "["
+            async for page in _stream_pages(bind, source_type, status, None):
+                yield separator + ",".join(json.dumps(item) for item in page)
+                separator = ","
+            yield "]" if separator == "," else "[]"
+
+        return StreamingResponse(array(), media_type="application/json")
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    result = await db.execute(_transactions_query(source_type, status, after, limit))
+    rows = result.all()
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
 
-    return response
+    return [_serialize_transaction(row, source_type) for row in rows]
+
+
+@router.get("/transactions/stream")
+async def stream_transactions(
+    source: str = Query(..., description="internal or external"),
+    status: Optional[str] = Query(
+        None, description="Match status filter: " + ", ".join(TRANSACTION_STATUSES)
+    ),
+    cursor: Optional[str] = Query(None, description="Resume after this cursor"),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Stream all matching transactions as NDJSON, one object per line.
+
+    Rows are read in keyset pages, so memory stays flat for any ledger size.
+    """
+    source_type, status = _parse_filters(source, status)
+    after = _decode_cursor(cursor) if cursor else None
+    # Dependencies with yield exit before the body is sent, so the stream
+    # reads through its own session on the same engine
+    bind = db.bind
+
+    async def lines():
+        async for page in _stream_pages(bind, source_type, status, after):
+            yield "".join(json.dumps(item) + "\n" for item in page)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.post("/match", response_model=Dict[str, Any])
@@ -138,6 +285,7 @@ async def create_manual_match(
         confidence=1.0,
     )
     db.add(match)
+    await ReconciliationIndexService.remove(db, [int_id, ext_id])
     await db.commit()
     await db.refresh(match)
 
@@ -173,6 +321,13 @@ async def unmatch_transaction(
         raise HTTPException(status_code=404, detail="Match not found")
 
     await db.delete(match)
+    counterparts = [
+        await db.get(Transaction, match.internal_transaction_id),
+        await db.get(Transaction, match.external_transaction_id),
+    ]
+    await ReconciliationIndexService.restore(
+        db, [tx for tx in counterparts if tx is not None]
+    )
     await db.commit()
 
     return {"status": "success", "message": "Match removed"}
@@ -192,7 +347,28 @@ async def auto_match(
             db=db,
             threshold=params.threshold or 0.8,
             date_buffer_days=params.date_buffer_days or 3,
+            strategy=params.strategy,
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Auto-matching failed: {str(e)}")
+
+
+@router.post("/auto-match/incremental", response_model=Dict[str, Any])
+async def auto_match_incremental(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Match the current tenant's newly ingested, not yet reconciled transactions.
+
+    Imports queue this automatically; the endpoint runs it on demand.
+    """
+    try:
+        return await ReconciliationService.reconcile_pending(
+            db, getattr(current_user, "tenant_id", None)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Incremental matching failed: {str(e)}"
+        )
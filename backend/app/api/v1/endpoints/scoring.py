@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List
+from uuid import UUID
+
+from app.api import deps
+from app.schemas.analysis import ScoringBatch, ScoringEvent, TransactionScore
+from app.services.realtime_scoring import realtime_scoring
+
+router = APIRouter()
+
+
+def _stored_subject_ids(events: Iterable[ScoringEvent]) -> List[UUID]:
+    """Subject ids that can name stored subjects; others only live in state."""
+    ids = []
+    for event in events:
+        try:
+            ids.append(UUID(event.subject_id))
+        except ValueError:
+            continue
+    return ids
+
+
+@router.post("/transactions", response_model=TransactionScore)
+async def score_transaction(
+    event: ScoringEvent,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Scores one transaction as it arrives against the heuristic rules, the
+    detectors and the latest ML models, and adds it to its subject's
+    rolling state.
+    """
+    await deps.verify_subjects_in_tenant(db, current_user, _stored_subject_ids([event]))
+    return await realtime_scoring.score(db, event)
+
+
+@router.post("/transactions/batch", response_model=List[TransactionScore])
+async def score_transactions(
+    batch: ScoringBatch,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user=Depends(deps.get_current_user),
+):
+    """
+    Scores many transactions in order; a subject's events see each other
+    as if they had arrived one by one.
+    """
+    await deps.verify_subjects_in_tenant(
+        db, current_user, _stored_subject_ids(batch.events)
+    )
+    return await realtime_scoring.score_batch(db, batch.events)
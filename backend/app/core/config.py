@@ -33,6 +33,63 @@ class Settings(BaseSettings):
 
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
     MAX_UPLOAD_FILE_SIZE_MB: int = 5  # Default to 5 MB
+    # Streaming ingestion reads the upload incrementally, so it can accept
+    # much larger files than the in-memory path above.
+    MAX_STREAMING_UPLOAD_FILE_SIZE_MB: int = 500
+    INGESTION_BATCH_SIZE: int = 5000  # Rows parsed and inserted per batch
+    INGESTION_QUEUE_MAXSIZE: int = 4  # Parsed batches buffered ahead of inserts
+    MAPPING_CACHE_TTL_SECONDS: int = 30 * 24 * 3600  # Redis TTL for column mappings
+    UPLOAD_SAMPLE_SIZE: int = 1000  # Reservoir sample rows used for mapping preview
+    # Staged uploads never handed to an import job are removed after an hour;
+    # files of queued, failed or checkpointed imports are kept this long
+    INGESTION_JOB_FILE_RETENTION_SECONDS: int = 7 * 24 * 3600
+    # An import job still marked processing that has not checkpointed for this
+    # long is taken to be abandoned by a crashed run and may be resumed
+    INGESTION_JOB_STALE_SECONDS: int = 30 * 60
+
+    # Background job queue: "redis" (falls back to in-process if Redis is
+    # unreachable) or "memory" (single process, tests/dev)
+    JOB_QUEUE_BACKEND: str = "redis"
+    JOB_RESULT_TTL_SECONDS: int = 24 * 3600
+    INGESTION_WORKER_CONCURRENCY: int = 2  # Jobs processed at once per worker
+    # Run the ingestion worker inside the API process instead of separately
+    INGESTION_WORKER_IN_PROCESS: bool = False
+
+    # Shared process pool for CPU-bound work (CSV parsing, ELA, model scoring)
+    CPU_POOL_MAX_WORKERS: int = 2
+
+    # Reconciliation "assignment" strategy: components of the candidate graph
+    # with more rows than this on either side are matched greedily instead
+    RECONCILIATION_ASSIGNMENT_MAX_COMPONENT: int = 2000
+    RECONCILIATION_PAGE_SIZE: int = 5000  # Unmatched rows per keyset page
+    # Incremental matching of newly ingested rows (see reconcile_pending)
+    RECONCILIATION_INCREMENTAL_ENABLED: bool = True
+    RECONCILIATION_INCREMENTAL_THRESHOLD: float = 0.8
+    RECONCILIATION_INCREMENTAL_DATE_BUFFER_DAYS: int = 3
+    # Score newly imported rows against the heuristic rules (rule_features)
+    HEURISTIC_SCORING_ON_IMPORT: bool = True
+    # Seconds a process trusts its cached heuristic rule set before checking
+    # the stored version; Redis pub/sub invalidates it sooner
+    HEURISTIC_RULES_REFRESH_SECONDS: int = 60
+    # Real-time scoring (realtime_scoring): per-subject rolling state lives in
+    # Redis when the job queue uses it, otherwise in the scoring process
+    REALTIME_MODEL_DIR: str = "models"
+    REALTIME_MAX_EVENTS_PER_SUBJECT: int = 5000  # Window events kept per subject
+    REALTIME_MAX_PENDING_INFLOWS: int = 1000  # Turnover FIFO bound per subject
+    REALTIME_MAX_SUBJECTS_IN_MEMORY: int = 100_000  # LRU bound without Redis
+    REALTIME_STATE_TTL_SECONDS: int = 8 * 24 * 3600  # Idle subject state expiry
+    # Seconds a process trusts its loaded ML models before looking for newer ones
+    MODEL_RECHECK_SECONDS: int = 60
+    # Batched mens rea analysis (mens_rea_batch): transactions per keyset page
+    MENS_REA_BATCH_PAGE_SIZE: int = 50_000
+
+    # Reconciliation "hybrid" strategy: rules settle exact matches, the LLM
+    # only sees ambiguous candidate groups
+    RECONCILIATION_EXACT_MATCH_SCORE: float = 0.9  # Accepted without the LLM
+    RECONCILIATION_LLM_CANDIDATE_FLOOR: float = 0.5  # Weakest pair sent to the LLM
+    RECONCILIATION_LLM_BATCH_SIZE: int = 40  # Transactions per prompt
+    RECONCILIATION_LLM_CONCURRENCY: int = 4  # Prompts in flight per run
+    RECONCILIATION_LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
 
     @field_validator("ANTHROPIC_API_KEY")
     @classmethod
@@ -117,6 +117,39 @@ events_created_total = Counter(
     "events_created_total", "Total events created", ["event_type", "aggregate_type"]
 )
 
+# ============================================
+# CPU Work Pool Metrics
+# ============================================
+
+cpu_pool_queue_depth = Gauge(
+    "cpu_pool_queue_depth", "Tasks submitted to the CPU pool and not yet finished"
+)
+
+cpu_pool_task_wait_seconds = Histogram(
+    "cpu_pool_task_wait_seconds",
+    "Time CPU pool tasks spend queued before a worker picks them up",
+    ["task"],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0],
+)
+
+cpu_pool_task_duration_seconds = Histogram(
+    "cpu_pool_task_duration_seconds",
+    "CPU pool task execution time in the worker process",
+    ["task"],
+    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0],
+)
+
+# ============================================
+# Real-time Scoring Metrics
+# ============================================
+
+realtime_scoring_duration_seconds = Histogram(
+    "realtime_scoring_duration_seconds",
+    "Time to score one transaction as it arrives, state round trip included",
+    ["mode"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5],
+)
+
 # ============================================
 # System Metrics
 # ============================================
@@ -127,7 +160,8 @@ process_cpu_usage_percent = Gauge(
 
 process_memory_bytes = Gauge("process_memory_bytes", "Process memory usage in bytes")
 
-process_open_fds = Gauge("process_open_fds", "Number of open file descriptors")
+# Open file descriptors come from prometheus_client's default ProcessCollector,
+# which already registers process_open_fds
 
 # ============================================
 # Metrics Middleware
@@ -219,12 +253,6 @@ def collect_system_metrics():
     memory_info = process.memory_info()
     process_memory_bytes.set(memory_info.rss)
 
-    # Open file descriptors (Unix only)
-    try:
-        process_open_fds.set(process.num_fds())
-    except AttributeError:
-        pass  # Windows doesn't have num_fds
-
 
 # ============================================
 # Metrics Endpoint Handler
@@ -0,0 +1,101 @@
+"""
+Shared CPU Work Pool
+
+Provides:
+- One bounded process pool per application process, sized by
+  CPU_POOL_MAX_WORKERS and only spawned on first use
+- run(): await a picklable module-level callable in the pool, recording
+  queue depth, queue wait and execution time in Prometheus
+- Shutdown hook for the application's shutdown event
+
+Hand large inputs to tasks as file paths rather than bytes: arguments and
+results are pickled across the process boundary.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import (
+    cpu_pool_queue_depth,
+    cpu_pool_task_duration_seconds,
+    cpu_pool_task_wait_seconds,
+)
+
+logger = structlog.get_logger()
+
+
+def _timed_call(func: Callable, args: Tuple) -> Tuple[Any, float]:
+    """Runs in the worker; returns the result and its execution time."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class CPUWorkPool:
+    """Lazily started, bounded ProcessPoolExecutor with metrics."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def max_workers(self) -> int:
+        return max(1, self._max_workers or settings.CPU_POOL_MAX_WORKERS)
+
+    def start(self) -> ProcessPoolExecutor:
+        """Create the pool on first use."""
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and driver
+            # threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info("CPU work pool started", max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, task: str, func: Callable, *args: Any) -> Any:
+        """
+        Run `func(*args)` in the pool and await its result.
+
+        Args:
+            task: Metric label, e.g. "csv_parse"
+            func: Picklable (module-level) callable
+            *args: Picklable arguments; prefer paths over large payloads
+        """
+        executor = self.start()
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        cpu_pool_queue_depth.inc()
+        try:
+            result, duration = await loop.run_in_executor(
+                executor, _timed_call, func, args
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); replace the pool for later tasks
+            logger.error("CPU work pool broken, restarting", task=task)
+            self.shutdown(wait=False)
+            raise
+        finally:
+            cpu_pool_queue_depth.dec()
+
+        elapsed = time.perf_counter() - submitted
+        cpu_pool_task_duration_seconds.labels(task=task).observe(duration)
+        cpu_pool_task_wait_seconds.labels(task=task).observe(max(elapsed - duration, 0))
+        return result
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+# Global CPU work pool instance
+cpu_pool = CPUWorkPool()
@@ -3,11 +3,15 @@ WebSocket server for real-time updates.
 """
 
 from fastapi import WebSocket
-from typing import Dict, Set
+from typing import Dict, Optional, Set
+import json
 import structlog
 
 logger = structlog.get_logger()
 
+# Redis channel carrying events emitted by worker processes
+EVENTS_CHANNEL = "ws:events"
+
 
 class ConnectionManager:
     """Manages WebSocket connections and broadcasts messages."""
@@ -17,6 +21,20 @@ class ConnectionManager:
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         # Map of WebSocket -> user_id
         self.connection_users: Dict[WebSocket, str] = {}
+        # Set in worker processes, which have no sockets of their own
+        self.publisher = None
+
+    def use_redis_relay(self, redis_client):
+        """Publish broadcasts to Redis for the API process to deliver."""
+        self.publisher = redis_client
+
+    async def _publish(self, message: dict, user_id: Optional[str]):
+        try:
+            await self.publisher.publish(
+                EVENTS_CHANNEL, json.dumps({"user_id": user_id, "message": message})
+            )
+        except Exception as e:
+            logger.error("Failed to publish WebSocket event", error=str(e))
 
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept a new WebSocket connection."""
@@ -57,6 +75,9 @@ class ConnectionManager:
 
     async def broadcast_to_user(self, message: dict, user_id: str):
         """Broadcast a message to all connections for a specific user."""
+        if self.publisher is not None:
+            await self._publish(message, user_id)
+            return
         if user_id in self.active_connections:
             disconnected = []
             for connection in self.active_connections[user_id]:
@@ -74,6 +95,9 @@ class ConnectionManager:
 
     async def broadcast_to_all(self, message: dict):
         """Broadcast a message to all connected clients."""
+        if self.publisher is not None:
+            await self._publish(message, None)
+            return
         disconnected = []
         for user_id, connections in self.active_connections.items():
             for connection in connections:
@@ -92,6 +116,27 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
+async def relay_published_events(redis_client):
+    """Deliver events published by worker processes to local connections."""
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(EVENTS_CHANNEL)
+    try:
+        async for item in pubsub.listen():
+            if item.get("type") != "message":
+                continue
+            try:
+                event = json.loads(item["data"])
+            except (TypeError, ValueError):
+                logger.warning("Dropping malformed relayed event")
+                continue
+            if event.get("user_id"):
+                await manager.broadcast_to_user(event["message"], event["user_id"])
+            else:
+                await manager.broadcast_to_all(event["message"])
+    finally:
+        await pubsub.reset()
+
+
 # Event emitter functions
 async def emit_case_created(case_id: str, user_id: str):
     """Emit case_created event."""
@@ -10,6 +10,8 @@ from sqlalchemy import (
     Uuid,
     Numeric,
     Integer,
+    Boolean,
+    Index,
 )
 
 # from sqlalchemy.dialects.postgresql import UUID
@@ -121,6 +123,14 @@ class AuditLog(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Keyset pages of one source type (reconciliation)
+        Index("ix_transactions_source_type_id", "source_type", "id"),
+        # Newest-first keyset pages of the reconciliation ledger
+        Index("ix_transactions_source_type_date_id", "source_type", "date", "id"),
+        # Subject-ordered keyset pages (batched mens rea analysis)
+        Index("ix_transactions_subject_id_id", "subject_id", "id"),
+    )
 
     id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     subject_id = Column(Uuid, ForeignKey("subjects.id"), nullable=False)
@@ -139,6 +149,9 @@ class Transaction(Base):
     )
     source_file_id = Column(String, nullable=True)
     external_id = Column(String, nullable=True)
+    # Natural-key hash (date, amount, description, account, occurrence) used
+    # to skip rows that were already imported
+    row_hash = Column(String(64), nullable=True, index=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -306,11 +319,12 @@ class Match(Base):
     __tablename__ = "matches"
 
     id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    # Indexed for the NOT EXISTS anti-joins that select unmatched rows
     internal_transaction_id = Column(
-        Uuid, ForeignKey("transactions.id"), nullable=False
+        Uuid, ForeignKey("transactions.id"), nullable=False, index=True
     )
     external_transaction_id = Column(
-        Uuid, ForeignKey("transactions.id"), nullable=False
+        Uuid, ForeignKey("transactions.id"), nullable=False, index=True
     )
     confidence = Column(Numeric, default=1.0)
     status = Column(Enum(MatchStatus), default=MatchStatus.MATCHED)
@@ -327,6 +341,38 @@ class Match(Base):
     )
 
 
+class ReconciliationBlock(Base):
+    """
+    Persistent blocking key of an unmatched transaction.
+
+    Rows are written by ingestion and removed once the transaction is
+    matched, so the table is the open candidate pool per tenant. `pending`
+    marks rows not yet reconciled incrementally.
+    """
+
+    __tablename__ = "reconciliation_blocks"
+    __table_args__ = (
+        # Candidate lookups: one tenant and side, nearby amount and date
+        Index(
+            "ix_reconciliation_blocks_lookup",
+            "tenant_id",
+            "source_type",
+            "amount_unit",
+            "date_ordinal",
+        ),
+        Index("ix_reconciliation_blocks_pending", "tenant_id", "pending"),
+    )
+
+    transaction_id = Column(
+        Uuid, ForeignKey("transactions.id", ondelete="CASCADE"), primary_key=True
+    )
+    tenant_id = Column(Uuid, ForeignKey("tenants.id"), nullable=True)
+    source_type = Column(Enum(TransactionSourceType), nullable=False)
+    amount_unit = Column(Integer, nullable=False)  # Whole currency units, floored
+    date_ordinal = Column(Integer, nullable=False)  # date.toordinal()
+    pending = Column(Boolean, nullable=False, default=True)
+
+
 class AnalysisResult(Base):
     __tablename__ = "analysis_results"
 
@@ -346,6 +392,9 @@ class AnalysisResult(Base):
     )  # confirmed_fraud, false_positive, escalated
     reviewer_notes = Column(String, nullable=True)
     reviewer_id = Column(Uuid, ForeignKey("users.id"), nullable=True)
+    # Heuristic rule set version the result was evaluated with (see
+    # HeuristicRuleVersion); None when no rules were involved
+    rule_version = Column(Integer, nullable=True)
 
     # Chain of Custody
     chain_of_custody = Column(JSON, default=list)  # List of custody log entries
@@ -412,6 +461,69 @@ class Event(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class HeuristicRuleVersion(Base):
+    """
+    One saved revision of a heuristic rule.
+
+    Rows are append-only; `version` increases across all rules, so the
+    highest version identifies the whole rule set. The active rules are the
+    built-in defaults overlaid with the latest revision of each rule_id.
+    """
+
+    __tablename__ = "heuristic_rule_versions"
+
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    rule_id = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=False, default="")
+    severity = Column(String, nullable=False)
+    logic = Column(String, nullable=False)
+    enabled = Column(Boolean, nullable=False, default=True)
+    deleted = Column(Boolean, nullable=False, default=False)  # Tombstone
+    created_by = Column(Uuid, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ColumnMappingCache(Base):
+    """Confirmed or suggested CSV column mappings keyed by header signature."""
+
+    __tablename__ = "column_mapping_cache"
+
+    header_signature = Column(String(64), primary_key=True)
+    headers = Column(JSON, nullable=False)  # Original header row
+    mapping = Column(JSON, nullable=False)  # {target_field: source_header}
+    confirmed = Column(Boolean, default=False, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IngestionJob(Base):
+    """Import of one uploaded file, checkpointed after every committed batch."""
+
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    subject_id = Column(Uuid, ForeignKey("subjects.id"), nullable=False, index=True)
+    file_id = Column(String, nullable=False)  # Staged upload name
+    file_sha256 = Column(String(64), nullable=False, index=True)
+    bank_name = Column(String, nullable=False)
+    mapping = Column(JSON, nullable=False)  # {target_field: source_header}
+    # Fixed per job so batch boundaries line up when resuming
+    batch_size = Column(Integer, nullable=False)
+    status = Column(
+        Enum(ProcessingStatus), default=ProcessingStatus.PENDING, nullable=False
+    )
+    last_committed_batch = Column(Integer, default=-1, nullable=False)
+    rows_inserted = Column(Integer, default=0, nullable=False)
+    rows_skipped = Column(Integer, default=0, nullable=False)  # Invalid rows
+    rows_duplicate = Column(Integer, default=0, nullable=False)
+    error = Column(String, nullable=True)
+    created_by = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class Feedback(Base):
     __tablename__ = "feedback"
 
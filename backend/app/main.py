@@ -214,6 +214,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ============================================================================
@@ -236,6 +237,33 @@ async def startup_event():
     except Exception as e:
         logger.warning("Redis cache initialization failed", error=str(e))
 
+    # Background job queue, WebSocket relay for worker events, heuristic
+    # rule change notifications, and the in-process worker when no
+    # separate worker consumes the queue
+    try:
+        import asyncio
+        from app.core.websocket import relay_published_events
+        from app.services.job_queue import job_queue
+        from app.services.rule_store import rule_store
+        from app.workers.ingestion_worker import IngestionWorker
+
+        await job_queue.connect()
+        if job_queue.redis_client is not None:
+            app.state.ws_relay = asyncio.create_task(
+                relay_published_events(job_queue.redis_client)
+            )
+            app.state.rule_listener = asyncio.create_task(
+                rule_store.listen(job_queue.redis_client)
+            )
+        if settings.INGESTION_WORKER_IN_PROCESS or job_queue.backend_name == "memory":
+            app.state.ingestion_worker = IngestionWorker()
+            app.state.ingestion_worker_task = asyncio.create_task(
+                app.state.ingestion_worker.run()
+            )
+            logger.info("In-process ingestion worker started")
+    except Exception as e:
+        logger.warning("Job queue initialization failed", error=str(e))
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -251,6 +279,30 @@ async def shutdown_event():
     except Exception as e:
         logger.warning("Error closing cache", error=str(e))
 
+    # Let running ingestion jobs finish, then close the job queue
+    try:
+        from app.services.job_queue import job_queue
+
+        worker = getattr(app.state, "ingestion_worker", None)
+        if worker is not None:
+            worker.stop()
+            await app.state.ingestion_worker_task
+        for task_name in ("ws_relay", "rule_listener"):
+            task = getattr(app.state, task_name, None)
+            if task is not None:
+                task.cancel()
+        await job_queue.close()
+    except Exception as e:
+        logger.warning("Error closing job queue", error=str(e))
+
+    # Stop the CPU work pool (only running if something used it)
+    try:
+        from app.core.process_pool import cpu_pool
+
+        cpu_pool.shutdown()
+    except Exception as e:
+        logger.warning("Error shutting down CPU work pool", error=str(e))
+
 
 # ============================================================================
 # ROUTES
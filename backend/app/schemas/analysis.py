@@ -8,10 +8,25 @@ class HeuristicRule(BaseModel):
     name: str
     description: str
     severity: str = Field(..., pattern="^(low|medium|high|critical)$")
-    logic: str  # simpleeval expression
+    logic: str  # Rule expression, see app.services.rule_compiler
     enabled: bool = True
 
 
+class HeuristicRuleRevision(HeuristicRule):
+    """A saved revision of a rule; `version` orders revisions of all rules."""
+
+    version: int
+    deleted: bool = False
+    created_at: Optional[datetime] = None
+
+
+class HeuristicRuleSet(BaseModel):
+    """The active rules and the rule set version they make up."""
+
+    version: int
+    rules: List[HeuristicRule]
+
+
 class RuleResult(BaseModel):
     rule_id: str
     rule_name: str
@@ -69,6 +84,7 @@ class AnalysisResultResponse(BaseModel):
     decision: Optional[str] = None
     reviewer_notes: Optional[str] = None
     reviewer_id: Optional[str] = None
+    rule_version: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)  # Allows conversion from ORM models
 
@@ -79,4 +95,33 @@ class AnalysisResult(BaseModel):
     subject_id: str
     risk_score: float
     triggered_rules: List[RuleResult] = []
+    rule_version: Optional[int] = None  # Rule set the rules came from
     created_at: Optional[datetime] = None
+
+
+class ScoringEvent(BaseModel):
+    """A transaction to score as it arrives."""
+
+    id: str
+    subject_id: str
+    amount: float  # Positive for inflows, negative for outflows
+    date: datetime
+    description: Optional[str] = None
+
+
+class ScoringBatch(BaseModel):
+    events: List[ScoringEvent] = Field(..., max_length=5000)
+
+
+class TransactionScore(BaseModel):
+    """Real-time score of one transaction, see app.services.realtime_scoring."""
+
+    transaction_id: str
+    subject_id: str
+    risk_score: float
+    triggered_rules: List[RuleResult] = []
+    indicators: List[Dict[str, Any]] = []  # Detector hits completed by this event
+    features: Dict[str, Any] = {}  # Rule features as of this event
+    fraud_probability: Optional[float] = None  # None without a trained model
+    anomaly_score: Optional[float] = None
+    rule_version: Optional[int] = None
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from uuid import UUID
 
 
 class IndicatorBase(BaseModel):
@@ -44,3 +45,17 @@ class PaginatedAnalysisResult(BaseModel):
     total: int
     page: int
     pages: int
+
+
+class MensReaBatchRequest(BaseModel):
+    """Subjects to analyze: every subject of a tenant, or the listed ones."""
+
+    tenant_id: Optional[UUID] = None
+    subject_ids: Optional[List[UUID]] = Field(None, max_length=100_000)
+
+
+class MensReaBatchJob(BaseModel):
+    job_id: str
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
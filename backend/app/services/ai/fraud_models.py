@@ -0,0 +1,324 @@
+"""
+Fraud and Anomaly Model Scoring
+
+Provides:
+- The latest trained fraud_detection / anomaly_detection models of a model
+  directory, loaded once per process and looked up again at most every
+  MODEL_RECHECK_SECONDS (retrained models are picked up by file mtime)
+- The transaction and anomaly feature vectors the models were trained on
+- CompiledForest: fitted tree ensembles walked for all trees at once, so
+  scoring a single transaction takes well under a millisecond instead of
+  a Python call per tree
+- Scoring one or many transactions in the calling process, and combining
+  the two model outputs into a 0-100 risk score
+
+Kept free of database and notification dependencies so CPU pool workers
+and the real-time scoring path can import it cheaply.
+"""
+
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+@lru_cache(maxsize=8)
+def _load_model_pair(model_path: str, scaler_path: str, mtime: float):
+    # mtime is part of the cache key so retrained models are picked up.
+    # joblib only ships with the optional ML stack; a missing install is
+    # logged by the caller like any other load failure
+    import joblib
+
+    return joblib.load(model_path), joblib.load(scaler_path)
+
+
+def _find_latest(model_dir: str, prefix: str) -> Tuple[Optional[Any], Optional[Any]]:
+    """Latest `<prefix>_v*` model and scaler in a directory."""
+    try:
+        model_files = list(Path(model_dir).glob(f"{prefix}_v*_metadata.json"))
+        if not model_files:
+            return None, None
+
+        latest_model = max(model_files, key=lambda x: x.stat().st_mtime)
+        model_version = latest_model.stem.replace("_metadata", "")
+
+        model_path = Path(model_dir) / f"{model_version}.joblib"
+        scaler_path = Path(model_dir) / f"{model_version}_scaler.joblib"
+
+        if model_path.exists() and scaler_path.exists():
+            return _load_model_pair(
+                str(model_path), str(scaler_path), model_path.stat().st_mtime
+            )
+
+    except Exception as e:
+        logger.error("Failed to load model", prefix=prefix, error=str(e))
+
+    return None, None
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Mean path length of an unsuccessful BST search, as in IsolationForest."""
+    n = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros_like(n)
+    lengths[n == 2] = 1.0
+    big = n > 2
+    lengths[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (
+        n[big] - 1.0
+    ) / n[big]
+    return lengths
+
+
+class CompiledForest:
+    """
+    A fitted scikit-learn tree ensemble as flat NumPy arrays. Every tree is
+    walked at once, one array step per tree level, instead of one Python
+    call per tree - which costs ~10 ms per 100 trees for a single row.
+
+    leaf_values(X) gives each tree's value for each row; only the leaf
+    entries of `values` (one per node, as built by the helpers below)
+    are ever read.
+    """
+
+    def __init__(
+        self,
+        estimators: List[Any],
+        values: List[np.ndarray],
+        estimator_features: Optional[List[np.ndarray]] = None,
+    ):
+        lefts, rights, features, thresholds, roots = [], [], [], [], []
+        offset = 0
+        self.depth = 0
+        for index, estimator in enumerate(estimators):
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            feature = np.where(leaf, 0, tree.feature)
+            if estimator_features is not None:
+                # Trees of a feature-subsampled ensemble index their subset
+                feature = np.asarray(estimator_features[index])[feature]
+            # Leaves point at themselves and always go "left"
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            features.append(feature)
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            roots.append(offset)
+            offset += tree.node_count
+            self.depth = max(self.depth, tree.max_depth)
+
+        self._left = np.concatenate(lefts)
+        self._right = np.concatenate(rights)
+        self._feature = np.concatenate(features)
+        self._threshold = np.concatenate(thresholds)
+        self._roots = np.array(roots)
+        self.values = np.concatenate(values)
+
+    def leaves(self, X: Any) -> np.ndarray:
+        """Leaf node reached by each row in each tree, shape (rows, trees)."""
+        # Trees compare float32 features, as scikit-learn does
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.repeat(self._roots[None, :], len(X), axis=0)
+        for _ in range(self.depth):
+            go_left = X[rows, self._feature[node]] <= self._threshold[node]
+            node = np.where(go_left, self._left[node], self._right[node])
+        return node
+
+    def leaf_values(self, X: Any) -> np.ndarray:
+        return self.values[self.leaves(X)]
+
+    @classmethod
+    def classifier(cls, model: Any) -> "CompiledForest":
+        """Class probabilities per node of a RandomForestClassifier."""
+        values = []
+        for estimator in model.estimators_:
+            counts = estimator.tree_.value[:, 0, :]
+            totals = counts.sum(axis=1, keepdims=True)
+            values.append(counts / np.where(totals == 0, 1, totals))
+        return cls(model.estimators_, values)
+
+    @classmethod
+    def isolation_forest(cls, model: Any) -> "CompiledForest":
+        """Isolation path length per node of an IsolationForest."""
+        values = []
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            depth = np.zeros(tree.node_count)
+            # Nodes are numbered depth first, so parents come before children
+            for node in range(tree.node_count):
+                if tree.children_left[node] != -1:
+                    depth[tree.children_left[node]] = depth[node] + 1
+                    depth[tree.children_right[node]] = depth[node] + 1
+            values.append(depth + _average_path_length(tree.n_node_samples))
+        return cls(model.estimators_, values, model.estimators_features_)
+
+
+@lru_cache(maxsize=8)
+def _compiled(model: Any) -> Optional[CompiledForest]:
+    """The model's compiled form; None for models other than the two forests."""
+    kind = type(model).__name__
+    try:
+        if kind == "RandomForestClassifier":
+            return CompiledForest.classifier(model)
+        if kind == "IsolationForest":
+            return CompiledForest.isolation_forest(model)
+    except Exception as e:
+        logger.error("Failed to compile model", kind=kind, error=str(e))
+    return None
+
+
+def predict_proba(model: Any, X: Any) -> np.ndarray:
+    """model.predict_proba(X), from the compiled forest when there is one."""
+    compiled = _compiled(model)
+    if compiled is None:
+        return model.predict_proba(X)
+    return compiled.leaf_values(X).mean(axis=1)
+
+
+def decision_function(model: Any, X: Any) -> np.ndarray:
+    """model.decision_function(X), from the compiled forest when there is one."""
+    compiled = _compiled(model)
+    if compiled is None:
+        return model.decision_function(X)
+    path_lengths = compiled.leaf_values(X).mean(axis=1)
+    scores = -(2.0 ** (-path_lengths / _average_path_length([model.max_samples_])[0]))
+    return scores - model.offset_
+
+
+# (model_dir, prefix) -> (time.monotonic() of the lookup, (model, scaler))
+_latest_models: Dict[Tuple[str, str], Tuple[float, Tuple[Any, Any]]] = {}
+
+
+def load_latest(model_dir: str, prefix: str) -> Tuple[Optional[Any], Optional[Any]]:
+    """
+    Latest `<prefix>_v*` model and scaler, cached per process. The
+    directory is searched again at most every MODEL_RECHECK_SECONDS.
+    """
+    now = time.monotonic()
+    cached = _latest_models.get((model_dir, prefix))
+    if cached and now - cached[0] < settings.MODEL_RECHECK_SECONDS:
+        return cached[1]
+    models = _find_latest(model_dir, prefix)
+    _latest_models[(model_dir, prefix)] = (now, models)
+    return models
+
+
+def extract_transaction_features(transaction_data: Dict[str, Any]) -> List[float]:
+    """Extract features from transaction data for ML prediction."""
+    amount = transaction_data.get("amount", 0)
+    timestamp = transaction_data.get("timestamp", datetime.utcnow())
+
+    # Time-based features
+    hour = timestamp.hour
+    is_weekend = timestamp.weekday() >= 5
+    is_business_hours = 9 <= hour <= 17
+
+    # Amount-based features
+    amount_log = np.log1p(amount) if amount > 0 else 0
+    is_round_amount = amount % 100 == 0
+    is_high_amount = amount > 10000
+
+    # Merchant-based features (simplified)
+    merchant = (transaction_data.get("merchant") or "").lower()
+    is_online = any(word in merchant for word in ["online", "web", "internet"])
+    is_foreign = any(word in merchant for word in ["international", "foreign"])
+
+    return [
+        amount,
+        amount_log,
+        hour,
+        int(is_weekend),
+        int(is_business_hours),
+        int(is_round_amount),
+        int(is_high_amount),
+        int(is_online),
+        int(is_foreign),
+    ]
+
+
+def extract_anomaly_features(transaction_data: Dict[str, Any]) -> List[float]:
+    """Extract features for anomaly detection."""
+    amount = transaction_data.get("amount", 0)
+    timestamp = transaction_data.get("timestamp", datetime.utcnow())
+
+    return [
+        amount,
+        timestamp.hour,
+        timestamp.weekday(),
+        np.log1p(amount) if amount > 0 else 0,
+    ]
+
+
+def combine_predictions(
+    fraud_probability: float, anomaly_score: Optional[float]
+) -> float:
+    """Combine fraud probability and anomaly score into final risk score."""
+    if anomaly_score is None:
+        return fraud_probability * 100
+
+    # Convert anomaly score to 0-100 scale (lower anomaly score = higher risk)
+    anomaly_risk = max(0, (anomaly_score * -1 + 0.5) * 200)  # Convert to 0-100
+
+    # Weighted combination
+    combined_score = (fraud_probability * 0.7 + anomaly_risk / 100 * 0.3) * 100
+
+    return min(combined_score, 100)
+
+
+def score_many_with_latest_models(
+    model_dir: str,
+    features: List[List[float]],
+    anomaly_features: List[List[float]],
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Score many transactions with one call per model, in the calling
+    process. Returns None when no fraud model is trained.
+    """
+    fraud_model, scaler = load_latest(model_dir, "fraud_detection")
+    if not fraud_model:
+        return None
+
+    features_scaled = scaler.transform(features)
+    probabilities = predict_proba(fraud_model, features_scaled)
+    fraud_probabilities = probabilities[:, 1]
+    # predict() is the most probable class
+    is_fraud_predictions = fraud_model.classes_[probabilities.argmax(axis=1)]
+
+    anomaly_scores: List[Optional[float]] = [None] * len(features)
+    anomaly_model, anomaly_scaler = load_latest(model_dir, "anomaly_detection")
+    if anomaly_model:
+        anomaly_features_scaled = anomaly_scaler.transform(anomaly_features)
+        anomaly_scores = [
+            float(score)
+            for score in decision_function(anomaly_model, anomaly_features_scaled)
+        ]
+
+    return [
+        {
+            "fraud_probability": float(fraud_probability),
+            "is_fraud_prediction": bool(is_fraud_prediction),
+            "anomaly_score": anomaly_score,
+        }
+        for fraud_probability, is_fraud_prediction, anomaly_score in zip(
+            fraud_probabilities, is_fraud_predictions, anomaly_scores
+        )
+    ]
+
+
+def score_with_latest_models(
+    model_dir: str, features: List[float], anomaly_features: List[float]
+) -> Optional[Dict[str, Any]]:
+    """
+    Score one transaction with the latest fraud and anomaly models.
+
+    Runs in the CPU work pool. Returns None when no fraud model is trained.
+    """
+    scores = score_many_with_latest_models(model_dir, [features], [anomaly_features])
+    return scores[0] if scores else None
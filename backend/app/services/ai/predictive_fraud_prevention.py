@@ -1,13 +1,20 @@
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
-import joblib
 from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import desc, and_
+from app.core.process_pool import cpu_pool
 from app.db.models import Subject, Transaction, AuditLog
 from app.db.models import AnalysisResult
+from app.services.ai.fraud_models import (
+    combine_predictions,
+    extract_anomaly_features,
+    extract_transaction_features,
+    load_latest,
+    score_with_latest_models,
+)
 from app.services.ai.ml_model_trainer import MLModelTrainer
 from app.services.notification_service import NotificationService
 
@@ -30,28 +37,25 @@ class PredictiveFraudPrevention:
         """
         # Extract features from transaction
         features = self._extract_transaction_features(transaction_data)
+        anomaly_features = self._extract_anomaly_features(transaction_data)
+
+        # Model loading and inference run in the shared CPU pool, where
+        # loaded models are cached per worker process
+        scores = await cpu_pool.run(
+            "model_scoring",
+            score_with_latest_models,
+            str(self.model_dir),
+            features,
+            anomaly_features,
+        )
 
-        # Load latest fraud detection model
-        fraud_model, scaler = await self._load_latest_fraud_model()
-
-        if not fraud_model:
+        if scores is None:
             # Fallback to rule-based analysis
             return await self._rule_based_transaction_analysis(transaction_data, db)
 
-        # Scale features and predict
-        features_scaled = scaler.transform([features])
-        fraud_probability = fraud_model.predict_proba(features_scaled)[0][1]
-        is_fraud_prediction = fraud_model.predict(features_scaled)[0]
-
-        # Load anomaly detection model
-        anomaly_model, anomaly_scaler = await self._load_latest_anomaly_model()
-
-        anomaly_score = None
-        if anomaly_model:
-            # Extract anomaly features
-            anomaly_features = self._extract_anomaly_features(transaction_data)
-            anomaly_features_scaled = anomaly_scaler.transform([anomaly_features])
-            anomaly_score = anomaly_model.decision_function(anomaly_features_scaled)[0]
+        fraud_probability = scores["fraud_probability"]
+        is_fraud_prediction = scores["is_fraud_prediction"]
+        anomaly_score = scores["anomaly_score"]
 
         # Combine predictions
         final_risk_score = self._combine_predictions(fraud_probability, anomaly_score)
@@ -176,98 +180,21 @@ class PredictiveFraudPrevention:
         self, transaction_data: Dict[str, Any]
     ) -> List[float]:
         """Extract features from transaction data for ML prediction."""
-        amount = transaction_data.get("amount", 0)
-        timestamp = transaction_data.get("timestamp", datetime.utcnow())
-
-        # Time-based features
-        hour = timestamp.hour
-        is_weekend = timestamp.weekday() >= 5
-        is_business_hours = 9 <= hour <= 17
-
-        # Amount-based features
-        amount_log = np.log1p(amount) if amount > 0 else 0
-        is_round_amount = amount % 100 == 0
-        is_high_amount = amount > 10000
-
-        # Merchant-based features (simplified)
-        merchant = transaction_data.get("merchant", "").lower()
-        is_online = any(word in merchant for word in ["online", "web", "internet"])
-        is_foreign = any(word in merchant for word in ["international", "foreign"])
-
-        return [
-            amount,
-            amount_log,
-            hour,
-            int(is_weekend),
-            int(is_business_hours),
-            int(is_round_amount),
-            int(is_high_amount),
-            int(is_online),
-            int(is_foreign),
-        ]
+        return extract_transaction_features(transaction_data)
 
     def _extract_anomaly_features(
         self, transaction_data: Dict[str, Any]
     ) -> List[float]:
         """Extract features for anomaly detection."""
-        amount = transaction_data.get("amount", 0)
-        timestamp = transaction_data.get("timestamp", datetime.utcnow())
-
-        return [
-            amount,
-            timestamp.hour,
-            timestamp.weekday(),
-            np.log1p(amount) if amount > 0 else 0,
-        ]
+        return extract_anomaly_features(transaction_data)
 
     async def _load_latest_fraud_model(self) -> Tuple[Optional[Any], Optional[Any]]:
         """Load the latest fraud detection model."""
-        try:
-            # Find latest fraud detection model
-            model_files = list(self.model_dir.glob("fraud_detection_v*_metadata.json"))
-            if not model_files:
-                return None, None
-
-            latest_model = max(model_files, key=lambda x: x.stat().st_mtime)
-            model_version = latest_model.stem.replace("_metadata", "")
-
-            model_path = self.model_dir / f"{model_version}.joblib"
-            scaler_path = self.model_dir / f"{model_version}_scaler.joblib"
-
-            if model_path.exists() and scaler_path.exists():
-                model = joblib.load(model_path)
-                scaler = joblib.load(scaler_path)
-                return model, scaler
-
-        except Exception as e:
-            print(f"Error loading fraud model: {e}")
-
-        return None, None
+        return load_latest(str(self.model_dir), "fraud_detection")
 
     async def _load_latest_anomaly_model(self) -> Tuple[Optional[Any], Optional[Any]]:
         """Load the latest anomaly detection model."""
-        try:
-            model_files = list(
-                self.model_dir.glob("anomaly_detection_v*_metadata.json")
-            )
-            if not model_files:
-                return None, None
-
-            latest_model = max(model_files, key=lambda x: x.stat().st_mtime)
-            model_version = latest_model.stem.replace("_metadata", "")
-
-            model_path = self.model_dir / f"{model_version}.joblib"
-            scaler_path = self.model_dir / f"{model_version}_scaler.joblib"
-
-            if model_path.exists() and scaler_path.exists():
-                model = joblib.load(model_path)
-                scaler = joblib.load(scaler_path)
-                return model, scaler
-
-        except Exception as e:
-            print(f"Error loading anomaly model: {e}")
-
-        return None, None
+        return load_latest(str(self.model_dir), "anomaly_detection")
 
     async def _rule_based_transaction_analysis(
         self, transaction_data: Dict[str, Any], db: AsyncSession
@@ -317,16 +244,7 @@ class PredictiveFraudPrevention:
         self, fraud_probability: float, anomaly_score: Optional[float]
     ) -> float:
         """Combine fraud probability and anomaly score into final risk score."""
-        if anomaly_score is None:
-            return fraud_probability * 100
-
-        # Convert anomaly score to 0-100 scale (lower anomaly score = higher risk)
-        anomaly_risk = max(0, (anomaly_score * -1 + 0.5) * 200)  # Convert to 0-100
-
-        # Weighted combination
-        combined_score = (fraud_probability * 0.7 + anomaly_risk / 100 * 0.3) * 100
-
-        return min(combined_score, 100)
+        return combine_predictions(fraud_probability, anomaly_score)
 
     def _generate_prevention_recommendations(
         self,
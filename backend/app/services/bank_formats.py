@@ -0,0 +1,291 @@
+"""
+Bank Statement Format Registry
+
+Declarative bank format specs (column names, date formats, sign conventions,
+encoding) that compile once into vectorized parsers.
+
+Provides:
+- BankFormatSpec: the declarative description of one export format
+- CompiledBankParser: a spec resolved against a concrete header row
+- BankFormatRegistry: lookup by name or alias, header auto-detection, and a
+  per-process cache of compiled parsers
+"""
+
+import csv
+import io
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Dict, List, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+
+from app.services.columnar_mapping import (
+    MappingResult,
+    build_result,
+    clean_amounts,
+    coalesce,
+    parse_dates,
+    to_cents,
+)
+
+SIGN_SIGNED = "signed"  # Amount column is already signed (+ in, - out)
+SIGN_INVERTED = "inverted"  # Amount column is positive for outflows
+SIGN_DEBIT_CREDIT = "debit_credit"  # Separate unsigned debit/credit columns
+
+GENERIC_FORMAT = "generic"
+
+
+@dataclass(frozen=True)
+class BankFormatSpec:
+    """Declarative description of a bank's CSV export format."""
+
+    name: str
+    date_columns: Tuple[str, ...]
+    description_columns: Tuple[str, ...]
+    # Tried in order; "ISO8601" selects pandas' ISO parser
+    date_formats: Tuple[str, ...]
+    amount_columns: Tuple[str, ...] = ()
+    debit_columns: Tuple[str, ...] = ()
+    credit_columns: Tuple[str, ...] = ()
+    sign_convention: str = SIGN_SIGNED
+    currency: str = "USD"
+    encoding: str = "utf-8"
+    delimiter: str = ","
+    aliases: Tuple[str, ...] = ()
+    # Extra headers that identify this format during auto-detection
+    signature_columns: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        if self.sign_convention == SIGN_DEBIT_CREDIT:
+            if not self.debit_columns or not self.credit_columns:
+                raise ValueError(
+                    f"Bank format '{self.name}' needs debit and credit columns"
+                )
+        elif self.sign_convention in (SIGN_SIGNED, SIGN_INVERTED):
+            if not self.amount_columns:
+                raise ValueError(f"Bank format '{self.name}' needs amount columns")
+        else:
+            raise ValueError(
+                f"Unknown sign convention '{self.sign_convention}' for '{self.name}'"
+            )
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        """Every header this spec knows about."""
+        return (
+            self.date_columns
+            + self.description_columns
+            + self.amount_columns
+            + self.debit_columns
+            + self.credit_columns
+            + self.signature_columns
+        )
+
+
+def _resolve(candidates: Sequence[str], lookup: Dict[str, str]) -> Tuple[str, ...]:
+    """Map spec column names to the actual (case-preserved) header names."""
+    return tuple(
+        lookup[name.lower()] for name in candidates if name.lower() in lookup
+    )
+
+
+class CompiledBankParser:
+    """
+    A bank format spec bound to one concrete header row.
+
+    Column resolution happens once at compile time, so parsing a chunk is
+    pure column arithmetic with no per-row branching.
+    """
+
+    def __init__(self, spec: BankFormatSpec, headers: Tuple[str, ...]):
+        self.spec = spec
+        self.headers = headers
+        lookup: Dict[str, str] = {}
+        for header in headers:
+            lookup.setdefault(str(header).strip().lower(), header)
+
+        self.date_columns = _resolve(spec.date_columns, lookup)
+        self.description_columns = _resolve(spec.description_columns, lookup)
+        self.amount_columns = _resolve(spec.amount_columns, lookup)
+        self.debit_columns = _resolve(spec.debit_columns, lookup)
+        self.credit_columns = _resolve(spec.credit_columns, lookup)
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether the header row has every column this spec requires."""
+        if not self.date_columns:
+            return False
+        if self.spec.sign_convention == SIGN_DEBIT_CREDIT:
+            return bool(self.debit_columns or self.credit_columns)
+        return bool(self.amount_columns)
+
+    def parse(self, df: pd.DataFrame, row_offset: int = 0) -> MappingResult:
+        """Map a chunk of raw text columns to transaction fields."""
+        date_text = coalesce(df, self.date_columns)
+        dates = parse_dates(date_text, self.spec.date_formats)
+        description = coalesce(df, self.description_columns)
+
+        if self.spec.sign_convention == SIGN_DEBIT_CREDIT:
+            debit_text = clean_amounts(coalesce(df, self.debit_columns))
+            credit_text = clean_amounts(coalesce(df, self.credit_columns))
+            amount_present = (debit_text != "") | (credit_text != "")
+            debit = to_cents(debit_text).abs()
+            credit = to_cents(credit_text).abs()
+            # A blank side counts as zero; a non-numeric side invalidates the row
+            debit = debit.where(debit_text != "", 0.0)
+            credit = credit.where(credit_text != "", 0.0)
+            amount_cents = credit - debit
+        else:
+            amount_text = clean_amounts(coalesce(df, self.amount_columns))
+            amount_present = amount_text != ""
+            amount_cents = to_cents(amount_text)
+            if self.spec.sign_convention == SIGN_INVERTED:
+                amount_cents = -amount_cents
+
+        return build_result(
+            date_text,
+            dates,
+            amount_present,
+            amount_cents,
+            description,
+            self.spec.currency,
+            row_offset=row_offset,
+        )
+
+
+@lru_cache(maxsize=512)
+def _compile(spec: BankFormatSpec, headers: Tuple[str, ...]) -> CompiledBankParser:
+    return CompiledBankParser(spec, headers)
+
+
+class BankFormatRegistry:
+    """Registry of bank format specs, selectable by name or header row."""
+
+    def __init__(self, default: str = GENERIC_FORMAT):
+        self._specs: Dict[str, BankFormatSpec] = {}
+        self._names: Dict[str, str] = {}  # lowercase name/alias -> spec name
+        # lowercase header -> spec names using it, for O(headers) detection
+        self._column_index: Dict[str, Set[str]] = {}
+        self.default = default
+
+    def register(self, spec: BankFormatSpec) -> BankFormatSpec:
+        """Add or replace a format spec."""
+        self._specs[spec.name] = spec
+        for name in (spec.name,) + spec.aliases:
+            self._names[name.lower()] = spec.name
+        for column in spec.columns:
+            self._column_index.setdefault(column.lower(), set()).add(spec.name)
+        return spec
+
+    def names(self) -> List[str]:
+        return sorted(self._specs)
+
+    def get(self, name: Optional[str]) -> Optional[BankFormatSpec]:
+        """Look up a spec by name or alias (case-insensitive)."""
+        spec_name = self._names.get((name or "").strip().lower())
+        return self._specs.get(spec_name) if spec_name else None
+
+    def detect(self, headers: Sequence[str]) -> Optional[BankFormatSpec]:
+        """
+        Pick the spec whose known columns best match a header row.
+
+        Only specs whose required columns are all present are eligible; among
+        those, the one recognising the most headers wins, with ties going to
+        the default spec so plain "date,amount,description" files stay generic.
+        """
+        hits: Dict[str, int] = {}
+        for header in {str(h).strip().lower() for h in headers}:
+            for spec_name in self._column_index.get(header, ()):
+                hits[spec_name] = hits.get(spec_name, 0) + 1
+
+        header_tuple = tuple(headers)
+        ranked = sorted(
+            hits.items(),
+            key=lambda item: (-item[1], item[0] != self.default, item[0]),
+        )
+        for spec_name, _ in ranked:
+            spec = self._specs[spec_name]
+            if self.compile(spec, header_tuple).is_complete:
+                return spec
+        return None
+
+    def resolve(
+        self, bank_name: Optional[str], headers: Sequence[str]
+    ) -> BankFormatSpec:
+        """Spec by name, else by header detection, else the default spec."""
+        return (
+            self.get(bank_name) or self.detect(headers) or self._specs[self.default]
+        )
+
+    def compile(
+        self, spec: BankFormatSpec, headers: Sequence[str]
+    ) -> CompiledBankParser:
+        """Compiled parser for a spec and header row, cached per process."""
+        return _compile(spec, tuple(headers))
+
+
+def read_header_row(file_obj: BinaryIO, encoding: str = "utf-8") -> List[str]:
+    """Read the header row of a CSV stream and rewind to where it started."""
+    start = file_obj.tell()
+    first_line = file_obj.readline()
+    file_obj.seek(start)
+    text = first_line.decode(encoding, errors="replace").lstrip("\ufeff")
+    rows = list(csv.reader(io.StringIO(text)))
+    return rows[0] if rows else []
+
+
+bank_format_registry = BankFormatRegistry()
+
+bank_format_registry.register(
+    BankFormatSpec(
+        name=GENERIC_FORMAT,
+        date_columns=("date", "transaction date", "posting date"),
+        amount_columns=("amount",),
+        description_columns=("description", "memo", "details"),
+        date_formats=("ISO8601", "%m/%d/%Y"),
+    )
+)
+bank_format_registry.register(
+    BankFormatSpec(
+        name="chase",
+        date_columns=("Posting Date", "Date"),
+        amount_columns=("Amount",),
+        description_columns=("Description", "Memo"),
+        date_formats=("%m/%d/%Y",),
+        signature_columns=("Details", "Type", "Balance", "Check or Slip #"),
+    )
+)
+bank_format_registry.register(
+    BankFormatSpec(
+        name="wells_fargo",
+        date_columns=("date",),
+        amount_columns=("amount",),
+        description_columns=("description",),
+        date_formats=("%m/%d/%Y",),
+        aliases=("wells fargo", "wellsfargo"),
+    )
+)
+bank_format_registry.register(
+    BankFormatSpec(
+        name="bank_of_america",
+        date_columns=("Date",),
+        amount_columns=("Amount",),
+        description_columns=("Description",),
+        date_formats=("%m/%d/%Y",),
+        aliases=("bofa", "bank of america"),
+        signature_columns=("Running Bal.",),
+    )
+)
+bank_format_registry.register(
+    BankFormatSpec(
+        name="capital_one",
+        date_columns=("Transaction Date", "Posted Date"),
+        debit_columns=("Debit",),
+        credit_columns=("Credit",),
+        description_columns=("Description",),
+        date_formats=("ISO8601", "%m/%d/%Y"),
+        sign_convention=SIGN_DEBIT_CREDIT,
+        aliases=("capital one", "capitalone"),
+        signature_columns=("Card No.", "Category"),
+    )
+)
@@ -0,0 +1,165 @@
+"""
+Columnar Row Mapping for Bank Statement Ingestion
+
+Vectorized building blocks used by the compiled bank format parsers
+(see app.services.bank_formats) to map a whole DataFrame at once instead of
+mapping CSV rows one by one:
+- Column coalescing (e.g. "Posting Date" falling back to "Date")
+- Vectorized date parsing with explicit formats, tried in order
+- Vectorized amount cleaning ($, thousands separators, (negatives)) and
+  exact conversion of plain decimal text to whole cents
+- A rejected-rows report instead of per-row error output
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class MappingResult:
+    """Mapped transactions plus the rows that could not be mapped."""
+
+    frame: pd.DataFrame  # columns: date, amount_cents, description, currency
+    rejected: pd.DataFrame  # columns: row, reason
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Convert mapped rows to Transaction field dicts."""
+        dates = self.frame["date"].dt.to_pydatetime()
+        # Integer cents keep amounts exact on the way to Decimal
+        amounts = [Decimal(int(c)).scaleb(-2) for c in self.frame["amount_cents"]]
+        descriptions = self.frame["description"].tolist()
+        currencies = self.frame["currency"].tolist()
+        return [
+            {
+                "date": d,
+                "description": desc,
+                "amount": a,
+                "currency": c,
+            }
+            for d, desc, a, c in zip(dates, descriptions, amounts, currencies)
+        ]
+
+    def rejected_report(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """First `limit` rejected rows as JSON-serializable dicts."""
+        return self.rejected.head(limit).to_dict(orient="records")
+
+
+def coalesce(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """First non-empty value across candidate columns, per row."""
+    result = pd.Series("", index=df.index, dtype=object)
+    for column in columns:
+        if column not in df.columns:
+            continue
+        values = df[column].fillna("").astype(str).str.strip()
+        result = result.where(result != "", values)
+    return result
+
+
+def parse_dates(values: pd.Series, formats: Sequence[str]) -> pd.Series:
+    """Parse date strings trying each explicit format on the remaining rows."""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    remaining = values != ""
+    for fmt in formats:
+        if not remaining.any():
+            break
+        attempt = pd.to_datetime(values[remaining], format=fmt, errors="coerce")
+        if getattr(attempt.dt, "tz", None) is not None:
+            attempt = attempt.dt.tz_convert(None)
+        parsed.loc[attempt.index] = parsed.loc[attempt.index].fillna(attempt)
+        remaining = remaining & parsed.isna()
+    return parsed
+
+
+def clean_amounts(values: pd.Series) -> pd.Series:
+    """Normalize amount text: strip currency symbols/separators, (x) -> -x."""
+    cleaned = values.str.replace(r"[\$,\s]", "", regex=True)
+    return cleaned.str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+
+
+# Plain decimal amounts: no exponent, inf or nan, and few enough digits that
+# every whole number of cents is exact in a float64
+AMOUNT_PATTERN = r"^([+-]?)(\d{0,13})(?:\.(\d*))?$"
+
+
+def valid_amounts(amount_text: pd.Series) -> pd.Series:
+    """True where cleaned amount text is a finite plain decimal number."""
+    parts = amount_text.str.extract(AMOUNT_PATTERN)
+    return parts[1].fillna("").ne("") | parts[2].fillna("").ne("")
+
+
+def to_cents(amount_text: pd.Series) -> pd.Series:
+    """
+    Cleaned amount text to whole cents (NaN where not a plain decimal).
+
+    Computed on the digits, never through binary floating point: extra
+    decimals round half to even on the exact value, like Decimal.quantize.
+    The result is float only to carry NaN; every value is a whole number.
+    """
+    parts = amount_text.str.extract(AMOUNT_PATTERN)
+    sign, units, fraction = parts[0], parts[1].fillna(""), parts[2].fillna("")
+    valid = units.ne("") | fraction.ne("")
+
+    fraction = fraction.str.pad(2, side="right", fillchar="0")
+    whole = units.str.pad(1, fillchar="0").astype("int64")
+    cents = whole * 100 + fraction.str[:2].astype("int64")
+    rest = fraction.str[2:].str.rstrip("0")
+    # rest holds the digits after the cents, so "5" is exactly half a cent
+    round_up = (rest > "5") | ((rest == "5") & (cents % 2 == 1))
+    cents = (cents + round_up).where(sign != "-", -(cents + round_up))
+    return cents.astype("float64").where(valid)
+
+
+def build_result(
+    date_text: pd.Series,
+    dates: pd.Series,
+    amount_present: pd.Series,
+    amount_cents: pd.Series,
+    description: pd.Series,
+    currency: str,
+    row_offset: int = 0,
+) -> MappingResult:
+    """
+    Assemble a MappingResult from parsed columns, rejecting incomplete rows.
+
+    Args:
+        date_text: Raw (coalesced) date text
+        dates: Parsed dates, NaT where invalid
+        amount_present: True where any amount text was supplied
+        amount_cents: Signed amounts in cents, NaN where invalid
+        description: Description text
+        currency: Currency code for every row
+        row_offset: Rows already consumed, when mapping one chunk of a file
+    """
+    missing_date = (date_text == "").to_numpy()
+    missing_amount = (~amount_present).to_numpy()
+    bad_date = dates.isna().to_numpy()
+    bad_amount = amount_cents.isna().to_numpy()
+
+    reasons = np.select(
+        [missing_date, missing_amount, bad_date, bad_amount],
+        ["Missing date", "Missing amount", "Invalid date", "Invalid amount"],
+        default="",
+    )
+    valid = reasons == ""
+
+    description = description[valid]
+    frame = pd.DataFrame(
+        {
+            "date": dates[valid],
+            "amount_cents": amount_cents[valid].astype("int64"),
+            "description": description.where(description != "", None),
+            "currency": currency,
+        }
+    )
+    rejected = pd.DataFrame(
+        {
+            # 1-based data row number (the header is not counted)
+            "row": (np.flatnonzero(~valid) + row_offset + 1).tolist(),
+            "reason": reasons[~valid].tolist(),
+        }
+    )
+    return MappingResult(frame=frame, rejected=rejected)
@@ -0,0 +1,152 @@
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class MirrorPair:
+    """An amount going one way and the same amount going back soon after."""
+
+    first_id: Any
+    second_id: Any
+    amount_cents: int  # Absolute amount
+    first_date: datetime
+    second_date: datetime
+
+    @property
+    def amount(self) -> float:
+        return self.amount_cents / 100
+
+    @property
+    def hours_apart(self) -> float:
+        return (self.second_date - self.first_date) / timedelta(hours=1)
+
+
+def _cents(amount: Any) -> Optional[int]:
+    try:
+        # str() keeps float amounts from carrying binary noise into cents
+        return int((Decimal(str(amount)) * 100).to_integral_value())
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+@dataclass
+class _Waiting:
+    date: datetime
+    id: Any
+    amount_cents: int  # Absolute amount
+    is_credit: bool
+    paired: bool = False
+
+
+class MirrorMatcher:
+    """
+    Incremental sweep for entries arriving in time order: each one pairs
+    with the oldest unpaired opposite-sign entry of the same absolute
+    amount less than `window` earlier, or waits for a later one.
+
+    Memory is bounded by the entries of the last `window`; older ones are
+    dropped as time advances.
+    """
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        # Unpaired entries per (absolute cents, is_credit), oldest first
+        self._waiting: Dict[Tuple[int, bool], Deque[_Waiting]] = {}
+        self._arrivals: Deque[_Waiting] = deque()
+
+    def _expire(self, now: datetime) -> None:
+        while self._arrivals and now - self._arrivals[0].date >= self.window:
+            entry = self._arrivals.popleft()
+            if entry.paired:
+                continue
+            # Queues are in arrival order, so it is the oldest of its queue
+            key = (entry.amount_cents, entry.is_credit)
+            self._waiting[key].popleft()
+            if not self._waiting[key]:
+                del self._waiting[key]
+
+    def _park(self, entry: _Waiting) -> None:
+        key = (entry.amount_cents, entry.is_credit)
+        self._waiting.setdefault(key, deque()).append(entry)
+        self._arrivals.append(entry)
+
+    def add(
+        self, tx_id: Any, amount: Any, date: Optional[datetime]
+    ) -> Optional[MirrorPair]:
+        """The pair this entry completes, if any; undated and zero are ignored."""
+        cents = _cents(amount)
+        if not cents or date is None:
+            return None
+        self._expire(date)
+
+        amount_cents, is_credit = abs(cents), cents > 0
+        opposite_key = (amount_cents, not is_credit)
+        opposite = self._waiting.get(opposite_key)
+        if opposite:
+            first = opposite.popleft()
+            first.paired = True
+            if not opposite:
+                del self._waiting[opposite_key]
+            return MirrorPair(first.id, tx_id, amount_cents, first.date, date)
+
+        self._park(_Waiting(date, tx_id, amount_cents, is_credit))
+        return None
+
+    def dump_state(self) -> List[List[Any]]:
+        """Unpaired entries as [iso date, id, signed cents], oldest first."""
+        return [
+            [
+                entry.date.isoformat(),
+                entry.id,
+                entry.amount_cents if entry.is_credit else -entry.amount_cents,
+            ]
+            for entry in self._arrivals
+            if not entry.paired
+        ]
+
+    @classmethod
+    def load_state(
+        cls, window: timedelta, state: List[List[Any]]
+    ) -> "MirrorMatcher":
+        matcher = cls(window)
+        for date, tx_id, cents in state:
+            # Waiting entries never pair with each other, so no sweep is needed
+            matcher._park(
+                _Waiting(datetime.fromisoformat(date), tx_id, abs(cents), cents > 0)
+            )
+        return matcher
+
+
+def find_mirror_pairs(
+    entries: Iterable[Tuple[Any, Any, Optional[datetime]]], window: timedelta
+) -> List[MirrorPair]:
+    """
+    Pair opposite-sign transactions of equal absolute amount less than
+    `window` apart.
+
+    Entries are (id, amount, date). They are sorted by time and swept once
+    by a MirrorMatcher, which keeps FIFO queues of unpaired credits and
+    debits per absolute amount in integer cents; each transaction pairs
+    with the oldest unpaired opposite one still inside the window.
+    Sorting dominates, so the cost is O(n log n) with no look-ahead limit.
+    Undated and zero-amount entries are skipped.
+    """
+    dated = [
+        (date, order, tx_id, amount)
+        for order, (tx_id, amount, date) in enumerate(entries)
+        if date is not None
+    ]
+    dated.sort(key=lambda entry: (entry[0], entry[1]))
+
+    matcher = MirrorMatcher(window)
+    pairs: List[MirrorPair] = []
+    for date, _, tx_id, amount in dated:
+        pair = matcher.add(tx_id, amount, date)
+        if pair is not None:
+            pairs.append(pair)
+
+    pairs.sort(key=lambda pair: (pair.first_date, pair.second_date))
+    return pairs
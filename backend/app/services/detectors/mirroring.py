@@ -1,4 +1,8 @@
-from typing import List, Dict, Any
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+
+from app.services.detectors.mirror_pairs import find_mirror_pairs
+from app.services.detectors.timeline import parse_time
 
 
 class MirroringDetector:
@@ -8,48 +12,50 @@ class MirroringDetector:
     appearance of activity (wash trading).
     """
 
+    WINDOW = timedelta(hours=24)  # Max time between the two legs
+    MAX_LISTED_PAIRS = 20  # Pairs listed in the evidence per amount
+
+    def __init__(self, window: Optional[timedelta] = None):
+        if window is not None:
+            self.WINDOW = window
+
     def detect(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         indicators = []
 
-        # Logic: Look for pairs of transactions where:
-        # 1. Amount is identical (or very close).
-        # 2. Source and Destination accounts belong to the same Subject (if known)
-        #    OR simply look for In/Out patterns that cancel each other out rapidly.
-
-        # For Phase 2 MVP, we'll simulate detection based on a "counterparty" field
-        # In a real scenario, we'd need a graph or account ownership mapping.
-
-        # Group by amount to find potential mirrors
-        amount_map = {}
-        for tx in transactions:
-            amt = float(tx.get("amount", 0))
-            if amt == 0:
-                continue
-
-            # Use absolute amount for grouping
-            abs_amt = abs(amt)
-            if abs_amt not in amount_map:
-                amount_map[abs_amt] = []
-            amount_map[abs_amt].append(tx)
-
-        for amt, txs in amount_map.items():
-            if len(txs) >= 2:
-                # Check if we have both credit and debit of same amount
-                # Or if we have transfers between known owned accounts
-
-                # Simplified logic: If we see same amount appearing multiple times
-                # within a short window, flag it as potential mirroring/wash trading.
-
-                indicators.append(
-                    {
-                        "type": "mirroring_suspected",
-                        "confidence": 0.6,
-                        "evidence": {
-                            "amount": amt,
-                            "transaction_count": len(txs),
-                            "reason": f"Repeated transactions of exact amount ${amt} detected, potential cashflow inflation.",
-                        },
-                    }
-                )
+        # Logic: an amount going out and the same amount coming back (or the
+        # reverse) within a short window; same-direction repeats are not
+        # mirrors
+        pairs = find_mirror_pairs(
+            (
+                (tx.get("id"), tx.get("amount", 0), parse_time(tx.get("date")))
+                for tx in transactions
+            ),
+            self.WINDOW,
+        )
+
+        by_amount: Dict[int, list] = {}
+        for pair in pairs:
+            by_amount.setdefault(pair.amount_cents, []).append(pair)
+
+        for amount_cents, amount_pairs in by_amount.items():
+            amt = amount_cents / 100
+            indicators.append(
+                {
+                    "type": "mirroring_suspected",
+                    "confidence": min(0.9, 0.6 + 0.1 * (len(amount_pairs) - 1)),
+                    "evidence": {
+                        "amount": amt,
+                        "pair_count": len(amount_pairs),
+                        "pairs": [
+                            {
+                                "transaction_ids": [pair.first_id, pair.second_id],
+                                "hours_apart": pair.hours_apart,
+                            }
+                            for pair in amount_pairs[: self.MAX_LISTED_PAIRS]
+                        ],
+                        "reason": f"${amt} moved in and back out (or out and back in) within {self.WINDOW} {len(amount_pairs)} time(s), potential cashflow inflation.",
+                    },
+                }
+            )
 
         return indicators
@@ -1,4 +1,106 @@
-from typing import List, Dict, Any
+from datetime import timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.services.detectors.timeline import parse_time
+
+
+def _format_time(micros: int) -> str:
+    return str(np.datetime64(int(micros), "us").astype("datetime64[s]"))
+
+
+class StructuringWindows:
+    """
+    A subject's transactions as time-sorted NumPy arrays, with rolling
+    counts and sums of near-threshold deposits over trailing windows.
+
+    Each window is found by binary search over the sorted timestamps (the
+    vectorized form of a two-pointer sweep), so a subject costs
+    O(n log n) per window size instead of a pairwise scan.
+    """
+
+    def __init__(
+        self,
+        transactions: List[Dict[str, Any]],
+        threshold: float,
+        near_threshold_pct: float,
+    ):
+        parsed = [
+            (parse_time(tx.get("date")), float(tx.get("amount", 0) or 0), index)
+            for index, tx in enumerate(transactions)
+        ]
+        # Transactions without a timestamp cannot fall inside any window
+        dated = sorted(
+            (time, amount, index) for time, amount, index in parsed if time
+        )
+
+        self.transactions = transactions
+        self.threshold = threshold
+        self.positions = np.array([index for _, _, index in dated], dtype=np.int64)
+        self.times = np.array(
+            [time for time, _, _ in dated], dtype="datetime64[us]"
+        ).astype(np.int64)
+        self.amounts = np.array([amount for _, amount, _ in dated], dtype=np.float64)
+
+        near = (self.amounts >= threshold * near_threshold_pct) & (
+            self.amounts < threshold
+        )
+        # Near-threshold deposits, still in time order
+        self.near_index = np.flatnonzero(near)
+        self.near_times = self.times[near]
+        self.near_cumsum = np.concatenate(([0.0], np.cumsum(self.amounts[near])))
+
+    def _window_bounds(
+        self, ends: np.ndarray, window: timedelta
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """[lo, hi) of near-threshold deposits within (end - window, end]."""
+        span = window // timedelta(microseconds=1)
+        hi = np.searchsorted(self.near_times, ends, side="right")
+        lo = np.searchsorted(self.near_times, ends - span, side="right")
+        return lo, hi
+
+    def rolling(self, window: timedelta) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Count and sum of near-threshold deposits in the trailing window
+        ending at each transaction, aligned with the time-sorted arrays.
+        """
+        lo, hi = self._window_bounds(self.times, window)
+        return hi - lo, self.near_cumsum[hi] - self.near_cumsum[lo]
+
+    def bursts(
+        self, window: timedelta, min_deposits: int
+    ) -> List[Tuple[int, int]]:
+        """
+        Non-overlapping runs of near-threshold deposits, as [lo, hi) ranges
+        into near_times, that fit in `window`, number at least
+        `min_deposits` and together reach the threshold.
+
+        Overlapping qualifying windows form one cluster, reported by the
+        window holding the most deposits (earliest on ties).
+        """
+        lo, hi = self._window_bounds(self.near_times, window)
+        counts = hi - lo
+        sums = self.near_cumsum[hi] - self.near_cumsum[lo]
+        qualifying = np.flatnonzero(
+            (counts >= min_deposits) & (sums >= self.threshold)
+        )
+
+        found: List[Tuple[int, int]] = []
+        best: Optional[int] = None
+        for end in qualifying.tolist():
+            if best is not None and lo[end] >= hi[best]:
+                found.append((int(lo[best]), int(hi[best])))
+                best = None
+            if best is None or counts[end] > counts[best]:
+                best = end
+        if best is not None:
+            found.append((int(lo[best]), int(hi[best])))
+        return found
+
+    def transaction_ids(self, lo: int, hi: int) -> List[Any]:
+        positions = self.positions[self.near_index[lo:hi]]
+        return [self.transactions[p].get("id") for p in positions.tolist()]
 
 
 class StructuringDetector:
@@ -9,30 +111,86 @@ class StructuringDetector:
 
     THRESHOLD_AMOUNT = 10000.0
     NEAR_THRESHOLD_PCT = 0.9  # 90% of threshold (e.g., $9,000)
+    # Trailing windows, shortest first; a burst already reported for a
+    # shorter window is not reported again for a longer one
+    WINDOWS: Dict[str, timedelta] = {
+        "24h": timedelta(hours=24),
+        "72h": timedelta(hours=72),
+        "7d": timedelta(days=7),
+    }
+    MIN_DEPOSITS = 2  # Near-threshold deposits that make a burst
+
+    def __init__(
+        self,
+        windows: Optional[Dict[str, timedelta]] = None,
+        min_deposits: Optional[int] = None,
+    ):
+        if windows is not None:
+            self.WINDOWS = windows
+        if min_deposits is not None:
+            self.MIN_DEPOSITS = min_deposits
+
+    def _windows(self, transactions: List[Dict[str, Any]]) -> StructuringWindows:
+        return StructuringWindows(
+            transactions, self.THRESHOLD_AMOUNT, self.NEAR_THRESHOLD_PCT
+        )
+
+    def window_features(
+        self, transactions: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-transaction rolling features, in input order: `count_<window>`
+        and `sum_<window>` of near-threshold deposits in the trailing
+        window (e.g. count_24h, used by heuristic RULE_001).
+        """
+        windows = self._windows(transactions)
+        features: List[Dict[str, Any]] = [
+            {
+                **{f"count_{label}": 0 for label in self.WINDOWS},
+                **{f"sum_{label}": 0.0 for label in self.WINDOWS},
+            }
+            for _ in transactions
+        ]
+        for label, window in self.WINDOWS.items():
+            counts, sums = windows.rolling(window)
+            for position, count, total in zip(
+                windows.positions.tolist(), counts.tolist(), sums.tolist()
+            ):
+                features[position][f"count_{label}"] = count
+                features[position][f"sum_{label}"] = total
+        return features
 
     def detect(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         indicators = []
 
-        # Logic: Look for multiple deposits just below the threshold within a short window
-        # For Phase 2 MVP, we'll do a simple check on individual transactions
-        # In a real scenario, this would need a time-window aggregation
-
-        for tx in transactions:
-            amount = float(tx.get("amount", 0))
-            if (
-                amount > 0
-                and self.THRESHOLD_AMOUNT * self.NEAR_THRESHOLD_PCT
-                <= amount
-                < self.THRESHOLD_AMOUNT
-            ):
+        # Logic: Look for multiple deposits just below the threshold within
+        # a short window that together reach it
+        windows = self._windows(transactions)
+        reported: List[set] = []
+
+        for label, window in self.WINDOWS.items():
+            for lo, hi in windows.bursts(window, self.MIN_DEPOSITS):
+                ids = windows.transaction_ids(lo, hi)
+                if any(set(ids) <= earlier for earlier in reported):
+                    continue
+                reported.append(set(ids))
+
+                count = hi - lo
+                total = float(windows.near_cumsum[hi] - windows.near_cumsum[lo])
                 indicators.append(
                     {
                         "type": "structuring_attempt",
-                        "confidence": 0.7,
+                        "confidence": min(
+                            0.95, 0.7 + 0.05 * (count - self.MIN_DEPOSITS)
+                        ),
                         "evidence": {
-                            "transaction_id": tx.get("id"),
-                            "amount": amount,
-                            "reason": f"Transaction amount ${amount} is just below the reporting threshold of ${self.THRESHOLD_AMOUNT}",
+                            "transaction_ids": ids,
+                            "window": label,
+                            "deposit_count": count,
+                            "total_amount": total,
+                            "first_date": _format_time(windows.near_times[lo]),
+                            "last_date": _format_time(windows.near_times[hi - 1]),
+                            "reason": f"{count} deposits just below the reporting threshold of ${self.THRESHOLD_AMOUNT} within {label}, totalling ${total:,.2f}",
                         },
                     }
                 )
@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def parse_time(value: Any) -> Optional[datetime]:
+    """Naive UTC datetime from an ISO string or datetime; None if missing."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def sort_by_time(
+    transactions: List[Dict[str, Any]],
+) -> List[Tuple[datetime, Dict[str, Any]]]:
+    """(time, transaction) pairs in time order; undated transactions dropped."""
+    dated = [
+        (parse_time(tx.get("date")), index) for index, tx in enumerate(transactions)
+    ]
+    return [
+        (time, transactions[index])
+        for time, index in sorted(pair for pair in dated if pair[0] is not None)
+    ]
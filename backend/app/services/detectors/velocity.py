@@ -1,4 +1,199 @@
-from typing import List, Dict, Any
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Deque, Iterable, Optional, Tuple
+
+from app.services.detectors.timeline import parse_time, sort_by_time
+
+# Upper edges (hours) of the turnover-time histogram buckets
+TURNOVER_BUCKET_HOURS: Tuple[float, ...] = (1, 6, 24, 72, 168, 720, float("inf"))
+# Inflow ids listed per pass-through event
+MAX_EVENT_SOURCES = 20
+
+
+def _finite(hours: Optional[float]) -> Optional[float]:
+    """JSON has no infinity; unbounded hours are reported as None."""
+    return None if hours == float("inf") else hours
+
+
+@dataclass
+class _Inflow:
+    time: datetime
+    remaining: float
+    id: Any
+
+
+@dataclass
+class TurnoverStats:
+    """Running totals of a turnover scan; constant size however long it runs."""
+
+    total_inflow: float = 0.0
+    total_outflow: float = 0.0
+    matched_amount: float = 0.0  # Outflow funded by tracked inflows
+    weighted_hours: float = 0.0  # Sum of turnover hours x matched amount
+    expired_inflow: float = 0.0  # Inflow dropped unspent from the FIFO
+    histogram: List[float] = field(
+        default_factory=lambda: [0.0] * len(TURNOVER_BUCKET_HOURS)
+    )
+
+    def add_turnover(self, hours: float, amount: float) -> None:
+        self.matched_amount += amount
+        self.weighted_hours += hours * amount
+        for bucket, edge in enumerate(TURNOVER_BUCKET_HOURS):
+            if hours <= edge:
+                self.histogram[bucket] += amount
+                return
+
+    @property
+    def inflow_outflow_ratio(self) -> float:
+        """Share of inflow that left again (outflow / inflow)."""
+        if not self.total_inflow:
+            return 0.0
+        return self.total_outflow / self.total_inflow
+
+    @property
+    def turnover_time_hours(self) -> Optional[float]:
+        """Amount-weighted mean time from inflow to outflow."""
+        if not self.matched_amount:
+            return None
+        return self.weighted_hours / self.matched_amount
+
+    def turnover_quantile(self, q: float) -> Optional[float]:
+        """Upper bucket edge (hours) below which `q` of matched funds turned."""
+        if not self.matched_amount:
+            return None
+        target = q * self.matched_amount
+        running = 0.0
+        for edge, amount in zip(TURNOVER_BUCKET_HOURS, self.histogram):
+            running += amount
+            if running >= target:
+                return edge
+        return TURNOVER_BUCKET_HOURS[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_inflow": self.total_inflow,
+            "total_outflow": self.total_outflow,
+            "matched_amount": self.matched_amount,
+            "expired_inflow": self.expired_inflow,
+            "inflow_outflow_ratio": self.inflow_outflow_ratio,
+            "turnover_time_hours": self.turnover_time_hours,
+            "median_turnover_hours": _finite(self.turnover_quantile(0.5)),
+            # The open-ended last bucket has max_hours None
+            "turnover_histogram": [
+                {"max_hours": _finite(edge), "amount": amount}
+                for edge, amount in zip(TURNOVER_BUCKET_HOURS, self.histogram)
+            ],
+        }
+
+
+class TurnoverScanner:
+    """
+    Single pass over time-sorted transactions that matches each outflow
+    against a FIFO of unconsumed inflows.
+
+    Memory is bounded: inflows older than `max_hold` leave the FIFO unspent,
+    and at most `max_pending` inflows are tracked (the oldest go first).
+    """
+
+    def __init__(
+        self,
+        rapid_window: timedelta,
+        min_pass_through: float,
+        max_hold: timedelta,
+        max_pending: int,
+    ):
+        self.rapid_window = rapid_window
+        self.min_pass_through = min_pass_through
+        self.max_hold = max_hold
+        self.max_pending = max_pending
+        self.stats = TurnoverStats()
+        self._pending: Deque[_Inflow] = deque()
+        self._last_time: Optional[datetime] = None
+
+    def _expire(self, now: datetime) -> None:
+        while self._pending and (
+            now - self._pending[0].time > self.max_hold
+            or len(self._pending) > self.max_pending
+        ):
+            self.stats.expired_inflow += self._pending.popleft().remaining
+
+    def feed(self, time: datetime, tx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Consume one transaction; returns a pass-through event when an
+        outflow was funded mostly by inflows from within `rapid_window`.
+        """
+        if self._last_time is not None and time < self._last_time:
+            raise ValueError("Transactions must be fed in time order")
+        self._last_time = time
+
+        amount = float(tx.get("amount", 0) or 0)
+        self._expire(time)
+        if amount > 0:
+            self.stats.total_inflow += amount
+            self._pending.append(_Inflow(time, amount, tx.get("id")))
+            self._expire(time)
+            return None
+        if amount == 0:
+            return None
+
+        outflow = -amount
+        self.stats.total_outflow += outflow
+        needed = outflow
+        rapid_amount = 0.0
+        rapid_count = 0
+        rapid_sources: List[Any] = []
+        slowest = 0.0
+        while needed > 0 and self._pending:
+            inflow = self._pending[0]
+            used = min(inflow.remaining, needed)
+            held = time - inflow.time
+            hours = held / timedelta(hours=1)
+            self.stats.add_turnover(hours, used)
+            if held <= self.rapid_window:
+                rapid_amount += used
+                rapid_count += 1
+                if len(rapid_sources) < MAX_EVENT_SOURCES:
+                    rapid_sources.append(inflow.id)
+                slowest = max(slowest, hours)
+            inflow.remaining -= used
+            needed -= used
+            if inflow.remaining <= 1e-9:
+                self._pending.popleft()
+
+        if rapid_amount < self.min_pass_through:
+            return None
+        return {
+            "outflow_id": tx.get("id"),
+            "outflow_amount": outflow,
+            "pass_through_amount": rapid_amount,
+            "pass_through_share": rapid_amount / outflow,
+            "inflow_ids": rapid_sources,
+            "inflow_count": rapid_count,
+            "max_hold_hours": slowest,
+            "date": time.isoformat(),
+        }
+
+    def dump_state(self) -> Dict[str, Any]:
+        """JSON-safe snapshot of the stats and FIFO, for load_state()."""
+        return {
+            "stats": asdict(self.stats),
+            "pending": [
+                [inflow.time.isoformat(), inflow.remaining, inflow.id]
+                for inflow in self._pending
+            ],
+            "last_time": self._last_time.isoformat() if self._last_time else None,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Continue a scan from a dump_state() snapshot."""
+        self.stats = TurnoverStats(**state["stats"])
+        self._pending = deque(
+            _Inflow(datetime.fromisoformat(time), remaining, tx_id)
+            for time, remaining, tx_id in state["pending"]
+        )
+        last_time = state["last_time"]
+        self._last_time = datetime.fromisoformat(last_time) if last_time else None
 
 
 class VelocityDetector:
@@ -7,14 +202,99 @@ class VelocityDetector:
     very quickly, often a sign of layering or money laundering.
     """
 
+    RAPID_WINDOW = timedelta(hours=24)  # Inflow spent within this is rapid
+    MIN_PASS_THROUGH = 1000.0  # Smallest rapid pass-through worth reporting
+    MIN_PASS_THROUGH_SHARE = 0.9  # Share of the outflow funded rapidly
+    MAX_HOLD = timedelta(days=90)  # Unspent inflow older than this is dropped
+    MAX_PENDING_INFLOWS = 100_000  # FIFO bound per subject
+    MAX_INDICATORS = 50  # Pass-through indicators kept per subject
+    # Whole-history layering profile (RULE_006 thresholds)
+    LAYERING_RATIO = 0.9
+    LAYERING_TURNOVER_HOURS = 24.0
+
+    def scanner(self, max_pending: Optional[int] = None) -> TurnoverScanner:
+        """A scanner with this detector's thresholds."""
+        return TurnoverScanner(
+            rapid_window=self.RAPID_WINDOW,
+            min_pass_through=self.MIN_PASS_THROUGH,
+            max_hold=self.MAX_HOLD,
+            max_pending=max_pending or self.MAX_PENDING_INFLOWS,
+        )
+
+    def pass_through_indicator(
+        self, event: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Indicator for a scanner event, if enough of the outflow passed through."""
+        if not event or event["pass_through_share"] < self.MIN_PASS_THROUGH_SHARE:
+            return None
+        return {
+            "type": "rapid_pass_through",
+            "confidence": min(0.9, 0.5 + 0.4 * event["pass_through_share"]),
+            "evidence": {
+                **event,
+                "reason": f"${event['pass_through_amount']:,.2f} left within {event['max_hold_hours']:.1f}h of arriving",
+            },
+        }
+
+    def scan(
+        self, timeline: Iterable[Tuple[datetime, Dict[str, Any]]]
+    ) -> Tuple[TurnoverStats, List[Dict[str, Any]], int]:
+        """
+        Stream (time, transaction) pairs in time order, e.g. from a cursor.
+
+        Returns the turnover stats, up to MAX_INDICATORS pass-through events
+        and the total number of events.
+        """
+        scanner = self.scanner()
+        events: List[Dict[str, Any]] = []
+        total = 0
+        for time, tx in timeline:
+            event = scanner.feed(time, tx)
+            if event and event["pass_through_share"] >= self.MIN_PASS_THROUGH_SHARE:
+                total += 1
+                if len(events) < self.MAX_INDICATORS:
+                    events.append(event)
+        return scanner.stats, events, total
+
+    def profile(self, transactions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Turnover features of time-sorted transactions, including RULE_006's
+        inflow_outflow_ratio and turnover_time_hours.
+        """
+        timeline = (
+            (time, tx)
+            for time, tx in ((parse_time(tx.get("date")), tx) for tx in transactions)
+            if time is not None
+        )
+        stats, _, _ = self.scan(timeline)
+        return stats.to_dict()
+
     def detect(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         indicators = []
 
-        # Placeholder logic for Phase 2 MVP
-        # In a real scenario, we'd calculate the time difference between
-        # credits and debits and check if it's below a threshold (e.g., 1 hour)
+        # Logic: credits are queued FIFO and consumed by later debits; funds
+        # that leave soon after arriving are passed through
+        stats, events, total = self.scan(sort_by_time(transactions))
+
+        for event in events:
+            indicators.append(self.pass_through_indicator(event))
 
-        # For now, we'll just return an empty list as we need more complex
-        # transaction history data to implement this meaningfully
+        turnover = stats.turnover_time_hours
+        if (
+            stats.inflow_outflow_ratio > self.LAYERING_RATIO
+            and turnover is not None
+            and turnover < self.LAYERING_TURNOVER_HOURS
+        ):
+            indicators.append(
+                {
+                    "type": "high_velocity_turnover",
+                    "confidence": 0.75,
+                    "evidence": {
+                        **stats.to_dict(),
+                        "pass_through_events": total,
+                        "reason": f"{stats.inflow_outflow_ratio:.0%} of inflows left again after {turnover:.1f}h on average",
+                    },
+                }
+            )
 
         return indicators
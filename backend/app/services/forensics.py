@@ -6,6 +6,7 @@ import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.process_pool import cpu_pool
 from app.db.models import Event
 
 # Configure logger
@@ -26,6 +27,29 @@ except ImportError:
     magic = None
 
 
+def calculate_ela_score(file_path: str) -> float:
+    """
+    Calculates a simple ELA score.
+
+    Module-level so it can run in the CPU work pool.
+    """
+    try:
+        original = cv2.imread(file_path)
+        if original is None:
+            return 0.0
+
+        # Use in-memory encoding/decoding to avoid disk I/O
+        _, encoded_img = cv2.imencode(".jpg", original, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        resaved = cv2.imdecode(encoded_img, cv2.IMREAD_COLOR)
+        diff = cv2.absdiff(original, resaved)
+        score = np.mean(diff) / 255.0
+        normalized_score = min(score * 10, 1.0)
+
+        return float(normalized_score)
+    except Exception:
+        return 0.0
+
+
 class ForensicsService:
     def __init__(self):
         self.exiftool_path = "exiftool"  # Assumes exiftool is in PATH
@@ -158,8 +182,9 @@ class ForensicsService:
                 return {"status": "skipped", "reason": "Not an image file"}
 
             # 1. Error Level Analysis (ELA)
-            # Run CPU-intensive ELA in a separate thread
-            ela_score = await asyncio.to_thread(self._calculate_ela_score, file_path)
+            # Run CPU-intensive ELA in the shared process pool; only the path
+            # crosses the process boundary
+            ela_score = await cpu_pool.run("ela", calculate_ela_score, file_path)
 
             return {
                 "ela_score": ela_score,
@@ -178,26 +203,7 @@ class ForensicsService:
         return file_path.lower().endswith((".jpg", ".jpeg", ".png", ".tiff"))
 
     def _calculate_ela_score(self, file_path: str) -> float:
-        """
-        Calculates a simple ELA score.
-        """
-        try:
-            original = cv2.imread(file_path)
-            if original is None:
-                return 0.0
-
-            # Use in-memory encoding/decoding to avoid disk I/O
-            _, encoded_img = cv2.imencode(
-                ".jpg", original, [cv2.IMWRITE_JPEG_QUALITY, 90]
-            )
-            resaved = cv2.imdecode(encoded_img, cv2.IMREAD_COLOR)
-            diff = cv2.absdiff(original, resaved)
-            score = np.mean(diff) / 255.0
-            normalized_score = min(score * 10, 1.0)
-
-            return float(normalized_score)
-        except Exception:
-            return 0.0
+        return calculate_ela_score(file_path)
 
     def _generate_summary(self, metadata: Dict, manipulation: Dict) -> str:
         summary = []
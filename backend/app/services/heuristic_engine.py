@@ -1,15 +1,33 @@
-from typing import List, Dict, Any
-from simpleeval import simple_eval
+from typing import List, Dict, Any, Iterable, Mapping, Tuple
+import numpy as np
 from app.schemas.analysis import HeuristicRule, RuleResult
 from app.core.heuristic_rules import DEFAULT_HEURISTIC_RULES
+from app.services.rule_compiler import CompiledRule, RuleCompileError, compile_rule
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Risk points per triggered rule, by severity
+SEVERITY_POINTS = {"critical": 50, "high": 25, "medium": 10, "low": 5}
+
 
 class HeuristicEngine:
-    def __init__(self, rules: List[HeuristicRule] = None):
-        self.rules = rules or DEFAULT_HEURISTIC_RULES
+    def __init__(self, rules: List[HeuristicRule] = None, version: int = 0):
+        # A private copy: add_rule must not change the shared defaults
+        self.rules = list(rules or DEFAULT_HEURISTIC_RULES)
+        # Rule set version the rules came from (see app.services.rule_store)
+        self.version = version
+        # Rules with their compiled logic; invalid rules are logged once here
+        self._compiled: List[Tuple[HeuristicRule, CompiledRule]] = []
+        for rule in self.rules:
+            self._compile(rule)
+
+    def _compile(self, rule: HeuristicRule) -> None:
+        """Add the rule's compiled form, or log and drop it if invalid."""
+        try:
+            self._compiled.append((rule, compile_rule(rule.logic)))
+        except RuleCompileError as e:
+            logger.error(f"Error compiling rule {rule.id}: {str(e)}")
 
     def evaluate_transaction(
         self, transaction_context: Dict[str, Any]
@@ -24,13 +42,13 @@ class HeuristicEngine:
             List of RuleResult for triggered rules.
         """
         results = []
-        for rule in self.rules:
+        for rule, compiled in self._compiled:
             if not rule.enabled:
                 continue
 
             try:
-                # simpleeval is safe for arithmetic and simple logic
-                is_triggered = simple_eval(rule.logic, names=transaction_context)
+                # Parsed and whitelisted once per process, see rule_compiler
+                is_triggered = compiled.evaluate(transaction_context)
 
                 if is_triggered:
                     results.append(
@@ -49,5 +67,52 @@ class HeuristicEngine:
 
         return results
 
+    def evaluate_batch(
+        self, contexts: Iterable[Dict[str, Any]]
+    ) -> List[List[RuleResult]]:
+        """
+        Evaluates many transaction contexts, e.g. the feature rows built by
+        app.services.rule_features.
+
+        Returns:
+            Triggered rules per context, in input order.
+        """
+        return [self.evaluate_transaction(context) for context in contexts]
+
+    def evaluate_columns(
+        self, columns: Mapping[str, Any], size: int
+    ) -> Dict[str, np.ndarray]:
+        """
+        Evaluates every enabled rule over whole feature columns at once.
+
+        Args:
+            columns: Equal-length columns by name, e.g. a pandas DataFrame
+            size: Number of rows
+
+        Returns:
+            Boolean mask of triggered rows per rule id; a rule that fails
+            is logged once and left out.
+        """
+        masks = {}
+        for rule, compiled in self._compiled:
+            if not rule.enabled:
+                continue
+
+            try:
+                masks[rule.id] = compiled.mask(columns, size)
+            except Exception as e:
+                logger.error(f"Error evaluating rule {rule.id}: {str(e)}")
+                continue
+
+        return masks
+
+    @staticmethod
+    def risk_score(triggered_rules: List[RuleResult], base_score: float = 10) -> float:
+        """Simple risk score aggregator (demo logic), capped at 100."""
+        for rule in triggered_rules:
+            base_score += SEVERITY_POINTS.get(rule.severity, 0)
+        return min(100, base_score)
+
     def add_rule(self, rule: HeuristicRule):
         self.rules.append(rule)
+        self._compile(rule)
@@ -1,37 +1,78 @@
-import csv
-import io
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Transaction, Event
+from app.db.models import Transaction, ProcessingStatus
 from uuid import UUID
 import uuid
 from fastapi import HTTPException
 from app.core.config import settings
-from concurrent.futures import ProcessPoolExecutor
+from app.core.process_pool import cpu_pool
 import asyncio
 from decimal import Decimal, InvalidOperation
 from app.services.ai.llm_service import LLMService
+from app.services.bulk_loader import BulkLoader, TRANSACTION_COLUMNS
+from app.services.bank_formats import bank_format_registry, read_header_row
+from app.services.columnar_mapping import (
+    MappingResult,
+    clean_amounts,
+    parse_dates,
+    valid_amounts,
+)
+from app.services.ingestion_jobs import IngestionJobService, RowHasher, file_sha256
+from app.services.mapping_cache import MappingCacheService
+from app.services.reconciliation_index import ReconciliationIndexService
+from app.services.upload_session import (
+    build_session,
+    csv_path,
+    describe_issues,
+    iter_columnar_chunks,
+    jobs_dir,
+    load_sample,
+    load_session,
+    remove_session,
+)
 from langchain_core.messages import HumanMessage
 import json
 import pandas as pd
 import shutil
 import os
+import tempfile
+import time
+import structlog
 
+logger = structlog.get_logger()
 
-def _parse_csv_in_process(
-    file_content: bytes, bank_name: str, filename: str
-) -> List[Dict[str, Any]]:
-    decoded_content = file_content.decode("utf-8")
-    csv_reader = csv.DictReader(io.StringIO(decoded_content))
 
-    parsed_data = []
-    for row in csv_reader:
-        tx_data = IngestionService._map_row(row, bank_name)
-        if tx_data:
-            tx_data["source_file_id"] = filename  # Add filename for Transaction model
-            parsed_data.append(tx_data)
-    return parsed_data
+def _parse_csv_file(file_path: str, bank_name: str) -> Optional[MappingResult]:
+    """
+    Parse a staged CSV file with its bank format parser.
+
+    Runs in the CPU work pool: it takes a path rather than the file bytes,
+    and returns the columnar MappingResult, which pickles far more compactly
+    than a list of row dicts.
+    """
+    with open(file_path, "rb") as file_obj:
+        spec = bank_format_registry.get(bank_name) or bank_format_registry.resolve(
+            bank_name, read_header_row(file_obj)
+        )
+        try:
+            df = pd.read_csv(
+                file_obj,
+                dtype=str,
+                keep_default_na=False,
+                encoding=spec.encoding,
+                sep=spec.delimiter,
+            )
+        except pd.errors.EmptyDataError:
+            return None
+
+    return bank_format_registry.compile(spec, df.columns).parse(df)
+
+
+def _write_temp_file(content: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+        f.write(content)
+        return f.name
 
 
 class IngestionService:
@@ -39,8 +80,6 @@ class IngestionService:
     Service to handle ingestion of transaction files from various banks.
     """
 
-    _executor: ProcessPoolExecutor = ProcessPoolExecutor()
-
     @staticmethod
     async def process_csv(
         db: AsyncSession,
@@ -59,36 +98,246 @@ class IngestionService:
                 detail=f"File too large. Maximum allowed size is {settings.MAX_UPLOAD_FILE_SIZE_MB} MB.",
             )
 
-        # Offload CPU-bound CSV parsing to a separate process
-        loop = asyncio.get_event_loop()
-        parsed_transactions_data = await loop.run_in_executor(
-            IngestionService._executor,
-            _parse_csv_in_process,
-            file_content,
-            bank_name,
-            filename,
-        )
+        # Offload CPU-bound CSV parsing to the shared process pool, handing
+        # over a temp file path instead of pickling the content
+        file_path = await asyncio.to_thread(_write_temp_file, file_content)
+        try:
+            result = await cpu_pool.run(
+                "csv_parse", _parse_csv_file, file_path, bank_name
+            )
+        finally:
+            os.remove(file_path)
+
+        if result is None:
+            return []
+        if len(result.rejected):
+            logger.warning(
+                "Rejected rows during CSV import",
+                filename=filename,
+                rejected=len(result.rejected),
+                sample=result.rejected_report(limit=5),
+            )
+        parsed_transactions_data = result.to_records()
+        for tx_data in parsed_transactions_data:
+            tx_data["source_file_id"] = filename
 
         if not parsed_transactions_data:
             return []
 
-        # Prepare data for bulk insert
+        RowHasher(account=bank_name).assign(parsed_transactions_data)
+        parsed_transactions_data, duplicates = (
+            await IngestionJobService.filter_new_rows(
+                db, subject_id, parsed_transactions_data
+            )
+        )
+        if duplicates:
+            logger.info(
+                "Skipped previously imported rows", filename=filename, count=duplicates
+            )
+
+        transactions_to_insert, events_to_insert = (
+            IngestionService._build_insert_rows(
+                parsed_transactions_data,
+                subject_id=subject_id,
+                bank_name=bank_name,
+                event_metadata={"source": "csv_import", "filename": filename},
+            )
+        )
+
+        await IngestionService._insert_rows(db, transactions_to_insert, events_to_insert)
+        await db.commit()
+
+        # Return created objects (re-querying might be needed if we need the ORM objects,
+        # but for performance we often skip this or return the IDs)
+        # For now, let's return a list of Transaction objects constructed from data to satisfy type hint
+        # Note: These won't be attached to the session in the same way as db.add()
+        return [Transaction(**tx) for tx in transactions_to_insert]
+
+    @staticmethod
+    async def process_csv_stream(
+        db: AsyncSession,
+        file_obj: BinaryIO,
+        bank_name: str,
+        subject_id: UUID,
+        filename: str,
+        total_bytes: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        upload_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Streams a CSV upload into Transaction records in bounded batches.
+
+        Unlike process_csv, the file is never held in memory as a whole: rows
+        are decoded and parsed incrementally, and every `batch_size` rows are
+        loaded into the session's open transaction before more input is read.
+        Parsing, hashing and row building run in a worker thread one chunk at
+        a time, so the event loop keeps serving other requests. The import is
+        committed once at the end; any failure rolls it back, so a failed
+        import leaves no partial data.
+
+        Rows already imported for the subject (same natural-key hash) are
+        skipped and counted as duplicates.
+
+        Returns:
+            Dict with inserted/skipped/duplicate row counts, a sample of
+            rejected rows and imported_at, the created_at of every row added.
+        """
+        max_size_bytes = settings.MAX_STREAMING_UPLOAD_FILE_SIZE_MB * 1024 * 1024
+        if total_bytes is not None and total_bytes > max_size_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum allowed size is {settings.MAX_STREAMING_UPLOAD_FILE_SIZE_MB} MB.",
+            )
+
+        batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+        upload_id = upload_id or str(uuid.uuid4())
+
+        from app.core.websocket import emit_upload_progress
+
+        event_metadata = {"source": "csv_import", "filename": filename}
+        # Stamped on every row, so follow-up jobs can select this import
+        imported_at = datetime.utcnow()
+        inserted = 0
+        skipped = 0
+        duplicates = 0
+        rejected_sample: List[Dict[str, Any]] = []
+        last_progress = -1
+        hasher = RowHasher(account=bank_name)
+
+        chunks = IngestionService._iter_csv_batches(
+            file_obj, bank_name, filename, batch_size
+        )
+        try:
+            while True:
+                item = await asyncio.to_thread(next, chunks, None)
+                if item is None:
+                    break
+                batch, rejected, bytes_read = item
+                if bytes_read > max_size_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum allowed size is {settings.MAX_STREAMING_UPLOAD_FILE_SIZE_MB} MB.",
+                    )
+
+                skipped += len(rejected)
+                rejected_sample.extend(rejected[: max(0, 100 - len(rejected_sample))])
+                if batch:
+                    await asyncio.to_thread(hasher.assign, batch)
+                    batch, batch_duplicates = await IngestionJobService.filter_new_rows(
+                        db, subject_id, batch
+                    )
+                    duplicates += batch_duplicates
+                    tx_rows, event_rows = await asyncio.to_thread(
+                        IngestionService._build_insert_rows,
+                        batch,
+                        subject_id=subject_id,
+                        bank_name=bank_name,
+                        event_metadata=event_metadata,
+                        created_at=imported_at,
+                    )
+                    await IngestionService._insert_rows(db, tx_rows, event_rows)
+                    inserted += len(tx_rows)
+
+                if user_id and total_bytes:
+                    # Reserve the final percent for the commit below
+                    progress = min(99, int(bytes_read / total_bytes * 100))
+                    if progress != last_progress:
+                        await emit_upload_progress(upload_id, progress, user_id)
+                        last_progress = progress
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            chunks.close()
+
+        await db.commit()
+
+        if user_id:
+            await emit_upload_progress(upload_id, 100, user_id)
+
+        return {
+            "upload_id": upload_id,
+            "inserted": inserted,
+            "skipped": skipped,
+            "duplicates": duplicates,
+            "rejected": rejected_sample,
+            "imported_at": imported_at.isoformat(),
+        }
+
+    @staticmethod
+    def _iter_csv_batches(
+        file_obj: BinaryIO, bank_name: str, filename: str, batch_size: int
+    ) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]:
+        """
+        Incrementally reads and maps a binary CSV stream.
+
+        Yields (parsed_rows, rejected_rows, bytes_read) for every `batch_size`
+        input rows, so memory stays bounded by the batch size rather than the
+        file size. Each chunk is mapped column-wise by the compiled parser of
+        the bank format selected by name or detected from the header row.
+        """
+        spec = bank_format_registry.get(bank_name) or bank_format_registry.resolve(
+            bank_name, read_header_row(file_obj)
+        )
+        try:
+            reader = pd.read_csv(
+                file_obj,
+                dtype=str,
+                keep_default_na=False,
+                encoding=spec.encoding,
+                sep=spec.delimiter,
+                chunksize=batch_size,
+            )
+        except pd.errors.EmptyDataError:
+            return
+
+        row_offset = 0
+        parser = None
+        with reader:
+            for chunk in reader:
+                if parser is None:
+                    parser = bank_format_registry.compile(spec, chunk.columns)
+                result = parser.parse(chunk, row_offset=row_offset)
+                row_offset += len(chunk)
+
+                parsed = result.to_records()
+                for tx_data in parsed:
+                    tx_data["source_file_id"] = filename
+                rejected = result.rejected_report(limit=len(result.rejected))
+                yield parsed, rejected, file_obj.tell()
+
+    @staticmethod
+    def _build_insert_rows(
+        parsed_transactions: List[Dict[str, Any]],
+        subject_id: UUID,
+        bank_name: str,
+        event_metadata: Dict[str, Any],
+        created_at: Optional[datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Builds Transaction rows and matching TRANSACTION_CREATED event rows
+        for BulkLoader.
+
+        Every row gets `created_at` (UTC, like the column default); imports
+        pass one stamp for all their rows so they can be found again.
+        """
+        now = created_at or datetime.utcnow()
         transactions_to_insert = []
         events_to_insert = []
-        for tx_data in parsed_transactions_data:
+        for tx_data in parsed_transactions:
             tx_id = uuid.uuid4()
-            # Transaction
+            # Mapped fields without a Transaction column (category, balance, ...)
+            # are kept in the event payload only
             transactions_to_insert.append(
                 {
                     "id": tx_id,
                     "subject_id": subject_id,
                     "source_bank": bank_name,
-                    **tx_data,
-                    "created_at": datetime.now(),
-                    # "updated_at": datetime.now() # Handled by database/ORM usually but fine here
+                    **{k: v for k, v in tx_data.items() if k in TRANSACTION_COLUMNS},
+                    "created_at": now,
                 }
             )
-            # Event
             events_to_insert.append(
                 {
                     "id": uuid.uuid4(),
@@ -104,30 +353,25 @@ class IngestionService:
                             for k, v in tx_data.items()
                         },
                     },
-                    "metadata_": {"source": "csv_import", "filename": filename},
-                    "created_at": datetime.now(),
+                    "metadata_": event_metadata,
+                    "created_at": now,
                 }
             )
+        return transactions_to_insert, events_to_insert
 
-        # Execute bulk insert
-        from sqlalchemy import insert
-
-        if transactions_to_insert:
-            # Insert Transactions
-            stmt = insert(Transaction).values(transactions_to_insert)
-            await db.execute(stmt)
-
-            # Insert Events
-            evt_stmt = insert(Event).values(events_to_insert)
-            await db.execute(evt_stmt)
-
-        await db.commit()
+    @staticmethod
+    async def _insert_rows(
+        db: AsyncSession,
+        transaction_rows: List[Dict[str, Any]],
+        event_rows: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Bulk loads prepared Transaction and Event rows without committing.
 
-        # Return created objects (re-querying might be needed if we need the ORM objects,
-        # but for performance we often skip this or return the IDs)
-        # For now, let's return a list of Transaction objects constructed from data to satisfy type hint
-        # Note: These won't be attached to the session in the same way as db.add()
-        return [Transaction(**tx) for tx in transactions_to_insert]
+        The rows also enter the reconciliation candidate pool as pending.
+        """
+        await BulkLoader.load(db, transaction_rows, event_rows)
+        await ReconciliationIndexService.add_transactions(db, transaction_rows)
 
     @staticmethod
     async def create_transactions_batch(
@@ -139,7 +383,7 @@ class IngestionService:
         """
         Creates multiple transaction records from a list of dictionaries.
         """
-        transactions = []
+        normalized = []
         for tx_data in transactions_data:
             # Handle date conversion if it's a string
             if isinstance(tx_data.get("date"), str):
@@ -157,37 +401,20 @@ class IngestionService:
                 except (ValueError, TypeError, InvalidOperation):
                     raise HTTPException(status_code=400, detail="Invalid amount format")
 
-            tx_id = uuid.uuid4()
-            transaction = Transaction(
-                id=tx_id,
-                subject_id=subject_id,
-                source_bank=bank_name,
-                source_file_id="manual_import",
-                **tx_data,
-            )
-            db.add(transaction)
-
-            # Create Event
-            event = Event(
-                aggregate_id=tx_id,
-                aggregate_type="transaction",
-                event_type="TRANSACTION_CREATED",
-                version=1,
-                payload={
-                    "subject_id": str(subject_id),
-                    "source_bank": bank_name,
-                    **{
-                        k: str(v) if isinstance(v, (datetime, Decimal)) else v
-                        for k, v in tx_data.items()
-                    },
-                },
-                metadata_={"source": "manual_batch_import"},
-            )
-            db.add(event)
-            transactions.append(transaction)
+            if not tx_data.get("source_file_id"):
+                tx_data["source_file_id"] = "manual_import"
+            normalized.append(tx_data)
 
+        transaction_rows, event_rows = IngestionService._build_insert_rows(
+            normalized,
+            subject_id=subject_id,
+            bank_name=bank_name,
+            event_metadata={"source": "manual_batch_import"},
+        )
+        await IngestionService._insert_rows(db, transaction_rows, event_rows)
         await db.commit()
-        return transactions
+
+        return [Transaction(**tx) for tx in transaction_rows]
 
     @staticmethod
     async def auto_map_columns(headers: List[str]) -> List[Dict[str, Any]]:
@@ -321,105 +548,48 @@ Example response format:
         return mappings
 
     @staticmethod
-    def _map_row(row: Dict[str, str], bank_name: str) -> Dict[str, Any]:
-        """
-        Maps a CSV row to Transaction model fields based on bank_name.
-        """
-        try:
-            if bank_name.lower() == "chase":
-                # Example Chase format: Details,Posting Date,Description,Amount,Type,Balance,Check or Slip #
-                # We'll assume a simplified version for MVP or standard columns
-
-                # MVP Assumption: We look for standard keys or specific Chase keys
-                date_str = row.get("Posting Date") or row.get("Date")
-                description = row.get("Description") or row.get("Memo")
-                amount_str = row.get("Amount")
-
-                if not date_str or not amount_str:
-                    return None
-
-                # Parse Date (Assuming MM/DD/YYYY)
-                date = datetime.strptime(date_str, "%m/%d/%Y")
-
-                # Parse Amount as Decimal
-                amount = Decimal(amount_str)
-
-                return {
-                    "date": date,
-                    "description": description,
-                    "amount": amount,
-                    "currency": "USD",
-                }
-
-            elif bank_name.lower() == "wells_fargo":
-                # Example Wells Fargo: date, amount, description
-                date_str = row.get("date")
-                amount_str = row.get("amount")
-                description = row.get("description")
-
-                if not date_str or not amount_str:
-                    return None
-
-                date = datetime.strptime(date_str, "%m/%d/%Y")
-                amount = Decimal(amount_str)
-
-                return {
-                    "date": date,
-                    "description": description,
-                    "amount": amount,
-                    "currency": "USD",
-                }
-
-            else:
-                # Generic fallback - expects standard columns
-                date_str = row.get("date") or row.get("Date")
-                amount_str = row.get("amount") or row.get("Amount")
-                description = row.get("description") or row.get("Description")
-
-                if not date_str or not amount_str:
-                    return None
-
-                # Try ISO format first, then US format
-                try:
-                    date = datetime.fromisoformat(date_str)
-                except ValueError:
-                    date = datetime.strptime(date_str, "%m/%d/%Y")
-
-                amount = Decimal(amount_str)
-
-                return {
-                    "date": date,
-                    "description": description,
-                    "amount": amount,
-                    "currency": "USD",
-                }
-
-        except Exception as e:
-            print(f"Error parsing row: {row} - {e}")
-            return None
+    def _remove_older_than(directory: str, max_age_seconds: int) -> None:
+        now = time.time()
+        for f in os.listdir(directory):
+            f_path = os.path.join(directory, f)
+            if os.path.isfile(f_path):
+                if now - os.path.getmtime(f_path) > max_age_seconds:
+                    try:
+                        os.remove(f_path)
+                    except OSError:
+                        pass
 
     @staticmethod
     def _cleanup_old_uploads(upload_dir: str, max_age_seconds: int = 3600):
-        """Clean up files older than max_age_seconds"""
-        import time
-
+        """
+        Clean up abandoned uploads older than max_age_seconds. Files handed
+        to an import job (see stage_for_job) have their own, longer
+        retention, so queued and resumable imports keep their file.
+        """
         try:
-            now = time.time()
-            for f in os.listdir(upload_dir):
-                f_path = os.path.join(upload_dir, f)
-                if os.path.isfile(f_path):
-                    if now - os.path.getmtime(f_path) > max_age_seconds:
-                        try:
-                            os.remove(f_path)
-                        except OSError:
-                            pass
+            IngestionService._remove_older_than(upload_dir, max_age_seconds)
+            staged = jobs_dir(upload_dir)
+            if os.path.isdir(staged):
+                IngestionService._remove_older_than(
+                    staged, settings.INGESTION_JOB_FILE_RETENTION_SECONDS
+                )
         except Exception:
             pass  # Silent fail on cleanup to avoid blocking main flow
 
     @staticmethod
-    async def init_upload(file_obj, filename: str, upload_dir: str) -> Dict[str, Any]:
+    async def init_upload(
+        file_obj,
+        filename: str,
+        upload_dir: str,
+        db: Optional[AsyncSession] = None,
+    ) -> Dict[str, Any]:
         """
         Step 1: Save file and get suggested mappings.
+
+        Mappings are looked up by header signature first; the LLM is only
+        asked for header rows that have not been seen before. The file is
+        parsed once here into an upload session (see upload_session) that
+        preview and import reuse.
         """
         os.makedirs(upload_dir, exist_ok=True)
 
@@ -432,15 +602,35 @@ Example response format:
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file_obj, buffer)
 
-        # Read headers
+        # Read headers, then parse the file once into the upload session
+        # (sample for previews, columnar copy for the import)
         try:
             df = pd.read_csv(file_path, nrows=0)
             headers = df.columns.tolist()
+            session = await asyncio.to_thread(
+                build_session,
+                upload_dir,
+                file_id,
+                headers,
+                settings.INGESTION_BATCH_SIZE,
+                settings.UPLOAD_SAMPLE_SIZE,
+            )
         except Exception as e:
             if os.path.exists(file_path):
                 os.remove(file_path)  # Cleanup on valid check fail
+            remove_session(upload_dir, file_id)
             raise HTTPException(status_code=400, detail=f"Invalid CSV file: {str(e)}")
 
+        cached_mapping = await MappingCacheService.get(db, headers)
+        if cached_mapping:
+            return {
+                "file_id": file_id,
+                "headers": headers,
+                "suggested_mapping": cached_mapping,
+                "mapping_source": "cache",
+                "row_count": session.row_count,
+            }
+
         # Get AI mapping suggestions
         mappings = await IngestionService.auto_map_columns(headers)
 
@@ -449,10 +639,16 @@ Example response format:
             if m.get("target") and m.get("confidence", 0) > 0.6:
                 suggested_mapping[m["target"]] = m["source"]
 
+        await MappingCacheService.store(
+            db, headers, suggested_mapping, confirmed=False
+        )
+
         return {
             "file_id": file_id,
             "headers": headers,
             "suggested_mapping": suggested_mapping,
+            "mapping_source": "ai",
+            "row_count": session.row_count,
         }
 
     @staticmethod
@@ -461,63 +657,56 @@ Example response format:
     ) -> Dict[str, Any]:
         """
         Step 2: Preview data with applied mapping and validation stats.
+
+        Validation runs column-wise over the upload session's reservoir
+        sample with the same date/amount rules as the import, so the valid
+        share reflects the whole file, not just its first rows.
         """
-        file_path = os.path.join(upload_dir, f"{file_id}.csv")
+        file_path = csv_path(upload_dir, file_id)
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found or expired")
 
         try:
-            # Read first 100 rows for validation sampling
-            df = pd.read_csv(file_path, nrows=100)
-
-            # Apply mapping: Frontend sends {target: source}, Pandas needs {source: target}
-            rename_map = {v: k for k, v in mapping.items()}
-            df = df.rename(columns=rename_map)
-
-            # Filter to mapped columns
-            mapped_cols = [k for k in mapping.keys() if k in df.columns]
-            df = df[mapped_cols]
-
-            # Fill NaNs
-            df = df.fillna("")
-
-            # Calculate Validation Stats
-            validation = {"total_rows_sampled": len(df), "valid_rows": 0, "issues": []}
-
-            valid_count = 0
-            for idx, row in df.iterrows():
-                is_valid = True
-                row_issues = []
-
-                # Check Date
-                if "date" in row:
-                    try:
-                        val = row["date"]
-                        if isinstance(val, str):
-                            pd.to_datetime(val)
-                    except:
-                        is_valid = False
-                        row_issues.append("Invalid Date")
-
-                # Check Amount
-                if "amount" in row:
-                    try:
-                        val = row["amount"]
-                        if isinstance(val, str):
-                            # Simple cleaning check
-                            val = val.replace("$", "").replace(",", "")
-                            float(val)
-                    except:
-                        is_valid = False
-                        row_issues.append("Invalid Amount")
-
-                if is_valid:
-                    valid_count += 1
-
-            validation["valid_rows"] = valid_count
+            session = load_session(upload_dir, file_id)
+            if session is None:
+                # Staged before upload sessions existed
+                headers = pd.read_csv(file_path, nrows=0).columns.tolist()
+                session = await asyncio.to_thread(
+                    build_session,
+                    upload_dir,
+                    file_id,
+                    headers,
+                    settings.INGESTION_BATCH_SIZE,
+                    settings.UPLOAD_SAMPLE_SIZE,
+                )
+            sample = await asyncio.to_thread(load_sample, upload_dir, file_id)
+
+            mapped = IngestionService._apply_mapping(sample, mapping)
+            checks = {
+                field: ok
+                for field, (_, ok) in IngestionService._parse_mapped(mapped).items()
+            }
+            valid = pd.Series(True, index=mapped.index)
+            for ok in checks.values():
+                valid &= ok
+
+            validation = {
+                "total_rows_sampled": len(mapped),
+                "total_rows": session.row_count,
+                "valid_rows": int(valid.sum()),
+                "issues": describe_issues(
+                    {
+                        f"an invalid {field}": int((~ok).sum())
+                        for field, ok in checks.items()
+                    },
+                    len(mapped),
+                ),
+            }
 
-            # Return preview rows (up to limit)
-            preview_rows = df.head(limit).to_dict(orient="records")
+            head = IngestionService._apply_mapping(
+                pd.DataFrame(session.head_rows, columns=session.headers), mapping
+            )
+            preview_rows = head.head(limit).to_dict(orient="records")
 
             return {"rows": preview_rows, "validation": validation}
 
@@ -533,9 +722,26 @@ Example response format:
         bank_name: str,
         upload_dir: str,
         user_id: str = None,
-    ) -> List[Transaction]:
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
         """
         Step 3: Process the full file with confirmed mapping.
+
+        Runs as a two-stage pipeline: a parse/clean stage reads the file in
+        `batch_size` row chunks and feeds a bounded queue, while an insert
+        stage drains it with bulk loads. Chunks come from the columnar copy
+        built at init_upload when there is one, else from the CSV.
+
+        The import is tracked as an IngestionJob keyed by the file's SHA-256.
+        Each batch is committed together with the job checkpoint, so a
+        restart resumes after the last committed batch, and re-submitting a
+        completed file is a no-op. Rows whose natural-key hash already exists
+        for the subject are skipped as duplicates.
+
+        Returns:
+            Dict with job_id, inserted/skipped/duplicate row counts for this
+            run and imported_at, the created_at of every row the job added
+            (the job's own creation time, shared by resumed runs).
         """
         # Lazy import to avoid circular dependencies at module level if any
         from app.core.websocket import (
@@ -545,80 +751,247 @@ Example response format:
             emit_processing_error,
         )
 
-        file_path = os.path.join(upload_dir, f"{file_id}.csv")
+        file_path = csv_path(upload_dir, file_id)
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found or expired")
-
-        try:
-            if user_id:
-                await emit_processing_stage(file_id, "Reading File", user_id)
-
-            df = pd.read_csv(file_path)
-
+        # Restart the staged file's retention while this run uses it
+        os.utime(file_path)
+
+        file_hash = await asyncio.to_thread(file_sha256, file_path)
+        job = await IngestionJobService.start(
+            db,
+            subject_id=subject_id,
+            file_id=file_id,
+            file_hash=file_hash,
+            bank_name=bank_name,
+            mapping=mapping,
+            batch_size=batch_size or settings.INGESTION_BATCH_SIZE,
+            user_id=user_id,
+        )
+        job_id = job.id
+        if job.status == ProcessingStatus.COMPLETED:
+            logger.info("File already imported", job_id=str(job_id), file_id=file_id)
+            os.remove(file_path)
+            remove_session(upload_dir, file_id)
             if user_id:
-                await emit_upload_progress(file_id, 10, user_id)
-
-            # Apply mapping
-            rename_map = {v: k for k, v in mapping.items()}
-            df = df.rename(columns=rename_map)
-
-            # Filter to mapped columns
-            mapped_cols = [k for k in mapping.keys() if k in df.columns]
-            df = df[mapped_cols]
-
-            # Convert to list of dicts
-            records = df.to_dict(orient="records")
+                await emit_processing_complete(file_id, user_id)
+            return {
+                "job_id": job_id,
+                "inserted": 0,
+                "skipped": 0,
+                "duplicates": 0,
+                "already_imported": True,
+            }
+
+        # Batch boundaries must match the run being resumed
+        batch_size = job.batch_size
+        # Rows of every run of the job share its stamp
+        imported_at = job.created_at
+        resume_from = job.last_committed_batch + 1
+        session = load_session(upload_dir, file_id)
+        if session is not None:
+            headers = session.headers
+        else:
+            # Same header parsing as init_upload, so signatures line up
+            try:
+                headers = pd.read_csv(file_path, nrows=0).columns.tolist()
+            except pd.errors.EmptyDataError:
+                headers = []
+        queue: asyncio.Queue = asyncio.Queue(
+            maxsize=settings.INGESTION_QUEUE_MAXSIZE
+        )
+        hasher = RowHasher(account=bank_name)
+
+        def read_chunks() -> Iterator[Tuple[pd.DataFrame, float]]:
+            """Raw text chunks of `batch_size` rows with the fraction read."""
+            if session is not None and session.columnar:
+                # The columnar copy from init_upload skips CSV tokenizing
+                total_rows = session.row_count or 1
+                for chunk, rows_read in iter_columnar_chunks(
+                    upload_dir, file_id, batch_size
+                ):
+                    yield chunk, rows_read / total_rows
+                return
 
-            if user_id:
-                await emit_processing_stage(file_id, "Cleaning Data", user_id)
-                await emit_upload_progress(file_id, 30, user_id)
-
-            # Clean records
-            cleaned_records = []
-            for record in records:
-                clean = {}
-                for k, v in record.items():
-                    if pd.notna(v) and v != "":
-                        clean[k] = v
-                cleaned_records.append(clean)
+            total_bytes = os.path.getsize(file_path) or 1
+            with open(file_path, "rb") as file_obj:
+                try:
+                    reader = pd.read_csv(
+                        file_obj, dtype=str, keep_default_na=False, chunksize=batch_size
+                    )
+                    with reader:
+                        for chunk in reader:
+                            yield chunk, file_obj.tell() / total_bytes
+                except pd.errors.EmptyDataError:
+                    return
+
+        async def parse_stage() -> None:
+            chunks = read_chunks()
+            try:
+                batch_index = 0
+                while True:
+                    # Reading is blocking; keep the event loop free for inserts
+                    item = await asyncio.to_thread(next, chunks, None)
+                    if item is None:
+                        break
+                    chunk, fraction_read = item
+                    records, rejected = await asyncio.to_thread(
+                        IngestionService._clean_mapped_chunk, chunk, mapping
+                    )
+                    # Committed batches are still hashed so occurrence
+                    # ordinals match the original run
+                    hasher.assign(records)
+                    await queue.put((batch_index, records, rejected, fraction_read))
+                    batch_index += 1
+            finally:
+                chunks.close()
+                await queue.put(None)
+
+        event_metadata = {
+            "source": "mapped_import",
+            "file_id": file_id,
+            "job_id": str(job_id),
+        }
+        inserted = 0
+        skipped = 0
+        duplicates = 0
 
+        try:
             if user_id:
                 await emit_processing_stage(file_id, "Creating Transactions", user_id)
-                await emit_upload_progress(file_id, 50, user_id)
-
-            # Chunk processing
-            chunk_size = 100
-            transactions = []
-
-            chunks = [
-                cleaned_records[i : i + chunk_size]
-                for i in range(0, len(cleaned_records), chunk_size)
-            ]
-
-            for i, chunk in enumerate(chunks):
-                batch = await IngestionService.create_transactions_batch(
-                    db=db,
-                    transactions_data=chunk,
-                    subject_id=subject_id,
-                    bank_name=bank_name,
-                )
-                transactions.extend(batch)
+                await emit_upload_progress(file_id, 5, user_id)
+
+            producer = asyncio.create_task(parse_stage())
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    batch_index, records, rejected, fraction_read = item
+
+                    if batch_index >= resume_from:
+                        records, batch_duplicates = (
+                            await IngestionJobService.filter_new_rows(
+                                db, subject_id, records
+                            )
+                        )
+                        tx_rows, event_rows = IngestionService._build_insert_rows(
+                            records,
+                            subject_id=subject_id,
+                            bank_name=bank_name,
+                            event_metadata=event_metadata,
+                            created_at=imported_at,
+                        )
+                        await IngestionService._insert_rows(db, tx_rows, event_rows)
+                        IngestionJobService.checkpoint(
+                            job,
+                            batch_index,
+                            inserted=len(tx_rows),
+                            skipped=rejected,
+                            duplicates=batch_duplicates,
+                        )
+                        # Rows and checkpoint become durable together
+                        await db.commit()
+                        inserted += len(tx_rows)
+                        skipped += rejected
+                        duplicates += batch_duplicates
+
+                    if user_id:
+                        # Scale progress from 5 to 95 by share of the file read
+                        progress = 5 + int(min(fraction_read, 1) * 90)
+                        await emit_upload_progress(file_id, progress, user_id)
+            finally:
+                if not producer.done():
+                    producer.cancel()
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+
+            await IngestionJobService.finish(db, job)
 
-                if user_id:
-                    # Scale progress from 50 to 90
-                    progress = 50 + int(((i + 1) / len(chunks)) * 40)
-                    await emit_upload_progress(file_id, progress, user_id)
+            # Remember the confirmed mapping so the next upload with these
+            # headers skips the LLM
+            await MappingCacheService.store(db, headers, mapping, confirmed=True)
 
-            # Clean up file
+            # The staged file is kept until the job completes so a failed
+            # run can be resumed
             os.remove(file_path)
+            remove_session(upload_dir, file_id)
 
             if user_id:
                 await emit_upload_progress(file_id, 100, user_id)
                 await emit_processing_complete(file_id, user_id)
 
-            return transactions
+            return {
+                "job_id": job_id,
+                "inserted": inserted,
+                "skipped": skipped,
+                "duplicates": duplicates,
+                "already_imported": False,
+                "imported_at": imported_at.isoformat(),
+            }
 
         except Exception as e:
+            await db.rollback()
+            await IngestionJobService.fail(db, job_id, str(e))
             if user_id:
                 await emit_processing_error(file_id, str(e), user_id)
             raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+    @staticmethod
+    def _apply_mapping(df: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
+        """Rename source columns to target fields, keeping mapped ones only."""
+        # Frontend sends {target: source}, pandas renames {source: target}
+        rename_map = {v: k for k, v in mapping.items()}
+        df = df.rename(columns=rename_map)
+        return df[[k for k in mapping.keys() if k in df.columns]]
+
+    @staticmethod
+    def _parse_mapped(df: pd.DataFrame) -> Dict[str, Tuple[pd.Series, pd.Series]]:
+        """
+        Column-wise parse of mapped date and amount fields.
+
+        Returns {field: (parsed_values, is_valid)}, with dates as datetimes
+        and amounts as cleaned decimal text; only finite plain decimals
+        (no inf, nan or exponents) are valid amounts.
+        """
+        parsed = {}
+        if "date" in df.columns:
+            dates = parse_dates(df["date"].str.strip(), ("ISO8601", "%m/%d/%Y"))
+            parsed["date"] = (dates, dates.notna())
+        if "amount" in df.columns:
+            amount_text = clean_amounts(df["amount"])
+            parsed["amount"] = (amount_text, valid_amounts(amount_text))
+        return parsed
+
+    @staticmethod
+    def _clean_mapped_chunk(
+        chunk: pd.DataFrame, mapping: Dict[str, str]
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Applies a confirmed {target: source} mapping to one raw chunk.
+
+        Dates and amounts are parsed column-wise; rows where either is
+        missing or invalid are dropped and counted. Empty optional fields
+        are omitted from the resulting records.
+        """
+        df = IngestionService._apply_mapping(chunk, mapping)
+        parsed = IngestionService._parse_mapped(df)
+
+        valid = pd.Series(True, index=df.index)
+        for _, ok in parsed.values():
+            valid &= ok
+
+        df = df[valid]
+        records = df.to_dict(orient="records")
+        if "date" in parsed:
+            dates = parsed["date"][0][valid]
+            for record, date in zip(records, dates.dt.to_pydatetime()):
+                record["date"] = date
+        if "amount" in parsed:
+            for record, amount in zip(records, parsed["amount"][0][valid]):
+                record["amount"] = Decimal(amount)
+
+        cleaned = [{k: v for k, v in r.items() if v != ""} for r in records]
+        return cleaned, int((~valid).sum())
@@ -0,0 +1,267 @@
+"""
+Resumable, Idempotent Ingestion Jobs
+
+Provides:
+- IngestionJob bookkeeping keyed by subject and file SHA-256, with a
+  checkpoint after every committed batch so a restart resumes where the
+  last run stopped, and a claim so only one run works on a job at a time
+- RowHasher: natural-key row hashes (date, amount, description, account)
+  with an occurrence ordinal, so genuinely repeated rows within a file survive
+- Set-based duplicate filtering against already imported transactions
+  (one anti-join per batch instead of a lookup per row)
+"""
+
+import hashlib
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import IngestionJob, ProcessingStatus, Transaction
+
+logger = structlog.get_logger()
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 of a file, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def natural_key(record: Dict[str, Any], account: str = "") -> str:
+    """
+    Canonical text of a row's natural key.
+
+    Amounts are compared at cent precision and descriptions ignore case and
+    whitespace, so cosmetic differences between exports do not defeat dedup.
+    """
+    date = record.get("date")
+    amount = record.get("amount")
+    if amount is not None:
+        amount = Decimal(str(amount)).quantize(Decimal("0.01"))
+    description = re.sub(r"\s+", " ", str(record.get("description") or ""))
+    return "\x1f".join(
+        (
+            date.isoformat() if hasattr(date, "isoformat") else str(date or ""),
+            str(amount if amount is not None else ""),
+            description.strip().lower(),
+            str(record.get("account_number") or account).strip().lower(),
+        )
+    )
+
+
+class RowHasher:
+    """
+    Assigns `row_hash` to the rows of one file, in file order.
+
+    The n-th occurrence of a natural key within the file hashes differently
+    from the first, so two identical coffees on the same day are both kept,
+    while re-importing the same (or an overlapping) statement maps every row
+    onto a hash that already exists.
+    """
+
+    def __init__(self, account: str = ""):
+        self.account = account
+        # 16-byte key digest -> occurrences seen so far
+        self._occurrences: Dict[bytes, int] = {}
+
+    def assign(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            key = hashlib.blake2b(
+                natural_key(record, self.account).encode("utf-8"), digest_size=16
+            ).digest()
+            ordinal = self._occurrences.get(key, 0)
+            self._occurrences[key] = ordinal + 1
+            record["row_hash"] = hashlib.sha256(
+                key + ordinal.to_bytes(4, "big")
+            ).hexdigest()
+
+
+class IngestionJobService:
+    """Job lookup, checkpointing and duplicate filtering for imports."""
+
+    @staticmethod
+    async def get(db: AsyncSession, job_id: UUID) -> Optional[IngestionJob]:
+        return await db.get(IngestionJob, job_id)
+
+    @staticmethod
+    async def start(
+        db: AsyncSession,
+        subject_id: UUID,
+        file_id: str,
+        file_hash: str,
+        bank_name: str,
+        mapping: Dict[str, str],
+        batch_size: int,
+        user_id: Optional[str] = None,
+    ) -> IngestionJob:
+        """
+        Latest job for this subject, file content and mapping, or a new one.
+
+        A completed job is returned as is so the caller can skip the import;
+        an unfinished one is claimed and reused so the import resumes after
+        its last checkpoint. The job is committed before any rows are loaded.
+
+        Raises:
+            HTTPException 409 while another run is working on the job.
+        """
+        result = await db.execute(
+            select(IngestionJob)
+            .where(
+                IngestionJob.subject_id == subject_id,
+                IngestionJob.file_sha256 == file_hash,
+            )
+            .order_by(IngestionJob.created_at.desc())
+        )
+        for job in result.scalars():
+            if job.mapping == mapping:
+                if job.status != ProcessingStatus.COMPLETED:
+                    await IngestionJobService._claim(db, job, file_id)
+                    logger.info(
+                        "Resuming ingestion job",
+                        job_id=str(job.id),
+                        next_batch=job.last_committed_batch + 1,
+                    )
+                return job
+
+        job = IngestionJob(
+            subject_id=subject_id,
+            file_id=file_id,
+            file_sha256=file_hash,
+            bank_name=bank_name,
+            mapping=mapping,
+            batch_size=batch_size,
+            status=ProcessingStatus.PROCESSING,
+            last_committed_batch=-1,
+            rows_inserted=0,
+            rows_skipped=0,
+            rows_duplicate=0,
+            created_by=user_id,
+        )
+        db.add(job)
+        await db.commit()
+        return job
+
+    @staticmethod
+    async def _claim(db: AsyncSession, job: IngestionJob, file_id: str) -> None:
+        """
+        Mark an unfinished job processing for this run.
+
+        One conditional UPDATE, so of two concurrent runs only one gets the
+        job. A job left processing by a run that stopped checkpointing
+        INGESTION_JOB_STALE_SECONDS ago is taken over.
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.INGESTION_JOB_STALE_SECONDS)
+        result = await db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.id == job.id,
+                or_(
+                    IngestionJob.status.in_(
+                        [ProcessingStatus.PENDING, ProcessingStatus.FAILED]
+                    ),
+                    and_(
+                        IngestionJob.status == ProcessingStatus.PROCESSING,
+                        IngestionJob.updated_at < stale_before,
+                    ),
+                ),
+            )
+            .values(
+                file_id=file_id,
+                status=ProcessingStatus.PROCESSING,
+                error=None,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            await db.rollback()
+            raise HTTPException(
+                status_code=409, detail="This file is already being imported"
+            )
+        await db.commit()
+        await db.refresh(job)
+
+    @staticmethod
+    def checkpoint(
+        job: IngestionJob, batch_index: int, inserted: int, skipped: int, duplicates: int
+    ) -> None:
+        """Record a batch as done; committed together with the batch's rows."""
+        job.last_committed_batch = batch_index
+        job.rows_inserted += inserted
+        job.rows_skipped += skipped
+        job.rows_duplicate += duplicates
+
+    @staticmethod
+    async def finish(db: AsyncSession, job: IngestionJob) -> None:
+        job.status = ProcessingStatus.COMPLETED
+        await db.commit()
+
+    @staticmethod
+    async def fail(db: AsyncSession, job_id: UUID, error: str) -> None:
+        """Mark a job failed after its session was rolled back."""
+        try:
+            await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id)
+                .values(status=ProcessingStatus.FAILED, error=error[:2000])
+            )
+            await db.commit()
+        except Exception as e:
+            logger.warning(
+                "Failed to mark ingestion job failed", job_id=str(job_id), error=str(e)
+            )
+            await db.rollback()
+
+    @staticmethod
+    async def filter_new_rows(
+        db: AsyncSession, subject_id: UUID, records: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Drop records whose row_hash already exists for the subject.
+
+        One statement per batch: an anti-join of the batch's hashes against
+        transactions on PostgreSQL, an IN lookup plus set difference elsewhere.
+
+        Returns:
+            (new_records, duplicate_count)
+        """
+        hashes = [r["row_hash"] for r in records]
+        if not hashes:
+            return records, 0
+
+        if db.bind.dialect.name == "postgresql":
+            result = await db.execute(
+                text(
+                    "SELECT h FROM unnest(CAST(:hashes AS varchar[])) AS h "
+                    "WHERE NOT EXISTS ("
+                    "SELECT 1 FROM transactions t "
+                    "WHERE t.subject_id = :subject_id AND t.row_hash = h)"
+                ),
+                {"hashes": hashes, "subject_id": subject_id},
+            )
+            new_hashes = set(result.scalars())
+        else:
+            result = await db.execute(
+                select(Transaction.row_hash).where(
+                    Transaction.subject_id == subject_id,
+                    Transaction.row_hash.in_(hashes),
+                )
+            )
+            new_hashes = set(hashes) - set(result.scalars())
+
+        new_records = [r for r in records if r["row_hash"] in new_hashes]
+        return new_records, len(records) - len(new_records)
@@ -0,0 +1,302 @@
+"""
+Background Job Queue for Simple378
+
+Provides:
+- Job: a unit of background work (kind + JSON payload) and its status
+- Redis-backed queue (LPUSH/BLMOVE list plus per-job status keys) shared by
+  API and worker processes; a dequeued job waits in its consumer's
+  processing list until acknowledged, and jobs of consumers that stopped
+  heartbeating are requeued when a worker starts
+- In-process asyncio fallback for tests, development, or when Redis is down
+- Handler registry keyed by job kind
+"""
+
+import asyncio
+import json
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as redis
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+QUEUE_KEY = "jobs:queue"
+JOB_KEY_PREFIX = "jobs:job"
+# Per-consumer list of dequeued, not yet acknowledged job ids
+PROCESSING_KEY_PREFIX = "jobs:processing"
+# Per-consumer liveness key; its processing list is stale once it expires
+HEARTBEAT_KEY_PREFIX = "jobs:consumer"
+HEARTBEAT_TTL_SECONDS = 60
+
+JobHandler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """
+    Register the coroutine that runs jobs of a given kind.
+
+    Example:
+        @register_handler("ingestion.upload")
+        async def run_upload(db, payload) -> dict:
+            ...
+    """
+
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+
+    return decorator
+
+
+def get_handler(kind: str) -> Optional[JobHandler]:
+    return _handlers.get(kind)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+@dataclass
+class Job:
+    """A queued unit of work; payload and result must be JSON-serializable."""
+
+    kind: str
+    payload: Dict[str, Any]
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = JOB_QUEUED
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=_now)
+    updated_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        return cls(**data)
+
+
+class InMemoryBackend:
+    """Single-process queue; jobs are lost when the process exits."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job.to_dict()
+
+    async def load(self, job_id: str) -> Optional[Job]:
+        data = self._jobs.get(job_id)
+        return Job.from_dict(dict(data)) if data else None
+
+    async def push(self, job_id: str) -> None:
+        await self._queue.put(job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, job_id: str) -> None:
+        pass
+
+    async def heartbeat(self) -> None:
+        pass
+
+    async def requeue_stale(self) -> int:
+        return 0
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """
+    Redis list as the queue, one JSON key per job for status and result.
+
+    pop() moves a job id atomically into this consumer's processing list,
+    where it stays until ack(), so a job of a crashed worker is not lost.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: redis.Redis, ttl: int):
+        self.client = client
+        self.ttl = ttl
+        self.consumer_id = str(uuid.uuid4())
+        self.processing_key = f"{PROCESSING_KEY_PREFIX}:{self.consumer_id}"
+
+    async def save(self, job: Job) -> None:
+        await self.client.set(
+            f"{JOB_KEY_PREFIX}:{job.id}",
+            json.dumps(job.to_dict(), default=str),
+            ex=self.ttl,
+        )
+
+    async def load(self, job_id: str) -> Optional[Job]:
+        raw = await self.client.get(f"{JOB_KEY_PREFIX}:{job_id}")
+        return Job.from_dict(json.loads(raw)) if raw else None
+
+    async def push(self, job_id: str) -> None:
+        await self.client.lpush(QUEUE_KEY, job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        return await self.client.blmove(
+            QUEUE_KEY, self.processing_key, timeout, src="RIGHT", dest="LEFT"
+        )
+
+    async def ack(self, job_id: str) -> None:
+        await self.client.lrem(self.processing_key, 1, job_id)
+
+    async def heartbeat(self) -> None:
+        await self.client.set(
+            f"{HEARTBEAT_KEY_PREFIX}:{self.consumer_id}",
+            _now(),
+            ex=HEARTBEAT_TTL_SECONDS,
+        )
+
+    async def requeue_stale(self) -> int:
+        """Return jobs of consumers without a heartbeat to the queue."""
+        requeued = 0
+        async for key in self.client.scan_iter(match=f"{PROCESSING_KEY_PREFIX}:*"):
+            consumer_id = key.rsplit(":", 1)[-1]
+            if await self.client.exists(f"{HEARTBEAT_KEY_PREFIX}:{consumer_id}"):
+                continue
+            # Newest first onto the consuming end, so the oldest runs first
+            while await self.client.lmove(key, QUEUE_KEY, src="LEFT", dest="RIGHT"):
+                requeued += 1
+        return requeued
+
+    async def depth(self) -> int:
+        return await self.client.llen(QUEUE_KEY)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class JobQueue:
+    """Enqueue, dequeue and track background jobs."""
+
+    def __init__(self):
+        self._backend = None
+
+    async def connect(self):
+        """Select the backend; Redis is used when configured and reachable."""
+        if self._backend is not None:
+            return
+
+        if settings.JOB_QUEUE_BACKEND == "redis":
+            try:
+                client = redis.from_url(
+                    settings.REDIS_URL,
+                    encoding="utf-8",
+                    decode_responses=True,
+                    socket_connect_timeout=5,
+                )
+                await client.ping()
+                self._backend = RedisBackend(client, settings.JOB_RESULT_TTL_SECONDS)
+                logger.info("Job queue connected", backend="redis")
+            except Exception as e:
+                logger.warning(
+                    "Redis job queue unavailable, using in-process queue",
+                    error=str(e),
+                )
+
+        if self._backend is None:
+            self._backend = InMemoryBackend()
+
+    @property
+    def backend_name(self) -> Optional[str]:
+        return self._backend.name if self._backend else None
+
+    @property
+    def redis_client(self) -> Optional[redis.Redis]:
+        return getattr(self._backend, "client", None)
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> Job:
+        """Store a new job and push it onto the queue."""
+        await self.connect()
+        job = Job(kind=kind, payload=payload)
+        await self._backend.save(job)
+        await self._backend.push(job.id)
+        logger.info("Job enqueued", job_id=job.id, kind=kind)
+        return job
+
+    async def dequeue(self, timeout: float = 5) -> Optional[Job]:
+        """
+        Next job, or None if nothing arrived within `timeout` seconds.
+
+        The job counts as in progress until ack(); on Redis it is requeued
+        by requeue_stale() if this consumer dies first.
+        """
+        await self.connect()
+        job_id = await self._backend.pop(timeout)
+        if job_id is None:
+            return None
+        job = await self._backend.load(job_id)
+        if job is None:
+            logger.warning("Dequeued job has expired", job_id=job_id)
+            await self._backend.ack(job_id)
+        return job
+
+    async def ack(self, job: Job) -> None:
+        """Mark a dequeued job as finished, whatever its outcome."""
+        await self._backend.ack(job.id)
+
+    async def heartbeat(self) -> None:
+        """Keep this consumer's in-progress jobs from counting as stale."""
+        await self.connect()
+        await self._backend.heartbeat()
+
+    async def requeue_stale(self) -> int:
+        """Requeue in-progress jobs of consumers that stopped heartbeating."""
+        await self.connect()
+        requeued = await self._backend.requeue_stale()
+        if requeued:
+            logger.warning("Requeued jobs of stopped workers", jobs=requeued)
+        return requeued
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        await self.connect()
+        return await self._backend.load(job_id)
+
+    async def update(self, job: Job, **fields: Any) -> Job:
+        """Set job fields (status, result, error) and persist them."""
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated_at = _now()
+        await self._backend.save(job)
+        return job
+
+    async def depth(self) -> int:
+        await self.connect()
+        return await self._backend.depth()
+
+    async def close(self):
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+
+# Global job queue instance
+job_queue = JobQueue()
@@ -0,0 +1,164 @@
+"""
+Column Mapping Cache for CSV Ingestion
+
+Banks send the same header row every month, so the column mapping for a
+header row is cached under a normalized header signature:
+- Redis (via CacheService) for millisecond lookups
+- The column_mapping_cache table as the durable fallback
+- Confirmed user mappings always take precedence over AI suggestions
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.models import ColumnMappingCache
+from app.services.cache_service import cache
+
+logger = structlog.get_logger()
+
+CACHE_KEY_PREFIX = "ingestion:mapping"
+
+
+def normalize_header(header: str) -> str:
+    """Case-, whitespace- and BOM-insensitive form of a header name."""
+    return re.sub(r"\s+", " ", str(header).replace("\ufeff", "")).strip().lower()
+
+
+def header_signature(headers: List[str]) -> str:
+    """Stable signature of a header row (order-sensitive)."""
+    normalized = "\x1f".join(normalize_header(h) for h in headers)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _rebind(mapping: Dict[str, str], headers: List[str]) -> Dict[str, str]:
+    """
+    Point a cached {target: source} mapping at this file's exact header
+    spellings, dropping sources that no longer exist.
+    """
+    by_normalized = {normalize_header(h): h for h in headers}
+    rebound = {}
+    for target, source in mapping.items():
+        actual = by_normalized.get(normalize_header(source))
+        if actual is not None:
+            rebound[target] = actual
+    return rebound
+
+
+class MappingCacheService:
+    """Lookup and write-back of column mappings by header signature."""
+
+    @staticmethod
+    async def get(
+        db: Optional[AsyncSession], headers: List[str]
+    ) -> Optional[Dict[str, str]]:
+        """
+        Cached mapping for a header row, or None on a miss.
+
+        Checks Redis first, then the database; a database hit is written
+        back to Redis. Failures are logged and count as a miss, so the
+        upload falls back to auto-mapping.
+        """
+        signature = header_signature(headers)
+        key = f"{CACHE_KEY_PREFIX}:{signature}"
+        try:
+            cached = await cache.get(key)
+            if cached is not None:
+                return _rebind(cached, headers)
+
+            if db is None:
+                return None
+
+            result = await db.execute(
+                select(ColumnMappingCache.mapping).where(
+                    ColumnMappingCache.header_signature == signature
+                )
+            )
+            mapping = result.scalar_one_or_none()
+            if mapping is None:
+                return None
+
+            await MappingCacheService._count_hit(db, signature)
+            await cache.set(key, mapping, ttl=settings.MAPPING_CACHE_TTL_SECONDS)
+            return _rebind(mapping, headers)
+        except Exception as e:
+            logger.warning(
+                "Failed to look up column mapping", signature=signature, error=str(e)
+            )
+            return None
+
+    @staticmethod
+    async def _count_hit(db: AsyncSession, signature: str) -> None:
+        """
+        Bump the hit count in a session of its own, leaving the caller's
+        transaction untouched; a lost count is only logged.
+        """
+        try:
+            async with AsyncSession(db.bind) as counter:
+                hits = func.coalesce(ColumnMappingCache.hit_count, 0) + 1
+                await counter.execute(
+                    update(ColumnMappingCache)
+                    .where(ColumnMappingCache.header_signature == signature)
+                    .values(hit_count=hits)
+                )
+                await counter.commit()
+        except Exception as e:
+            logger.warning(
+                "Failed to count column mapping hit", signature=signature, error=str(e)
+            )
+
+    @staticmethod
+    async def store(
+        db: Optional[AsyncSession],
+        headers: List[str],
+        mapping: Dict[str, str],
+        confirmed: bool,
+    ) -> None:
+        """
+        Remember a mapping for a header row.
+
+        AI suggestions (confirmed=False) never overwrite a mapping a user
+        has confirmed. Failures are logged and swallowed so caching can
+        never break an upload.
+        """
+        if not mapping:
+            return
+
+        signature = header_signature(headers)
+        try:
+            if db is not None:
+                entry = await db.get(ColumnMappingCache, signature)
+                if entry is not None and entry.confirmed and not confirmed:
+                    return
+                if entry is None:
+                    db.add(
+                        ColumnMappingCache(
+                            header_signature=signature,
+                            headers=list(headers),
+                            mapping=mapping,
+                            confirmed=confirmed,
+                        )
+                    )
+                else:
+                    entry.headers = list(headers)
+                    entry.mapping = mapping
+                    entry.confirmed = confirmed
+                await db.commit()
+
+            await cache.set(
+                f"{CACHE_KEY_PREFIX}:{signature}",
+                mapping,
+                ttl=settings.MAPPING_CACHE_TTL_SECONDS,
+            )
+        except Exception as e:
+            logger.warning(
+                "Failed to store column mapping", signature=signature, error=str(e)
+            )
+            if db is not None:
+                await db.rollback()
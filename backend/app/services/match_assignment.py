@@ -0,0 +1,205 @@
+"""
+One-to-One Assignment for Reconciliation
+
+Provides:
+- greedy_select(): first-best selection over scored pairs, in the order the
+  rule-based passes use
+- connected_components(): splits scored candidate pairs into independent
+  components of the internal/external graph
+- solve_component(): maximum total score matching for one component, with
+  the Hungarian method from scipy when installed and networkx otherwise
+- assign_pairs(): solves every component, batching non-trivial ones into
+  the shared CPU pool
+
+Pairs are aligned (rows, cols, scores) arrays of internal positions,
+external positions and match scores.
+"""
+
+import asyncio
+from typing import List, Tuple
+
+import networkx as nx
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.core.process_pool import cpu_pool
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # pragma: no cover - depends on the environment
+    linear_sum_assignment = None
+
+logger = structlog.get_logger()
+
+# Edges per batch of components sent to the CPU pool
+POOL_BATCH_EDGES = 50_000
+
+Pairs = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _pairs(rows, cols, scores) -> Pairs:
+    return (
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(cols, dtype=np.int64),
+        np.asarray(scores, dtype=np.float64),
+    )
+
+
+def greedy_select(
+    li: np.ndarray, ri: np.ndarray, scores: np.ndarray, used: bytearray
+) -> Pairs:
+    """
+    Each row takes its best unused column.
+
+    Pairs are visited by row, then score descending, then column, so the
+    result equals the per-pair greedy pass. Taken columns are set in `used`.
+    """
+    order = np.lexsort((ri, -scores, li))
+    rows, cols, picked = [], [], []
+    current = -1
+    for i, j, score in zip(
+        li[order].tolist(), ri[order].tolist(), scores[order].tolist()
+    ):
+        if i == current or used[j]:
+            continue
+        current = i
+        used[j] = 1
+        rows.append(i)
+        cols.append(j)
+        picked.append(score)
+    return _pairs(rows, cols, picked)
+
+
+def connected_components(li: np.ndarray, ri: np.ndarray) -> np.ndarray:
+    """Component label of every pair, with rows and columns as graph nodes."""
+    _, row_nodes = np.unique(li, return_inverse=True)
+    cols, col_nodes = np.unique(ri, return_inverse=True)
+    row_count = int(row_nodes.max()) + 1 if len(row_nodes) else 0
+    col_nodes = col_nodes + row_count
+    parent = list(range(row_count + len(cols)))
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]  # Path halving
+            node = parent[node]
+        return node
+
+    for a, b in zip(row_nodes.tolist(), col_nodes.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    return np.fromiter(
+        (find(node) for node in row_nodes.tolist()),
+        dtype=np.int64,
+        count=len(row_nodes),
+    )
+
+
+def solve_component(
+    li: np.ndarray, ri: np.ndarray, scores: np.ndarray, max_component: int
+) -> Pairs:
+    """
+    Matching with the largest total score within one component.
+
+    Components with more than `max_component` rows or columns fall back to
+    greedy_select, as a dense cost matrix would not fit.
+    """
+    rows, r = np.unique(li, return_inverse=True)
+    cols, c = np.unique(ri, return_inverse=True)
+
+    if len(rows) == 1 or len(cols) == 1:
+        best = int(np.argmax(scores))
+        return _pairs([li[best]], [ri[best]], [scores[best]])
+
+    if max(len(rows), len(cols)) > max_component:
+        sel_r, sel_c, picked = greedy_select(r, c, scores, bytearray(len(cols)))
+        return rows[sel_r], cols[sel_c], picked
+
+    if linear_sum_assignment is not None:
+        # Unlinked cells cost 0, the same as leaving both sides unmatched
+        cost = np.zeros((len(rows), len(cols)))
+        cost[r, c] = -scores
+        sel_r, sel_c = linear_sum_assignment(cost)
+        linked = cost[sel_r, sel_c] < 0
+        sel_r, sel_c = sel_r[linked], sel_c[linked]
+        return _pairs(rows[sel_r], cols[sel_c], -cost[sel_r, sel_c])
+
+    graph = nx.Graph()
+    offset = len(rows)
+    graph.add_weighted_edges_from(
+        zip(r.tolist(), (c + offset).tolist(), scores.tolist())
+    )
+    matched = sorted(
+        (min(a, b), max(a, b)) for a, b in nx.max_weight_matching(graph)
+    )
+    return _pairs(
+        [rows[a] for a, _ in matched],
+        [cols[b - offset] for _, b in matched],
+        [graph[a][b]["weight"] for a, b in matched],
+    )
+
+
+def solve_components(components: List[Pairs], max_component: int) -> List[Pairs]:
+    """CPU pool entry point: solve a batch of components."""
+    return [solve_component(*component, max_component) for component in components]
+
+
+async def assign_pairs(li: np.ndarray, ri: np.ndarray, scores: np.ndarray) -> Pairs:
+    """
+    One-to-one matching of scored pairs maximizing total score.
+
+    Components with a single row or column are solved inline; the rest
+    are batched by edge count and solved in parallel in the CPU pool.
+    """
+    if not len(li):
+        return _pairs([], [], [])
+
+    labels = connected_components(li, ri)
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    max_component = settings.RECONCILIATION_ASSIGNMENT_MAX_COMPONENT
+
+    results: List[Pairs] = []
+    batches: List[List[Pairs]] = []
+    batch: List[Pairs] = []
+    batch_edges = 0
+    for group in np.split(order, boundaries):
+        component = (li[group], ri[group], scores[group])
+        if (
+            len(group) == 1
+            or len(np.unique(component[0])) == 1
+            or len(np.unique(component[1])) == 1
+        ):
+            results.append(solve_component(*component, max_component))
+            continue
+        batch.append(component)
+        batch_edges += len(group)
+        if batch_edges >= POOL_BATCH_EDGES:
+            batches.append(batch)
+            batch, batch_edges = [], 0
+    if batch:
+        batches.append(batch)
+
+    solved = await asyncio.gather(
+        *(
+            cpu_pool.run("match_assignment", solve_components, batch, max_component)
+            for batch in batches
+        )
+    )
+    for batch_results in solved:
+        results.extend(batch_results)
+
+    logger.info(
+        "Reconciliation assignment solved",
+        components=len(boundaries) + 1,
+        pooled_components=sum(len(b) for b in batches),
+        pool_batches=len(batches),
+    )
+
+    rows = np.concatenate([r for r, _, _ in results])
+    cols = np.concatenate([c for _, c, _ in results])
+    picked = np.concatenate([s for _, _, s in results])
+    by_row = np.argsort(rows, kind="stable")
+    return rows[by_row], cols[by_row], picked[by_row]
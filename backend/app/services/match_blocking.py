@@ -0,0 +1,195 @@
+"""
+Candidate Blocking for Reconciliation Matching
+
+Provides:
+- BlockingIndex: external transactions bucketed by whole currency unit of
+  their amount, each bucket sorted by date, so an internal transaction is
+  only scored against externals with a nearby amount and date
+- Used-slot tracking so greedy matching skips matched externals without
+  rescanning or removing from lists
+- Aligned candidate pair arrays for batched scoring
+"""
+
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+
+# Date ordinals stay below 2**22 (year 9999), so (bucket, ordinal) packs
+# into one sortable int64
+_ORDINAL_SPAN = 1 << 22
+
+
+def amount_cents(tx: Any) -> int:
+    """Transaction amount in integer cents (missing amounts count as 0)."""
+    return int((Decimal(tx.amount or 0) * 100).to_integral_value())
+
+
+def amount_unit(tx: Any) -> int:
+    """Whole currency unit of the amount, floored; the amount bucket key."""
+    return amount_cents(tx) // 100
+
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, start + count) for each range."""
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+class BlockingIndex:
+    """
+    Bucket externals by amount and date for candidate lookups.
+
+    A bucket holds every external whose amount falls in the same whole
+    currency unit; lookups probe the unit on either side, which covers all
+    pairs less than 1.00 apart. Within a bucket, externals are sorted by date
+    ordinal and the date window is a bisect range.
+
+    Either dimension can be switched off when the caller's threshold can be
+    reached without it, so blocking never drops a pair that could match.
+    """
+
+    def __init__(
+        self,
+        externals: Sequence[Any],
+        date_window_days: Optional[int] = None,
+        block_on_amount: bool = True,
+    ):
+        """
+        Args:
+            externals: Transactions with amount and date attributes
+            date_window_days: Max day difference for candidates, or None to
+                ignore dates
+            block_on_amount: Restrict candidates to amounts within 1.00
+        """
+        self.externals = externals
+        self.date_window_days = date_window_days
+        self.block_on_amount = block_on_amount
+        # Flags of externals already matched, shared by greedy passes
+        self.used = bytearray(len(externals))
+
+        grouped: Dict[int, List[Tuple[int, int]]] = {}
+        for position, tx in enumerate(externals):
+            if date_window_days is not None and tx.date is None:
+                continue  # Can never fall inside a date window
+            ordinal = tx.date.toordinal() if tx.date else 0
+            key = amount_unit(tx) if block_on_amount else 0
+            grouped.setdefault(key, []).append((ordinal, position))
+
+        # key -> (sorted date ordinals, positions in the same order)
+        self._buckets: Dict[int, Tuple[List[int], List[int]]] = {}
+        packed: List[int] = []
+        packed_positions: List[int] = []
+        for key in sorted(grouped):
+            entries = sorted(grouped[key])
+            ordinals = [ordinal for ordinal, _ in entries]
+            positions = [position for _, position in entries]
+            self._buckets[key] = (ordinals, positions)
+            packed.extend(key * _ORDINAL_SPAN + ordinal for ordinal in ordinals)
+            packed_positions.extend(positions)
+
+        # The same buckets flattened for batched lookups in candidate_pairs
+        self._packed = np.asarray(packed, dtype=np.int64)
+        self._packed_positions = np.asarray(packed_positions, dtype=np.int64)
+
+        logger.debug(
+            "Blocking index built",
+            externals=len(externals),
+            buckets=len(self._buckets),
+            date_window_days=date_window_days,
+            block_on_amount=block_on_amount,
+        )
+
+    def candidates(self, internal: Any) -> List[int]:
+        """Unused external positions that may match `internal`, ascending."""
+        if self.date_window_days is not None and internal.date is None:
+            return []
+
+        if self.block_on_amount:
+            unit = amount_unit(internal)
+            keys = (unit - 1, unit, unit + 1)
+        else:
+            keys = (0,)
+
+        found: List[int] = []
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            ordinals, positions = bucket
+            if self.date_window_days is None:
+                lo, hi = 0, len(positions)
+            else:
+                # Scored days floor the elapsed time, so calendar days can be
+                # one more than the scored difference; pad to stay a superset
+                ordinal = internal.date.toordinal()
+                window = self.date_window_days + 1
+                lo = bisect_left(ordinals, ordinal - window)
+                hi = bisect_right(ordinals, ordinal + window)
+            found.extend(p for p in positions[lo:hi] if not self.used[p])
+
+        # Ascending positions keep first-in-list tie-breaking
+        found.sort()
+        return found
+
+    def candidate_pairs(
+        self, internals: Sequence[Any], offset: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aligned (internal, external) position arrays of all candidate pairs.
+
+        The same pairs as candidates() for each internal, found with one
+        searchsorted per probed bucket over the packed (bucket, date) keys.
+        Used flags are ignored. Internal positions start at `offset`, so
+        callers can block a slice of a larger list.
+        """
+        size = len(internals)
+        rows = np.arange(offset, offset + size, dtype=np.int64)
+        if self.date_window_days is not None:
+            dated = np.fromiter(
+                (tx.date is not None for tx in internals), dtype=bool, count=size
+            )
+            ordinals = np.fromiter(
+                (tx.date.toordinal() if tx.date else 0 for tx in internals),
+                dtype=np.int64,
+                count=size,
+            )
+            rows, ordinals = rows[dated], ordinals[dated]
+            internals = [tx for tx, keep in zip(internals, dated) if keep]
+            window = self.date_window_days + 1  # See candidates()
+            low, high = ordinals - window, ordinals + window
+        else:
+            low = np.zeros(len(rows), dtype=np.int64)
+            high = np.full(len(rows), _ORDINAL_SPAN - 1, dtype=np.int64)
+
+        if self.block_on_amount:
+            units = np.fromiter(
+                (amount_unit(tx) for tx in internals),
+                dtype=np.int64,
+                count=len(internals),
+            )
+            probes = (units - 1, units, units + 1)
+        else:
+            probes = (np.zeros(len(rows), dtype=np.int64),)
+
+        left = []
+        right = []
+        for keys in probes:
+            base = keys * _ORDINAL_SPAN
+            lo = np.searchsorted(self._packed, base + low, side="left")
+            hi = np.searchsorted(self._packed, base + high, side="right")
+            counts = hi - lo
+            left.append(np.repeat(rows, counts))
+            right.append(self._packed_positions[expand_ranges(lo, counts)])
+        return np.concatenate(left), np.concatenate(right)
+
+    def mark_used(self, position: int) -> None:
+        self.used[position] = 1
+
+    def is_used(self, position: int) -> bool:
+        return bool(self.used[position])
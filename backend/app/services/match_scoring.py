@@ -0,0 +1,275 @@
+"""
+Batched Match Scoring for Reconciliation
+
+Provides:
+- Score weights and the description tokenizer shared by per-pair and
+  batched scoring
+- FeatureVocabulary: encodes transactions once into NumPy feature arrays
+  (amounts, timestamps, bank and description ids, token sets in CSR
+  form) with ids shared between the internal and external sides
+- score_pairs(): scores aligned arrays of candidate pairs in one pass
+- CandidatePool: externals encoded and blocked once, so pages of internals
+  can be scored against them one after another
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, FrozenSet, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.match_blocking import BlockingIndex, expand_ranges
+
+# Match score weights
+AMOUNT_WEIGHT = 0.4
+DATE_WEIGHT = 0.3
+DESCRIPTION_WEIGHT = 0.2
+BANK_WEIGHT = 0.1
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+_MICROS_PER_DAY = 86_400_000_000
+
+
+def description_tokens(text: str) -> FrozenSet[str]:
+    """
+    Whole words of a lowercased description. Two descriptions that share
+    one get partial credit, in the per-pair and the batched scorer alike.
+    """
+    return frozenset(text.split())
+
+
+def _epoch_micros(value: datetime) -> int:
+    epoch = _EPOCH_UTC if value.tzinfo else _EPOCH
+    return (value - epoch) // timedelta(microseconds=1)
+
+
+@dataclass
+class TransactionFeatures:
+    """Column arrays for one side of a reconciliation run."""
+
+    amounts: np.ndarray  # float64, as compared by the per-pair scorer
+    micros: np.ndarray  # int64 microseconds since epoch
+    has_date: np.ndarray  # bool
+    bank_ids: np.ndarray  # int64, -1 when missing
+    description_ids: np.ndarray  # int64 id of the lowercased text, -1 when missing
+    token_indptr: np.ndarray  # CSR row pointers into token_ids
+    token_ids: np.ndarray  # int64 distinct token ids per transaction, ascending
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+
+class FeatureVocabulary:
+    """Interns banks, descriptions and tokens so both sides share ids."""
+
+    def __init__(self):
+        self.banks: Dict[str, int] = {}
+        self.descriptions: Dict[str, int] = {}
+        self.tokens: Dict[str, int] = {}
+        # Token ids per description id; descriptions repeat a lot, so each
+        # distinct text is only split once
+        self._description_tokens: List[List[int]] = []
+
+    @staticmethod
+    def _intern(table: Dict[str, int], value: str) -> int:
+        return table.setdefault(value, len(table))
+
+    def _description_id(self, text: str) -> int:
+        description_id = self.descriptions.get(text)
+        if description_id is None:
+            description_id = len(self.descriptions)
+            self.descriptions[text] = description_id
+            self._description_tokens.append(
+                sorted(
+                    self._intern(self.tokens, token)
+                    for token in description_tokens(text)
+                )
+            )
+        return description_id
+
+    def encode(self, transactions: Sequence[Any]) -> TransactionFeatures:
+        size = len(transactions)
+        amounts = np.fromiter(
+            (float(tx.amount or 0) for tx in transactions), dtype=np.float64, count=size
+        )
+        micros = np.fromiter(
+            (_epoch_micros(tx.date) if tx.date else 0 for tx in transactions),
+            dtype=np.int64,
+            count=size,
+        )
+        has_date = np.fromiter(
+            (tx.date is not None for tx in transactions), dtype=bool, count=size
+        )
+        bank_ids = np.fromiter(
+            (
+                self._intern(self.banks, tx.source_bank.lower())
+                if tx.source_bank
+                else -1
+                for tx in transactions
+            ),
+            dtype=np.int64,
+            count=size,
+        )
+        description_ids = np.fromiter(
+            (
+                self._description_id(tx.description.lower()) if tx.description else -1
+                for tx in transactions
+            ),
+            dtype=np.int64,
+            count=size,
+        )
+
+        token_lists = [
+            self._description_tokens[d] if d >= 0 else []
+            for d in description_ids.tolist()
+        ]
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum([len(tokens) for tokens in token_lists], out=indptr[1:])
+        token_ids = np.fromiter(
+            (token for tokens in token_lists for token in tokens),
+            dtype=np.int64,
+            count=int(indptr[-1]),
+        )
+
+        return TransactionFeatures(
+            amounts=amounts,
+            micros=micros,
+            has_date=has_date,
+            bank_ids=bank_ids,
+            description_ids=description_ids,
+            token_indptr=indptr,
+            token_ids=token_ids,
+        )
+
+
+def _gather_tokens(features: TransactionFeatures, rows: np.ndarray):
+    """(pair index, token id) for every token of every row in `rows`."""
+    counts = np.diff(features.token_indptr)[rows]
+    pair_index = np.repeat(np.arange(len(rows)), counts)
+    tokens = features.token_ids[expand_ranges(features.token_indptr[rows], counts)]
+    return pair_index, tokens
+
+
+def _token_overlap(
+    left: TransactionFeatures,
+    right: TransactionFeatures,
+    li: np.ndarray,
+    ri: np.ndarray,
+    vocabulary_size: int,
+) -> np.ndarray:
+    """Whether each pair shares at least one description token."""
+    left_pairs, left_tokens = _gather_tokens(left, li)
+    right_pairs, right_tokens = _gather_tokens(right, ri)
+    # One int64 key per (pair, token); a key on both sides is a shared token.
+    # Tokens are ascending within each transaction, so both key arrays are
+    # already sorted and membership is a binary search
+    stride = max(vocabulary_size, 1)
+    left_keys = left_pairs * stride + left_tokens
+    right_keys = right_pairs * stride + right_tokens
+    if not len(right_keys):
+        return np.zeros(len(li), dtype=bool)
+    found = np.minimum(np.searchsorted(right_keys, left_keys), len(right_keys) - 1)
+    hit = right_keys[found] == left_keys
+    overlap = np.zeros(len(li), dtype=bool)
+    overlap[left_pairs[hit]] = True
+    return overlap
+
+
+def score_pairs(
+    left: TransactionFeatures,
+    right: TransactionFeatures,
+    li: np.ndarray,
+    ri: np.ndarray,
+    date_buffer_days: int,
+    vocabulary: FeatureVocabulary,
+) -> np.ndarray:
+    """
+    Match scores for the aligned candidate pairs (left[li], right[ri]).
+
+    Mirrors ReconciliationService._calculate_match_score exactly.
+    """
+    scores = np.zeros(len(li), dtype=np.float64)
+    if not len(li):
+        return scores
+
+    # Amount: exact, or partial credit within 1.00
+    amount_diff = np.abs(left.amounts[li] - right.amounts[ri])
+    scores += np.where(
+        amount_diff < 0.01,
+        AMOUNT_WEIGHT,
+        np.where(amount_diff < 1.0, AMOUNT_WEIGHT / 2, 0.0),
+    )
+
+    # Date: whole days of the absolute difference, so the score is symmetric
+    both_dated = left.has_date[li] & right.has_date[ri]
+    days = np.abs(left.micros[li] - right.micros[ri]) // _MICROS_PER_DAY
+    date_score = np.where(
+        days == 0,
+        DATE_WEIGHT,
+        DATE_WEIGHT * (1 - days / (date_buffer_days + 1)),
+    )
+    scores += np.where(both_dated & (days <= date_buffer_days), date_score, 0.0)
+
+    # Description: identical text, else any shared token
+    left_desc = left.description_ids[li]
+    both_described = (left_desc >= 0) & (right.description_ids[ri] >= 0)
+    identical = both_described & (left_desc == right.description_ids[ri])
+    overlap = both_described & ~identical
+    if overlap.any():
+        partial = np.flatnonzero(overlap)
+        overlap[partial] = _token_overlap(
+            left, right, li[partial], ri[partial], len(vocabulary.tokens)
+        )
+    scores += np.where(
+        identical,
+        DESCRIPTION_WEIGHT,
+        np.where(overlap, DESCRIPTION_WEIGHT / 2, 0.0),
+    )
+
+    # Bank consistency
+    left_bank = left.bank_ids[li]
+    scores += np.where(
+        (left_bank >= 0) & (left_bank == right.bank_ids[ri]), BANK_WEIGHT, 0.0
+    )
+
+    return np.minimum(scores, 1.0)
+
+
+class CandidatePool:
+    """
+    External transactions prepared once for repeated matching.
+
+    Greedy passes mark matches in `index.used`, so matching pages of
+    internals one after another gives the same result as a single pass.
+    """
+
+    def __init__(self, externals: Sequence[Any], index: BlockingIndex):
+        self.externals = externals
+        self.index = index
+        self.vocabulary = FeatureVocabulary()
+        self.features = self.vocabulary.encode(externals)
+
+    def scored_pairs(
+        self,
+        internals: Sequence[Any],
+        threshold: float,
+        date_buffer_days: int,
+        batch_size: int,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Candidate pairs of `internals` scoring at least `threshold`.
+
+        Yields aligned (internal positions, external positions, scores) per
+        batch of `batch_size` internals.
+        """
+        left = self.vocabulary.encode(internals)
+        for start in range(0, len(internals), batch_size):
+            li, ri = self.index.candidate_pairs(
+                internals[start : start + batch_size], offset=start
+            )
+            scores = score_pairs(
+                left, self.features, li, ri, date_buffer_days, self.vocabulary
+            )
+            keep = scores >= threshold
+            yield li[keep], ri[keep], scores[keep]
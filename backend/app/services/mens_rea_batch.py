@@ -0,0 +1,295 @@
+"""
+Batched Mens Rea Analysis
+
+Provides:
+- MensReaBatchService.run(): analyzes every subject of a tenant, or a list
+  of subjects, in one pass - e.g. the nightly portfolio re-score
+- Transactions streamed in (subject_id, id) keyset pages; the subject a
+  page ends in is carried into the next page, so each subject is analyzed
+  once over its whole history
+- The detectors and heuristic rules for a page run in the shared CPU
+  pool, split across its workers by subject, while the next page loads
+- AnalysisResult and Indicator rows written with one bulk insert each per
+  page, committed per page
+
+Rule hits are stored as "heuristic_rule" indicators, and every result
+records the rule set version it was scored with.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+import structlog
+from sqlalchemy import insert, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.process_pool import cpu_pool
+from app.db.models import AnalysisResult, Indicator, Subject, Transaction
+from app.schemas.analysis import HeuristicRule, RuleResult
+from app.services.detectors.mirroring import MirroringDetector
+from app.services.detectors.structuring import StructuringDetector
+from app.services.detectors.velocity import VelocityDetector
+from app.services.heuristic_engine import HeuristicEngine
+from app.services.rule_features import RuleFeatureService, compute_rule_features
+from app.services.rule_store import rule_store
+
+logger = structlog.get_logger()
+
+DETECTORS = (StructuringDetector, VelocityDetector, MirroringDetector)
+# Indicator confidence of a triggered heuristic rule, by severity
+RULE_CONFIDENCE = {"low": 0.3, "medium": 0.5, "high": 0.7, "critical": 0.9}
+
+# One subject's analysis: (subject id, indicators)
+SubjectAnalysis = Tuple[str, List[Dict[str, Any]]]
+
+
+def risk_score(indicators: List[Dict[str, Any]]) -> float:
+    """Confidence of the strongest indicator; 0 without any."""
+    return max((indicator["confidence"] for indicator in indicators), default=0.0)
+
+
+def _rule_indicator(result: RuleResult) -> Dict[str, Any]:
+    count = result.context["transaction_count"]
+    return {
+        "type": "heuristic_rule",
+        "confidence": RULE_CONFIDENCE.get(result.severity, 0.5),
+        "evidence": {
+            "rule_id": result.rule_id,
+            "rule_name": result.rule_name,
+            "severity": result.severity,
+            **result.context,
+            "reason": f"{result.rule_name} triggered on {count} transaction(s)",
+        },
+    }
+
+
+def analyze_subjects(
+    columns: Dict[str, Any], rules: List[HeuristicRule], rule_version: int
+) -> List[SubjectAnalysis]:
+    """
+    Run the detectors and heuristic rules over whole subjects.
+
+    Runs in the CPU work pool. `columns` holds equal-length id, subject_id,
+    amount and date columns with each subject's rows contiguous.
+    """
+    frame = pd.DataFrame(columns)
+    engine = HeuristicEngine(rules, version=rule_version)
+    scored = RuleFeatureService.score_frame(compute_rule_features(frame), engine)
+    detectors = [detector() for detector in DETECTORS]
+
+    ids = columns["id"]
+    subject_ids = columns["subject_id"]
+    amounts = columns["amount"].tolist()
+    dates = pd.DatetimeIndex(columns["date"]).to_pydatetime()
+
+    analyzed: List[SubjectAnalysis] = []
+    start = 0
+    while start < len(ids):
+        stop = start
+        while stop < len(ids) and subject_ids[stop] == subject_ids[start]:
+            stop += 1
+        transactions = [
+            {"id": ids[row], "amount": amounts[row], "date": dates[row]}
+            for row in range(start, stop)
+        ]
+        indicators = [
+            indicator
+            for detector in detectors
+            for indicator in detector.detect(transactions)
+        ]
+        hits = {tx["id"]: scored[tx["id"]] for tx in transactions if tx["id"] in scored}
+        indicators.extend(
+            _rule_indicator(result) for result in RuleFeatureService.summarize(hits)
+        )
+        analyzed.append((subject_ids[start], indicators))
+        start = stop
+    return analyzed
+
+
+def _chunks(rows: List[Any], parts: int) -> List[Dict[str, Any]]:
+    """About `parts` column chunks of `rows`, never splitting a subject."""
+    target = max(1, -(-len(rows) // parts))
+    chunks: List[Dict[str, Any]] = []
+    start = 0
+    while start < len(rows):
+        stop = min(start + target, len(rows))
+        while stop < len(rows) and rows[stop].subject_id == rows[stop - 1].subject_id:
+            stop += 1
+        part = rows[start:stop]
+        chunks.append(
+            {
+                "id": [str(row.id) for row in part],
+                "subject_id": [str(row.subject_id) for row in part],
+                "amount": np.array([float(row.amount) for row in part]),
+                "date": np.array([row.date for row in part], dtype="datetime64[us]"),
+            }
+        )
+        start = stop
+    return chunks
+
+
+class MensReaBatchService:
+    """Analyzes many subjects at once and bulk-writes the results."""
+
+    @staticmethod
+    async def _pages(
+        db: AsyncSession, subject_clause: Any, page_size: int
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Transactions of whole subjects in (subject_id, id) order. Each
+        keyset page resumes after the last row of the previous one; the
+        rows of the page's last subject wait for the next page.
+        """
+        query = (
+            select(
+                Transaction.id,
+                Transaction.subject_id,
+                Transaction.amount,
+                Transaction.date,
+            )
+            .where(subject_clause)
+            .order_by(Transaction.subject_id, Transaction.id)
+            .limit(page_size)
+        )
+        carried: List[Any] = []
+        last: Optional[Tuple[Any, Any]] = None
+        while True:
+            page_query = query
+            if last is not None:
+                page_query = query.where(
+                    tuple_(Transaction.subject_id, Transaction.id) > tuple_(*last)
+                )
+            page = list((await db.execute(page_query)).all())
+            rows = carried + page
+            if len(page) < page_size:
+                if rows:
+                    yield rows
+                return
+
+            last = (page[-1].subject_id, page[-1].id)
+            cut = len(rows)
+            while cut > 0 and rows[cut - 1].subject_id == last[0]:
+                cut -= 1
+            carried = rows[cut:]
+            if cut:
+                yield rows[:cut]
+
+    @staticmethod
+    async def _write(
+        db: AsyncSession, analyzed: List[SubjectAnalysis], rule_version: int
+    ) -> int:
+        """Bulk insert one page's results and indicators; returns indicators."""
+        results: List[Dict[str, Any]] = []
+        indicators: List[Dict[str, Any]] = []
+        for subject_id, subject_indicators in analyzed:
+            result_id = uuid.uuid4()
+            results.append(
+                {
+                    "id": result_id,
+                    "subject_id": UUID(subject_id),
+                    "status": "completed",
+                    "risk_score": risk_score(subject_indicators),
+                    "rule_version": rule_version,
+                }
+            )
+            indicators.extend(
+                {
+                    "id": uuid.uuid4(),
+                    "analysis_result_id": result_id,
+                    "type": indicator["type"],
+                    "confidence": indicator["confidence"],
+                    "evidence": indicator["evidence"],
+                }
+                for indicator in subject_indicators
+            )
+        if results:
+            await db.execute(insert(AnalysisResult), results)
+        if indicators:
+            await db.execute(insert(Indicator), indicators)
+        await db.commit()
+        return len(indicators)
+
+    @staticmethod
+    async def run(
+        db: AsyncSession,
+        tenant_id: Optional[UUID] = None,
+        subject_ids: Optional[List[UUID]] = None,
+        page_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Analyze every subject of `tenant_id`, or the given subjects, and
+        store one AnalysisResult per subject.
+
+        Tenant runs cover subjects with transactions; listed subjects
+        without any still get a completed result with no indicators.
+        """
+        if (tenant_id is None) == (subject_ids is None):
+            raise ValueError("Pass either tenant_id or subject_ids")
+        page_size = page_size or settings.MENS_REA_BATCH_PAGE_SIZE
+        if tenant_id is not None:
+            subject_clause = Transaction.subject_id.in_(
+                select(Subject.id).where(Subject.tenant_id == tenant_id)
+            )
+        else:
+            subject_clause = Transaction.subject_id.in_(subject_ids)
+
+        engine = await rule_store.engine(db)
+        started = datetime.utcnow()
+        totals = {"subjects": 0, "transactions": 0, "indicators": 0}
+        seen = set()
+
+        async def analyze(rows: List[Any]) -> List[SubjectAnalysis]:
+            parts = await asyncio.gather(
+                *(
+                    cpu_pool.run(
+                        "mens_rea_batch",
+                        analyze_subjects,
+                        chunk,
+                        engine.rules,
+                        engine.version,
+                    )
+                    for chunk in _chunks(rows, cpu_pool.max_workers)
+                )
+            )
+            return [analysis for part in parts for analysis in part]
+
+        async def write(analyzed: List[SubjectAnalysis]) -> None:
+            written = await MensReaBatchService._write(db, analyzed, engine.version)
+            totals["indicators"] += written
+            totals["subjects"] += len(analyzed)
+            seen.update(subject_id for subject_id, _ in analyzed)
+
+        # The pool analyzes one page while the next one loads
+        pending: Optional[asyncio.Task] = None
+        async for rows in MensReaBatchService._pages(db, subject_clause, page_size):
+            totals["transactions"] += len(rows)
+            task = asyncio.create_task(analyze(rows))
+            if pending is not None:
+                await write(await pending)
+            pending = task
+        if pending is not None:
+            await write(await pending)
+
+        if subject_ids is not None:
+            await write(
+                [
+                    (str(subject_id), [])
+                    for subject_id in dict.fromkeys(subject_ids)
+                    if str(subject_id) not in seen
+                ]
+            )
+
+        summary = {
+            **totals,
+            "rule_version": engine.version,
+            "seconds": (datetime.utcnow() - started).total_seconds(),
+        }
+        logger.info("Batched mens rea analysis completed", **summary)
+        return summary
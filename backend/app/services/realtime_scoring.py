@@ -0,0 +1,516 @@
+"""
+Real-time Transaction Scoring
+
+Provides:
+- SubjectState: a subject's rolling state, updated one event at a time -
+  the rule feature windows of rule_features, account age, the velocity
+  detector's FIFO turnover scan and a mirror-pair matcher
+- SubjectStateStore: states in Redis when the job queue uses it, so every
+  API worker sees the same history (optimistic WATCH/MULTI per subject),
+  otherwise in a per-process LRU
+- RealtimeScoringService: scores transactions as they arrive against the
+  compiled heuristic rules, the detectors and the latest ML models
+
+An event sees the features compute_rule_features() gives it within the
+subject's history so far. Events are expected roughly in time order; a
+late one is counted at the subject's latest time instead of rewinding the
+windows. A subject seen for the first time is seeded from its stored
+transactions, so windows, turnover and account age do not start empty.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from redis.exceptions import WatchError
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.metrics import realtime_scoring_duration_seconds
+from app.db.models import Transaction
+from app.schemas.analysis import ScoringEvent, TransactionScore
+from app.services.ai.fraud_models import (
+    combine_predictions,
+    extract_anomaly_features,
+    extract_transaction_features,
+    score_many_with_latest_models,
+)
+from app.services.detectors.mirror_pairs import MirrorMatcher, MirrorPair
+from app.services.detectors.mirroring import MirroringDetector
+from app.services.detectors.structuring import StructuringDetector
+from app.services.detectors.velocity import VelocityDetector
+from app.services.heuristic_engine import HeuristicEngine
+from app.services.job_queue import job_queue
+from app.services.rule_features import FEATURE_WINDOWS
+from app.services.rule_store import rule_store
+
+logger = structlog.get_logger()
+
+STATE_KEY = "realtime:subject:{}"
+# Attempts at a conflict-free read-modify-write of one subject's state, with
+# a short random backoff between them so concurrent writers spread out
+MAX_STATE_RETRIES = 10
+STATE_RETRY_BACKOFF_SECONDS = 0.002
+
+_EPOCH = datetime(1970, 1, 1)
+_structuring = StructuringDetector()
+_velocity = VelocityDetector()
+_mirroring = MirroringDetector()
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Stored transaction dates are naive UTC."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _micros(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class RollingWindows:
+    """
+    Counts and sums over the trailing windows (now - span, now], updated
+    one event at a time. Events of the longest window are kept once, and
+    each window is a start position into them with running totals.
+    """
+
+    def __init__(self, spans: Dict[str, timedelta], max_events: int):
+        self.spans = {
+            label: span // timedelta(microseconds=1) for label, span in spans.items()
+        }
+        self.max_events = max_events
+        self._times: List[int] = []  # Microseconds since the epoch
+        self._amounts: List[float] = []
+        self._starts = {label: 0 for label in spans}
+        # [transaction_count, total_volume, count (near threshold), sum]
+        self._totals = {label: [0, 0.0, 0, 0.0] for label in spans}
+
+    @staticmethod
+    def _near(amount: float) -> bool:
+        threshold = _structuring.THRESHOLD_AMOUNT
+        return threshold * _structuring.NEAR_THRESHOLD_PCT <= amount < threshold
+
+    def _leave(self, label: str, position: int) -> None:
+        amount = self._amounts[position]
+        totals = self._totals[label]
+        totals[0] -= 1
+        totals[1] -= abs(amount)
+        if self._near(amount):
+            totals[2] -= 1
+            totals[3] -= amount
+
+    def add(self, now: int, amount: float) -> None:
+        """Count an event at `now`, which must not precede earlier events."""
+        self._times.append(now)
+        self._amounts.append(amount)
+        near = self._near(amount)
+        oldest = len(self._times) - self.max_events
+        for label, span in self.spans.items():
+            totals = self._totals[label]
+            totals[0] += 1
+            totals[1] += abs(amount)
+            if near:
+                totals[2] += 1
+                totals[3] += amount
+            start = self._starts[label]
+            while start < oldest or self._times[start] <= now - span:
+                self._leave(label, start)
+                start += 1
+            self._starts[label] = start
+            if totals[0] == 1:
+                # Running sums restart exactly instead of drifting
+                totals[1], totals[3] = abs(amount), amount if near else 0.0
+
+        # Drop events no window holds once they are half the list
+        dropped = min(self._starts.values())
+        if dropped * 2 > len(self._times):
+            del self._times[:dropped]
+            del self._amounts[:dropped]
+            for label in self._starts:
+                self._starts[label] -= dropped
+
+    def features(self) -> Dict[str, Any]:
+        features: Dict[str, Any] = {}
+        for label, (count, volume, near_count, near_sum) in self._totals.items():
+            features[f"transaction_count_{label}"] = count
+            features[f"total_volume_{label}"] = volume
+            features[f"count_{label}"] = near_count
+            features[f"sum_{label}"] = near_sum
+        return features
+
+    def dump_state(self) -> Dict[str, Any]:
+        dropped = min(self._starts.values())
+        return {
+            "times": self._times[dropped:],
+            "amounts": self._amounts[dropped:],
+            "starts": {
+                label: start - dropped for label, start in self._starts.items()
+            },
+            "totals": self._totals,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self._times = state["times"]
+        self._amounts = state["amounts"]
+        self._starts = state["starts"]
+        self._totals = state["totals"]
+
+
+class SubjectState:
+    """One subject's rolling features and detector state."""
+
+    def __init__(self):
+        self.windows = RollingWindows(
+            FEATURE_WINDOWS, settings.REALTIME_MAX_EVENTS_PER_SUBJECT
+        )
+        self.turnover = _velocity.scanner(settings.REALTIME_MAX_PENDING_INFLOWS)
+        self.mirrors = MirrorMatcher(_mirroring.WINDOW)
+        self.first_seen: Optional[datetime] = None
+        self.last_seen: Optional[datetime] = None
+
+    def update(
+        self, tx_id: str, amount: float, date: datetime
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Add one transaction. Returns its rule features and the detector
+        indicators it completes.
+        """
+        now = _naive_utc(date)
+        if self.last_seen is not None and now < self.last_seen:
+            now = self.last_seen  # Late: counted at the latest time seen
+        if self.first_seen is None:
+            self.first_seen = now
+        self.last_seen = now
+
+        self.windows.add(_micros(now), amount)
+        pass_through = self.turnover.feed(now, {"id": tx_id, "amount": amount})
+        pair = self.mirrors.add(tx_id, amount, now)
+
+        stats = self.turnover.stats
+        hours = stats.turnover_time_hours
+        features = {
+            **self.windows.features(),
+            "account_age_days": (now - self.first_seen) / timedelta(days=1),
+            "inflow_outflow_ratio": stats.inflow_outflow_ratio,
+            # NaN compares False, as in rule_features
+            "turnover_time_hours": math.nan if hours is None else hours,
+        }
+
+        indicators = []
+        structuring = self._structuring_indicator(tx_id, amount, features)
+        if structuring:
+            indicators.append(structuring)
+        velocity = _velocity.pass_through_indicator(pass_through)
+        if velocity:
+            indicators.append(velocity)
+        if pair:
+            indicators.append(self._mirror_indicator(pair))
+        return features, indicators
+
+    @staticmethod
+    def _structuring_indicator(
+        tx_id: str, amount: float, features: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """A near-threshold deposit completing a burst, shortest window first."""
+        if not RollingWindows._near(amount):
+            return None
+        for label in _structuring.WINDOWS:
+            count, total = features[f"count_{label}"], features[f"sum_{label}"]
+            if (
+                count >= _structuring.MIN_DEPOSITS
+                and total >= _structuring.THRESHOLD_AMOUNT
+            ):
+                return {
+                    "type": "structuring_attempt",
+                    "confidence": min(
+                        0.95, 0.7 + 0.05 * (count - _structuring.MIN_DEPOSITS)
+                    ),
+                    "evidence": {
+                        "transaction_id": tx_id,
+                        "window": label,
+                        "deposit_count": count,
+                        "total_amount": total,
+                        "reason": f"{count} deposits just below the reporting threshold of ${_structuring.THRESHOLD_AMOUNT} within {label}, totalling ${total:,.2f}",
+                    },
+                }
+        return None
+
+    @staticmethod
+    def _mirror_indicator(pair: MirrorPair) -> Dict[str, Any]:
+        return {
+            "type": "mirroring_suspected",
+            "confidence": 0.6,
+            "evidence": {
+                "amount": pair.amount,
+                "pair_count": 1,
+                "pairs": [
+                    {
+                        "transaction_ids": [pair.first_id, pair.second_id],
+                        "hours_apart": pair.hours_apart,
+                    }
+                ],
+                "reason": f"${pair.amount} moved in and back out (or out and back in) within {pair.hours_apart:.1f}h, potential cashflow inflation.",
+            },
+        }
+
+    def dump(self) -> str:
+        return json.dumps(
+            {
+                "windows": self.windows.dump_state(),
+                "turnover": self.turnover.dump_state(),
+                "mirrors": self.mirrors.dump_state(),
+                "first_seen": self.first_seen.isoformat() if self.first_seen else None,
+                "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+            }
+        )
+
+    @classmethod
+    def load(cls, raw: str) -> "SubjectState":
+        data = json.loads(raw)
+        state = cls()
+        state.windows.load_state(data["windows"])
+        state.turnover.load_state(data["turnover"])
+        state.mirrors = MirrorMatcher.load_state(_mirroring.WINDOW, data["mirrors"])
+        if data["first_seen"]:
+            state.first_seen = datetime.fromisoformat(data["first_seen"])
+        if data["last_seen"]:
+            state.last_seen = datetime.fromisoformat(data["last_seen"])
+        return state
+
+
+# One event's rule features and detector indicators
+Update = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+
+class SubjectStateStore:
+    """
+    Subject states shared through Redis, or kept in this process when the
+    job queue has no Redis connection.
+    """
+
+    def __init__(self):
+        self._local: "OrderedDict[str, SubjectState]" = OrderedDict()
+
+    @staticmethod
+    async def seed(
+        db: AsyncSession, subject_id: str, before: datetime
+    ) -> SubjectState:
+        """
+        A new state replaying the subject's stored transactions from the
+        MAX_HOLD (90 days) before `before`, which covers every window and
+        the turnover FIFO. Account age counts from the subject's earliest
+        stored transaction, however old, as in compute_rule_features.
+        """
+        state = SubjectState()
+        try:
+            subject_uuid = UUID(subject_id)
+        except ValueError:
+            return state  # Not a stored subject
+        before = _naive_utc(before)
+        earliest = await db.scalar(
+            select(func.min(Transaction.date)).where(
+                Transaction.subject_id == subject_uuid, Transaction.date < before
+            )
+        )
+        if earliest is not None:
+            state.first_seen = _naive_utc(earliest)
+        result = await db.execute(
+            select(Transaction.id, Transaction.amount, Transaction.date)
+            .where(
+                Transaction.subject_id == subject_uuid,
+                Transaction.date >= before - _velocity.MAX_HOLD,
+                Transaction.date < before,
+            )
+            .order_by(Transaction.date)
+        )
+        for tx_id, amount, date in result:
+            state.update(str(tx_id), float(amount), date)
+        return state
+
+    async def apply(
+        self, db: AsyncSession, subject_id: str, events: List[ScoringEvent]
+    ) -> List[Update]:
+        """Add a subject's events, in order, to its state and save it."""
+        client = job_queue.redis_client
+        if client is None:
+            return await self._apply_local(db, subject_id, events)
+
+        key = STATE_KEY.format(subject_id)
+        updates: List[Update] = []
+        for attempt in range(MAX_STATE_RETRIES):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, STATE_RETRY_BACKOFF_SECONDS))
+            async with client.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    if raw:
+                        state = SubjectState.load(raw)
+                    else:
+                        state = await self.seed(db, subject_id, events[0].date)
+                    updates = [
+                        state.update(event.id, event.amount, event.date)
+                        for event in events
+                    ]
+                    pipe.multi()
+                    pipe.set(
+                        key, state.dump(), ex=settings.REALTIME_STATE_TTL_SECONDS
+                    )
+                    await pipe.execute()
+                    return updates
+                except WatchError:
+                    continue  # Another worker updated the subject first
+
+        logger.warning(
+            "Subject state kept changing; scored without saving",
+            subject_id=subject_id,
+            events=len(events),
+        )
+        return updates
+
+    async def _apply_local(
+        self, db: AsyncSession, subject_id: str, events: List[ScoringEvent]
+    ) -> List[Update]:
+        state = self._local.get(subject_id)
+        if state is None:
+            state = await self.seed(db, subject_id, events[0].date)
+            # Another request may have seeded it while this one awaited
+            state = self._local.setdefault(subject_id, state)
+            while len(self._local) > settings.REALTIME_MAX_SUBJECTS_IN_MEMORY:
+                self._local.popitem(last=False)
+        self._local.move_to_end(subject_id)
+        # No await from here on, so updates to one subject never interleave
+        return [state.update(event.id, event.amount, event.date) for event in events]
+
+
+class RealtimeScoringService:
+    """Scores transactions as they arrive."""
+
+    def __init__(self, store: Optional[SubjectStateStore] = None):
+        self.store = store or SubjectStateStore()
+
+    @staticmethod
+    def _model_scores(
+        events: List[ScoringEvent],
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Latest fraud and anomaly model scores, one model call per batch."""
+        transactions = [
+            {
+                "amount": event.amount,
+                "timestamp": event.date,
+                "merchant": event.description,
+            }
+            for event in events
+        ]
+        try:
+            scores = score_many_with_latest_models(
+                settings.REALTIME_MODEL_DIR,
+                [extract_transaction_features(tx) for tx in transactions],
+                [extract_anomaly_features(tx) for tx in transactions],
+            )
+        except Exception as e:
+            logger.error("Model scoring failed", error=str(e))
+            scores = None
+        return scores or [None] * len(events)
+
+    @staticmethod
+    def _score(
+        event: ScoringEvent,
+        update: Update,
+        model: Optional[Dict[str, Any]],
+        engine: HeuristicEngine,
+    ) -> TransactionScore:
+        features, indicators = update
+        context = {
+            "amount": event.amount,
+            "country_tags": (),  # No jurisdiction data on transactions yet
+            **features,
+        }
+        triggered_rules = engine.evaluate_transaction(context)
+
+        risk_score = HeuristicEngine.risk_score(triggered_rules, base_score=0)
+        for indicator in indicators:
+            risk_score = max(risk_score, indicator["confidence"] * 100)
+        fraud_probability = anomaly_score = None
+        if model is not None:
+            fraud_probability = model["fraud_probability"]
+            anomaly_score = model["anomaly_score"]
+            risk_score = max(
+                risk_score, combine_predictions(fraud_probability, anomaly_score)
+            )
+
+        return TransactionScore(
+            transaction_id=event.id,
+            subject_id=event.subject_id,
+            risk_score=risk_score,
+            triggered_rules=triggered_rules,
+            indicators=indicators,
+            # JSON has no NaN
+            features={
+                name: None if isinstance(value, float) and math.isnan(value) else value
+                for name, value in features.items()
+            },
+            fraud_probability=fraud_probability,
+            anomaly_score=anomaly_score,
+            rule_version=engine.version,
+        )
+
+    async def score(self, db: AsyncSession, event: ScoringEvent) -> TransactionScore:
+        """Score one transaction and add it to its subject's state."""
+        started = time.perf_counter()
+        engine = await rule_store.engine(db)
+        updates = await self.store.apply(db, event.subject_id, [event])
+        model = self._model_scores([event])[0]
+        result = self._score(event, updates[0], model, engine)
+        realtime_scoring_duration_seconds.labels(mode="single").observe(
+            time.perf_counter() - started
+        )
+        return result
+
+    async def score_batch(
+        self, db: AsyncSession, events: List[ScoringEvent]
+    ) -> List[TransactionScore]:
+        """
+        Score many transactions, in input order. Each subject's state is
+        read and saved once, and the models run once for the whole batch.
+        """
+        if not events:
+            return []
+        started = time.perf_counter()
+        engine = await rule_store.engine(db)
+
+        by_subject: Dict[str, List[int]] = {}
+        for position, event in enumerate(events):
+            by_subject.setdefault(event.subject_id, []).append(position)
+        updates: List[Optional[Update]] = [None] * len(events)
+        for subject_id, positions in by_subject.items():
+            applied = await self.store.apply(
+                db, subject_id, [events[position] for position in positions]
+            )
+            for position, update in zip(positions, applied):
+                updates[position] = update
+
+        models = self._model_scores(events)
+        results = [
+            self._score(event, update, model, engine)
+            for event, update, model in zip(events, updates, models)
+        ]
+        realtime_scoring_duration_seconds.labels(mode="batch").observe(
+            (time.perf_counter() - started) / len(events)
+        )
+        return results
+
+
+# Global scoring service instance
+realtime_scoring = RealtimeScoringService()
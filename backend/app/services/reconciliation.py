@@ -1,12 +1,69 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.db.models import Transaction, Match, TransactionSourceType, MatchStatus
+from sqlalchemy.sql import Select
+from app.core.config import settings
+from app.db.models import (
+    Transaction,
+    Match,
+    TransactionSourceType,
+    MatchStatus,
+    ReconciliationBlock,
+)
 from app.services.ai.llm_service import LLMService
+from app.services.cache_service import cache
+from app.services.match_assignment import (
+    assign_pairs,
+    connected_components,
+    greedy_select,
+)
+from app.services.match_blocking import BlockingIndex
+from app.services.match_scoring import (
+    AMOUNT_WEIGHT,
+    BANK_WEIGHT,
+    DATE_WEIGHT,
+    DESCRIPTION_WEIGHT,
+    CandidatePool,
+    description_tokens,
+)
+from app.services.reconciliation_index import ReconciliationIndexService
 from langchain_core.messages import HumanMessage
+import asyncio
+import hashlib
+import numpy as np
+import structlog
 import uuid
 import json
 
+logger = structlog.get_logger()
+
+# Matching strategies selectable per run:
+# - "ai": LLM matching, falling back to rules on failure
+# - "rules": blocked per-pair rule scoring
+# - "vectorized": blocked rule scoring batched in NumPy
+# - "assignment": vectorized scoring with a score-maximizing one-to-one
+#   assignment instead of greedy first-best
+# - "hybrid": rules settle exact and unambiguous matches, the LLM resolves
+#   the remaining candidate groups in small batches
+MATCHING_STRATEGIES = ("ai", "rules", "vectorized", "assignment", "hybrid")
+
+# Strategies that match internals page by page against the external pool
+PAGED_STRATEGIES = ("rules", "vectorized")
+
+LLM_CACHE_KEY_PREFIX = "reconciliation:llm"
+
+# Columns matching needs; plain rows are much lighter than ORM instances
+MATCH_COLUMNS = (
+    Transaction.id,
+    Transaction.amount,
+    Transaction.date,
+    Transaction.description,
+    Transaction.source_bank,
+)
+
+# Internals per batch of candidate pairs in vectorized matching
+VECTORIZED_BATCH_SIZE = 5000
+
 
 class ReconciliationService:
     """
@@ -15,79 +72,324 @@ class ReconciliationService:
 
     @staticmethod
     async def ml_based_matching(
-        db: AsyncSession, threshold: float = 0.8, date_buffer_days: int = 3
+        db: AsyncSession,
+        threshold: float = 0.8,
+        date_buffer_days: int = 3,
+        strategy: str = "ai",
     ) -> Dict[str, Any]:
         """
         Use ML/AI to match transactions based on multiple features.
+
+        `strategy` picks the matcher for this run (see MATCHING_STRATEGIES).
         """
-        # Get unmatched transactions
-        unmatched_internals, unmatched_externals = (
-            await ReconciliationService._get_unmatched_transactions(db)
-        )
+        if strategy not in MATCHING_STRATEGIES:
+            raise ValueError(f"Unknown matching strategy: {strategy}")
+
+        no_work = {
+            "matched": 0,
+            "conflicts": 0,
+            "message": "No unmatched transactions to reconcile",
+        }
 
-        if not unmatched_internals or not unmatched_externals:
+        # The external side is the candidate pool and is loaded whole
+        unmatched_externals = await ReconciliationService._fetch_unmatched(
+            db, TransactionSourceType.EXTERNAL
+        )
+        if not unmatched_externals:
+            return no_work
+
+        if strategy in PAGED_STRATEGIES:
+            # Greedy matching is sequential over internals, so they can be
+            # streamed in pages without changing the result
+            created_matches, seen = await ReconciliationService._paged_matching(
+                db, unmatched_externals, threshold, date_buffer_days, strategy
+            )
+            if not seen:
+                return no_work
             return {
-                "matched": 0,
+                "matched": created_matches,
                 "conflicts": 0,
-                "message": "No unmatched transactions to reconcile",
+                "strategy": strategy,
+                "message": f"ML-based matching completed: {created_matches} matches found",
             }
 
-        # Use AI to find matches
-        matches = await ReconciliationService._find_matches_with_ai(
-            unmatched_internals, unmatched_externals, threshold, date_buffer_days
+        unmatched_internals = await ReconciliationService._fetch_unmatched(
+            db, TransactionSourceType.INTERNAL
         )
+        if not unmatched_internals:
+            return no_work
 
-        # Create matches in database
-        created_matches = 0
-        for match in matches:
-            db_match = Match(
-                internal_transaction_id=match["internal_id"],
-                external_transaction_id=match["external_id"],
-                status=MatchStatus.MATCHED,
-                confidence=match["confidence"],
+        if strategy == "hybrid":
+            matches = await ReconciliationService._hybrid_matching(
+                unmatched_internals, unmatched_externals, threshold, date_buffer_days
+            )
+        elif strategy == "assignment":
+            matches = await ReconciliationService._assignment_matching(
+                unmatched_internals, unmatched_externals, threshold, date_buffer_days
+            )
+        else:
+            # Use AI to find matches
+            matches = await ReconciliationService._find_matches_with_ai(
+                unmatched_internals, unmatched_externals, threshold, date_buffer_days
             )
-            db.add(db_match)
-            created_matches += 1
 
+        # Create matches in database
+        created_matches = await ReconciliationService._save_matches(db, matches)
         await db.commit()
 
         return {
             "matched": created_matches,
             "conflicts": 0,  # For now, no conflict detection
+            "strategy": strategy,
             "message": f"ML-based matching completed: {created_matches} matches found",
         }
 
     @staticmethod
-    async def _get_unmatched_transactions(
+    async def _save_matches(db: AsyncSession, matches: List[Dict[str, Any]]) -> int:
+        """Add Match rows and take both sides out of the candidate pool."""
+        for match in matches:
+            db.add(
+                Match(
+                    internal_transaction_id=match["internal_id"],
+                    external_transaction_id=match["external_id"],
+                    status=MatchStatus.MATCHED,
+                    confidence=match["confidence"],
+                )
+            )
+        await ReconciliationIndexService.remove(
+            db,
+            [m["internal_id"] for m in matches] + [m["external_id"] for m in matches],
+        )
+        return len(matches)
+
+    @staticmethod
+    async def reconcile_pending(
         db: AsyncSession,
-    ) -> Tuple[List[Transaction], List[Transaction]]:
-        """Get all unmatched internal and external transactions."""
-        # Get all existing matches
-        matches_result = await db.execute(select(Match))
-        matches = matches_result.scalars().all()
+        tenant_id: Optional[uuid.UUID],
+        threshold: Optional[float] = None,
+        date_buffer_days: Optional[int] = None,
+        page_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Incremental reconciliation of a tenant's newly ingested transactions.
 
-        matched_ids = set()
-        for match in matches:
-            matched_ids.add(match.internal_transaction_id)
-            matched_ids.add(match.external_transaction_id)
-
-        # Get unmatched internals
-        internals_result = await db.execute(
-            select(Transaction)
-            .where(Transaction.source_type == TransactionSourceType.INTERNAL)
-            .where(Transaction.id.not_in(matched_ids))
+        Pending rows of the persistent blocking index are matched, a page at
+        a time, against the open pool of the other side, selected through
+        the index buckets. Cost follows the new rows and their candidates
+        rather than total history, as long as `threshold` allows amount and
+        date blocking (see _blocking_dimensions).
+        """
+        threshold = (
+            settings.RECONCILIATION_INCREMENTAL_THRESHOLD
+            if threshold is None
+            else threshold
+        )
+        date_buffer_days = (
+            settings.RECONCILIATION_INCREMENTAL_DATE_BUFFER_DAYS
+            if date_buffer_days is None
+            else date_buffer_days
+        )
+        page_size = page_size or settings.RECONCILIATION_PAGE_SIZE
+        date_window_days, block_on_amount = (
+            ReconciliationService._blocking_dimensions(threshold, date_buffer_days)
+        )
+        pending_query = (
+            select(*MATCH_COLUMNS, Transaction.source_type)
+            .join(
+                ReconciliationBlock,
+                ReconciliationBlock.transaction_id == Transaction.id,
+            )
+            .where(ReconciliationIndexService.tenant_clause(tenant_id))
+            .where(ReconciliationBlock.pending.is_(True))
+            .order_by(ReconciliationBlock.transaction_id)
+            .limit(page_size)
+        )
+
+        created = 0
+        reconciled = 0
+        while True:
+            await ReconciliationIndexService.lock_tenant(db, tenant_id)
+            page = (await db.execute(pending_query)).all()
+            if not page:
+                await db.commit()  # Releases the tenant lock
+                break
+
+            matches: List[Dict[str, Any]] = []
+            claimed: Set[Any] = set()
+            for side, other in (
+                (TransactionSourceType.INTERNAL, TransactionSourceType.EXTERNAL),
+                (TransactionSourceType.EXTERNAL, TransactionSourceType.INTERNAL),
+            ):
+                new_rows = [
+                    row
+                    for row in page
+                    if row.source_type == side and row.id not in claimed
+                ]
+                if not new_rows:
+                    continue
+                found: Dict[Any, Any] = {}
+                for probes in ReconciliationIndexService.probe_chunks(new_rows):
+                    filters = ReconciliationIndexService.candidate_filters(
+                        tenant_id, other, probes, date_window_days, block_on_amount
+                    )
+                    result = await db.execute(
+                        ReconciliationService._unmatched_query(other)
+                        .join(
+                            ReconciliationBlock,
+                            ReconciliationBlock.transaction_id == Transaction.id,
+                        )
+                        .where(*filters)
+                    )
+                    found.update((row.id, row) for row in result.all())
+                candidates = [
+                    found[row_id] for row_id in sorted(found) if row_id not in claimed
+                ]
+                if not candidates:
+                    continue
+
+                # Scoring only looks at absolute differences, so new externals
+                # can take the internal slot; swap the ids back afterwards
+                for match in ReconciliationService._vectorized_matching(
+                    new_rows, candidates, threshold, date_buffer_days
+                ):
+                    if side == TransactionSourceType.EXTERNAL:
+                        match["internal_id"], match["external_id"] = (
+                            match["external_id"],
+                            match["internal_id"],
+                        )
+                    claimed.update((match["internal_id"], match["external_id"]))
+                    matches.append(match)
+
+            created += await ReconciliationService._save_matches(db, matches)
+            await ReconciliationIndexService.mark_reconciled(
+                db, [row.id for row in page]
+            )
+            await db.commit()
+            reconciled += len(page)
+
+        logger.info(
+            "Incremental reconciliation completed",
+            tenant_id=str(tenant_id) if tenant_id else None,
+            reconciled=reconciled,
+            matched=created,
+        )
+        return {
+            "matched": created,
+            "reconciled": reconciled,
+            "conflicts": 0,
+            "message": f"Incremental matching completed: {created} matches found",
+        }
+
+    @staticmethod
+    async def _paged_matching(
+        db: AsyncSession,
+        externals: List[Any],
+        threshold: float,
+        date_buffer_days: int,
+        strategy: str,
+    ) -> Tuple[int, int]:
+        """
+        Greedy matching of unmatched internals, one keyset page at a time.
+
+        Matches are committed per page. Returns (matches created, internals
+        seen).
+        """
+        index = ReconciliationService._blocking_index(
+            externals, threshold, date_buffer_days
+        )
+        pool = CandidatePool(externals, index) if strategy == "vectorized" else None
+        created = 0
+        seen = 0
+
+        async for page in ReconciliationService.iter_unmatched_pages(
+            db, TransactionSourceType.INTERNAL
+        ):
+            if pool is not None:
+                matches = ReconciliationService._vectorized_matching(
+                    page, externals, threshold, date_buffer_days, pool=pool
+                )
+            else:
+                matches = ReconciliationService._fallback_matching(
+                    page, externals, threshold, date_buffer_days, index=index
+                )
+            created += await ReconciliationService._save_matches(db, matches)
+            seen += len(page)
+            await db.commit()
+
+        return created, seen
+
+    @staticmethod
+    def _unmatched_query(source_type: TransactionSourceType) -> Select:
+        """
+        Unmatched transactions of one source type, as an anti-join.
+
+        One NOT EXISTS per match column, so each probe uses its own index.
+        """
+        as_internal = select(Match.id).where(
+            Match.internal_transaction_id == Transaction.id
+        )
+        as_external = select(Match.id).where(
+            Match.external_transaction_id == Transaction.id
+        )
+        return (
+            select(*MATCH_COLUMNS)
+            .where(Transaction.source_type == source_type)
+            .where(~as_internal.exists())
+            .where(~as_external.exists())
         )
-        internals = internals_result.scalars().all()
 
-        # Get unmatched externals
-        externals_result = await db.execute(
-            select(Transaction)
-            .where(Transaction.source_type == TransactionSourceType.EXTERNAL)
-            .where(Transaction.id.not_in(matched_ids))
+    @staticmethod
+    async def _fetch_unmatched(
+        db: AsyncSession, source_type: TransactionSourceType
+    ) -> List[Any]:
+        """All unmatched rows of one source type, in id order."""
+        result = await db.execute(
+            ReconciliationService._unmatched_query(source_type).order_by(
+                Transaction.id
+            )
         )
-        externals = externals_result.scalars().all()
+        return list(result.all())
 
-        return list(internals), list(externals)
+    @staticmethod
+    async def iter_unmatched_pages(
+        db: AsyncSession,
+        source_type: TransactionSourceType,
+        page_size: Optional[int] = None,
+    ) -> AsyncIterator[List[Any]]:
+        """
+        Stream unmatched rows of one source type in keyset pages by id.
+
+        Rows carry the MATCH_COLUMNS attributes. Each page resumes after
+        the last id of the previous one, so rows matched while streaming
+        never shift later pages.
+        """
+        page_size = page_size or settings.RECONCILIATION_PAGE_SIZE
+        last_id = None
+        while True:
+            query = ReconciliationService._unmatched_query(source_type)
+            if last_id is not None:
+                query = query.where(Transaction.id > last_id)
+            result = await db.execute(query.order_by(Transaction.id).limit(page_size))
+            page = list(result.all())
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1].id
+
+    @staticmethod
+    async def _get_unmatched_transactions(
+        db: AsyncSession,
+    ) -> Tuple[List[Any], List[Any]]:
+        """Get all unmatched internal and external transactions."""
+        internals = await ReconciliationService._fetch_unmatched(
+            db, TransactionSourceType.INTERNAL
+        )
+        externals = await ReconciliationService._fetch_unmatched(
+            db, TransactionSourceType.EXTERNAL
+        )
+        return internals, externals
 
     @staticmethod
     async def _find_matches_with_ai(
@@ -102,32 +404,51 @@ class ReconciliationService:
         llm_service = LLMService()
 
         # Prepare transaction data for AI analysis
-        internal_data = []
-        for tx in internals:
-            internal_data.append(
-                {
-                    "id": str(tx.id),
-                    "date": tx.date.isoformat() if tx.date else "",
-                    "amount": float(tx.amount) if tx.amount else 0.0,
-                    "description": tx.description or "",
-                    "bank": tx.source_bank or "",
-                }
-            )
+        internal_data = [
+            ReconciliationService._transaction_payload(tx) for tx in internals
+        ]
+        external_data = [
+            ReconciliationService._transaction_payload(tx) for tx in externals
+        ]
+        prompt = ReconciliationService._build_matching_prompt(
+            internal_data, external_data, threshold, date_buffer_days
+        )
+
+        try:
+            messages = [HumanMessage(content=prompt)]
+            response = await llm_service.generate_response(messages)
 
-        external_data = []
-        for tx in externals:
-            external_data.append(
-                {
-                    "id": str(tx.id),
-                    "date": tx.date.isoformat() if tx.date else "",
-                    "amount": float(tx.amount) if tx.amount else 0.0,
-                    "description": tx.description or "",
-                    "bank": tx.source_bank or "",
-                }
+            # Parse the JSON response
+            matches = json.loads(response)
+            return ReconciliationService._validate_ai_matches(matches, threshold)
+
+        except Exception as e:
+            print(f"AI matching failed: {e}")
+            # Fallback to basic matching
+            return ReconciliationService._fallback_matching(
+                internals, externals, threshold, date_buffer_days
             )
 
+    @staticmethod
+    def _transaction_payload(tx: Transaction) -> Dict[str, Any]:
+        """Fields of a transaction shown to the LLM."""
+        return {
+            "id": str(tx.id),
+            "date": tx.date.isoformat() if tx.date else "",
+            "amount": float(tx.amount) if tx.amount else 0.0,
+            "description": tx.description or "",
+            "bank": tx.source_bank or "",
+        }
+
+    @staticmethod
+    def _build_matching_prompt(
+        internal_data: List[Dict[str, Any]],
+        external_data: List[Dict[str, Any]],
+        threshold: float,
+        date_buffer_days: int,
+    ) -> str:
         # Create prompt for AI matching
-        prompt = f"""You are an expert financial reconciliation specialist. Your task is to match internal transactions with external transactions based on multiple criteria.
+        return f"""You are an expert financial reconciliation specialist. Your task is to match internal transactions with external transactions based on multiple criteria.
 
 INTERNAL TRANSACTIONS:
 {json.dumps(internal_data, indent=2)}
@@ -161,53 +482,56 @@ Only include matches with confidence >= {threshold}.
 Each transaction should only be matched once (no duplicates).
 Focus on high-confidence matches first."""
 
-        try:
-            messages = [HumanMessage(content=prompt)]
-            response = await llm_service.generate_response(messages)
+    @staticmethod
+    def _validate_ai_matches(
+        matches: Any,
+        threshold: float,
+        internal_ids: Optional[Set[str]] = None,
+        external_ids: Optional[Set[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Keep well-formed, one-to-one LLM matches at or above `threshold`.
 
-            # Parse the JSON response
-            matches = json.loads(response)
+        When id sets are given, matches referring to other transactions are
+        dropped.
+        """
+        validated_matches = []
+        used_internal_ids = set()
+        used_external_ids = set()
 
-            # Validate and filter matches
-            validated_matches = []
-            used_internal_ids = set()
-            used_external_ids = set()
+        for match in matches:
+            if isinstance(match, dict) and all(
+                k in match for k in ["internal_id", "external_id", "confidence"]
+            ):
+                internal_id = match["internal_id"]
+                external_id = match["external_id"]
+                confidence = float(match.get("confidence", 0.0))
+
+                if (internal_ids is not None and internal_id not in internal_ids) or (
+                    external_ids is not None and external_id not in external_ids
+                ):
+                    continue
 
-            for match in matches:
-                if isinstance(match, dict) and all(
-                    k in match for k in ["internal_id", "external_id", "confidence"]
+                # Check if IDs are valid and not already used
+                if (
+                    confidence >= threshold
+                    and internal_id not in used_internal_ids
+                    and external_id not in used_external_ids
                 ):
-                    internal_id = match["internal_id"]
-                    external_id = match["external_id"]
-                    confidence = float(match.get("confidence", 0.0))
-
-                    # Check if IDs are valid and not already used
-                    if (
-                        confidence >= threshold
-                        and internal_id not in used_internal_ids
-                        and external_id not in used_external_ids
-                    ):
-
-                        validated_matches.append(
-                            {
-                                "internal_id": uuid.UUID(internal_id),
-                                "external_id": uuid.UUID(external_id),
-                                "confidence": confidence,
-                                "reasoning": match.get("reasoning", ""),
-                            }
-                        )
 
-                        used_internal_ids.add(internal_id)
-                        used_external_ids.add(external_id)
+                    validated_matches.append(
+                        {
+                            "internal_id": uuid.UUID(internal_id),
+                            "external_id": uuid.UUID(external_id),
+                            "confidence": confidence,
+                            "reasoning": match.get("reasoning", ""),
+                        }
+                    )
 
-            return validated_matches
+                    used_internal_ids.add(internal_id)
+                    used_external_ids.add(external_id)
 
-        except Exception as e:
-            print(f"AI matching failed: {e}")
-            # Fallback to basic matching
-            return ReconciliationService._fallback_matching(
-                internals, externals, threshold, date_buffer_days
-            )
+        return validated_matches
 
     @staticmethod
     def _fallback_matching(
@@ -215,38 +539,375 @@ Focus on high-confidence matches first."""
         externals: List[Transaction],
         threshold: float,
         date_buffer_days: int,
+        index: Optional[BlockingIndex] = None,
     ) -> List[Dict[str, Any]]:
         """
         Basic rule-based matching as fallback when AI fails.
+
+        Each internal is scored only against blocked candidates (see
+        _blocking_index) and takes the best unused external, earliest in
+        the list on ties. Pass the same `index` to continue a previous call.
         """
         matches = []
+        if index is None:
+            index = ReconciliationService._blocking_index(
+                externals, threshold, date_buffer_days
+            )
 
         for internal in internals:
-            best_match = None
+            best_position = None
             best_score = 0.0
 
-            for external in externals:
+            for position in index.candidates(internal):
                 score = ReconciliationService._calculate_match_score(
-                    internal, external, date_buffer_days
+                    internal, externals[position], date_buffer_days
                 )
                 if score > best_score and score >= threshold:
-                    best_match = external
+                    best_position = position
                     best_score = score
 
-            if best_match:
+            if best_position is not None:
                 matches.append(
                     {
                         "internal_id": internal.id,
-                        "external_id": best_match.id,
+                        "external_id": externals[best_position].id,
                         "confidence": best_score,
                         "reasoning": "Fallback rule-based matching",
                     }
                 )
-                # Remove matched external to prevent duplicates
-                externals.remove(best_match)
+                # Matched externals are skipped by later lookups
+                index.mark_used(best_position)
+
+        return matches
+
+    @staticmethod
+    def _scored_candidates(
+        internals: List[Transaction],
+        externals: List[Transaction],
+        threshold: float,
+        date_buffer_days: int,
+        index: Optional[BlockingIndex] = None,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Blocked candidate pairs scoring at least `threshold`, scored in NumPy.
+
+        Yields aligned (internal positions, external positions, scores) per
+        batch of VECTORIZED_BATCH_SIZE internals. `index` defaults to the
+        lossless blocking for `threshold`.
+        """
+        if index is None:
+            index = ReconciliationService._blocking_index(
+                externals, threshold, date_buffer_days
+            )
+        pool = CandidatePool(externals, index)
+        yield from pool.scored_pairs(
+            internals, threshold, date_buffer_days, VECTORIZED_BATCH_SIZE
+        )
+
+    @staticmethod
+    def _pairs_to_matches(
+        internals: List[Transaction],
+        externals: List[Transaction],
+        pairs: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        reasoning: str,
+    ) -> List[Dict[str, Any]]:
+        rows, cols, scores = pairs
+        return [
+            {
+                "internal_id": internals[i].id,
+                "external_id": externals[j].id,
+                "confidence": score,
+                "reasoning": reasoning,
+            }
+            for i, j, score in zip(rows.tolist(), cols.tolist(), scores.tolist())
+        ]
+
+    @staticmethod
+    def _vectorized_matching(
+        internals: List[Transaction],
+        externals: List[Transaction],
+        threshold: float,
+        date_buffer_days: int,
+        pool: Optional[CandidatePool] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rule-based matching with candidate pairs scored in NumPy batches.
+
+        Same blocking and greedy order as _fallback_matching: pairs are
+        sorted by internal, then score descending, then external position,
+        and each internal takes its first unused external. Pass the same
+        `pool` to continue a previous call.
+        """
+        if pool is None:
+            pool = CandidatePool(
+                externals,
+                ReconciliationService._blocking_index(
+                    externals, threshold, date_buffer_days
+                ),
+            )
+        matches = []
+        for li, ri, scores in pool.scored_pairs(
+            internals, threshold, date_buffer_days, VECTORIZED_BATCH_SIZE
+        ):
+            matches.extend(
+                ReconciliationService._pairs_to_matches(
+                    internals,
+                    externals,
+                    greedy_select(li, ri, scores, pool.index.used),
+                    "Vectorized rule-based matching",
+                )
+            )
+        return matches
+
+    @staticmethod
+    async def _assignment_matching(
+        internals: List[Transaction],
+        externals: List[Transaction],
+        threshold: float,
+        date_buffer_days: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        One-to-one matching that maximizes the total score of all matches.
+
+        Unlike the greedy passes, the result does not depend on list order:
+        when amounts repeat, an internal does not take an external that a
+        later internal matches better. See match_assignment.
+        """
+        batches = list(
+            ReconciliationService._scored_candidates(
+                internals, externals, threshold, date_buffer_days
+            )
+        )
+        if not batches:
+            return []
+        pairs = await assign_pairs(
+            np.concatenate([li for li, _, _ in batches]),
+            np.concatenate([ri for _, ri, _ in batches]),
+            np.concatenate([scores for _, _, scores in batches]),
+        )
+        return ReconciliationService._pairs_to_matches(
+            internals, externals, pairs, "Optimal assignment matching"
+        )
 
+    @staticmethod
+    async def _hybrid_matching(
+        internals: List[Transaction],
+        externals: List[Transaction],
+        threshold: float,
+        date_buffer_days: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Deterministic matching first, the LLM only for what stays ambiguous.
+
+        1. Pairs scoring at least RECONCILIATION_EXACT_MATCH_SCORE are
+           matched greedily.
+        2. The remaining candidates (amount within 1.00, date within the
+           buffer, score at least RECONCILIATION_LLM_CANDIDATE_FLOOR) are
+           split into connected groups. A group with a single pair at or
+           above `threshold` is matched directly.
+        3. Every other group goes to the LLM, packed into prompts of up to
+           RECONCILIATION_LLM_BATCH_SIZE transactions that run with bounded
+           concurrency. Groups too large for one prompt are matched
+           greedily.
+
+        Transactions without any candidate never reach the LLM.
+        """
+        exact_score = max(settings.RECONCILIATION_EXACT_MATCH_SCORE, threshold)
+        floor = min(settings.RECONCILIATION_LLM_CANDIDATE_FLOOR, threshold)
+        batch_limit = settings.RECONCILIATION_LLM_BATCH_SIZE
+
+        # Candidate groups are defined by amount and date proximity, whatever
+        # the floor, so the LLM never sees unrelated transactions
+        index = BlockingIndex(externals, date_window_days=date_buffer_days)
+        batches = list(
+            ReconciliationService._scored_candidates(
+                internals, externals, floor, date_buffer_days, index=index
+            )
+        )
+        if not batches:
+            return []
+        li = np.concatenate([b[0] for b in batches])
+        ri = np.concatenate([b[1] for b in batches])
+        scores = np.concatenate([b[2] for b in batches])
+
+        # 1. Exact and near-exact matches
+        exact = scores >= exact_score
+        used = bytearray(len(externals))
+        rows, cols, picked = greedy_select(li[exact], ri[exact], scores[exact], used)
+        matches = ReconciliationService._pairs_to_matches(
+            internals, externals, (rows, cols, picked), "Exact rule-based match"
+        )
+
+        # 2. Residual candidate groups
+        matched_rows = np.zeros(len(internals), dtype=bool)
+        matched_rows[rows] = True
+        open_pairs = ~matched_rows[li] & ~np.frombuffer(used, dtype=bool)[ri]
+        li, ri, scores = li[open_pairs], ri[open_pairs], scores[open_pairs]
+
+        prompts: List[Tuple[List[int], List[int]]] = []
+        prompt_rows: List[int] = []
+        prompt_cols: List[int] = []
+        greedy_groups = 0
+        if len(li):
+            labels = connected_components(li, ri)
+            order = np.argsort(labels, kind="stable")
+            boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+            for group in np.split(order, boundaries):
+                if len(group) == 1 and scores[group[0]] >= threshold:
+                    matches.extend(
+                        ReconciliationService._pairs_to_matches(
+                            internals,
+                            externals,
+                            (li[group], ri[group], scores[group]),
+                            "Unambiguous rule-based match",
+                        )
+                    )
+                    continue
+
+                group_rows = np.unique(li[group]).tolist()
+                group_cols = np.unique(ri[group]).tolist()
+                size = len(group_rows) + len(group_cols)
+                if size > batch_limit:
+                    confident = group[scores[group] >= threshold]
+                    matches.extend(
+                        ReconciliationService._pairs_to_matches(
+                            internals,
+                            externals,
+                            greedy_select(
+                                li[confident],
+                                ri[confident],
+                                scores[confident],
+                                bytearray(len(externals)),
+                            ),
+                            "Rule-based match (group too large for the LLM)",
+                        )
+                    )
+                    greedy_groups += 1
+                    continue
+
+                if len(prompt_rows) + len(prompt_cols) + size > batch_limit:
+                    prompts.append((prompt_rows, prompt_cols))
+                    prompt_rows, prompt_cols = [], []
+                prompt_rows.extend(group_rows)
+                prompt_cols.extend(group_cols)
+        if prompt_rows:
+            prompts.append((prompt_rows, prompt_cols))
+
+        # 3. LLM over the ambiguous groups
+        llm_service = LLMService()
+        semaphore = asyncio.Semaphore(settings.RECONCILIATION_LLM_CONCURRENCY)
+        resolved = await asyncio.gather(
+            *(
+                ReconciliationService._match_batch_with_ai(
+                    llm_service,
+                    semaphore,
+                    [internals[i] for i in batch_rows],
+                    [externals[j] for j in batch_cols],
+                    threshold,
+                    date_buffer_days,
+                )
+                for batch_rows, batch_cols in prompts
+            )
+        )
+        for batch_matches in resolved:
+            matches.extend(batch_matches)
+
+        logger.info(
+            "Hybrid reconciliation finished",
+            exact_matches=len(rows),
+            llm_prompts=len(prompts),
+            greedy_groups=greedy_groups,
+            matched=len(matches),
+        )
         return matches
 
+    @staticmethod
+    async def _match_batch_with_ai(
+        llm_service: LLMService,
+        semaphore: asyncio.Semaphore,
+        internals: List[Transaction],
+        externals: List[Transaction],
+        threshold: float,
+        date_buffer_days: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        One LLM prompt over a batch of candidate groups.
+
+        Responses are cached by prompt hash, so re-running reconciliation
+        over unchanged groups does not call the LLM again. Falls back to
+        rule-based matching of the batch if the call or its output fails.
+        """
+        internal_data = [
+            ReconciliationService._transaction_payload(tx) for tx in internals
+        ]
+        external_data = [
+            ReconciliationService._transaction_payload(tx) for tx in externals
+        ]
+        prompt = ReconciliationService._build_matching_prompt(
+            internal_data, external_data, threshold, date_buffer_days
+        )
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        key = f"{LLM_CACHE_KEY_PREFIX}:{prompt_hash}"
+
+        try:
+            matches = await cache.get(key)
+            if matches is None:
+                async with semaphore:
+                    response = await llm_service.generate_response(
+                        [HumanMessage(content=prompt)]
+                    )
+                # Only parseable responses are cached
+                matches = json.loads(response)
+                await cache.set(
+                    key, matches, ttl=settings.RECONCILIATION_LLM_CACHE_TTL_SECONDS
+                )
+            return ReconciliationService._validate_ai_matches(
+                matches,
+                threshold,
+                internal_ids={item["id"] for item in internal_data},
+                external_ids={item["id"] for item in external_data},
+            )
+        except Exception as e:
+            logger.warning(
+                "LLM batch matching failed, using rules",
+                error=str(e),
+                transactions=len(internals) + len(externals),
+            )
+            return ReconciliationService._fallback_matching(
+                internals, list(externals), threshold, date_buffer_days
+            )
+
+    @staticmethod
+    def _blocking_index(
+        externals: List[Transaction], threshold: float, date_buffer_days: int
+    ) -> BlockingIndex:
+        """Candidate index that only prunes pairs unable to reach `threshold`."""
+        date_window_days, block_on_amount = (
+            ReconciliationService._blocking_dimensions(threshold, date_buffer_days)
+        )
+        return BlockingIndex(
+            externals,
+            date_window_days=date_window_days,
+            block_on_amount=block_on_amount,
+        )
+
+    @staticmethod
+    def _blocking_dimensions(
+        threshold: float, date_buffer_days: int
+    ) -> Tuple[Optional[int], bool]:
+        """
+        (date window in days or None, whether to block on amount).
+
+        Amount blocking (within 1.00) is safe once the other components
+        alone cannot reach the threshold; date blocking likewise.
+        """
+        max_without_amount = DATE_WEIGHT + DESCRIPTION_WEIGHT + BANK_WEIGHT
+        max_without_date = AMOUNT_WEIGHT + DESCRIPTION_WEIGHT + BANK_WEIGHT
+        return (
+            date_buffer_days if threshold > max_without_date else None,
+            threshold > max_without_amount,
+        )
+
     @staticmethod
     def _calculate_match_score(
         internal: Transaction, external: Transaction, date_buffer_days: int
@@ -258,30 +919,30 @@ Focus on high-confidence matches first."""
 
         # Amount match (40% weight)
         if abs(float(internal.amount or 0) - float(external.amount or 0)) < 0.01:
-            score += 0.4
+            score += AMOUNT_WEIGHT
         elif abs(float(internal.amount or 0) - float(external.amount or 0)) < 1.0:
-            score += 0.2  # Partial credit for close amounts
+            score += AMOUNT_WEIGHT / 2  # Partial credit for close amounts
 
         # Date proximity (30% weight)
         if internal.date and external.date:
-            days_diff = abs((internal.date - external.date).days)
+            days_diff = abs(internal.date - external.date).days
             if days_diff == 0:
-                score += 0.3
+                score += DATE_WEIGHT
             elif days_diff <= date_buffer_days:
-                score += 0.3 * (1 - days_diff / (date_buffer_days + 1))
+                score += DATE_WEIGHT * (1 - days_diff / (date_buffer_days + 1))
 
-        # Description similarity (20% weight) - basic text matching
+        # Description similarity (20% weight) - identical text or a shared word
         if internal.description and external.description:
             desc1 = internal.description.lower()
             desc2 = external.description.lower()
             if desc1 == desc2:
-                score += 0.2
-            elif any(word in desc2 for word in desc1.split()):
-                score += 0.1
+                score += DESCRIPTION_WEIGHT
+            elif description_tokens(desc1) & description_tokens(desc2):
+                score += DESCRIPTION_WEIGHT / 2
 
         # Bank consistency bonus (10% weight)
         if internal.source_bank and external.source_bank:
             if internal.source_bank.lower() == external.source_bank.lower():
-                score += 0.1
+                score += BANK_WEIGHT
 
         return min(score, 1.0)
@@ -0,0 +1,245 @@
+"""
+Persistent Blocking Index for Incremental Reconciliation
+
+Provides:
+- Blocking keys (amount unit, date ordinal) of every unmatched transaction
+  in reconciliation_blocks, written in the same transaction as the import
+- Candidate filters over one tenant's open pool for a slice of new rows:
+  per amount bucket, the date windows around the rows probing it
+- Pending flags, so incremental runs only pick up rows not yet reconciled
+- Removal of matched transactions from the pool, and their return when a
+  match is undone
+- A per-tenant lock so incremental runs of one tenant never overlap
+"""
+
+import hashlib
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import and_, delete, false, insert, or_, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import (
+    Match,
+    ReconciliationBlock,
+    Subject,
+    TransactionSourceType,
+)
+from app.services.match_blocking import amount_unit
+
+logger = structlog.get_logger()
+
+# Ids per DELETE/UPDATE statement, well below driver parameter limits
+ID_CHUNK_SIZE = 10_000
+# New rows per candidate query; each adds at most three amount buckets of
+# three parameters, which keeps queries well below driver parameter limits
+PROBE_CHUNK_SIZE = 1_000
+
+
+def _chunks(ids: Sequence[Any], size: int = ID_CHUNK_SIZE) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Overlapping or adjacent inclusive (low, high) ranges, merged and sorted."""
+    merged: List[Tuple[int, int]] = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+class ReconciliationIndexService:
+    """Maintains and queries the reconciliation_blocks candidate pool."""
+
+    @staticmethod
+    def tenant_clause(tenant_id: Optional[UUID]):
+        """Rows of one tenant; subjects without a tenant share one pool."""
+        if tenant_id is None:
+            return ReconciliationBlock.tenant_id.is_(None)
+        return ReconciliationBlock.tenant_id == tenant_id
+
+    @staticmethod
+    async def tenant_of(db: AsyncSession, subject_id: UUID) -> Optional[UUID]:
+        result = await db.execute(
+            select(Subject.tenant_id).where(Subject.id == subject_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def add_transactions(
+        db: AsyncSession, transaction_rows: List[Dict[str, Any]], pending: bool = True
+    ) -> int:
+        """
+        Add Transaction rows (dicts keyed by attribute name) to the pool.
+
+        Runs inside the caller's transaction, so the index never disagrees
+        with the imported rows.
+        """
+        if not transaction_rows:
+            return 0
+
+        subject_ids = {row["subject_id"] for row in transaction_rows}
+        result = await db.execute(
+            select(Subject.id, Subject.tenant_id).where(Subject.id.in_(subject_ids))
+        )
+        tenants = dict(result.all())
+
+        blocks = [
+            {
+                "transaction_id": row["id"],
+                "tenant_id": tenants.get(row["subject_id"]),
+                "source_type": row.get("source_type")
+                or TransactionSourceType.EXTERNAL,
+                "amount_unit": amount_unit(SimpleNamespace(amount=row["amount"])),
+                "date_ordinal": row["date"].toordinal(),
+                "pending": pending,
+            }
+            for row in transaction_rows
+        ]
+        await db.execute(insert(ReconciliationBlock), blocks)
+        return len(blocks)
+
+    @staticmethod
+    async def remove(db: AsyncSession, transaction_ids: Sequence[UUID]) -> None:
+        """Drop matched transactions from the pool."""
+        for chunk in _chunks(list(transaction_ids)):
+            await db.execute(
+                delete(ReconciliationBlock).where(
+                    ReconciliationBlock.transaction_id.in_(chunk)
+                )
+            )
+
+    @staticmethod
+    async def restore(db: AsyncSession, transactions: Sequence[Any]) -> None:
+        """
+        Return unmatched transactions to the pool as candidates.
+
+        Transactions another match still references stay out of the pool, so
+        they cannot be matched twice. Call after the undone match is deleted.
+        Restored rows are not pending, so incremental runs do not
+        immediately match them again.
+        """
+        matched = set()
+        for chunk in _chunks([tx.id for tx in transactions]):
+            result = await db.execute(
+                select(Match.internal_transaction_id, Match.external_transaction_id)
+                .where(
+                    or_(
+                        Match.internal_transaction_id.in_(chunk),
+                        Match.external_transaction_id.in_(chunk),
+                    )
+                )
+            )
+            for internal_id, external_id in result:
+                matched.update((internal_id, external_id))
+        transactions = [tx for tx in transactions if tx.id not in matched]
+
+        await ReconciliationIndexService.remove(db, [tx.id for tx in transactions])
+        await ReconciliationIndexService.add_transactions(
+            db,
+            [
+                {
+                    "id": tx.id,
+                    "subject_id": tx.subject_id,
+                    "source_type": tx.source_type,
+                    "amount": tx.amount,
+                    "date": tx.date,
+                }
+                for tx in transactions
+            ],
+            pending=False,
+        )
+
+    @staticmethod
+    async def mark_reconciled(
+        db: AsyncSession, transaction_ids: Sequence[UUID]
+    ) -> None:
+        """Clear the pending flag; the rows stay in the pool as candidates."""
+        for chunk in _chunks(list(transaction_ids)):
+            await db.execute(
+                update(ReconciliationBlock)
+                .where(ReconciliationBlock.transaction_id.in_(chunk))
+                .values(pending=False)
+            )
+
+    @staticmethod
+    async def lock_tenant(db: AsyncSession, tenant_id: Optional[UUID]) -> None:
+        """
+        Serialize incremental runs of one tenant until the transaction ends.
+
+        Uses a PostgreSQL advisory lock; other dialects run unlocked.
+        """
+        if db.bind.dialect.name != "postgresql":
+            return
+        digest = hashlib.sha256(f"reconciliation:{tenant_id}".encode()).digest()
+        key = int.from_bytes(digest[:8], "big", signed=True)
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+
+    @staticmethod
+    def probe_chunks(transactions: Sequence[Any]) -> Iterable[Sequence[Any]]:
+        """New rows in slices small enough for one candidate query each."""
+        return _chunks(transactions, PROBE_CHUNK_SIZE)
+
+    @staticmethod
+    def candidate_filters(
+        tenant_id: Optional[UUID],
+        source_type: TransactionSourceType,
+        transactions: Sequence[Any],
+        date_window_days: Optional[int],
+        block_on_amount: bool,
+    ) -> List[Any]:
+        """
+        WHERE clauses selecting pool rows of `source_type` that may match
+        any of `transactions` (at most PROBE_CHUNK_SIZE, see probe_chunks).
+
+        Probes the same neighbouring amount units and padded date window as
+        BlockingIndex.candidates(). The window is taken around each row
+        within each amount bucket it probes, so rows far apart in time never
+        widen each other's ranges. With either dimension off the whole side
+        of the tenant's pool qualifies on it.
+        """
+        filters = [
+            ReconciliationIndexService.tenant_clause(tenant_id),
+            ReconciliationBlock.source_type == source_type,
+        ]
+        if date_window_days is not None:
+            transactions = [tx for tx in transactions if tx.date]
+            if not transactions:
+                # Undated rows fall in no date window
+                return filters + [false()]
+        if not block_on_amount and date_window_days is None:
+            return filters
+
+        if date_window_days is None:
+            units = [(amount_unit(tx) - 1, amount_unit(tx) + 1) for tx in transactions]
+            clauses = [
+                ReconciliationBlock.amount_unit.between(low, high)
+                for low, high in _merge_ranges(units)
+            ]
+        else:
+            window = date_window_days + 1  # See BlockingIndex.candidates()
+            windows: Dict[int, List[Tuple[int, int]]] = {}
+            for tx in transactions:
+                ordinal = tx.date.toordinal()
+                unit = amount_unit(tx) if block_on_amount else 0
+                keys = (unit - 1, unit, unit + 1) if block_on_amount else (unit,)
+                for key in keys:
+                    windows.setdefault(key, []).append(
+                        (ordinal - window, ordinal + window)
+                    )
+            clauses = []
+            for key in sorted(windows):
+                for low, high in _merge_ranges(windows[key]):
+                    clause = ReconciliationBlock.date_ordinal.between(low, high)
+                    if block_on_amount:
+                        clause = and_(ReconciliationBlock.amount_unit == key, clause)
+                    clauses.append(clause)
+        filters.append(or_(*clauses))
+        return filters
@@ -0,0 +1,287 @@
+"""
+Heuristic Rule Compiler
+
+Parses each HeuristicRule.logic expression once, checks it against a small
+whitelist of syntax, and caches the result.
+
+Provides:
+- compile_rule(): the cached CompiledRule for a logic string
+- CompiledRule.evaluate(): one context dict, with Python semantics (the
+  value of the expression, like simpleeval)
+- CompiledRule.mask(): whole columns at once, as a boolean NumPy mask
+- RuleCompileError for expressions outside the whitelist
+
+Allowed: names, number/string/bool/None literals and literal tuples or
+lists, arithmetic (+ - * / // %), comparisons (also chained), in / not in,
+and / or / not. Calls, attribute access, subscripts, powers and lambdas
+are rejected, so a compiled rule can only read the names it is given.
+Multiplication is numeric only: repeating a string or sequence (e.g.
+'a' * 10000000000) is rejected when compiled or raises TypeError when
+evaluated, as simpleeval's size limits did.
+"""
+
+import ast
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Mapping
+
+import numpy as np
+
+_SEQUENCE_TYPES = (str, bytes, tuple, list)
+# Global the scalar bytecode calls for `*`; rules cannot name dunders
+_MULTIPLY = "__multiply"
+
+
+def _is_sequence(value: Any) -> bool:
+    if isinstance(value, _SEQUENCE_TYPES):
+        return True
+    if isinstance(value, np.ndarray) and value.dtype.kind in "OSU":
+        return value.dtype.kind != "O" or any(
+            isinstance(item, _SEQUENCE_TYPES) for item in value.ravel()
+        )
+    return False
+
+
+def _multiply(left: Any, right: Any) -> Any:
+    """`left * right` for numbers (or columns of numbers) only."""
+    if _is_sequence(left) or _is_sequence(right):
+        raise TypeError("Only numbers can be multiplied")
+    return left * right
+
+
+_BINARY_OPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _multiply,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_COMPARE_OPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_ALLOWED_NODES = (
+    ast.Expression,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.USub,
+    ast.UAdd,
+    ast.BinOp,
+    ast.Compare,
+    ast.In,
+    ast.NotIn,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Tuple,
+    ast.List,
+    *_BINARY_OPS,
+    *_COMPARE_OPS,
+)
+_CONSTANT_TYPES = (int, float, str, bool, type(None))
+MAX_LOGIC_LENGTH = 2000
+
+# A vectorized node: columns in, array (one value per row) or scalar out
+Vector = Callable[[Mapping[str, Any]], Any]
+
+
+class RuleCompileError(ValueError):
+    """A rule's logic is not a valid, whitelisted expression."""
+
+
+def _validate(tree: ast.Expression) -> None:
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleCompileError(f"{type(node).__name__} is not allowed")
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise RuleCompileError(f"Name {node.id} is not allowed")
+        if isinstance(node, ast.Constant) and not isinstance(
+            node.value, _CONSTANT_TYPES
+        ):
+            raise RuleCompileError(f"Literal {node.value!r} is not allowed")
+        if isinstance(node, (ast.Tuple, ast.List)) and not all(
+            isinstance(element, ast.Constant) for element in node.elts
+        ):
+            raise RuleCompileError("Only literal tuples and lists are allowed")
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+            for operand in (node.left, node.right):
+                if isinstance(operand, (ast.Tuple, ast.List)) or (
+                    isinstance(operand, ast.Constant) and isinstance(operand.value, str)
+                ):
+                    raise RuleCompileError("Only numbers can be multiplied")
+
+
+class _GuardMultiply(ast.NodeTransformer):
+    """Rewrites `a * b` into a call of _multiply for the scalar bytecode."""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if not isinstance(node.op, ast.Mult):
+            return node
+        call = ast.Call(
+            func=ast.Name(id=_MULTIPLY, ctx=ast.Load()),
+            args=[node.left, node.right],
+            keywords=[],
+        )
+        return ast.copy_location(call, node)
+
+
+def _truth(value: Any) -> np.ndarray:
+    """Element-wise truth value, like bool() per row."""
+    array = np.asarray(value)
+    if array.dtype == bool:
+        return array
+    if array.dtype == object:
+        return np.array([bool(item) for item in array.ravel()], dtype=bool).reshape(
+            array.shape
+        )
+    return array.astype(bool)
+
+
+def _column(columns: Mapping[str, Any], name: str) -> np.ndarray:
+    if name not in columns:
+        raise NameError(f"'{name}' is not defined")
+    value = columns[name]
+    if hasattr(value, "to_numpy"):
+        return value.to_numpy()
+    try:
+        array = np.asarray(value)
+    except ValueError:  # Ragged rows, e.g. tags of different lengths
+        array = None
+    if array is None or array.ndim != 1:
+        # One object per row, even when every row holds a sequence
+        array = np.empty(len(value), dtype=object)
+        for row, item in enumerate(value):
+            array[row] = item
+    return array
+
+
+def _contains(item: Any, container: Any) -> np.ndarray:
+    """`item in container` per row; either side may be a column."""
+    item_rows = np.ndim(item) > 0
+    if isinstance(container, (tuple, list)):
+        # Literal container: one vectorized membership test
+        return np.isin(item, list(container))
+    if np.ndim(container) == 0:
+        # Scalar container, e.g. a substring test against a string literal
+        if item_rows:
+            return np.fromiter(
+                (value in container for value in item), dtype=bool, count=len(item)
+            )
+        return np.asarray(item in container)
+    if item_rows:
+        return np.fromiter(
+            (value in values for value, values in zip(item, container)),
+            dtype=bool,
+            count=len(container),
+        )
+    return np.fromiter(
+        (item in values for values in container), dtype=bool, count=len(container)
+    )
+
+
+def _vectorize(node: ast.AST) -> Vector:
+    if isinstance(node, ast.Expression):
+        return _vectorize(node.body)
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda columns: value
+    if isinstance(node, (ast.Tuple, ast.List)):
+        values = tuple(element.value for element in node.elts)
+        return lambda columns: values
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda columns: _column(columns, name)
+    if isinstance(node, ast.BinOp):
+        op = _BINARY_OPS[type(node.op)]
+        left, right = _vectorize(node.left), _vectorize(node.right)
+        return lambda columns: op(left(columns), right(columns))
+    if isinstance(node, ast.UnaryOp):
+        operand = _vectorize(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda columns: ~_truth(operand(columns))
+        op = operator.neg if isinstance(node.op, ast.USub) else operator.pos
+        return lambda columns: op(operand(columns))
+    if isinstance(node, ast.BoolOp):
+        parts = [_vectorize(value) for value in node.values]
+        combine = (
+            np.logical_and.reduce
+            if isinstance(node.op, ast.And)
+            else np.logical_or.reduce
+        )
+        return lambda columns: combine(
+            np.broadcast_arrays(*(_truth(part(columns)) for part in parts))
+        )
+    if isinstance(node, ast.Compare):
+        operands = [_vectorize(node.left)] + [
+            _vectorize(comparator) for comparator in node.comparators
+        ]
+        ops = list(node.ops)
+
+        def compare(columns: Mapping[str, Any]) -> np.ndarray:
+            values = [operand(columns) for operand in operands]
+            result = None
+            # a < b < c is (a < b) and (b < c)
+            for op, left, right in zip(ops, values, values[1:]):
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    step = _contains(left, right)
+                    if isinstance(op, ast.NotIn):
+                        step = ~step
+                else:
+                    step = _truth(_COMPARE_OPS[type(op)](left, right))
+                result = step if result is None else result & step
+            return result
+
+        return compare
+    raise RuleCompileError(f"{type(node).__name__} is not allowed")
+
+
+class CompiledRule:
+    """A parsed, validated rule expression in scalar and vectorized form."""
+
+    def __init__(self, logic: str):
+        if len(logic) > MAX_LOGIC_LENGTH:
+            raise RuleCompileError("Rule logic is too long")
+        try:
+            tree = ast.parse(logic.strip(), mode="eval")
+        except SyntaxError as e:
+            raise RuleCompileError(f"Invalid rule logic: {e.msg}") from e
+        _validate(tree)
+
+        self.logic = logic
+        self.names: FrozenSet[str] = frozenset(
+            node.id for node in ast.walk(tree) if isinstance(node, ast.Name)
+        )
+        self._vector = _vectorize(tree)
+        # Safe to run as bytecode: the whitelist leaves nothing but names,
+        # literals and operators, and no builtins are reachable
+        tree = ast.fix_missing_locations(_GuardMultiply().visit(tree))
+        self._code = compile(tree, "<rule>", "eval")
+
+    def evaluate(self, context: Mapping[str, Any]) -> Any:
+        """Value of the expression for one context; NameError if a name is missing."""
+        return eval(self._code, {"__builtins__": {}, _MULTIPLY: _multiply}, context)
+
+    def mask(self, columns: Mapping[str, Any], size: int) -> np.ndarray:
+        """
+        Truth of the expression for every row of `columns` (e.g. a
+        DataFrame, or a dict of equal-length arrays) with `size` rows.
+        """
+        # Division by zero gives inf/nan per row, as pandas does
+        with np.errstate(all="ignore"):
+            result = _truth(self._vector(columns))
+        return np.broadcast_to(result, (size,)).copy()
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(logic: str) -> CompiledRule:
+    """Compile a rule's logic once per process; raises RuleCompileError."""
+    return CompiledRule(logic)
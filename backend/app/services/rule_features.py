@@ -0,0 +1,278 @@
+"""
+Rule Feature Contexts for the Heuristic Engine
+
+Provides:
+- compute_rule_features(): every rolling-window feature the heuristic rules
+  read (count_24h, transaction_count_1h, total_volume_24h, ...), for every
+  transaction of many subjects in one vectorized pandas pass
+- Per-subject turnover features (inflow_outflow_ratio, turnover_time_hours)
+  from the velocity detector's FIFO scan
+- Loading a subject's or an import's transactions from the database,
+  scoring them against the rules and summarizing the hits per rule
+
+Windows are trailing and half-open, (date - window, date], the same as the
+structuring detector's, so count_24h here equals its window_features().
+"""
+
+import asyncio
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import Transaction
+from app.schemas.analysis import RuleResult
+from app.services.detectors.structuring import StructuringDetector
+from app.services.detectors.velocity import VelocityDetector
+from app.services.heuristic_engine import HeuristicEngine
+
+logger = structlog.get_logger()
+
+# Trailing windows; each yields transaction_count_<label>,
+# total_volume_<label>, count_<label> and sum_<label>
+FEATURE_WINDOWS: Dict[str, timedelta] = {
+    "1h": timedelta(hours=1),
+    **StructuringDetector.WINDOWS,
+}
+# Rows fetched per round trip when loading transactions
+LOAD_CHUNK_SIZE = 50_000
+# Transaction ids listed per rule in a summary
+MAX_SUMMARY_IDS = 20
+
+FRAME_COLUMNS = ["id", "subject_id", "date", "amount"]
+# Features that describe the subject rather than a window
+SUBJECT_COLUMNS = ("account_age_days", "inflow_outflow_ratio", "turnover_time_hours")
+
+
+def _window_columns() -> List[str]:
+    return [
+        f"{prefix}_{label}"
+        for label in FEATURE_WINDOWS
+        for prefix in ("transaction_count", "total_volume", "count", "sum")
+    ]
+
+
+def _turnover(dates: np.ndarray, amounts: np.ndarray) -> Dict[str, float]:
+    """inflow_outflow_ratio and turnover_time_hours of one subject."""
+    stats, _, _ = VelocityDetector().scan(
+        (date, {"amount": amount})
+        for date, amount in zip(pd.DatetimeIndex(dates).to_pydatetime(), amounts)
+    )
+    hours = stats.turnover_time_hours
+    return {
+        "inflow_outflow_ratio": stats.inflow_outflow_ratio,
+        # NaN compares False, so rules on it stay quiet instead of erroring
+        "turnover_time_hours": math.nan if hours is None else hours,
+    }
+
+
+def compute_rule_features(
+    frame: pd.DataFrame, opened: Optional[Dict[Any, datetime]] = None
+) -> pd.DataFrame:
+    """
+    Rule features for every row of `frame`, aligned with it.
+
+    Args:
+        frame: Columns id, subject_id, date, amount; any order, many subjects
+        opened: Account opening date per subject_id; defaults to the
+            subject's earliest transaction in `frame`
+
+    Returns:
+        `frame` plus the window features, account_age_days, the subject's
+        turnover features and an empty country_tags
+    """
+    result = frame.copy()
+    if frame.empty:
+        for column in _window_columns() + list(SUBJECT_COLUMNS):
+            result[column] = pd.Series(dtype=float)
+        result["country_tags"] = pd.Series(dtype=object)
+        return result
+
+    codes, subjects = pd.factorize(frame["subject_id"])
+    dates = pd.to_datetime(frame["date"]).to_numpy()
+    amounts = frame["amount"].astype(float).to_numpy()
+    threshold = StructuringDetector.THRESHOLD_AMOUNT
+    near = (amounts >= threshold * StructuringDetector.NEAR_THRESHOLD_PCT) & (
+        amounts < threshold
+    )
+
+    # Time-sorted within each subject
+    order = np.lexsort((dates, codes))
+    sorted_codes = codes[order]
+    sorted_dates = dates[order]
+    sorted_amounts = amounts[order]
+    sorted_near = near[order]
+
+    # One ascending key per row, (subject, rank of its instant), so every
+    # subject's window is a binary search over all rows at once
+    instants = np.unique(sorted_dates)
+    base = sorted_codes.astype(np.int64) * (len(instants) + 1)
+    keys = base + np.searchsorted(instants, sorted_dates, side="right")
+    # side="right": a window ends after every row at the same instant
+    hi = np.searchsorted(keys, keys, side="right")
+
+    cumulative = {
+        "transaction_count": np.arange(len(order) + 1, dtype=np.int64),
+        "total_volume": np.concatenate(([0.0], np.cumsum(np.abs(sorted_amounts)))),
+        "count": np.concatenate(([0], np.cumsum(sorted_near, dtype=np.int64))),
+        "sum": np.concatenate(
+            ([0.0], np.cumsum(np.where(sorted_near, sorted_amounts, 0.0)))
+        ),
+    }
+    rolled = pd.DataFrame(index=range(len(order)))
+    for label, window in FEATURE_WINDOWS.items():
+        span = np.timedelta64(window // timedelta(microseconds=1), "us")
+        starts = np.searchsorted(instants, sorted_dates - span, side="right")
+        lo = np.searchsorted(keys, base + starts, side="right")
+        for name, running in cumulative.items():
+            rolled[f"{name}_{label}"] = running[hi] - running[lo]
+
+    # Subject i's rows are sorted positions edges[i]:edges[i + 1]
+    edges = np.concatenate(
+        ([0], np.flatnonzero(np.diff(sorted_codes)) + 1, [len(order)])
+    )
+    sizes = np.diff(edges)
+
+    opening = pd.to_datetime(pd.Series(subjects).map(opened or {})).to_numpy()
+    first = sorted_dates[edges[:-1]]
+    opening = np.where(pd.isna(opening), first, opening)
+    age = (sorted_dates - np.repeat(opening, sizes)) / np.timedelta64(1, "D")
+    rolled["account_age_days"] = np.maximum(age, 0.0)
+
+    # FIFO turnover is sequential, so it is one scan per subject
+    turnover = [
+        _turnover(sorted_dates[start:stop], sorted_amounts[start:stop])
+        for start, stop in zip(edges[:-1], edges[1:])
+    ]
+    for name in SUBJECT_COLUMNS[1:]:
+        per_subject = np.array([stats[name] for stats in turnover], dtype=float)
+        rolled[name] = np.repeat(per_subject, sizes)
+
+    # Back from time order to the caller's row order
+    restored = np.empty(len(order), dtype=np.int64)
+    restored[order] = np.arange(len(order))
+    rolled = rolled.iloc[restored]
+    for column in rolled.columns:
+        result[column] = rolled[column].to_numpy()
+    # No jurisdiction data is recorded on transactions yet
+    result["country_tags"] = [()] * len(result)
+    return result
+
+
+def rule_contexts(features: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+    """Feature rows as single HeuristicEngine contexts."""
+    return iter(features.to_dict(orient="records"))
+
+
+class RuleFeatureService:
+    """Builds rule contexts from stored transactions and scores them."""
+
+    @staticmethod
+    async def load_frame(
+        db: AsyncSession, subject_ids: List[UUID]
+    ) -> pd.DataFrame:
+        """All transactions of the subjects, with created_at for filtering."""
+        stream = await db.stream(
+            select(
+                Transaction.id,
+                Transaction.subject_id,
+                Transaction.date,
+                Transaction.amount,
+                Transaction.created_at,
+            )
+            .where(Transaction.subject_id.in_(subject_ids))
+            .execution_options(yield_per=LOAD_CHUNK_SIZE)
+        )
+        rows = []
+        async for partition in stream.partitions():
+            rows.extend(partition)
+        frame = pd.DataFrame(rows, columns=FRAME_COLUMNS + ["created_at"])
+        # Rules compare amounts with float columns
+        frame["amount"] = frame["amount"].astype(float)
+        return frame
+
+    @staticmethod
+    def score_frame(
+        features: pd.DataFrame, engine: Optional[HeuristicEngine] = None
+    ) -> Dict[str, List[RuleResult]]:
+        """Triggered rules per transaction id; rows with none are left out."""
+        engine = engine or HeuristicEngine()
+        masks = engine.evaluate_columns(features, len(features))
+        if not masks:
+            return {}
+        rules = {rule.id: rule for rule in engine.rules}
+        ids = features["id"].to_numpy()
+
+        scored: Dict[str, List[RuleResult]] = {}
+        for position in np.flatnonzero(np.logical_or.reduce(list(masks.values()))):
+            scored[str(ids[position])] = [
+                RuleResult(
+                    rule_id=rule_id,
+                    rule_name=rules[rule_id].name,
+                    triggered=True,
+                    severity=rules[rule_id].severity,
+                    context={"val": True},
+                )
+                for rule_id, mask in masks.items()
+                if mask[position]
+            ]
+        return scored
+
+    @staticmethod
+    async def score_subject(
+        db: AsyncSession,
+        subject_id: UUID,
+        imported_at: Optional[datetime] = None,
+        engine: Optional[HeuristicEngine] = None,
+    ) -> Dict[str, List[RuleResult]]:
+        """
+        Score a subject's transactions, or only those of one import: imports
+        stamp all their rows with the same created_at, `imported_at`.
+        Features always use the whole history.
+        """
+        frame = await RuleFeatureService.load_frame(db, [subject_id])
+
+        def compute() -> Dict[str, List[RuleResult]]:
+            features = compute_rule_features(frame[FRAME_COLUMNS])
+            if imported_at is not None:
+                own = frame["created_at"] == pd.Timestamp(imported_at)
+                features = features[own.to_numpy()]
+            return RuleFeatureService.score_frame(features, engine)
+
+        scored = await asyncio.to_thread(compute)
+        logger.info(
+            "Scored transactions against heuristic rules",
+            subject_id=str(subject_id),
+            transactions=len(frame),
+            flagged=len(scored),
+        )
+        return scored
+
+    @staticmethod
+    def summarize(scored: Dict[str, List[RuleResult]]) -> List[RuleResult]:
+        """One result per triggered rule, listing the transactions it hit."""
+        by_rule: Dict[str, List[str]] = {}
+        first: Dict[str, RuleResult] = {}
+        for tx_id, triggered in scored.items():
+            for result in triggered:
+                by_rule.setdefault(result.rule_id, []).append(tx_id)
+                first.setdefault(result.rule_id, result)
+        return [
+            RuleResult(
+                rule_id=rule_id,
+                rule_name=first[rule_id].rule_name,
+                triggered=True,
+                severity=first[rule_id].severity,
+                context={
+                    "transaction_count": len(tx_ids),
+                    "transaction_ids": tx_ids[:MAX_SUMMARY_IDS],
+                },
+            )
+            for rule_id, tx_ids in by_rule.items()
+        ]
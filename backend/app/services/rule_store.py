@@ -0,0 +1,202 @@
+"""
+Versioned Heuristic Rule Store
+
+Provides:
+- Append-only rule revisions in heuristic_rule_versions, overlaid on the
+  built-in DEFAULT_HEURISTIC_RULES (the rule set version 0)
+- One HeuristicEngine per process for the current rule set, reused until
+  the set changes; rule expressions are compiled once by rule_compiler
+- Invalidation over Redis pub/sub, so API and worker processes pick up a
+  change without a restart, plus a periodic version check in case a
+  message is missed or no subscriber is running
+"""
+
+import json
+import time
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.heuristic_rules import DEFAULT_HEURISTIC_RULES
+from app.db.models import HeuristicRuleVersion
+from app.schemas.analysis import HeuristicRule, HeuristicRuleRevision
+from app.services.heuristic_engine import HeuristicEngine
+from app.services.job_queue import job_queue
+from app.services.rule_compiler import compile_rule
+
+logger = structlog.get_logger()
+
+RULES_CHANNEL = "heuristics:rules"
+
+
+def _revision(row: HeuristicRuleVersion) -> HeuristicRuleRevision:
+    return HeuristicRuleRevision(
+        id=row.rule_id,
+        name=row.name,
+        description=row.description,
+        severity=row.severity,
+        logic=row.logic,
+        enabled=row.enabled,
+        version=row.version,
+        deleted=row.deleted,
+        created_at=row.created_at,
+    )
+
+
+class RuleStore:
+    """Stored rule revisions and this process's engine for the current set."""
+
+    def __init__(self):
+        self._engine: Optional[HeuristicEngine] = None
+        self._checked_at = 0.0  # time.monotonic() of the last version check
+
+    @staticmethod
+    async def current_version(db: AsyncSession) -> int:
+        result = await db.execute(select(func.max(HeuristicRuleVersion.version)))
+        return result.scalar() or 0
+
+    @staticmethod
+    async def load(db: AsyncSession) -> Tuple[int, List[HeuristicRule]]:
+        """The active rules and their rule set version."""
+        result = await db.execute(
+            select(HeuristicRuleVersion).order_by(HeuristicRuleVersion.version)
+        )
+        rules = {rule.id: rule for rule in DEFAULT_HEURISTIC_RULES}
+        version = 0
+        # Later revisions replace earlier ones
+        for row in result.scalars():
+            version = row.version
+            if row.deleted:
+                rules.pop(row.rule_id, None)
+            else:
+                rules[row.rule_id] = HeuristicRule(
+                    id=row.rule_id,
+                    name=row.name,
+                    description=row.description,
+                    severity=row.severity,
+                    logic=row.logic,
+                    enabled=row.enabled,
+                )
+        return version, list(rules.values())
+
+    async def engine(self, db: AsyncSession) -> HeuristicEngine:
+        """
+        The engine for the current rule set. The stored version is checked
+        at most every HEURISTIC_RULES_REFRESH_SECONDS unless invalidated.
+        """
+        now = time.monotonic()
+        if (
+            self._engine is not None
+            and now - self._checked_at < settings.HEURISTIC_RULES_REFRESH_SECONDS
+        ):
+            return self._engine
+
+        version = await self.current_version(db)
+        if self._engine is None or self._engine.version != version:
+            version, rules = await self.load(db)
+            self._engine = HeuristicEngine(rules, version=version)
+            logger.info("Heuristic rule set loaded", version=version, rules=len(rules))
+        self._checked_at = now
+        return self._engine
+
+    def invalidate(self) -> None:
+        """Reload the rule set on next use."""
+        self._engine = None
+
+    async def _record(
+        self, db: AsyncSession, row: HeuristicRuleVersion
+    ) -> HeuristicRuleRevision:
+        db.add(row)
+        await db.commit()
+        await db.refresh(row)
+        self.invalidate()
+        await self.publish(row.version)
+        return _revision(row)
+
+    async def save_rule(
+        self, db: AsyncSession, rule: HeuristicRule, user_id: Optional[UUID] = None
+    ) -> HeuristicRuleRevision:
+        """
+        Store a new revision of a rule (new or existing id).
+
+        Raises RuleCompileError if the logic is not a valid expression, so
+        a broken rule never reaches the engines.
+        """
+        compile_rule(rule.logic)
+        return await self._record(
+            db,
+            HeuristicRuleVersion(
+                rule_id=rule.id,
+                name=rule.name,
+                description=rule.description,
+                severity=rule.severity,
+                logic=rule.logic,
+                enabled=rule.enabled,
+                created_by=user_id,
+            ),
+        )
+
+    async def delete_rule(
+        self, db: AsyncSession, rule_id: str, user_id: Optional[UUID] = None
+    ) -> Optional[HeuristicRuleRevision]:
+        """Store a tombstone revision; None if the rule is not active."""
+        _, rules = await self.load(db)
+        current = next((rule for rule in rules if rule.id == rule_id), None)
+        if current is None:
+            return None
+        return await self._record(
+            db,
+            HeuristicRuleVersion(
+                rule_id=rule_id,
+                name=current.name,
+                description=current.description,
+                severity=current.severity,
+                logic=current.logic,
+                enabled=False,
+                deleted=True,
+                created_by=user_id,
+            ),
+        )
+
+    @staticmethod
+    async def history(
+        db: AsyncSession, rule_id: str
+    ) -> List[HeuristicRuleRevision]:
+        """Stored revisions of a rule, newest first."""
+        result = await db.execute(
+            select(HeuristicRuleVersion)
+            .where(HeuristicRuleVersion.rule_id == rule_id)
+            .order_by(HeuristicRuleVersion.version.desc())
+        )
+        return [_revision(row) for row in result.scalars()]
+
+    @staticmethod
+    async def publish(version: int) -> None:
+        """Tell every process that the rule set changed."""
+        client = job_queue.redis_client
+        if client is None:
+            return
+        try:
+            await client.publish(RULES_CHANNEL, json.dumps({"version": version}))
+        except Exception as e:
+            logger.error("Failed to publish rule set change", error=str(e))
+
+    async def listen(self, redis_client) -> None:
+        """Invalidate the cached rule set whenever another process changes it."""
+        pubsub = redis_client.pubsub()
+        await pubsub.subscribe(RULES_CHANNEL)
+        try:
+            async for item in pubsub.listen():
+                if item.get("type") == "message":
+                    self.invalidate()
+        finally:
+            await pubsub.reset()
+
+
+# Global rule store instance
+rule_store = RuleStore()
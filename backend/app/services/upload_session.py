@@ -0,0 +1,269 @@
+"""
+Upload Session Cache for Mapped CSV Imports
+
+init_upload parses a staged CSV once and keeps next to it:
+- <file_id>.session.json: header row, row count and the first rows
+- <file_id>.sample.parquet: a uniform reservoir sample used to validate
+  mappings during preview
+- <file_id>.parquet: a columnar copy of the file that the final import
+  streams from instead of re-parsing the CSV
+
+File ids are the UUIDs init_upload issues; every path is built through a
+check of the id, so names sent by clients never reach outside the upload
+directory.
+
+Once an import is queued, stage_for_job moves the CSV and its session
+files into the jobs/ subdirectory. The hourly cleanup of abandoned uploads
+does not touch that directory, so failed or checkpointed imports can be
+resumed until INGESTION_JOB_FILE_RETENTION_SECONDS.
+
+pyarrow is optional: without it the sample is stored as JSON and imports
+read the CSV as before.
+"""
+
+import json
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+    pq = None
+
+logger = structlog.get_logger()
+
+HEAD_ROWS = 20  # Rows kept verbatim for the preview table
+JOBS_SUBDIR = "jobs"  # Staged files handed to an import job
+SESSION_SUFFIXES = (".session.json", ".sample.parquet", ".sample.json", ".parquet")
+
+
+@dataclass
+class UploadSession:
+    """What init_upload learned about a staged file."""
+
+    file_id: str
+    headers: List[str]
+    row_count: int
+    columnar: bool  # Whether <file_id>.parquet holds the full file
+    head_rows: List[Dict[str, str]] = field(default_factory=list)
+
+
+def check_file_id(file_id: str) -> str:
+    """The file id if it is a UUID as init_upload issues them; else ValueError."""
+    try:
+        valid = str(uuid.UUID(file_id)) == file_id
+    except (AttributeError, TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid file id")
+    return file_id
+
+
+def _path(upload_dir: str, file_id: str, suffix: str) -> str:
+    return os.path.join(upload_dir, f"{check_file_id(file_id)}{suffix}")
+
+
+def csv_path(upload_dir: str, file_id: str) -> str:
+    """Path of a staged upload's CSV."""
+    return _path(upload_dir, file_id, ".csv")
+
+
+def _write_sample(upload_dir: str, file_id: str, sample: pd.DataFrame) -> None:
+    if pq is not None:
+        sample.to_parquet(_path(upload_dir, file_id, ".sample.parquet"), index=False)
+    else:
+        sample.to_json(
+            _path(upload_dir, file_id, ".sample.json"), orient="split", index=False
+        )
+
+
+def load_sample(upload_dir: str, file_id: str) -> pd.DataFrame:
+    """The reservoir sample of a session, as raw text columns."""
+    parquet_path = _path(upload_dir, file_id, ".sample.parquet")
+    if pq is not None and os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path)
+    return pd.read_json(
+        _path(upload_dir, file_id, ".sample.json"), orient="split", dtype=False
+    )
+
+
+def build_session(
+    upload_dir: str,
+    file_id: str,
+    headers: List[str],
+    chunk_size: int,
+    sample_size: int,
+    seed: Optional[int] = None,
+) -> UploadSession:
+    """
+    Single pass over <file_id>.csv building the session files.
+
+    The sample is a uniform reservoir: every row gets a random key and the
+    `sample_size` smallest keys seen so far are kept, so memory is bounded
+    by chunk_size + sample_size rows whatever the file size.
+    """
+    csv_path = _path(upload_dir, file_id, ".csv")
+    parquet_path = _path(upload_dir, file_id, ".parquet")
+    rng = np.random.default_rng(seed)
+
+    sample: Optional[pd.DataFrame] = None
+    sample_keys = np.empty(0)
+    head: Optional[pd.DataFrame] = None
+    row_count = 0
+    writer = None
+    columnar = pq is not None
+
+    try:
+        reader = pd.read_csv(
+            csv_path, dtype=str, keep_default_na=False, chunksize=chunk_size
+        )
+        with reader:
+            for chunk in reader:
+                if head is None or len(head) < HEAD_ROWS:
+                    head = chunk if head is None else pd.concat([head, chunk])
+                    head = head.head(HEAD_ROWS)
+
+                sample = (
+                    chunk.reset_index(drop=True)
+                    if sample is None
+                    else pd.concat([sample, chunk], ignore_index=True)
+                )
+                sample_keys = np.concatenate([sample_keys, rng.random(len(chunk))])
+                if len(sample) > sample_size:
+                    keep = np.argpartition(sample_keys, sample_size)[:sample_size]
+                    # Keep file order in the sample for readability
+                    keep.sort()
+                    sample = sample.iloc[keep].reset_index(drop=True)
+                    sample_keys = sample_keys[keep]
+
+                if columnar:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(parquet_path, table.schema)
+                    writer.write_table(table)
+
+                row_count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if columnar and writer is None:
+        # Header-only file: nothing to stream
+        columnar = False
+    if sample is None:
+        sample = pd.DataFrame(columns=headers, dtype=object)
+
+    _write_sample(upload_dir, file_id, sample)
+    session = UploadSession(
+        file_id=file_id,
+        headers=headers,
+        row_count=row_count,
+        columnar=columnar,
+        head_rows=head.to_dict(orient="records") if head is not None else [],
+    )
+    with open(_path(upload_dir, file_id, ".session.json"), "w") as f:
+        json.dump(asdict(session), f)
+
+    logger.info(
+        "Upload session built",
+        file_id=file_id,
+        rows=row_count,
+        sampled=len(sample),
+        columnar=columnar,
+    )
+    return session
+
+
+def load_session(upload_dir: str, file_id: str) -> Optional[UploadSession]:
+    path = _path(upload_dir, file_id, ".session.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        session = UploadSession(**json.load(f))
+    if session.columnar and (
+        pq is None or not os.path.exists(_path(upload_dir, file_id, ".parquet"))
+    ):
+        session.columnar = False
+    return session
+
+
+def iter_columnar_chunks(
+    upload_dir: str, file_id: str, batch_size: int
+) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """
+    Stream the columnar copy in chunks of exactly `batch_size` rows.
+
+    Parquet batches can be cut short at row-group boundaries; they are
+    re-sliced so batch numbers match a CSV read of the same file (resumed
+    imports rely on stable batch boundaries). Yields (chunk, rows_read).
+    """
+    parquet_file = pq.ParquetFile(_path(upload_dir, file_id, ".parquet"))
+    buffer: List[pd.DataFrame] = []
+    buffered = 0
+    rows_read = 0
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        buffer.append(batch.to_pandas())
+        buffered += batch.num_rows
+        while buffered >= batch_size:
+            frame = pd.concat(buffer, ignore_index=True)
+            chunk, rest = frame.iloc[:batch_size], frame.iloc[batch_size:]
+            rows_read += len(chunk)
+            yield chunk, rows_read
+            buffer = [rest] if len(rest) else []
+            buffered = len(rest)
+
+    if buffered:
+        chunk = pd.concat(buffer, ignore_index=True)
+        rows_read += len(chunk)
+        yield chunk, rows_read
+
+
+def remove_session(upload_dir: str, file_id: str) -> None:
+    """Delete every session file (the staged CSV is handled by the caller)."""
+    for suffix in SESSION_SUFFIXES:
+        path = _path(upload_dir, file_id, suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def jobs_dir(upload_dir: str) -> str:
+    return os.path.join(upload_dir, JOBS_SUBDIR)
+
+
+def stage_for_job(upload_dir: str, file_id: str) -> Optional[str]:
+    """
+    Move a staged CSV and its session files into the jobs directory and
+    return that directory; None if the file is in neither place. Files that
+    are already there (a re-queued or resumed import) have their
+    modification time refreshed instead, restarting their retention.
+    """
+    target = jobs_dir(upload_dir)
+    os.makedirs(target, exist_ok=True)
+    for suffix in (".csv",) + SESSION_SUFFIXES:
+        source = _path(upload_dir, file_id, suffix)
+        staged = _path(target, file_id, suffix)
+        if os.path.exists(source):
+            os.replace(source, staged)
+        elif os.path.exists(staged):
+            os.utime(staged)
+    if not os.path.exists(_path(target, file_id, ".csv")):
+        return None
+    return target
+
+
+def describe_issues(counts: Dict[str, int], sampled: int) -> List[str]:
+    """Human-readable validation issues for the preview panel."""
+    return [
+        f"{count} of {sampled} sampled rows have {label}"
+        for label, count in counts.items()
+        if count
+    ]
@@ -6,11 +6,15 @@ for the visualization endpoints.
 """
 
 from typing import List, Dict, Any, Tuple
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 import statistics
 
 from app.db.models import Transaction
+from app.services.detectors.mirror_pairs import find_mirror_pairs
+
+# Max time between the two legs of a mirror transaction
+MIRROR_WINDOW = timedelta(hours=24)
 
 
 class CashflowAnalyzer:
@@ -177,34 +181,19 @@ class CashflowAnalyzer:
     @staticmethod
     def _detect_mirror_transactions(transactions: List[Transaction]) -> Dict[str, str]:
         """
-        Detect mirror transactions (same amount, opposite direction, within 24h).
+        Detect mirror transactions (equal amount to the cent, opposite
+        direction, less than MIRROR_WINDOW apart).
 
         Returns:
             Dictionary mapping transaction IDs to their mirror pair IDs
         """
         mirror_pairs = {}
-        sorted_txs = sorted(transactions, key=lambda x: x.date or datetime.min)
-
-        for i, tx1 in enumerate(sorted_txs):
-            if str(tx1.id) in mirror_pairs:
-                continue
-
-            amt1 = float(tx1.amount or 0)
-            date1 = tx1.date or datetime.min
-
-            # Look ahead for mirror (opposite amount, within 24h)
-            for tx2 in sorted_txs[i + 1 : i + 50]:  # Check next 50 transactions
-                amt2 = float(tx2.amount or 0)
-                date2 = tx2.date or datetime.min
-
-                # Check if amounts are opposite and within 1%
-                if abs(amt1 + amt2) < abs(amt1) * 0.01:
-                    # Check if within 24 hours
-                    time_diff = abs((date2 - date1).total_seconds())
-                    if time_diff < 86400:  # 24 hours
-                        mirror_pairs[str(tx1.id)] = str(tx2.id)
-                        mirror_pairs[str(tx2.id)] = str(tx1.id)
-                        break
+        for pair in find_mirror_pairs(
+            ((tx.id, tx.amount, tx.date) for tx in transactions),
+            MIRROR_WINDOW,
+        ):
+            mirror_pairs[str(pair.first_id)] = str(pair.second_id)
+            mirror_pairs[str(pair.second_id)] = str(pair.first_id)
 
         return mirror_pairs
 
@@ -0,0 +1,308 @@
+"""
+Ingestion Worker
+
+Runs queued ingestion jobs outside the HTTP request:
+- Pulls jobs from the shared job queue with bounded concurrency
+- Gives every job its own database session
+- Queues incremental reconciliation of the rows an import added, and
+  heuristic rule scoring of them
+- Runs batched mens rea analysis of a tenant or a list of subjects
+- Reports progress through the app.core.websocket emitters; a standalone
+  worker relays them to the API process over Redis
+- Acknowledges every job it finishes and requeues the unfinished jobs of
+  workers that died, so a crash never loses a job
+
+Run standalone with: python -m app.workers.ingestion_worker
+"""
+
+import asyncio
+import os
+from datetime import datetime
+import signal
+from typing import Any, Dict, Optional, Set
+from uuid import UUID
+
+import structlog
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.process_pool import cpu_pool
+from app.db.session import AsyncSessionLocal
+from app.services.ingestion import IngestionService
+from app.services.mens_rea_batch import MensReaBatchService
+from app.services.reconciliation import ReconciliationService
+from app.services.reconciliation_index import ReconciliationIndexService
+from app.services.rule_features import RuleFeatureService
+from app.services.rule_store import rule_store
+from app.services.job_queue import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_RUNNING,
+    HEARTBEAT_TTL_SECONDS,
+    Job,
+    JobQueue,
+    get_handler,
+    job_queue,
+    register_handler,
+)
+
+logger = structlog.get_logger()
+
+PROCESS_MAPPED_JOB = "ingestion.process_mapped"
+UPLOAD_JOB = "ingestion.upload"
+RECONCILE_JOB = "reconciliation.incremental"
+RULE_SCORING_JOB = "heuristics.score_import"
+MENS_REA_BATCH_JOB = "mens_rea.batch"
+
+# Seconds to block waiting for a job before re-checking for shutdown
+POLL_TIMEOUT = 5
+# Seconds between liveness marks, several per heartbeat lifetime
+HEARTBEAT_INTERVAL = HEARTBEAT_TTL_SECONDS / 4
+
+
+async def _queue_reconciliation(subject_id: str, result: Dict[str, Any]) -> None:
+    """Match the rows just imported once the import has committed."""
+    if settings.RECONCILIATION_INCREMENTAL_ENABLED and result.get("inserted"):
+        await job_queue.enqueue(RECONCILE_JOB, {"subject_id": subject_id})
+
+
+async def _queue_rule_scoring(subject_id: str, result: Dict[str, Any]) -> None:
+    """Score the rows an import created, found by their shared created_at."""
+    if settings.HEURISTIC_SCORING_ON_IMPORT and result.get("inserted"):
+        await job_queue.enqueue(
+            RULE_SCORING_JOB,
+            {"subject_id": subject_id, "imported_at": result["imported_at"]},
+        )
+
+
+@register_handler(PROCESS_MAPPED_JOB)
+async def run_process_mapped(db: AsyncSession, payload: Dict[str, Any]) -> Dict:
+    """Import a staged upload with a confirmed column mapping."""
+    result = await IngestionService.process_mapped_file(
+        db=db,
+        file_id=payload["file_id"],
+        mapping=payload["mapping"],
+        subject_id=UUID(payload["subject_id"]),
+        bank_name=payload["bank_name"],
+        upload_dir=payload["upload_dir"],
+        user_id=payload.get("user_id"),
+        batch_size=payload.get("batch_size"),
+    )
+    # Distinguish the resumable IngestionJob from this queue job
+    result["ingestion_job_id"] = str(result.pop("job_id"))
+    await _queue_reconciliation(payload["subject_id"], result)
+    await _queue_rule_scoring(payload["subject_id"], result)
+    return result
+
+
+@register_handler(UPLOAD_JOB)
+async def run_upload(db: AsyncSession, payload: Dict[str, Any]) -> Dict:
+    """Import a staged bank-format CSV; the staged file is always removed."""
+    from app.core.websocket import emit_processing_complete, emit_processing_error
+
+    file_path = payload["file_path"]
+    upload_id = payload["upload_id"]
+    user_id = payload.get("user_id")
+    try:
+        with open(file_path, "rb") as file_obj:
+            result = await IngestionService.process_csv_stream(
+                db=db,
+                file_obj=file_obj,
+                bank_name=payload["bank_name"],
+                subject_id=UUID(payload["subject_id"]),
+                filename=payload["filename"],
+                total_bytes=os.path.getsize(file_path),
+                upload_id=upload_id,
+                user_id=user_id,
+            )
+    except Exception as e:
+        if user_id:
+            await emit_processing_error(
+                upload_id, str(getattr(e, "detail", e)), user_id
+            )
+        raise
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    if user_id:
+        await emit_processing_complete(upload_id, user_id)
+    await _queue_reconciliation(payload["subject_id"], result)
+    await _queue_rule_scoring(payload["subject_id"], result)
+    return result
+
+
+@register_handler(RECONCILE_JOB)
+async def run_incremental_reconciliation(
+    db: AsyncSession, payload: Dict[str, Any]
+) -> Dict:
+    """Match pending rows of the subject's tenant against its open pool."""
+    tenant_id = await ReconciliationIndexService.tenant_of(
+        db, UUID(payload["subject_id"])
+    )
+    return await ReconciliationService.reconcile_pending(db, tenant_id)
+
+
+@register_handler(RULE_SCORING_JOB)
+async def run_rule_scoring(db: AsyncSession, payload: Dict[str, Any]) -> Dict:
+    """Evaluate the heuristic rules over one import's rows."""
+    engine = await rule_store.engine(db)
+    scored = await RuleFeatureService.score_subject(
+        db,
+        UUID(payload["subject_id"]),
+        imported_at=datetime.fromisoformat(payload["imported_at"]),
+        engine=engine,
+    )
+    return {
+        "rule_version": engine.version,
+        "flagged": len(scored),
+        "rules": {
+            result.rule_id: result.context["transaction_count"]
+            for result in RuleFeatureService.summarize(scored)
+        },
+    }
+
+
+@register_handler(MENS_REA_BATCH_JOB)
+async def run_mens_rea_batch(db: AsyncSession, payload: Dict[str, Any]) -> Dict:
+    """Analyze every subject of a tenant, or the listed subjects."""
+    tenant_id = payload.get("tenant_id")
+    subject_ids = payload.get("subject_ids")
+    return await MensReaBatchService.run(
+        db,
+        tenant_id=UUID(tenant_id) if tenant_id else None,
+        subject_ids=None if subject_ids is None else [UUID(s) for s in subject_ids],
+    )
+
+
+class IngestionWorker:
+    """Consumes the job queue, running at most `concurrency` jobs at once."""
+
+    def __init__(
+        self,
+        queue: JobQueue = job_queue,
+        concurrency: Optional[int] = None,
+        poll_timeout: float = POLL_TIMEOUT,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency or settings.INGESTION_WORKER_CONCURRENCY
+        self.poll_timeout = poll_timeout
+        self._stopping = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def stop(self):
+        """Stop taking new jobs; run() returns once running jobs finish."""
+        self._stopping.set()
+
+    async def _heartbeat(self):
+        """Mark this consumer alive until the worker stops."""
+        while True:
+            try:
+                await self.queue.heartbeat()
+            except Exception as e:
+                logger.error("Failed to send worker heartbeat", error=str(e))
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def run(self):
+        await self.queue.connect()
+        await self.queue.heartbeat()
+        await self.queue.requeue_stale()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        slots = asyncio.Semaphore(self.concurrency)
+        logger.info(
+            "Ingestion worker started",
+            backend=self.queue.backend_name,
+            concurrency=self.concurrency,
+        )
+
+        while not self._stopping.is_set():
+            # Only take a job off the queue when there is a free slot for it,
+            # so other workers can pick it up meanwhile
+            await slots.acquire()
+            try:
+                job = await self.queue.dequeue(timeout=self.poll_timeout)
+            except Exception as e:
+                slots.release()
+                logger.error("Failed to dequeue job", error=str(e))
+                await asyncio.sleep(self.poll_timeout)
+                continue
+
+            if job is None:
+                slots.release()
+                continue
+
+            task = asyncio.create_task(self.run_job(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        heartbeat.cancel()
+        logger.info("Ingestion worker stopped")
+
+    async def run_job(self, job: Job):
+        """Run one job, record its outcome and acknowledge it."""
+        try:
+            await self._run_job(job)
+        finally:
+            await self.queue.ack(job)
+
+    async def _run_job(self, job: Job):
+        handler = get_handler(job.kind)
+        if handler is None:
+            await self.queue.update(
+                job, status=JOB_FAILED, error=f"Unknown job kind '{job.kind}'"
+            )
+            return
+
+        await self.queue.update(job, status=JOB_RUNNING)
+        logger.info("Job started", job_id=job.id, kind=job.kind)
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await handler(db, job.payload)
+        except Exception as e:
+            # HTTPException carries its message in `detail`
+            error = str(getattr(e, "detail", e))
+            logger.error("Job failed", job_id=job.id, kind=job.kind, error=error)
+            await self.queue.update(job, status=JOB_FAILED, error=error)
+            return
+
+        await self.queue.update(job, status=JOB_COMPLETED, result=result)
+        logger.info("Job completed", job_id=job.id, kind=job.kind)
+
+
+async def main():
+    from app.core.logging import setup_logging
+    from app.core.websocket import manager
+    from app.services.cache_service import cache
+
+    setup_logging()
+    await job_queue.connect()
+    if job_queue.redis_client is None:
+        # An in-process queue here would never see the API's jobs
+        logger.error("Standalone worker needs the Redis job queue; exiting")
+        await job_queue.close()
+        raise SystemExit(1)
+
+    await cache.connect()
+    # This process has no WebSocket clients; hand events to the API
+    manager.use_redis_relay(job_queue.redis_client)
+    rule_listener = asyncio.create_task(rule_store.listen(job_queue.redis_client))
+
+    worker = IngestionWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        rule_listener.cancel()
+        cpu_pool.shutdown()
+        await job_queue.close()
+        await cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
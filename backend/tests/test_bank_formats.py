@@ -0,0 +1,144 @@
+"""
+Unit tests for the bank format registry and columnar statement mapping.
+"""
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from app.services.bank_formats import (
+    SIGN_DEBIT_CREDIT,
+    BankFormatSpec,
+    bank_format_registry,
+    read_header_row,
+)
+from app.services.columnar_mapping import clean_amounts, to_cents
+
+
+def _parse(spec_name, df, row_offset=0):
+    spec = bank_format_registry.get(spec_name)
+    return bank_format_registry.compile(spec, df.columns).parse(df, row_offset)
+
+
+class TestCompiledParsers:
+    """Tests for compiled bank format parsers."""
+
+    def test_chase_coalesces_date_columns(self):
+        """Posting Date falls back to Date per row."""
+        df = pd.DataFrame(
+            {
+                "Posting Date": ["01/05/2024", ""],
+                "Date": ["", "01/06/2024"],
+                "Description": ["Coffee", "Rent"],
+                "Amount": ["-4.50", "-1200.00"],
+            }
+        )
+        result = _parse("Chase", df)
+
+        records = result.to_records()
+        assert len(records) == 2
+        assert records[0]["date"] == datetime(2024, 1, 5)
+        assert records[1]["date"] == datetime(2024, 1, 6)
+        assert records[1]["amount"] == Decimal("-1200.00")
+        assert len(result.rejected) == 0
+
+    def test_generic_accepts_iso_and_us_dates(self):
+        """Generic format tries ISO first, then MM/DD/YYYY."""
+        df = pd.DataFrame(
+            {"date": ["2024-02-01", "02/03/2024"], "amount": ["10", "20"]}
+        )
+        result = _parse("generic", df)
+
+        dates = [r["date"] for r in result.to_records()]
+        assert dates == [datetime(2024, 2, 1), datetime(2024, 2, 3)]
+
+    def test_debit_credit_sign_convention(self):
+        """Debit/credit columns become one signed amount."""
+        df = pd.DataFrame(
+            {
+                "Transaction Date": ["2024-03-01", "2024-03-02"],
+                "Description": ["Salary", "Groceries"],
+                "Debit": ["", "55.10"],
+                "Credit": ["2,000.00", ""],
+            }
+        )
+        amounts = [r["amount"] for r in _parse("capital one", df).to_records()]
+        assert amounts == [Decimal("2000.00"), Decimal("-55.10")]
+
+    def test_rejected_rows_report_reasons(self):
+        """Bad rows are reported with their data row number and reason."""
+        df = pd.DataFrame(
+            {
+                "date": ["2024-01-01", "", "not a date", "2024-01-04"],
+                "amount": ["1.00", "2.00", "3.00", "abc"],
+            }
+        )
+        result = _parse("generic", df, row_offset=10)
+
+        assert len(result.frame) == 1
+        assert result.rejected_report() == [
+            {"row": 12, "reason": "Missing date"},
+            {"row": 13, "reason": "Invalid date"},
+            {"row": 14, "reason": "Invalid amount"},
+        ]
+
+    def test_clean_amounts(self):
+        """Currency symbols, separators and parenthesized negatives."""
+        cleaned = clean_amounts(pd.Series(["$1,234.50", "(12.00)", " 7 "]))
+        assert cleaned.tolist() == ["1234.50", "-12.00", "7"]
+
+
+    def test_cents_are_exact(self):
+        """No binary float on the way: 1.005 is 100.5 cents, rounded to even."""
+        text = pd.Series(["1.005", "1.015", "0.29", "-2.5", ".5", "4.", "0.0051"])
+
+        assert to_cents(text).tolist() == [100, 102, 29, -250, 50, 400, 1]
+
+    def test_non_finite_amounts_are_rejected(self):
+        df = pd.DataFrame(
+            {
+                "date": ["2024-01-01"] * 4,
+                "amount": ["inf", "-Infinity", "nan", "1e3"],
+            }
+        )
+
+        result = _parse("generic", df)
+
+        assert result.to_records() == []
+        assert {r["reason"] for r in result.rejected_report()} == {"Invalid amount"}
+
+class TestBankFormatRegistry:
+    """Tests for lookup and header auto-detection."""
+
+    def test_detects_chase_from_signature_columns(self):
+        headers = ["Details", "Posting Date", "Description", "Amount", "Type"]
+        assert bank_format_registry.detect(headers).name == "chase"
+
+    def test_plain_headers_stay_generic(self):
+        headers = ["date", "amount", "description"]
+        assert bank_format_registry.resolve("unknown bank", headers).name == "generic"
+
+    def test_compiled_parser_is_cached(self):
+        spec = bank_format_registry.get("chase")
+        headers = ("Posting Date", "Description", "Amount")
+        assert bank_format_registry.compile(spec, headers) is (
+            bank_format_registry.compile(spec, list(headers))
+        )
+
+    def test_debit_credit_spec_requires_both_sides(self):
+        with pytest.raises(ValueError):
+            BankFormatSpec(
+                name="broken",
+                date_columns=("Date",),
+                description_columns=(),
+                date_formats=("ISO8601",),
+                debit_columns=("Debit",),
+                sign_convention=SIGN_DEBIT_CREDIT,
+            )
+
+    def test_read_header_row_rewinds(self):
+        stream = io.BytesIO(b"\xef\xbb\xbfDate,Amount\n01/01/2024,5\n")
+        assert read_header_row(stream) == ["Date", "Amount"]
+        assert stream.tell() == 0
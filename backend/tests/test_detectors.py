@@ -0,0 +1,216 @@
+"""
+Unit tests for the mens rea pattern detectors.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.core.heuristic_rules import DEFAULT_HEURISTIC_RULES
+from app.services.detectors.mirror_pairs import find_mirror_pairs
+from app.services.detectors.mirroring import MirroringDetector
+from app.services.detectors.structuring import StructuringDetector
+from app.services.detectors.velocity import TurnoverScanner, VelocityDetector
+from app.services.heuristic_engine import HeuristicEngine
+
+
+def _deposits(*rows):
+    """(hours after the start, amount) pairs as transaction dicts."""
+    start = datetime(2024, 5, 1, 9)
+    return [
+        {
+            "id": f"tx{i}",
+            "amount": amount,
+            "date": (start + timedelta(hours=hours)).isoformat(),
+        }
+        for i, (hours, amount) in enumerate(rows)
+    ]
+
+
+class TestStructuringDetector:
+    """Rolling windows of near-threshold deposits."""
+
+    def test_single_near_threshold_deposit_is_not_structuring(self):
+        assert StructuringDetector().detect(_deposits((0, 9500.0))) == []
+
+    def test_burst_within_24h(self):
+        transactions = _deposits((0, 9500.0), (5, 9800.0), (30, 200.0))
+
+        indicators = StructuringDetector().detect(transactions)
+
+        assert len(indicators) == 1
+        evidence = indicators[0]["evidence"]
+        assert evidence["window"] == "24h"
+        assert evidence["transaction_ids"] == ["tx0", "tx1"]
+        assert evidence["total_amount"] == pytest.approx(19300.0)
+
+    def test_longer_window_reports_only_new_bursts(self):
+        # Two deposits in one day, a third two days later
+        transactions = _deposits((0, 9100.0), (2, 9200.0), (50, 9300.0))
+
+        indicators = StructuringDetector().detect(transactions)
+
+        assert [i["evidence"]["window"] for i in indicators] == ["24h", "72h"]
+        assert indicators[1]["evidence"]["deposit_count"] == 3
+        assert indicators[1]["confidence"] > indicators[0]["confidence"]
+
+    def test_input_order_does_not_matter(self):
+        transactions = _deposits((0, 9100.0), (2, 9200.0), (50, 9300.0))
+        detector = StructuringDetector()
+
+        assert detector.detect(transactions[::-1]) == detector.detect(transactions)
+
+    def test_window_features_match_brute_force(self):
+        rows = [(hours, 9000.0 + hours) for hours in (0, 3, 20, 26, 70, 71, 200)]
+        rows += [(10, 50.0), (72, -9500.0)]
+        transactions = _deposits(*rows)
+        detector = StructuringDetector()
+
+        features = detector.window_features(transactions)
+
+        for tx, feature in zip(transactions, features):
+            end = datetime.fromisoformat(tx["date"])
+            for label, window in detector.WINDOWS.items():
+                near = [
+                    other["amount"]
+                    for other in transactions
+                    if 9000 <= other["amount"] < 10000
+                    and end - window < datetime.fromisoformat(other["date"]) <= end
+                ]
+                assert feature[f"count_{label}"] == len(near)
+                assert feature[f"sum_{label}"] == pytest.approx(sum(near))
+
+    def test_features_feed_structuring_rule(self):
+        transactions = _deposits((0, 9100.0), (1, 9200.0), (2, 9300.0))
+        features = StructuringDetector().window_features(transactions)
+        engine = HeuristicEngine(
+            [rule for rule in DEFAULT_HEURISTIC_RULES if rule.id == "RULE_001"]
+        )
+
+        triggered = [
+            engine.evaluate_transaction({**tx, **feature})
+            for tx, feature in zip(transactions, features)
+        ]
+
+        # count_24h > 2 only holds once the third deposit arrives
+        assert [bool(results) for results in triggered] == [False, False, True]
+
+
+class TestVelocityDetector:
+    """FIFO matching of outflows against earlier inflows."""
+
+    def test_outflow_consumes_oldest_inflows_first(self):
+        transactions = _deposits((0, 5000.0), (1, 3000.0), (6, -7900.0))
+
+        indicators = VelocityDetector().detect(transactions)
+
+        pass_through = [i for i in indicators if i["type"] == "rapid_pass_through"]
+        assert len(pass_through) == 1
+        evidence = pass_through[0]["evidence"]
+        assert evidence["inflow_ids"] == ["tx0", "tx1"]
+        assert evidence["pass_through_amount"] == pytest.approx(7900.0)
+        assert evidence["max_hold_hours"] == pytest.approx(6.0)
+
+    def test_slow_turnover_is_not_pass_through(self):
+        transactions = _deposits((0, 5000.0), (24 * 10, -4000.0))
+
+        assert VelocityDetector().detect(transactions) == []
+
+    def test_profile_feeds_layering_rule(self):
+        transactions = _deposits((0, 5000.0), (2, -2500.0), (4, -2400.0))
+        profile = VelocityDetector().profile(transactions)
+
+        assert profile["inflow_outflow_ratio"] == pytest.approx(0.98)
+        # 2500 held 2h and 2400 held 4h
+        assert profile["turnover_time_hours"] == pytest.approx(
+            (2500 * 2 + 2400 * 4) / 4900
+        )
+        engine = HeuristicEngine(
+            [rule for rule in DEFAULT_HEURISTIC_RULES if rule.id == "RULE_006"]
+        )
+        assert engine.evaluate_transaction(profile)
+
+    def test_layering_profile_indicator(self):
+        transactions = _deposits((0, 5000.0), (2, -2500.0), (4, -2400.0))
+
+        types = [i["type"] for i in VelocityDetector().detect(transactions)]
+
+        assert "high_velocity_turnover" in types
+
+    def test_fifo_is_bounded(self):
+        scanner = TurnoverScanner(
+            rapid_window=timedelta(hours=24),
+            min_pass_through=0.0,
+            max_hold=timedelta(days=1),
+            max_pending=3,
+        )
+        start = datetime(2024, 1, 1)
+        for minute in range(1000):
+            scanner.feed(start + timedelta(minutes=minute), {"amount": 1.0})
+
+        assert len(scanner._pending) == 3
+        assert scanner.stats.expired_inflow == pytest.approx(997.0)
+
+    def test_unsorted_stream_is_rejected(self):
+        scanner = VelocityDetector().scanner()
+        scanner.feed(datetime(2024, 1, 2), {"amount": 1.0})
+
+        with pytest.raises(ValueError):
+            scanner.feed(datetime(2024, 1, 1), {"amount": -1.0})
+
+
+class TestMirroringDetector:
+    """Opposite-sign pairs of equal amount inside the window."""
+
+    def test_same_direction_repeats_are_not_mirrors(self):
+        transactions = _deposits((0, 5000.0), (1, 5000.0), (2, 5000.0))
+
+        assert MirroringDetector().detect(transactions) == []
+
+    def test_pair_outside_window_is_not_a_mirror(self):
+        transactions = _deposits((0, 5000.0), (30, -5000.0))
+
+        assert MirroringDetector().detect(transactions) == []
+
+    def test_opposite_pair_inside_window(self):
+        transactions = _deposits((0, 5000.0), (3, 200.0), (5, -5000.0))
+
+        indicators = MirroringDetector().detect(transactions)
+
+        assert len(indicators) == 1
+        evidence = indicators[0]["evidence"]
+        assert evidence["amount"] == pytest.approx(5000.0)
+        assert evidence["pairs"] == [
+            {"transaction_ids": ["tx0", "tx2"], "hours_apart": pytest.approx(5.0)}
+        ]
+
+    def test_each_leg_pairs_with_oldest_open_opposite(self):
+        # Both credits are open when the debits arrive, oldest goes first
+        transactions = _deposits((0, 100.0), (1, 100.0), (2, -100.0), (20, -100.0))
+
+        pairs = find_mirror_pairs(
+            (
+                (tx["id"], tx["amount"], datetime.fromisoformat(tx["date"]))
+                for tx in transactions
+            ),
+            timedelta(hours=24),
+        )
+
+        assert [(p.first_id, p.second_id) for p in pairs] == [
+            ("tx0", "tx2"),
+            ("tx1", "tx3"),
+        ]
+
+    def test_float_and_decimal_amounts_share_a_bucket(self):
+        start = datetime(2024, 1, 1)
+
+        pairs = find_mirror_pairs(
+            [
+                ("a", 0.1 + 0.2, start),
+                ("b", Decimal("-0.30"), start + timedelta(hours=1)),
+            ],
+            timedelta(hours=24),
+        )
+
+        assert len(pairs) == 1
+        assert pairs[0].amount_cents == 30
@@ -0,0 +1,217 @@
+"""
+Tests for incremental reconciliation over the persistent blocking index.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import (
+    Match,
+    ReconciliationBlock,
+    Subject,
+    Tenant,
+    TransactionSourceType,
+)
+from app.services import reconciliation_index
+from app.services.ingestion import IngestionService
+from app.services.reconciliation import ReconciliationService
+from app.services.reconciliation_index import ReconciliationIndexService
+
+
+async def _subject(db: AsyncSession, tenant_id=None) -> Subject:
+    subject = Subject(id=uuid.uuid4(), encrypted_pii={}, tenant_id=tenant_id)
+    db.add(subject)
+    await db.commit()
+    return subject
+
+
+async def _ingest(db: AsyncSession, subject: Subject, source_type, rows, month=3):
+    return await IngestionService.create_transactions_batch(
+        db,
+        [
+            {
+                "amount": amount,
+                "date": datetime(2024, month, day),
+                "description": description,
+                "source_type": source_type,
+            }
+            for amount, day, description in rows
+        ],
+        subject_id=subject.id,
+        bank_name="chase",
+    )
+
+
+async def _blocks(db: AsyncSession):
+    result = await db.execute(select(ReconciliationBlock))
+    return {block.transaction_id: block for block in result.scalars().all()}
+
+
+class TestIncrementalReconciliation:
+    """New rows are matched against the open pool only."""
+
+    @pytest.mark.asyncio
+    async def test_ingested_rows_enter_pool_as_pending(self, db: AsyncSession):
+        subject = await _subject(db)
+        created = await _ingest(
+            db, subject, TransactionSourceType.EXTERNAL, [("-42.50", 5, "Rent")]
+        )
+
+        block = (await _blocks(db))[created[0].id]
+        assert block.pending
+        assert block.amount_unit == -43
+        assert block.date_ordinal == datetime(2024, 3, 5).toordinal()
+
+    @pytest.mark.asyncio
+    async def test_new_rows_match_open_pool(self, db: AsyncSession):
+        subject = await _subject(db)
+        externals = await _ingest(
+            db,
+            subject,
+            TransactionSourceType.EXTERNAL,
+            [("100.00", 1, "Invoice 1"), ("250.00", 2, "Invoice 2")],
+        )
+        first = await ReconciliationService.reconcile_pending(db, None)
+        assert first["matched"] == 0 and first["reconciled"] == 2
+
+        internals = await _ingest(
+            db, subject, TransactionSourceType.INTERNAL, [("250.00", 3, "Invoice 2")]
+        )
+        second = await ReconciliationService.reconcile_pending(db, None)
+
+        # Only the new row was reconciled, and it found its counterpart
+        assert second["matched"] == 1 and second["reconciled"] == 1
+        match = (await db.execute(select(Match))).scalars().one()
+        assert match.internal_transaction_id == internals[0].id
+        assert match.external_transaction_id == externals[1].id
+
+        blocks = await _blocks(db)
+        assert set(blocks) == {externals[0].id}
+        assert not blocks[externals[0].id].pending
+
+    @pytest.mark.asyncio
+    async def test_new_externals_take_the_external_side(self, db: AsyncSession):
+        subject = await _subject(db)
+        internals = await _ingest(
+            db, subject, TransactionSourceType.INTERNAL, [("75.00", 4, "Payroll")]
+        )
+        await ReconciliationService.reconcile_pending(db, None)
+        externals = await _ingest(
+            db, subject, TransactionSourceType.EXTERNAL, [("75.00", 4, "Payroll")]
+        )
+
+        result = await ReconciliationService.reconcile_pending(db, None)
+
+        assert result["matched"] == 1
+        match = (await db.execute(select(Match))).scalars().one()
+        assert match.internal_transaction_id == internals[0].id
+        assert match.external_transaction_id == externals[0].id
+
+    @pytest.mark.asyncio
+    async def test_other_tenants_are_not_candidates(self, db: AsyncSession):
+        tenant_a, tenant_b = Tenant(name="A"), Tenant(name="B")
+        db.add_all([tenant_a, tenant_b])
+        await db.commit()
+        subject_a = await _subject(db, tenant_a.id)
+        subject_b = await _subject(db, tenant_b.id)
+        await _ingest(
+            db, subject_a, TransactionSourceType.EXTERNAL, [("10.00", 1, "Fee")]
+        )
+        await _ingest(
+            db, subject_b, TransactionSourceType.INTERNAL, [("10.00", 1, "Fee")]
+        )
+
+        result = await ReconciliationService.reconcile_pending(db, tenant_b.id)
+
+        assert result["matched"] == 0 and result["reconciled"] == 1
+        blocks = await _blocks(db)
+        # Tenant A's row is still pending for its own run
+        assert sum(block.pending for block in blocks.values()) == 1
+
+    @pytest.mark.asyncio
+    async def test_candidates_stay_near_each_new_row(self, db: AsyncSession):
+        subject = await _subject(db)
+        externals = await _ingest(
+            db,
+            subject,
+            TransactionSourceType.EXTERNAL,
+            [("100.00", 1, "A"), ("100.00", 15, "B"), ("100.00", 28, "C")],
+        )
+        internals = await _ingest(
+            db,
+            subject,
+            TransactionSourceType.INTERNAL,
+            [("100.00", 2, "A"), ("100.40", 27, "C"), ("500.00", 15, "D")],
+        )
+
+        filters = ReconciliationIndexService.candidate_filters(
+            None, TransactionSourceType.EXTERNAL, internals, 3, True
+        )
+        result = await db.execute(select(ReconciliationBlock).where(*filters))
+
+        # The mid-month external lies between the new rows' dates, but
+        # outside every one of their windows
+        found = {block.transaction_id for block in result.scalars().all()}
+        assert found == {externals[0].id, externals[2].id}
+
+    @pytest.mark.asyncio
+    async def test_probe_chunks_find_the_same_matches(
+        self, db: AsyncSession, monkeypatch
+    ):
+        monkeypatch.setattr(reconciliation_index, "PROBE_CHUNK_SIZE", 1)
+        subject = await _subject(db)
+        externals = await _ingest(
+            db,
+            subject,
+            TransactionSourceType.EXTERNAL,
+            [("20.00", 3, "Gym"), ("20.00", 5, "Gym"), ("61.00", 9, "Books")],
+        )
+        await ReconciliationService.reconcile_pending(db, None)
+        await _ingest(
+            db,
+            subject,
+            TransactionSourceType.INTERNAL,
+            [("20.00", 4, "Gym"), ("61.00", 9, "Books"), ("20.00", 4, "Gym")],
+        )
+
+        result = await ReconciliationService.reconcile_pending(db, None)
+
+        assert result["matched"] == 3
+        matched = (await db.execute(select(Match))).scalars().all()
+        assert {m.external_transaction_id for m in matched} == {
+            tx.id for tx in externals
+        }
+
+    @pytest.mark.asyncio
+    async def test_undone_match_keeps_rows_matched_elsewhere(self, db: AsyncSession):
+        subject = await _subject(db)
+        internals = await _ingest(
+            db,
+            subject,
+            TransactionSourceType.INTERNAL,
+            [("75.00", 4, "Fee"), ("75.00", 4, "Fee")],
+        )
+        (external,) = await _ingest(
+            db, subject, TransactionSourceType.EXTERNAL, [("75.00", 4, "Fee")]
+        )
+        undone, kept = (
+            Match(internal_transaction_id=tx.id, external_transaction_id=external.id)
+            for tx in internals
+        )
+        db.add_all([undone, kept])
+        await ReconciliationIndexService.remove(
+            db, [internals[0].id, internals[1].id, external.id]
+        )
+        await db.commit()
+
+        await db.delete(undone)
+        await ReconciliationIndexService.restore(db, [internals[0], external])
+        await db.commit()
+
+        # The external is still matched to the second internal
+        blocks = await _blocks(db)
+        assert set(blocks) == {internals[0].id}
+        assert not blocks[internals[0].id].pending
@@ -0,0 +1,235 @@
+"""
+Tests for ingestion jobs: file and row hashing, mapping of raw chunks, and
+resuming, repeating and claiming mapped imports.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.db.models import IngestionJob, ProcessingStatus, Subject, Transaction
+from app.services.ingestion import IngestionService
+from app.services.ingestion_jobs import (
+    IngestionJobService,
+    RowHasher,
+    file_sha256,
+    natural_key,
+)
+from app.services.reconciliation_index import ReconciliationIndexService
+
+FILE_ID = "9a3c2f5e-51b4-4d8e-9f1a-6b7c8d9e0f12"
+MAPPING = {"date": "When", "amount": "Value", "description": "Memo"}
+# Five rows, two of them identical, in batches of two
+STATEMENT = (
+    "When,Value,Memo\n"
+    "2024-01-05,4.50,Coffee\n"
+    "2024-01-05,4.50,Coffee\n"
+    "2024-01-06,-1200.00,Rent\n"
+    "2024-01-07,2500.00,Salary\n"
+    "2024-01-08,12.30,Lunch\n"
+)
+
+
+def _row(description="Coffee", amount="4.50", day=5):
+    return {
+        "date": datetime(2024, 1, day),
+        "amount": Decimal(amount),
+        "description": description,
+    }
+
+
+class TestRowHasher:
+    """Tests for natural-key row hashes."""
+
+    def test_same_statement_hashes_identically(self):
+        """Re-importing a file reproduces every hash."""
+        first = [_row(), _row("Rent", "-1200.00", 6)]
+        second = [_row(), _row("Rent", "-1200.00", 6)]
+        RowHasher("chase").assign(first)
+        RowHasher("chase").assign(second)
+        assert [r["row_hash"] for r in first] == [r["row_hash"] for r in second]
+
+    def test_repeated_rows_in_one_file_stay_distinct(self):
+        """Two identical purchases on the same day are both kept."""
+        rows = [_row(), _row()]
+        RowHasher().assign(rows)
+        assert rows[0]["row_hash"] != rows[1]["row_hash"]
+
+    def test_occurrences_carry_across_batches(self):
+        """Hashing in batches matches hashing the whole file at once."""
+        whole = [_row(), _row(), _row()]
+        RowHasher().assign(whole)
+
+        batched = [_row(), _row(), _row()]
+        hasher = RowHasher()
+        hasher.assign(batched[:2])
+        hasher.assign(batched[2:])
+        assert [r["row_hash"] for r in whole] == [r["row_hash"] for r in batched]
+
+    def test_cosmetic_differences_are_ignored(self):
+        """Case, whitespace and amount precision do not change the key."""
+        assert natural_key(_row("  COFFEE   shop ", "4.5")) == natural_key(
+            _row("coffee shop", "4.50")
+        )
+
+    def test_account_is_part_of_the_key(self):
+        row = _row()
+        assert natural_key(row, "chase") != natural_key(row, "wells_fargo")
+        row["account_number"] = "1234"
+        assert natural_key(row, "chase") == natural_key(row, "wells_fargo")
+
+
+class TestFileSha256:
+    """Tests for the file content hash."""
+
+    def test_matches_hashlib(self, tmp_path):
+        path = tmp_path / "statement.csv"
+        content = b"date,amount\n2024-01-01,5\n" * 1000
+        path.write_bytes(content)
+        assert file_sha256(str(path)) == hashlib.sha256(content).hexdigest()
+
+
+class TestMappedChunks:
+    """Tests for applying a confirmed column mapping to a raw chunk."""
+
+    def test_non_finite_amounts_are_dropped(self):
+        chunk = pd.DataFrame(
+            {
+                "When": ["2024-01-05"] * 5,
+                "Value": ["12.30", "inf", "NaN", "-infinity", "1e3"],
+            }
+        )
+
+        records, dropped = IngestionService._clean_mapped_chunk(
+            chunk, {"date": "When", "amount": "Value"}
+        )
+
+        assert [r["amount"] for r in records] == [Decimal("12.30")]
+        assert dropped == 4
+
+
+async def _import(db, subject_id, upload_dir, file_id=FILE_ID):
+    (upload_dir / f"{file_id}.csv").write_text(STATEMENT)
+    return await IngestionService.process_mapped_file(
+        db=db,
+        file_id=file_id,
+        mapping=MAPPING,
+        subject_id=subject_id,
+        bank_name="chase",
+        upload_dir=str(upload_dir),
+        batch_size=2,
+    )
+
+
+async def _row_hashes(db, subject_id):
+    result = await db.execute(
+        select(Transaction.row_hash).where(Transaction.subject_id == subject_id)
+    )
+    return result.scalars().all()
+
+
+class TestResumableImport:
+    """Mapped imports checkpoint per batch, resume and never repeat rows."""
+
+    @pytest.fixture
+    async def subject_id(self, db):
+        subject = Subject(id=uuid.uuid4(), encrypted_pii={})
+        db.add(subject)
+        await db.commit()
+        return subject.id
+
+    @pytest.mark.asyncio
+    async def test_failed_import_resumes_after_last_batch(
+        self, db, subject_id, tmp_path, monkeypatch
+    ):
+        add_transactions = ReconciliationIndexService.add_transactions
+        calls = []
+
+        async def fail_second_batch(session, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError("database went away")
+            await add_transactions(session, rows)
+
+        monkeypatch.setattr(
+            ReconciliationIndexService, "add_transactions", fail_second_batch
+        )
+        with pytest.raises(HTTPException):
+            await _import(db, subject_id, tmp_path)
+
+        job = (await db.execute(select(IngestionJob))).scalar_one()
+        assert job.status == ProcessingStatus.FAILED
+        assert job.last_committed_batch == 0
+        assert len(await _row_hashes(db, subject_id)) == 2
+
+        monkeypatch.setattr(
+            ReconciliationIndexService, "add_transactions", add_transactions
+        )
+        result = await _import(db, subject_id, tmp_path)
+
+        hashes = await _row_hashes(db, subject_id)
+        assert result["job_id"] == job.id
+        assert result["inserted"] == 3
+        assert len(hashes) == len(set(hashes)) == 5
+        await db.refresh(job)
+        assert job.status == ProcessingStatus.COMPLETED
+        assert job.rows_inserted == 5
+
+    @pytest.mark.asyncio
+    async def test_completed_import_is_a_no_op(self, db, subject_id, tmp_path):
+        first = await _import(db, subject_id, tmp_path)
+        # The same content under another upload name is the same job
+        other_id = str(uuid.uuid4())
+        again = await _import(db, subject_id, tmp_path, file_id=other_id)
+
+        assert first["inserted"] == 5
+        assert again["job_id"] == first["job_id"]
+        assert again["already_imported"] is True
+        assert again["inserted"] == 0
+        assert len(await _row_hashes(db, subject_id)) == 5
+        assert not (tmp_path / f"{other_id}.csv").exists()
+
+    @pytest.mark.asyncio
+    async def test_another_mapping_is_another_job(self, db, subject_id):
+        async def start(mapping):
+            job = await IngestionJobService.start(
+                db, subject_id, FILE_ID, "sha", "chase", mapping, 2
+            )
+            await IngestionJobService.fail(db, job.id, "stopped")
+            return job.id
+
+        first = await start(MAPPING)
+        other = await start({**MAPPING, "description": "When"})
+        again = await start(MAPPING)
+
+        assert other != first
+        assert again == first
+        count = await db.scalar(select(func.count()).select_from(IngestionJob))
+        assert count == 2
+
+    @pytest.mark.asyncio
+    async def test_running_job_is_not_claimed_twice(self, db, subject_id):
+        job = await IngestionJobService.start(
+            db, subject_id, FILE_ID, "sha", "chase", MAPPING, 2
+        )
+
+        # The first run is still working on it
+        with pytest.raises(HTTPException) as error:
+            await IngestionJobService.start(
+                db, subject_id, FILE_ID, "sha", "chase", MAPPING, 2
+            )
+        assert error.value.status_code == 409
+
+        # A run that stopped checkpointing long ago has crashed
+        job.updated_at = datetime.utcnow() - timedelta(days=1)
+        await db.commit()
+        resumed = await IngestionJobService.start(
+            db, subject_id, FILE_ID, "sha", "chase", MAPPING, 2
+        )
+        assert resumed.id == job.id
+        assert resumed.status == ProcessingStatus.PROCESSING
@@ -0,0 +1,204 @@
+"""
+Tests for the streamed CSV import and the pipelined mapped import.
+"""
+import io
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+import app.core.websocket as websocket
+from app.core.config import settings
+from app.db.models import Event, IngestionJob, Subject, Transaction
+from app.services.bulk_loader import BulkLoader
+from app.services.ingestion import IngestionService
+
+FILE_ID = "2f6d8b1c-0a4e-4c3b-8e7d-5a9b1c2d3e4f"
+MAPPING = {"date": "Date", "amount": "Amount", "description": "Memo"}
+
+
+def _statement(rows: int) -> str:
+    lines = ["Date,Amount,Memo"]
+    lines += [f"2024-01-{1 + i % 28:02d},{10 + i}.25,Row {i}" for i in range(rows)]
+    return "\n".join(lines) + "\n"
+
+
+async def _count(db, model, subject_id=None):
+    query = select(func.count()).select_from(model)
+    if subject_id is not None:
+        query = query.where(model.subject_id == subject_id)
+    return await db.scalar(query)
+
+
+@pytest.fixture
+async def subject_id(db):
+    subject = Subject(id=uuid.uuid4(), encrypted_pii={})
+    db.add(subject)
+    await db.commit()
+    return subject.id
+
+
+class TestCsvStream:
+    """CSV uploads parsed and loaded in bounded batches, committed once."""
+
+    @staticmethod
+    async def _stream(db, subject_id, text, batch_size=3, total_bytes=None):
+        return await IngestionService.process_csv_stream(
+            db=db,
+            file_obj=io.BytesIO(text.encode()),
+            bank_name="generic",
+            subject_id=subject_id,
+            filename="statement.csv",
+            total_bytes=total_bytes,
+            batch_size=batch_size,
+        )
+
+    @pytest.mark.asyncio
+    async def test_batches_span_chunk_boundaries(self, db, subject_id, monkeypatch):
+        insert_rows = IngestionService._insert_rows
+        batches = []
+
+        async def record(session, tx_rows, event_rows):
+            batches.append(len(tx_rows))
+            await insert_rows(session, tx_rows, event_rows)
+
+        monkeypatch.setattr(IngestionService, "_insert_rows", record)
+        text = "date,amount,description\n" + "".join(
+            f"2024-01-0{1 + i},{i}.50,Row {i}\n" for i in range(7)
+        )
+
+        result = await self._stream(db, subject_id, text)
+
+        assert batches == [3, 3, 1]
+        assert result["inserted"] == 7
+        assert await _count(db, Transaction, subject_id) == 7
+
+    @pytest.mark.asyncio
+    async def test_rejected_rows_are_reported_by_file_row(self, db, subject_id):
+        text = (
+            "date,amount,description\n"
+            "2024-01-01,1.00,Ok\n"
+            "2024-01-02,2.00,Ok\n"
+            "2024-01-03,3.00,Ok\n"
+            "not a date,4.00,Bad\n"
+            "2024-01-05,abc,Bad\n"
+        )
+
+        result = await self._stream(db, subject_id, text)
+
+        assert result["inserted"] == 3
+        assert result["skipped"] == 2
+        # Row numbers continue across chunks of three
+        assert result["rejected"] == [
+            {"row": 4, "reason": "Invalid date"},
+            {"row": 5, "reason": "Invalid amount"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_is_rejected(self, db, subject_id, monkeypatch):
+        text = "date,amount\n" + "2024-01-01,1.00\n" * 10
+        monkeypatch.setattr(settings, "MAX_STREAMING_UPLOAD_FILE_SIZE_MB", 0)
+
+        # Declared size over the limit, and a stream that turns out too big
+        for total_bytes in (len(text), None):
+            with pytest.raises(HTTPException) as error:
+                await self._stream(db, subject_id, text, total_bytes=total_bytes)
+            assert error.value.status_code == 413
+
+        assert await _count(db, Transaction, subject_id) == 0
+
+    @pytest.mark.asyncio
+    async def test_repeated_rows_in_one_file_are_kept(self, db, subject_id):
+        text = "date,amount,description\n" + "2024-01-01,4.50,Coffee\n" * 4
+
+        first = await self._stream(db, subject_id, text)
+        again = await self._stream(db, subject_id, text)
+
+        assert first["inserted"] == 4
+        assert again["inserted"] == 0
+        assert again["duplicates"] == 4
+        assert await _count(db, Transaction, subject_id) == 4
+
+
+class TestMappedPipeline:
+    """Parse and insert stages joined by a bounded queue."""
+
+    @pytest.fixture
+    def progress(self, monkeypatch):
+        """Progress percentages emitted to the uploader."""
+        sent = []
+
+        async def emit_upload_progress(upload_id, value, user_id):
+            sent.append(value)
+
+        async def ignore(*args):
+            pass
+
+        monkeypatch.setattr(websocket, "emit_upload_progress", emit_upload_progress)
+        for name in (
+            "emit_processing_stage",
+            "emit_processing_complete",
+            "emit_processing_error",
+        ):
+            monkeypatch.setattr(websocket, name, ignore)
+        return sent
+
+    async def _run(self, db, subject_id, upload_dir, rows=7, batch_size=3):
+        (upload_dir / f"{FILE_ID}.csv").write_text(_statement(rows))
+        return await IngestionService.process_mapped_file(
+            db=db,
+            file_id=FILE_ID,
+            mapping=MAPPING,
+            subject_id=subject_id,
+            bank_name="chase",
+            upload_dir=str(upload_dir),
+            user_id="analyst",
+            batch_size=batch_size,
+        )
+
+    @pytest.mark.asyncio
+    async def test_every_row_is_committed_once(
+        self, db, subject_id, tmp_path, progress
+    ):
+        result = await self._run(db, subject_id, tmp_path)
+
+        assert result["inserted"] == 7
+        assert result["skipped"] == 0
+        assert await _count(db, Transaction, subject_id) == 7
+        # One TRANSACTION_CREATED event per row
+        assert await _count(db, Event) == 7
+        assert progress == sorted(progress)
+        assert progress[-1] == 100
+        # The staged file is removed once the import completed
+        assert not (tmp_path / f"{FILE_ID}.csv").exists()
+
+    @pytest.mark.asyncio
+    async def test_failing_batch_leaves_no_partial_rows(
+        self, db, subject_id, tmp_path, progress, monkeypatch
+    ):
+        load = BulkLoader.load
+        batches = []
+
+        async def fail_after_second_load(session, transaction_rows, event_rows):
+            # The rows reach the database before the batch fails
+            await load(session, transaction_rows, event_rows)
+            batches.append(len(transaction_rows))
+            if len(batches) == 2:
+                raise RuntimeError("constraint violated")
+            return len(transaction_rows)
+
+        monkeypatch.setattr(BulkLoader, "load", fail_after_second_load)
+
+        with pytest.raises(HTTPException) as error:
+            await self._run(db, subject_id, tmp_path)
+
+        assert error.value.status_code == 500
+        # Only the first batch, committed with its checkpoint, is kept
+        assert await _count(db, Transaction, subject_id) == 3
+        assert await _count(db, Event) == 3
+        job = (await db.execute(select(IngestionJob))).scalar_one()
+        assert job.last_committed_batch == 0
+        assert job.rows_inserted == 3
+        # Kept so the import can be resumed
+        assert (tmp_path / f"{FILE_ID}.csv").exists()
@@ -0,0 +1,186 @@
+"""
+Tests for the background job queue and the ingestion worker loop,
+using the in-process queue backend, and for the Redis backend's
+acknowledgement and requeueing over a fake Redis.
+"""
+import asyncio
+import fnmatch
+
+import pytest
+
+from app.core.config import settings
+from app.services.job_queue import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    Job,
+    JobQueue,
+    RedisBackend,
+    register_handler,
+)
+from app.workers.ingestion_worker import IngestionWorker
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_QUEUE_BACKEND", "memory")
+    return JobQueue()
+
+
+async def _run_until_done(worker, queue, job_ids, timeout=5):
+    runner = asyncio.create_task(worker.run())
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                jobs = [await queue.get(job_id) for job_id in job_ids]
+                if all(j.status in (JOB_COMPLETED, JOB_FAILED) for j in jobs):
+                    return jobs
+                await asyncio.sleep(0.01)
+    finally:
+        worker.stop()
+        await runner
+
+
+class TestJobQueue:
+    """Tests for enqueueing and tracking jobs."""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_and_dequeue(self, queue):
+        job = await queue.enqueue("test.echo", {"value": 1})
+
+        assert job.status == JOB_QUEUED
+        assert queue.backend_name == "memory"
+        assert await queue.depth() == 1
+
+        dequeued = await queue.dequeue(timeout=1)
+        assert dequeued.id == job.id
+        assert dequeued.payload == {"value": 1}
+        assert await queue.dequeue(timeout=0) is None
+
+    @pytest.mark.asyncio
+    async def test_worker_records_result_and_errors(self, queue):
+        @register_handler("test.double")
+        async def double(db, payload):
+            return {"value": payload["value"] * 2}
+
+        ok = await queue.enqueue("test.double", {"value": 21})
+        unknown = await queue.enqueue("test.missing", {})
+
+        worker = IngestionWorker(queue=queue, concurrency=1, poll_timeout=0.05)
+        ok, unknown = await _run_until_done(worker, queue, [ok.id, unknown.id])
+
+        assert ok.status == JOB_COMPLETED
+        assert ok.result == {"value": 42}
+        assert unknown.status == JOB_FAILED
+        assert "Unknown job kind" in unknown.error
+
+    @pytest.mark.asyncio
+    async def test_worker_bounds_concurrency(self, queue):
+        running = 0
+        peak = 0
+
+        @register_handler("test.sleep")
+        async def sleep(db, payload):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return {}
+
+        jobs = [await queue.enqueue("test.sleep", {}) for _ in range(6)]
+        worker = IngestionWorker(queue=queue, concurrency=2, poll_timeout=0.05)
+        await _run_until_done(worker, queue, [j.id for j in jobs])
+
+        assert peak == 2
+
+
+class _FakeRedis:
+    """The list and key commands RedisBackend uses, on plain dicts."""
+
+    def __init__(self):
+        self.lists = {}
+        self.keys = {}
+
+    async def set(self, key, value, ex=None):
+        self.keys[key] = value
+
+    async def get(self, key):
+        return self.keys.get(key)
+
+    async def exists(self, key):
+        return int(key in self.keys)
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    async def lmove(self, first, second, src="LEFT", dest="RIGHT"):
+        source = self.lists.get(first)
+        if not source:
+            return None
+        value = source.pop(0 if src == "LEFT" else -1)
+        target = self.lists.setdefault(second, [])
+        target.insert(0 if dest == "LEFT" else len(target), value)
+        return value
+
+    async def blmove(self, first, second, timeout, src="LEFT", dest="RIGHT"):
+        return await self.lmove(first, second, src, dest)
+
+    async def lrem(self, key, count, value):
+        self.lists.get(key, []).remove(value)
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def scan_iter(self, match):
+        for key in list(self.lists):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+
+class TestRedisBackend:
+    """Dequeued jobs survive a worker crash."""
+
+    async def _enqueue(self, backend, *kinds):
+        jobs = [Job(kind=kind, payload={}) for kind in kinds]
+        for job in jobs:
+            await backend.save(job)
+            await backend.push(job.id)
+        return jobs
+
+    @pytest.mark.asyncio
+    async def test_jobs_of_a_dead_worker_are_requeued(self):
+        client = _FakeRedis()
+        crashed = RedisBackend(client, ttl=60)
+        first, second, third = await self._enqueue(crashed, "a", "b", "c")
+        assert await crashed.pop(0) == first.id
+        assert await crashed.pop(0) == second.id
+
+        restarted = RedisBackend(client, ttl=60)
+        await restarted.heartbeat()
+        requeued = await restarted.requeue_stale()
+
+        assert requeued == 2
+        assert await restarted.depth() == 3
+        assert [await restarted.pop(0) for _ in range(3)] == [
+            first.id,
+            second.id,
+            third.id,
+        ]
+
+    @pytest.mark.asyncio
+    async def test_live_and_acknowledged_jobs_stay_put(self):
+        client = _FakeRedis()
+        live = RedisBackend(client, ttl=60)
+        await live.heartbeat()
+        done, running = await self._enqueue(live, "a", "b")
+        await live.pop(0)
+        await live.ack(done.id)
+        await live.pop(0)
+
+        other = RedisBackend(client, ttl=60)
+        await other.heartbeat()
+
+        assert await other.requeue_stale() == 0
+        assert await other.depth() == 0
+        assert client.lists[live.processing_key] == [running.id]
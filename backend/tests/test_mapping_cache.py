@@ -0,0 +1,62 @@
+"""
+Tests for the column mapping cache lookups.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.models import ColumnMappingCache
+from app.services.cache_service import cache
+from app.services.mapping_cache import MappingCacheService, header_signature
+
+HEADERS = ["Posting Date", "Details", "Amount"]
+MAPPING = {"date": "posting date", "description": "details", "amount": "amount"}
+
+
+async def _cached(db: AsyncSession) -> None:
+    db.add(
+        ColumnMappingCache(
+            header_signature=header_signature(HEADERS),
+            headers=HEADERS,
+            mapping=MAPPING,
+            confirmed=True,
+            hit_count=2,
+        )
+    )
+    await db.commit()
+
+
+class TestMappingCacheLookup:
+    """Database lookups never disturb or break the caller."""
+
+    @pytest.mark.asyncio
+    async def test_hit_is_counted_without_committing_caller(
+        self, db: AsyncSession, monkeypatch
+    ):
+        await _cached(db)
+        committed = []
+        monkeypatch.setattr(db, "commit", lambda: committed.append(True))
+
+        mapping = await MappingCacheService.get(db, HEADERS)
+
+        assert mapping == {
+            "date": "Posting Date",
+            "description": "Details",
+            "amount": "Amount",
+        }
+        assert committed == []
+        result = await db.execute(
+            select(ColumnMappingCache.hit_count).execution_options(
+                populate_existing=True
+            )
+        )
+        assert result.scalar_one() == 3
+
+    @pytest.mark.asyncio
+    async def test_lookup_failure_is_a_miss(self, db: AsyncSession, monkeypatch):
+        async def broken(key):
+            raise ConnectionError("redis down")
+
+        monkeypatch.setattr(cache, "get", broken)
+
+        assert await MappingCacheService.get(db, HEADERS) is None
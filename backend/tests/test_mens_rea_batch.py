@@ -0,0 +1,217 @@
+"""
+Tests for batched mens rea analysis.
+"""
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.future import select
+
+from app.api import deps
+from app.core.process_pool import cpu_pool
+from app.db.models import (
+    AnalysisResult,
+    Indicator,
+    Subject,
+    Tenant,
+    Transaction,
+    User,
+)
+from app.main import app
+from app.services.job_queue import job_queue
+from app.services.mens_rea_batch import MensReaBatchService, _chunks
+
+START = datetime(2024, 5, 1, 9)
+
+
+@pytest.fixture(autouse=True)
+def inline_pool(monkeypatch):
+    """Run the CPU pool work in-process."""
+
+    async def run(task, func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(cpu_pool, "run", run)
+
+
+async def _subject(db, tenant_id=None, *rows):
+    """A subject with (hours after the start, amount) transactions."""
+    subject = Subject(id=uuid.uuid4(), encrypted_pii={}, tenant_id=tenant_id)
+    db.add(subject)
+    for hours, amount in rows:
+        db.add(
+            Transaction(
+                id=uuid.uuid4(),
+                subject_id=subject.id,
+                amount=Decimal(str(amount)),
+                date=START + timedelta(hours=hours),
+                source_bank="chase",
+            )
+        )
+    await db.commit()
+    return subject.id
+
+
+async def _results(db):
+    results = (await db.execute(select(AnalysisResult))).scalars().all()
+    indicators = (await db.execute(select(Indicator))).scalars().all()
+    by_result = {}
+    for indicator in indicators:
+        by_result.setdefault(indicator.analysis_result_id, []).append(indicator.type)
+    return {
+        result.subject_id: (result, sorted(by_result.get(result.id, [])))
+        for result in results
+    }
+
+
+class TestChunks:
+    """Splitting a page across pool workers."""
+
+    def test_subjects_are_never_split(self):
+        rows = [
+            SimpleNamespace(id=i, subject_id=s, amount=1, date=START)
+            for i, s in enumerate("aaabbbbbc")
+        ]
+
+        chunks = _chunks(rows, 4)
+
+        assert [chunk["subject_id"] for chunk in chunks] == [
+            ["a", "a", "a"],
+            ["b", "b", "b", "b", "b"],
+            ["c"],
+        ]
+
+
+class TestMensReaBatch:
+    """Paged analysis and bulk writes."""
+
+    @pytest.mark.asyncio
+    async def test_small_pages_give_one_result_per_subject(self, db):
+        tenant = Tenant(id=uuid.uuid4(), name="Acme")
+        db.add(tenant)
+        await db.commit()
+        structuring = await _subject(
+            db, tenant.id, (0, 9100), (1, 9200), (2, 9300), (3, 9400), (4, 50)
+        )
+        quiet = await _subject(db, tenant.id, (0, 120), (30, 80))
+        other = await _subject(db, None, (0, 9100), (1, 9200), (2, 9300))
+
+        summary = await MensReaBatchService.run(db, tenant_id=tenant.id, page_size=2)
+        results = await _results(db)
+
+        assert summary["subjects"] == 2
+        assert summary["transactions"] == 7
+        assert set(results) == {structuring, quiet}
+        assert other not in results
+        result, types = results[structuring]
+        assert "structuring_attempt" in types
+        assert "heuristic_rule" in types
+        assert result.risk_score > 0
+        assert result.rule_version == summary["rule_version"] == 0
+        assert results[quiet][0].risk_score == 0.0
+        assert results[quiet][1] == []
+
+    @pytest.mark.asyncio
+    async def test_page_size_does_not_change_results(self, db):
+        rows = [(i * 0.5, 9000 + i * 100) for i in range(6)] + [(10, -9500)]
+        first = await _subject(db, None, *rows)
+        second = await _subject(db, None, (0, 5000), (0.1, -5000))
+
+        await MensReaBatchService.run(db, subject_ids=[first, second], page_size=3)
+        paged = {s: types for s, (_, types) in (await _results(db)).items()}
+        await db.execute(Indicator.__table__.delete())
+        await db.execute(AnalysisResult.__table__.delete())
+        await db.commit()
+        await MensReaBatchService.run(db, subject_ids=[first, second])
+        whole = {s: types for s, (_, types) in (await _results(db)).items()}
+
+        assert paged == whole
+        assert "mirroring_suspected" in whole[second]
+
+    @pytest.mark.asyncio
+    async def test_listed_subject_without_transactions(self, db):
+        empty = await _subject(db, None)
+
+        summary = await MensReaBatchService.run(db, subject_ids=[empty])
+        results = await _results(db)
+
+        assert summary["subjects"] == 1
+        assert results[empty][0].status == "completed"
+        assert results[empty][1] == []
+
+    @pytest.mark.asyncio
+    async def test_needs_tenant_or_subjects(self, db):
+        with pytest.raises(ValueError):
+            await MensReaBatchService.run(db)
+
+
+class TestBatchEndpoint:
+    """Analysts only queue analyses of their own tenant."""
+
+    URL = "/api/v1/analysis/mens-rea/batch"
+
+    @pytest.fixture
+    def enqueued(self, monkeypatch):
+        payloads = []
+
+        async def enqueue(kind, payload):
+            payloads.append(payload)
+            return SimpleNamespace(id="job-1", status="queued")
+
+        monkeypatch.setattr(job_queue, "enqueue", enqueue)
+        return payloads
+
+    async def _login(self, db, role="analyst"):
+        tenant = Tenant(id=uuid.uuid4(), name="Acme")
+        db.add(tenant)
+        await db.commit()
+        user = User(
+            id=uuid.uuid4(),
+            email="analyst@example.com",
+            hashed_password="x",
+            role=role,
+            tenant_id=tenant.id,
+        )
+        app.dependency_overrides[deps.get_current_user] = lambda: user
+        return tenant.id
+
+    @pytest.mark.asyncio
+    async def test_other_tenant_is_rejected(self, client: AsyncClient, db, enqueued):
+        await self._login(db)
+
+        response = await client.post(self.URL, json={"tenant_id": str(uuid.uuid4())})
+
+        assert response.status_code == 403
+        assert enqueued == []
+
+    @pytest.mark.asyncio
+    async def test_admin_may_pass_another_tenant(
+        self, client: AsyncClient, db, enqueued
+    ):
+        await self._login(db, role="admin")
+        other = uuid.uuid4()
+
+        response = await client.post(self.URL, json={"tenant_id": str(other)})
+
+        assert response.status_code == 202
+        assert enqueued == [{"tenant_id": str(other)}]
+
+    @pytest.mark.asyncio
+    async def test_subjects_must_belong_to_the_tenant(
+        self, client: AsyncClient, db, enqueued
+    ):
+        tenant_id = await self._login(db)
+        own = await _subject(db, tenant_id)
+        foreign = await _subject(db, None)
+
+        rejected = await client.post(
+            self.URL, json={"subject_ids": [str(own), str(foreign)]}
+        )
+        accepted = await client.post(self.URL, json={"subject_ids": [str(own)]})
+
+        assert rejected.status_code == 404
+        assert accepted.status_code == 202
+        assert enqueued == [{"subject_ids": [str(own)]}]
@@ -0,0 +1,51 @@
+"""
+Tests for the shared CPU work pool.
+"""
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.core.metrics import cpu_pool_queue_depth
+from app.core.process_pool import CPUWorkPool
+
+
+class TestCPUWorkPool:
+    """Tests for pool lifecycle and task execution."""
+
+    def test_pool_is_started_lazily(self):
+        pool = CPUWorkPool(max_workers=1)
+        assert pool._executor is None
+        executor = pool.start()
+        assert pool.start() is executor
+        pool.shutdown()
+        assert pool._executor is None
+
+    @pytest.mark.asyncio
+    async def test_run_returns_result_and_settles_queue_depth(self):
+        pool = CPUWorkPool(max_workers=1)
+        try:
+            result = await pool.run("test", math.factorial, 10)
+        finally:
+            pool.shutdown()
+
+        assert result == 3628800
+        assert cpu_pool_queue_depth._value.get() == 0
+
+
+class TestMetricsRegistry:
+    """The pool's metrics must load next to prometheus_client's defaults."""
+
+    def test_app_imports_on_default_registry(self):
+        # A fresh interpreter, so the default ProcessCollector is registered
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, "-c", "import app.main"],
+            cwd=backend_dir,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, result.stderr
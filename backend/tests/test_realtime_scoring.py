@@ -0,0 +1,343 @@
+"""
+Tests for real-time transaction scoring.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from httpx import AsyncClient
+
+from app.api import deps
+from app.core.config import settings
+from app.db.models import Subject, Tenant, Transaction, User
+from app.main import app
+from app.schemas.analysis import ScoringEvent
+from app.services.ai.fraud_models import decision_function, predict_proba
+from app.services.detectors.mirror_pairs import MirrorMatcher
+from app.services.realtime_scoring import (
+    RealtimeScoringService,
+    SubjectState,
+    SubjectStateStore,
+)
+from app.services.rule_features import FEATURE_WINDOWS, compute_rule_features
+
+START = datetime(2024, 5, 1, 9)
+
+
+def _events(subject: str, *rows):
+    """(hours after the start, amount) rows as scoring events."""
+    return [
+        ScoringEvent(
+            id=f"{subject}-{i}",
+            subject_id=subject,
+            amount=amount,
+            date=START + timedelta(hours=hours),
+        )
+        for i, (hours, amount) in enumerate(rows)
+    ]
+
+
+class TestSubjectState:
+    """Incremental features and detector hits."""
+
+    def test_features_match_batch_computation(self):
+        hours = (0, 0.5, 1, 3, 10, 20, 26, 70, 71, 150, 200)
+        amounts = (9100, -50, 9200, 10, -9000, 9500, 5000, -4000, 9900, 120, -9950)
+        rows = list(zip(hours, map(float, amounts)))
+        frame = pd.DataFrame(
+            [
+                {
+                    "id": f"tx{i}",
+                    "subject_id": "a",
+                    "date": START + timedelta(hours=h),
+                    "amount": amount,
+                }
+                for i, (h, amount) in enumerate(rows)
+            ]
+        )
+        expected = compute_rule_features(frame).to_dict(orient="records")
+        state = SubjectState()
+
+        for i, (h, amount) in enumerate(rows):
+            features, _ = state.update(f"tx{i}", amount, START + timedelta(hours=h))
+            for label in FEATURE_WINDOWS:
+                for prefix in ("transaction_count", "total_volume", "count", "sum"):
+                    name = f"{prefix}_{label}"
+                    assert features[name] == pytest.approx(expected[i][name]), name
+            assert features["account_age_days"] == pytest.approx(
+                expected[i]["account_age_days"]
+            )
+
+        # The batch turnover features describe the whole history
+        assert features["inflow_outflow_ratio"] == pytest.approx(
+            expected[-1]["inflow_outflow_ratio"]
+        )
+
+    def test_late_event_counts_at_latest_time(self):
+        state = SubjectState()
+        state.update("tx0", 100.0, START + timedelta(hours=30))
+
+        features, _ = state.update("tx1", 100.0, START)
+
+        assert features["transaction_count_1h"] == 2
+        assert state.last_seen == START + timedelta(hours=30)
+
+    def test_aware_dates_are_utc(self):
+        state = SubjectState()
+        state.update("tx0", 100.0, START)
+
+        local = datetime(2024, 5, 1, 11, tzinfo=timezone(timedelta(hours=2)))
+
+        features, _ = state.update("tx1", 100.0, local)
+
+        assert features["transaction_count_1h"] == 2
+
+    def test_event_cap_bounds_the_windows(self, monkeypatch):
+        monkeypatch.setattr(settings, "REALTIME_MAX_EVENTS_PER_SUBJECT", 3)
+        state = SubjectState()
+
+        for i in range(10):
+            features, _ = state.update(f"tx{i}", 1.0, START + timedelta(minutes=i))
+
+        assert features["transaction_count_7d"] == 3
+        assert len(state.windows.dump_state()["times"]) == 3
+
+    def test_detector_hits(self):
+        state = SubjectState()
+        hits = [
+            [indicator["type"] for indicator in state.update(tx_id, amount, date)[1]]
+            for tx_id, amount, date in [
+                ("d1", 9100.0, START),
+                ("d2", 9200.0, START + timedelta(hours=1)),
+                ("out", -9200.0, START + timedelta(hours=2)),
+            ]
+        ]
+
+        assert hits == [
+            [],
+            ["structuring_attempt"],
+            ["rapid_pass_through", "mirroring_suspected"],
+        ]
+
+    def test_dumped_state_continues_the_same_way(self):
+        rows = [(0, 9100.0), (1, 5000.0), (2, -4000.0), (30, 9300.0)]
+        original = SubjectState()
+        for i, (hours, amount) in enumerate(rows):
+            original.update(f"tx{i}", amount, START + timedelta(hours=hours))
+
+        restored = SubjectState.load(original.dump())
+        date = START + timedelta(hours=31)
+
+        assert restored.update("next", -5000.0, date) == original.update(
+            "next", -5000.0, date
+        )
+
+
+class TestMirrorMatcher:
+    """Incremental mirror pairing."""
+
+    def test_pairs_oldest_opposite_within_window(self):
+        matcher = MirrorMatcher(timedelta(hours=24))
+
+        assert matcher.add("a", 500, START) is None
+        assert matcher.add("b", 500, START + timedelta(hours=1)) is None
+        pair = matcher.add("c", -500, START + timedelta(hours=2))
+        late = matcher.add("d", -500, START + timedelta(hours=30))
+
+        assert (pair.first_id, pair.second_id) == ("a", "c")
+        assert late is None  # "b" expired
+
+    def test_state_round_trip(self):
+        matcher = MirrorMatcher(timedelta(hours=24))
+        matcher.add("a", 500, START)
+        matcher.add("b", -500, START)
+        matcher.add("c", 75.5, START)
+
+        restored = MirrorMatcher.load_state(matcher.window, matcher.dump_state())
+        pair = restored.add("d", -75.5, START + timedelta(hours=1))
+
+        assert matcher.dump_state() == [[START.isoformat(), "c", 7550]]
+        assert pair.first_id == "c"
+
+
+class TestCompiledForest:
+    """Compiled tree ensembles agree with scikit-learn."""
+
+    @pytest.fixture
+    def data(self):
+        rng = np.random.default_rng(5)
+        features = rng.normal(size=(400, 6))
+        return features, (features[:, 0] + features[:, 2] > 0.5).astype(int)
+
+    def test_random_forest_probabilities(self, data):
+        ensemble = pytest.importorskip("sklearn.ensemble")
+        features, labels = data
+        model = ensemble.RandomForestClassifier(
+            n_estimators=20, max_depth=6, min_samples_leaf=2, random_state=42
+        ).fit(features, labels)
+
+        assert np.allclose(
+            predict_proba(model, features[:50]), model.predict_proba(features[:50])
+        )
+
+    def test_isolation_forest_scores(self, data):
+        ensemble = pytest.importorskip("sklearn.ensemble")
+        features, _ = data
+        # Feature subsampling: trees index a permuted subset of the columns
+        model = ensemble.IsolationForest(
+            n_estimators=20, max_features=0.5, random_state=42
+        ).fit(features)
+
+        assert np.allclose(
+            decision_function(model, features[:50]),
+            model.decision_function(features[:50]),
+        )
+
+
+class TestRealtimeScoring:
+    """The scoring service with in-process state."""
+
+    @pytest.fixture(autouse=True)
+    def _no_models(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "REALTIME_MODEL_DIR", str(tmp_path))
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_one_by_one(self, db):
+        events = _events("a", (0, 9100.0), (1, 9200.0), (2, 9300.0))
+        events += _events("b", (0, 9400.0))
+
+        one_by_one = RealtimeScoringService()
+        singles = [await one_by_one.score(db, event) for event in events]
+        batched = await RealtimeScoringService().score_batch(db, events)
+
+        assert [s.model_dump(exclude={"triggered_rules"}) for s in singles] == [
+            s.model_dump(exclude={"triggered_rules"}) for s in batched
+        ]
+        assert "RULE_001" in {r.rule_id for r in batched[2].triggered_rules}
+        assert "RULE_001" not in {r.rule_id for r in batched[1].triggered_rules}
+        assert batched[2].risk_score >= 50
+        assert batched[0].fraud_probability is None
+        assert batched[0].features["turnover_time_hours"] is None
+
+    @pytest.mark.asyncio
+    async def test_new_subject_is_seeded_from_stored_transactions(self, db):
+        subject = Subject(id=uuid.uuid4(), encrypted_pii={})
+        db.add(subject)
+        for i in range(2):
+            db.add(
+                Transaction(
+                    id=uuid.uuid4(),
+                    subject_id=subject.id,
+                    amount=Decimal("9100.00") + i,
+                    date=START + timedelta(hours=i),
+                    source_bank="chase",
+                )
+            )
+        await db.commit()
+
+        scored = await RealtimeScoringService(SubjectStateStore()).score(
+            db,
+            ScoringEvent(
+                id="new",
+                subject_id=str(subject.id),
+                amount=9300.0,
+                date=START + timedelta(hours=2),
+            ),
+        )
+
+        assert scored.features["count_24h"] == 3
+        assert scored.features["account_age_days"] == pytest.approx(2 / 24)
+        assert "RULE_001" in {r.rule_id for r in scored.triggered_rules}
+
+    @pytest.mark.asyncio
+    async def test_account_age_counts_from_before_the_replay_window(self, db):
+        subject = Subject(id=uuid.uuid4(), encrypted_pii={})
+        db.add(subject)
+        db.add(
+            Transaction(
+                id=uuid.uuid4(),
+                subject_id=subject.id,
+                amount=Decimal("100.00"),
+                date=START - timedelta(days=400),
+                source_bank="chase",
+            )
+        )
+        await db.commit()
+
+        scored = await RealtimeScoringService(SubjectStateStore()).score(
+            db,
+            ScoringEvent(
+                id="new", subject_id=str(subject.id), amount=60000.0, date=START
+            ),
+        )
+
+        # Too old to replay, but the account is still 400 days old
+        assert scored.features["transaction_count_7d"] == 1
+        assert scored.features["account_age_days"] == pytest.approx(400)
+
+
+class TestScoringEndpoint:
+    """Events of another tenant's subjects are rejected before seeding."""
+
+    URL = "/api/v1/scoring/transactions"
+
+    @pytest.fixture(autouse=True)
+    def _no_models(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "REALTIME_MODEL_DIR", str(tmp_path))
+
+    async def _subjects(self, db):
+        """A subject of the caller's tenant and one of another tenant."""
+        own = Tenant(id=uuid.uuid4(), name="Acme")
+        other = Tenant(id=uuid.uuid4(), name="Other")
+        mine = Subject(id=uuid.uuid4(), encrypted_pii={}, tenant_id=own.id)
+        theirs = Subject(id=uuid.uuid4(), encrypted_pii={}, tenant_id=other.id)
+        db.add_all([own, other, mine, theirs])
+        await db.commit()
+        user = User(
+            id=uuid.uuid4(),
+            email="analyst@example.com",
+            hashed_password="x",
+            role="analyst",
+            tenant_id=own.id,
+        )
+        app.dependency_overrides[deps.get_current_user] = lambda: user
+        return str(mine.id), str(theirs.id)
+
+    @staticmethod
+    def _event(subject_id: str) -> dict:
+        return {
+            "id": str(uuid.uuid4()),
+            "subject_id": subject_id,
+            "amount": 9100.0,
+            "date": START.isoformat(),
+        }
+
+    @pytest.mark.asyncio
+    async def test_subject_of_another_tenant_is_not_found(
+        self, client: AsyncClient, db
+    ):
+        mine, theirs = await self._subjects(db)
+
+        foreign = await client.post(self.URL, json=self._event(theirs))
+        allowed = await client.post(self.URL, json=self._event(mine))
+
+        assert foreign.status_code == 404
+        assert allowed.status_code == 200
+        assert allowed.json()["subject_id"] == mine
+
+    @pytest.mark.asyncio
+    async def test_batch_with_a_foreign_subject_is_not_found(
+        self, client: AsyncClient, db
+    ):
+        mine, theirs = await self._subjects(db)
+        events = [self._event(mine), self._event("stream-only"), self._event(theirs)]
+
+        foreign = await client.post(f"{self.URL}/batch", json={"events": events})
+        allowed = await client.post(f"{self.URL}/batch", json={"events": events[:2]})
+
+        assert foreign.status_code == 404
+        assert allowed.status_code == 200
+        assert [s["subject_id"] for s in allowed.json()] == [mine, "stream-only"]
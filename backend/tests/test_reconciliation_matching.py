@@ -0,0 +1,453 @@
+"""
+Unit tests for rule-based reconciliation matching and candidate blocking.
+"""
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.process_pool import cpu_pool
+from app.services import match_assignment, reconciliation
+from app.services.match_assignment import (
+    assign_pairs,
+    connected_components,
+    greedy_select,
+    solve_component,
+)
+from app.services.match_blocking import BlockingIndex
+from app.db.models import TransactionSourceType
+from app.services.match_scoring import CandidatePool, FeatureVocabulary, score_pairs
+from app.services.reconciliation import ReconciliationService
+
+
+def _tx(amount, day, description="Payment", bank="chase", hour=0):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        amount=Decimal(amount),
+        date=datetime(2024, 1, 1, hour) + timedelta(days=day),
+        description=description,
+        source_bank=bank,
+    )
+
+
+def _brute_force(internals, externals, threshold, date_buffer_days):
+    """The original O(N x M) greedy pass, as a reference."""
+    remaining = list(externals)
+    matches = []
+    for internal in internals:
+        best, best_score = None, 0.0
+        for external in remaining:
+            score = ReconciliationService._calculate_match_score(
+                internal, external, date_buffer_days
+            )
+            if score > best_score and score >= threshold:
+                best, best_score = external, score
+        if best:
+            matches.append((internal.id, best.id, best_score))
+            remaining.remove(best)
+    return matches
+
+
+def _random_book(rng, size, words=None):
+    words = words or ["rent", "coffee", "payroll", "invoice", "refund", "charge"]
+    return [
+        _tx(
+            f"{rng.choice([12, 250, 999, 1000, 4500])}.{rng.randint(0, 99):02d}",
+            rng.randint(0, 20),
+            description=" ".join(rng.sample(words, 2)),
+            bank=rng.choice(["chase", "wells"]),
+            hour=rng.choice([0, 23]),
+        )
+        for _ in range(size)
+    ]
+
+
+class TestBlockingIndex:
+    """Tests for candidate lookups."""
+
+    def test_candidates_respect_amount_and_date(self):
+        externals = [
+            _tx("100.00", 5),
+            _tx("100.50", 6),
+            _tx("250.00", 5),
+            _tx("100.00", 30),
+        ]
+        index = BlockingIndex(externals, date_window_days=2)
+
+        assert index.candidates(_tx("100.00", 5)) == [0, 1]
+
+    def test_used_externals_are_skipped(self):
+        externals = [_tx("10.00", 1), _tx("10.00", 1)]
+        index = BlockingIndex(externals, date_window_days=1)
+        index.mark_used(0)
+
+        assert index.candidates(_tx("10.00", 1)) == [1]
+
+    def test_unblocked_index_returns_everything(self):
+        externals = [_tx("1.00", 1), _tx("900.00", 200)]
+        index = BlockingIndex(externals, date_window_days=None, block_on_amount=False)
+
+        assert index.candidates(_tx("50.00", 50)) == [0, 1]
+
+    @pytest.mark.parametrize(
+        "date_window_days,block_on_amount", [(3, True), (None, True), (None, False)]
+    )
+    def test_candidate_pairs_match_candidates(self, date_window_days, block_on_amount):
+        rng = random.Random(7)
+        internals = _random_book(rng, 80)
+        externals = _random_book(rng, 80)
+        internals[0].date = None
+        externals[0].date = None
+        index = BlockingIndex(externals, date_window_days, block_on_amount)
+
+        li, ri = index.candidate_pairs(internals[40:], offset=40)
+        pairs = sorted(zip(li.tolist(), ri.tolist()))
+        expected = [
+            (i, j)
+            for i, tx in enumerate(internals[40:], start=40)
+            for j in index.candidates(tx)
+        ]
+        assert pairs == expected
+
+
+class TestFallbackMatching:
+    """Blocked greedy matching must equal the unblocked pass."""
+
+    @pytest.mark.parametrize("threshold", [0.5, 0.65, 0.75, 0.8, 0.95])
+    def test_matches_brute_force(self, threshold):
+        rng = random.Random(1234)
+        internals = _random_book(rng, 120)
+        externals = _random_book(rng, 120)
+
+        expected = _brute_force(internals, externals, threshold, 3)
+        matches = ReconciliationService._fallback_matching(
+            internals, list(externals), threshold, 3
+        )
+
+        assert [
+            (m["internal_id"], m["external_id"], m["confidence"]) for m in matches
+        ] == expected
+
+
+class TestVectorizedScoring:
+    """Batched scores must equal per-pair scores."""
+
+    def test_scores_match_per_pair_scoring(self):
+        rng = random.Random(99)
+        internals = _random_book(rng, 60)
+        externals = _random_book(rng, 60)
+        internals.append(_tx("5.00", 1, description=None, bank=None))
+        externals.append(SimpleNamespace(**{**vars(_tx("5.00", 1)), "date": None}))
+
+        vocabulary = FeatureVocabulary()
+        left = vocabulary.encode(internals)
+        right = vocabulary.encode(externals)
+        li = np.repeat(np.arange(len(internals)), len(externals))
+        ri = np.tile(np.arange(len(externals)), len(internals))
+
+        scores = score_pairs(left, right, li, ri, 3, vocabulary)
+        expected = [
+            ReconciliationService._calculate_match_score(internals[i], externals[j], 3)
+            for i, j in zip(li, ri)
+        ]
+        assert scores.tolist() == expected
+
+    def test_token_overlap_ignores_substrings(self):
+        internal = _tx("1.00", 1, description="fee")
+        external = _tx("1.00", 1, description="coffee shop")
+        vocabulary = FeatureVocabulary()
+        left = vocabulary.encode([internal])
+        right = vocabulary.encode([external])
+        pair = np.array([0])
+
+        score = score_pairs(left, right, pair, pair, 3, vocabulary)[0]
+        per_pair = ReconciliationService._calculate_match_score(internal, external, 3)
+        assert score == per_pair == pytest.approx(0.8)
+
+    def test_substring_words_score_alike_in_both_paths(self):
+        rng = random.Random(7)
+        # Words that are substrings of others, where a substring test and
+        # whole-word overlap would disagree
+        words = ["fee", "coffee", "pay", "payroll", "rent", "rental", "Rent"]
+        internals = _random_book(rng, 80, words)
+        externals = _random_book(rng, 80, words)
+
+        vocabulary = FeatureVocabulary()
+        left = vocabulary.encode(internals)
+        right = vocabulary.encode(externals)
+        li = np.repeat(np.arange(len(internals)), len(externals))
+        ri = np.tile(np.arange(len(externals)), len(internals))
+
+        scores = score_pairs(left, right, li, ri, 3, vocabulary)
+        assert scores.tolist() == [
+            ReconciliationService._calculate_match_score(internals[i], externals[j], 3)
+            for i, j in zip(li, ri)
+        ]
+
+    def test_date_score_is_symmetric(self):
+        # 1 day 23 hours apart: floors to one day in either direction
+        early = _tx("1.00", 1, hour=0)
+        late = _tx("1.00", 2, hour=23)
+        vocabulary = FeatureVocabulary()
+        left = vocabulary.encode([early])
+        right = vocabulary.encode([late])
+        pair = np.array([0])
+
+        forward = score_pairs(left, right, pair, pair, 3, vocabulary)[0]
+        backward = score_pairs(right, left, pair, pair, 3, vocabulary)[0]
+        assert forward == backward == pytest.approx(0.4 + 0.3 * 3 / 4 + 0.2 + 0.1)
+        assert ReconciliationService._calculate_match_score(
+            early, late, 3
+        ) == ReconciliationService._calculate_match_score(late, early, 3)
+
+    @pytest.mark.parametrize("threshold", [0.5, 0.7, 0.8])
+    def test_matches_rule_based_pass(self, threshold):
+        rng = random.Random(4321)
+        internals = _random_book(rng, 150)
+        externals = _random_book(rng, 150)
+
+        expected = ReconciliationService._fallback_matching(
+            internals, externals, threshold, 3
+        )
+        matches = ReconciliationService._vectorized_matching(
+            internals, externals, threshold, 3
+        )
+        assert matches and [
+            (m["internal_id"], m["external_id"], m["confidence"]) for m in matches
+        ] == [
+            (m["internal_id"], m["external_id"], m["confidence"]) for m in expected
+        ]
+
+
+class TestPagedMatching:
+    """Greedy passes continued page by page over shared used flags."""
+
+    @staticmethod
+    def _pages(items, size):
+        return [items[start : start + size] for start in range(0, len(items), size)]
+
+    @staticmethod
+    def _triples(matches):
+        return [(m["internal_id"], m["external_id"], m["confidence"]) for m in matches]
+
+    def test_rules_pages_match_single_pass(self):
+        rng = random.Random(99)
+        internals = _random_book(rng, 120)
+        externals = _random_book(rng, 120)
+
+        expected = ReconciliationService._fallback_matching(
+            internals, externals, 0.7, 3
+        )
+        index = ReconciliationService._blocking_index(externals, 0.7, 3)
+        paged = []
+        for page in self._pages(internals, 25):
+            paged.extend(
+                ReconciliationService._fallback_matching(
+                    page, externals, 0.7, 3, index=index
+                )
+            )
+        assert expected and self._triples(paged) == self._triples(expected)
+
+    def test_vectorized_pages_match_single_pass(self):
+        rng = random.Random(100)
+        internals = _random_book(rng, 120)
+        externals = _random_book(rng, 120)
+
+        expected = ReconciliationService._vectorized_matching(
+            internals, externals, 0.7, 3
+        )
+        pool = CandidatePool(
+            externals, ReconciliationService._blocking_index(externals, 0.7, 3)
+        )
+        paged = []
+        for page in self._pages(internals, 25):
+            paged.extend(
+                ReconciliationService._vectorized_matching(
+                    page, externals, 0.7, 3, pool=pool
+                )
+            )
+        assert expected and self._triples(paged) == self._triples(expected)
+
+    def test_unmatched_query_is_an_anti_join(self):
+        sql = str(
+            ReconciliationService._unmatched_query(TransactionSourceType.INTERNAL)
+        ).upper()
+        assert sql.count("NOT (EXISTS") == 2
+        assert " IN (" not in sql
+
+
+def _arrays(edges):
+    li, ri, scores = zip(*edges)
+    return np.array(li), np.array(ri), np.array(scores, dtype=float)
+
+
+# Internal 0 is a slightly better fit for external 0, but internal 1 can only
+# use external 0: greedy takes one match, the optimum takes both
+CONTESTED = [(0, 0, 0.90), (0, 1, 0.85), (1, 0, 0.88)]
+
+
+class TestAssignment:
+    """Tests for score-maximizing one-to-one assignment."""
+
+    def test_components_split_independent_groups(self):
+        li, ri, _ = _arrays(CONTESTED + [(2, 5, 0.9), (3, 5, 0.8), (4, 6, 0.9)])
+        labels = connected_components(li, ri).tolist()
+
+        assert labels[0] == labels[1] == labels[2]
+        assert labels[3] == labels[4]
+        assert len(set(labels)) == 3
+
+    def test_greedy_is_order_dependent(self):
+        rows, cols, _ = greedy_select(*_arrays(CONTESTED), bytearray(2))
+        assert list(zip(rows, cols)) == [(0, 0)]
+
+    @pytest.mark.parametrize("use_scipy", [True, False])
+    def test_component_maximizes_total_score(self, use_scipy, monkeypatch):
+        if not use_scipy:
+            monkeypatch.setattr(match_assignment, "linear_sum_assignment", None)
+        rows, cols, scores = solve_component(*_arrays(CONTESTED), max_component=10)
+
+        assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 1), (1, 0)]
+        assert scores.sum() == pytest.approx(1.73)
+
+    def test_oversized_component_falls_back_to_greedy(self):
+        rows, cols, _ = solve_component(*_arrays(CONTESTED), max_component=1)
+        assert list(zip(rows, cols)) == [(0, 0)]
+
+    @pytest.mark.asyncio
+    async def test_assignment_beats_greedy_on_repeated_amounts(self):
+        rng = random.Random(11)
+        internals = _random_book(rng, 200)
+        externals = _random_book(rng, 200)
+        try:
+            assigned = await ReconciliationService._assignment_matching(
+                internals, externals, 0.7, 3
+            )
+        finally:
+            cpu_pool.shutdown()
+        greedy = ReconciliationService._vectorized_matching(
+            internals, externals, 0.7, 3
+        )
+
+        assert len({m["external_id"] for m in assigned}) == len(assigned)
+        assert len({m["internal_id"] for m in assigned}) == len(assigned)
+        assert sum(m["confidence"] for m in assigned) >= sum(
+            m["confidence"] for m in greedy
+        )
+
+    @pytest.mark.asyncio
+    async def test_no_pairs(self):
+        rows, cols, scores = await assign_pairs(
+            np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([])
+        )
+        assert len(rows) == len(cols) == len(scores) == 0
+
+
+class FakeLLM:
+    """Answers every prompt with `reply(prompt)` and records the prompts."""
+
+    prompts = []
+    reply = staticmethod(lambda prompt: [])
+
+    async def generate_response(self, messages):
+        FakeLLM.prompts.append(messages[0].content)
+        reply = FakeLLM.reply(messages[0].content)
+        return reply if isinstance(reply, str) else json.dumps(reply)
+
+
+class FakeCache:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ttl=300):
+        self.store[key] = value
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    FakeLLM.prompts = []
+    monkeypatch.setattr(reconciliation, "LLMService", FakeLLM)
+    monkeypatch.setattr(reconciliation, "cache", FakeCache())
+    return FakeLLM
+
+
+def _hybrid_books():
+    # Two interchangeable wires: every pair scores 0.825, an ambiguous group
+    wires_in = [_tx("100.00", 1, "wire transfer"), _tx("100.00", 1, "wire transfer")]
+    wires_out = [_tx("100.00", 2, "incoming wire"), _tx("100.00", 2, "incoming wire")]
+    # An identical pair (exact) and a lone close pair (unambiguous)
+    rent_in, rent_out = _tx("50.00", 5, "rent"), _tx("50.00", 5, "rent")
+    coffee_in = _tx("70.00", 5, "coffee")
+    coffee_out = _tx("70.00", 6, "coffee", bank="wells")
+    internals = wires_in + [rent_in, coffee_in]
+    externals = wires_out + [rent_out, coffee_out]
+    return internals, externals
+
+
+class TestHybridMatching:
+    """Rules settle clear matches; only ambiguous groups reach the LLM."""
+
+    @pytest.mark.asyncio
+    async def test_only_ambiguous_group_is_sent(self, fake_llm):
+        internals, externals = _hybrid_books()
+        wires_in, wires_out = internals[:2], externals[:2]
+        # The LLM pairs the wires crosswise
+        fake_llm.reply = lambda prompt: [
+            {
+                "internal_id": str(wires_in[0].id),
+                "external_id": str(wires_out[1].id),
+                "confidence": 0.9,
+            },
+            {
+                "internal_id": str(wires_in[1].id),
+                "external_id": str(wires_out[0].id),
+                "confidence": 0.9,
+            },
+        ]
+
+        matches = await ReconciliationService._hybrid_matching(
+            internals, externals, 0.8, 3
+        )
+
+        assert len(fake_llm.prompts) == 1
+        prompt = fake_llm.prompts[0]
+        assert all(str(tx.id) in prompt for tx in wires_in + wires_out)
+        assert str(internals[2].id) not in prompt
+        assert str(internals[3].id) not in prompt
+        assert {(m["internal_id"], m["external_id"]) for m in matches} == {
+            (internals[2].id, externals[2].id),
+            (internals[3].id, externals[3].id),
+            (wires_in[0].id, wires_out[1].id),
+            (wires_in[1].id, wires_out[0].id),
+        }
+
+    @pytest.mark.asyncio
+    async def test_responses_are_cached_by_prompt(self, fake_llm):
+        internals, externals = _hybrid_books()
+
+        await ReconciliationService._hybrid_matching(internals, externals, 0.8, 3)
+        await ReconciliationService._hybrid_matching(internals, externals, 0.8, 3)
+
+        assert len(fake_llm.prompts) == 1
+
+    @pytest.mark.asyncio
+    async def test_unparseable_response_falls_back_to_rules(self, fake_llm):
+        internals, externals = _hybrid_books()
+        fake_llm.reply = lambda prompt: "Sorry, I cannot help with that."
+
+        matches = await ReconciliationService._hybrid_matching(
+            internals, externals, 0.8, 3
+        )
+        await ReconciliationService._hybrid_matching(internals, externals, 0.8, 3)
+
+        assert len(matches) == 4
+        # Failed responses are not cached
+        assert len(fake_llm.prompts) == 2
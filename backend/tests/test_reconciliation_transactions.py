@@ -0,0 +1,174 @@
+"""
+Tests for the paginated and streaming reconciliation transaction listings.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.endpoints import reconciliation
+from app.db.models import (
+    Match,
+    MatchStatus,
+    Subject,
+    Transaction,
+    TransactionSourceType,
+)
+
+URL = "/api/v1/reconciliation/transactions"
+
+
+async def _ledger(db: AsyncSession, size: int = 7):
+    """Internal transactions, two per day so dates tie, the first one matched."""
+    subject = Subject(id=uuid.uuid4(), encrypted_pii={})
+    db.add(subject)
+    internals = [
+        Transaction(
+            id=uuid.uuid4(),
+            subject_id=subject.id,
+            amount=Decimal("10.00") + i,
+            date=datetime(2024, 1, 1) + timedelta(days=i // 2),
+            description=f"Row {i}",
+            source_bank="chase",
+            source_type=TransactionSourceType.INTERNAL,
+        )
+        for i in range(size)
+    ]
+    external = Transaction(
+        id=uuid.uuid4(),
+        subject_id=subject.id,
+        amount=Decimal("10.00"),
+        date=datetime(2024, 1, 1),
+        source_bank="chase",
+        source_type=TransactionSourceType.EXTERNAL,
+    )
+    db.add_all(internals + [external])
+    db.add(
+        Match(
+            internal_transaction_id=internals[0].id,
+            external_transaction_id=external.id,
+            status=MatchStatus.MATCHED,
+            confidence=0.9,
+        )
+    )
+    await db.commit()
+    return internals, external
+
+
+class TestTransactionPages:
+    """Cursor pages keyed on (date, id), newest first."""
+
+    @pytest.mark.asyncio
+    async def test_cursor_walks_every_row_once(self, client: AsyncClient, db):
+        internals, _ = await _ledger(db)
+
+        seen, cursor = [], None
+        while True:
+            params = {"source": "internal", "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get(URL, params=params)
+            assert response.status_code == 200
+            seen.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert sorted(row["id"] for row in seen) == sorted(
+            str(tx.id) for tx in internals
+        )
+        keys = [(row["date"], row["id"]) for row in seen]
+        assert keys == sorted(keys, reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_unpaged_request_lists_every_row(
+        self, client: AsyncClient, db, monkeypatch
+    ):
+        internals, _ = await _ledger(db)
+        monkeypatch.setattr(reconciliation, "MAX_PAGE_SIZE", 3)
+
+        response = await client.get(URL, params={"source": "internal"})
+
+        assert response.status_code == 200
+        assert "X-Next-Cursor" not in response.headers
+        ids = [row["id"] for row in response.json()]
+        assert sorted(ids) == sorted(str(t.id) for t in internals)
+
+    @pytest.mark.asyncio
+    async def test_unpaged_request_with_no_rows_is_empty(
+        self, client: AsyncClient, db
+    ):
+        response = await client.get(URL, params={"source": "external"})
+
+        assert response.json() == []
+
+    @pytest.mark.asyncio
+    async def test_status_filter(self, client: AsyncClient, db):
+        internals, external = await _ledger(db)
+
+        matched = (
+            await client.get(URL, params={"source": "internal", "status": "matched"})
+        ).json()
+        unmatched = (
+            await client.get(URL, params={"source": "internal", "status": "unmatched"})
+        ).json()
+
+        assert [row["id"] for row in matched] == [str(internals[0].id)]
+        assert matched[0]["matchedWith"] == str(external.id)
+        assert matched[0]["confidence"] == pytest.approx(0.9)
+        assert len(unmatched) == len(internals) - 1
+        assert all(row["matchStatus"] == "unmatched" for row in unmatched)
+
+    @pytest.mark.asyncio
+    async def test_one_row_per_transaction(self, client: AsyncClient, db):
+        internals, external = await _ledger(db, size=2)
+        # A rejected earlier match and a pending one next to the settled one
+        for status in (MatchStatus.UNMATCHED, MatchStatus.PENDING):
+            db.add(
+                Match(
+                    internal_transaction_id=internals[0].id,
+                    external_transaction_id=external.id,
+                    status=status,
+                    confidence=0.5,
+                )
+            )
+        await db.commit()
+
+        listed = (await client.get(URL, params={"source": "internal"})).json()
+        pending = (
+            await client.get(URL, params={"source": "internal", "status": "pending"})
+        ).json()
+        unmatched = (
+            await client.get(URL, params={"source": "internal", "status": "unmatched"})
+        ).json()
+
+        assert sorted(row["id"] for row in listed) == sorted(
+            str(tx.id) for tx in internals
+        )
+        assert [row["id"] for row in pending] == [str(internals[0].id)]
+        assert pending[0]["matchStatus"] == "pending"
+        assert [row["id"] for row in unmatched] == [str(internals[1].id)]
+
+    @pytest.mark.asyncio
+    async def test_invalid_filters_are_rejected(self, client: AsyncClient, db):
+        bad_status = await client.get(URL, params={"source": "internal", "status": "x"})
+        bad_cursor = await client.get(URL, params={"source": "internal", "cursor": "x"})
+
+        assert bad_status.status_code == 400
+        assert bad_cursor.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_stream_is_ndjson(self, client: AsyncClient, db):
+        internals, _ = await _ledger(db)
+
+        response = await client.get(f"{URL}/stream", params={"source": "internal"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == len(internals)
+        assert {row["source"] for row in rows} == {"internal"}
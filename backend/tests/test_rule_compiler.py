@@ -0,0 +1,169 @@
+"""
+Tests for compiled and vectorized heuristic rule evaluation.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.heuristic_rules import DEFAULT_HEURISTIC_RULES
+from app.schemas.analysis import HeuristicRule
+from app.services.heuristic_engine import HeuristicEngine
+from app.services.rule_compiler import RuleCompileError, compile_rule
+
+
+def _rule(rule_id: str, logic: str) -> HeuristicRule:
+    return HeuristicRule(
+        id=rule_id, name=rule_id, description="", severity="low", logic=logic
+    )
+
+
+def _features(size: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    return pd.DataFrame(
+        {
+            "amount": rng.choice([9500.0, 2000.0, 1234.5, 60000.0], size),
+            "count_24h": rng.integers(0, 5, size),
+            "transaction_count_1h": rng.integers(0, 20, size),
+            "account_age_days": rng.uniform(0, 30, size),
+            "total_volume_24h": rng.uniform(0, 100000, size),
+            "inflow_outflow_ratio": rng.uniform(0, 1.2, size),
+            "turnover_time_hours": rng.choice([2.0, 48.0, np.nan], size),
+            "country_tags": [("high_risk",) if i % 7 == 0 else () for i in range(size)],
+        }
+    )
+
+
+class TestCompileRule:
+    """Parsing once, whitelisting and caching."""
+
+    def test_compiled_rules_are_cached(self):
+        logic = "amount > 1000 and amount % 100 == 0"
+
+        assert compile_rule(logic) is compile_rule(logic)
+
+    @pytest.mark.parametrize(
+        "logic",
+        [
+            "__import__('os').system('true')",
+            "amount.__class__",
+            "country_tags[0] == 'x'",
+            "amount ** 1000000",
+            "(lambda: 1)()",
+            "__builtins__",
+            "[x for x in country_tags]",
+            "amount >",
+            "'a' * 10000000000",
+            "10000000000 * ('a',)",
+        ],
+    )
+    def test_unsafe_or_invalid_logic_is_rejected(self, logic):
+        with pytest.raises(RuleCompileError):
+            compile_rule(logic)
+
+    def test_scalar_evaluation_has_python_semantics(self):
+        rule = compile_rule("9000 <= amount < 10000 and count_24h > 2")
+
+        assert rule.evaluate({"amount": 9500, "count_24h": 3}) is True
+        assert rule.evaluate({"amount": 10000, "count_24h": 3}) is False
+        assert rule.names == {"amount", "count_24h"}
+
+    def test_missing_name_raises(self):
+        with pytest.raises(NameError):
+            compile_rule("amount > 1").evaluate({})
+
+    def test_only_numbers_are_multiplied(self):
+        rule = compile_rule("amount * count > 100")
+
+        assert rule.evaluate({"amount": 60, "count": 2}) is True
+        assert rule.names == {"amount", "count"}
+        # A string held by a name is not repeated either
+        with pytest.raises(TypeError):
+            rule.evaluate({"amount": "a", "count": 10000000000})
+        with pytest.raises(TypeError):
+            rule.mask({"amount": ["a", "b"], "count": [10000000000] * 2}, 2)
+        with pytest.raises(TypeError):
+            rule.mask({"amount": np.array(["a", "b"]), "count": np.array([3, 3])}, 2)
+
+
+class TestVectorizedRules:
+    """Whole-column masks agree with row-by-row evaluation."""
+
+    @pytest.mark.parametrize("rule", DEFAULT_HEURISTIC_RULES, ids=lambda r: r.id)
+    def test_default_rules_match_scalar_evaluation(self, rule):
+        features = _features()
+        compiled = compile_rule(rule.logic)
+
+        mask = compiled.mask(features, len(features))
+        expected = [
+            bool(compiled.evaluate(row)) for row in features.to_dict(orient="records")
+        ]
+
+        assert mask.dtype == bool
+        assert mask.tolist() == expected
+
+    def test_operators(self):
+        columns = {"a": np.array([1.0, 5.0, 9.0]), "tag": ["x", "y", "z"]}
+        cases = {
+            "1 < a < 9": [False, True, False],
+            "not a > 4": [True, False, False],
+            "a == 1 or tag in ('z',)": [True, False, True],
+            "tag not in ['x', 'y']": [False, False, True],
+            "-a + 10 >= 5": [True, True, False],
+            "a * 2 > 9": [False, True, True],
+            "a // 2 == 2": [False, True, False],
+            "a / 0 > 1": [True, True, True],
+            "True": [True, True, True],
+        }
+
+        for logic, expected in cases.items():
+            assert compile_rule(logic).mask(columns, 3).tolist() == expected, logic
+
+    def test_membership_in_ragged_column(self):
+        columns = {"country_tags": [("high_risk", "eu"), (), ("eu",)]}
+
+        mask = compile_rule("'high_risk' in country_tags").mask(columns, 3)
+
+        assert mask.tolist() == [True, False, False]
+
+
+class TestEngineColumns:
+    """HeuristicEngine.evaluate_columns."""
+
+    def test_failing_rules_are_left_out(self):
+        engine = HeuristicEngine(
+            [
+                _rule("OK", "amount > 5000"),
+                _rule("BAD_SYNTAX", "amount >"),
+                _rule("MISSING", "unknown_feature > 1"),
+            ]
+        )
+
+        masks = engine.evaluate_columns({"amount": [1.0, 9000.0]}, 2)
+
+        assert list(masks) == ["OK"]
+        assert masks["OK"].tolist() == [False, True]
+
+    def test_invalid_rules_are_logged_once(self, caplog):
+        with caplog.at_level("ERROR"):
+            engine = HeuristicEngine(
+                [_rule("OK", "amount > 5000"), _rule("BAD", "amount >")]
+            )
+            for _ in range(3):
+                engine.evaluate_columns({"amount": [9000.0]}, 1)
+                engine.evaluate_transaction({"amount": 9000.0})
+
+        assert len(caplog.messages) == 1
+        assert caplog.messages[0].startswith("Error compiling rule BAD")
+        assert [rule.id for rule, _ in engine._compiled] == ["OK"]
+
+    def test_transaction_and_columns_agree(self):
+        engine = HeuristicEngine()
+        features = _features(200)
+
+        masks = engine.evaluate_columns(features, len(features))
+
+        for position, row in enumerate(features.to_dict(orient="records")):
+            triggered = {r.rule_id for r in engine.evaluate_transaction(row)}
+            assert triggered == {
+                rule_id for rule_id, mask in masks.items() if mask[position]
+            }
@@ -0,0 +1,233 @@
+"""
+Tests for the vectorized heuristic rule feature contexts.
+"""
+import math
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+from httpx import AsyncClient
+
+from app.api import deps
+from app.core.heuristic_rules import DEFAULT_HEURISTIC_RULES
+from app.db.models import Subject, Tenant, Transaction, User
+from app.main import app
+from app.services.detectors.structuring import StructuringDetector
+from app.services.detectors.velocity import VelocityDetector
+from app.services.heuristic_engine import HeuristicEngine
+from app.services.rule_features import (
+    FEATURE_WINDOWS,
+    RuleFeatureService,
+    compute_rule_features,
+)
+
+START = datetime(2024, 5, 1, 9)
+
+
+def _frame(*rows):
+    """(subject, hours after the start, amount) rows as a transaction frame."""
+    return pd.DataFrame(
+        [
+            {
+                "id": f"tx{i}",
+                "subject_id": subject,
+                "date": START + timedelta(hours=hours),
+                "amount": amount,
+            }
+            for i, (subject, hours, amount) in enumerate(rows)
+        ]
+    )
+
+
+class TestComputeRuleFeatures:
+    """Rolling features over many subjects in one pass."""
+
+    def test_windows_match_brute_force(self):
+        rows = [
+            ("a", hours, 9000.0 + hours)
+            for hours in (0, 0.5, 3, 20, 26, 70, 71, 200)
+        ]
+        rows += [("a", 10, -50.0), ("a", 3, 10.0), ("b", 1, 9500.0), ("b", 2, 9600.0)]
+        frame = _frame(*rows).sample(frac=1, random_state=7)
+
+        features = compute_rule_features(frame)
+
+        for _, row in features.iterrows():
+            for label, window in FEATURE_WINDOWS.items():
+                inside = frame[
+                    (frame["subject_id"] == row["subject_id"])
+                    & (frame["date"] > row["date"] - window)
+                    & (frame["date"] <= row["date"])
+                ]
+                amounts = inside["amount"]
+                near = amounts[(amounts >= 9000) & (amounts < 10000)]
+                assert row[f"transaction_count_{label}"] == len(inside)
+                assert row[f"total_volume_{label}"] == pytest.approx(
+                    inside["amount"].abs().sum()
+                )
+                assert row[f"count_{label}"] == len(near)
+                assert row[f"sum_{label}"] == pytest.approx(near.sum())
+
+    def test_row_order_is_preserved(self):
+        frame = _frame(("a", 5, 1.0), ("b", 0, 2.0), ("a", 1, 3.0))
+
+        features = compute_rule_features(frame)
+
+        assert features["id"].tolist() == ["tx0", "tx1", "tx2"]
+        assert features["transaction_count_24h"].tolist() == [2, 1, 1]
+
+    def test_same_instant_rows_share_a_window(self):
+        frame = _frame(("a", 0, 9100.0), ("a", 0, 9200.0), ("a", 0, 9300.0))
+
+        features = compute_rule_features(frame)
+
+        assert features["count_24h"].tolist() == [3, 3, 3]
+
+    def test_count_24h_matches_structuring_detector(self):
+        rows = [(hours, 9000.0 + hours) for hours in (0, 3, 20, 26, 70, 71)]
+        frame = _frame(*[("a", hours, amount) for hours, amount in rows])
+        transactions = [
+            {**tx, "date": tx["date"].isoformat()}
+            for tx in frame.to_dict(orient="records")
+        ]
+
+        features = compute_rule_features(frame)
+        expected = StructuringDetector().window_features(transactions)
+
+        assert features["count_24h"].tolist() == [f["count_24h"] for f in expected]
+
+    def test_account_age_and_turnover(self):
+        frame = _frame(("a", 0, 5000.0), ("a", 2, -2500.0), ("a", 48, -2400.0))
+
+        features = compute_rule_features(
+            frame, opened={"a": START - timedelta(days=10)}
+        )
+        profile = VelocityDetector().profile(
+            {**tx, "date": tx["date"].isoformat()}
+            for tx in frame.to_dict(orient="records")
+        )
+
+        assert features["account_age_days"].tolist() == pytest.approx(
+            [10, 10 + 2 / 24, 12]
+        )
+        assert features["inflow_outflow_ratio"].tolist() == pytest.approx(
+            [profile["inflow_outflow_ratio"]] * 3
+        )
+        assert features["turnover_time_hours"].iloc[0] == pytest.approx(
+            profile["turnover_time_hours"]
+        )
+
+    def test_subject_without_turnover_is_nan(self):
+        features = compute_rule_features(_frame(("a", 0, 100.0)))
+
+        assert math.isnan(features["turnover_time_hours"].iloc[0])
+        assert features["account_age_days"].iloc[0] == 0
+
+    def test_empty_frame(self):
+        frame = pd.DataFrame(columns=["id", "subject_id", "date", "amount"])
+
+        features = compute_rule_features(frame)
+
+        assert features.empty
+        assert "count_24h" in features.columns
+
+
+class TestRuleScoring:
+    """Feature rows evaluated by the heuristic engine."""
+
+    def test_structuring_rule_flags_third_deposit(self):
+        frame = _frame(("a", 0, 9100.0), ("a", 1, 9200.0), ("a", 2, 9300.0))
+        engine = HeuristicEngine(
+            [rule for rule in DEFAULT_HEURISTIC_RULES if rule.id == "RULE_001"]
+        )
+
+        scored = RuleFeatureService.score_frame(compute_rule_features(frame), engine)
+
+        assert list(scored) == ["tx2"]
+        assert scored["tx2"][0].rule_id == "RULE_001"
+
+    def test_summary_lists_hits_per_rule(self):
+        frame = _frame(*[("a", hours, 9100.0 + hours) for hours in range(4)])
+        engine = HeuristicEngine(
+            [rule for rule in DEFAULT_HEURISTIC_RULES if rule.id == "RULE_001"]
+        )
+
+        summary = RuleFeatureService.summarize(
+            RuleFeatureService.score_frame(compute_rule_features(frame), engine)
+        )
+
+        assert [result.rule_id for result in summary] == ["RULE_001"]
+        assert summary[0].context == {
+            "transaction_count": 2,
+            "transaction_ids": ["tx2", "tx3"],
+        }
+
+    @pytest.mark.asyncio
+    async def test_score_subject_of_one_import(self, db):
+        subject = Subject(id=uuid.uuid4(), encrypted_pii={})
+        db.add(subject)
+        imported = datetime(2024, 6, 1, 12, 30, 15, 123456)
+        # Two earlier rows, this import's row, then a concurrent import's
+        created = [imported - timedelta(days=1)] * 2 + [imported]
+        created.append(imported + timedelta(microseconds=1))
+        for i, created_at in enumerate(created):
+            db.add(
+                Transaction(
+                    id=uuid.uuid4(),
+                    subject_id=subject.id,
+                    amount=Decimal("9100.00") + i,
+                    date=START + timedelta(hours=i),
+                    source_bank="chase",
+                    created_at=created_at,
+                )
+            )
+        await db.commit()
+        engine = HeuristicEngine(
+            [rule for rule in DEFAULT_HEURISTIC_RULES if rule.id == "RULE_001"]
+        )
+
+        everything = await RuleFeatureService.score_subject(
+            db, subject.id, engine=engine
+        )
+        latest = await RuleFeatureService.score_subject(
+            db, subject.id, imported_at=imported, engine=engine
+        )
+
+        # The third and fourth deposits trigger; only the third is this import's
+        assert len(everything) == 2
+        assert len(latest) == 1
+        assert latest.keys() < everything.keys()
+
+
+class TestEvaluateEndpoint:
+    """Subjects of other tenants are not evaluated."""
+
+    URL = "/api/v1/analysis/advanced/evaluate/{}/transactions"
+
+    @pytest.mark.asyncio
+    async def test_subject_of_another_tenant_is_not_found(
+        self, client: AsyncClient, db
+    ):
+        own = Tenant(id=uuid.uuid4(), name="Acme")
+        other = Tenant(id=uuid.uuid4(), name="Other")
+        mine = Subject(id=uuid.uuid4(), encrypted_pii={}, tenant_id=own.id)
+        theirs = Subject(id=uuid.uuid4(), encrypted_pii={}, tenant_id=other.id)
+        db.add_all([own, other, mine, theirs])
+        await db.commit()
+        user = User(
+            id=uuid.uuid4(),
+            email="analyst@example.com",
+            hashed_password="x",
+            role="analyst",
+            tenant_id=own.id,
+        )
+        app.dependency_overrides[deps.get_current_user] = lambda: user
+
+        foreign = await client.post(self.URL.format(theirs.id))
+        allowed = await client.post(self.URL.format(mine.id))
+
+        assert foreign.status_code == 404
+        assert allowed.status_code == 200
+        assert allowed.json()["subject_id"] == str(mine.id)
@@ -0,0 +1,159 @@
+"""
+Tests for the versioned heuristic rule store.
+"""
+import pytest
+from httpx import AsyncClient
+
+from app.core.heuristic_rules import DEFAULT_HEURISTIC_RULES
+from app.schemas.analysis import HeuristicRule
+from app.services.heuristic_engine import HeuristicEngine
+from app.services.rule_compiler import RuleCompileError
+from app.services.rule_store import RuleStore
+
+RULES_URL = "/api/v1/analysis/advanced/rules"
+
+
+def _rule(rule_id: str = "RULE_100", logic: str = "amount > 50000") -> HeuristicRule:
+    return HeuristicRule(
+        id=rule_id,
+        name="Large Transfer",
+        description="Single transfer above $50,000",
+        severity="medium",
+        logic=logic,
+    )
+
+
+class _FakePubSub:
+    """Delivers one change message, then ends like a closed connection."""
+
+    def __init__(self):
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        yield {"type": "subscribe"}
+        yield {"type": "message", "data": '{"version": 7}'}
+
+    async def reset(self):
+        pass
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.pubsub_instance = _FakePubSub()
+
+    def pubsub(self):
+        return self.pubsub_instance
+
+
+class TestHeuristicEngineRules:
+    """Engines own their rule lists."""
+
+    def test_add_rule_leaves_defaults_alone(self):
+        count = len(DEFAULT_HEURISTIC_RULES)
+
+        HeuristicEngine().add_rule(_rule())
+
+        assert len(DEFAULT_HEURISTIC_RULES) == count
+
+
+class TestRuleStore:
+    """Revisions, the cached engine and invalidation."""
+
+    @pytest.mark.asyncio
+    async def test_defaults_are_version_zero(self, db):
+        version, rules = await RuleStore.load(db)
+
+        assert version == 0
+        assert [r.id for r in rules] == [r.id for r in DEFAULT_HEURISTIC_RULES]
+
+    @pytest.mark.asyncio
+    async def test_saved_rule_reaches_the_engine(self, db):
+        store = RuleStore()
+        before = await store.engine(db)
+
+        revision = await store.save_rule(db, _rule())
+        after = await store.engine(db)
+
+        assert before.version == 0
+        assert after.version == revision.version > 0
+        assert "RULE_100" in {rule.id for rule in after.rules}
+        assert after.evaluate_transaction({"amount": 60000.0, "country_tags": ()})
+
+    @pytest.mark.asyncio
+    async def test_engine_is_reused_until_the_set_changes(self, db):
+        store = RuleStore()
+
+        first = await store.engine(db)
+        second = await store.engine(db)
+
+        assert first is second
+
+    @pytest.mark.asyncio
+    async def test_revision_replaces_and_tombstone_removes(self, db):
+        store = RuleStore()
+        await store.save_rule(db, _rule(logic="amount > 50000"))
+        await store.save_rule(db, _rule(logic="amount > 75000"))
+        await store.delete_rule(db, "RULE_003")
+
+        version, rules = await store.load(db)
+        history = await store.history(db, "RULE_100")
+
+        by_id = {rule.id: rule for rule in rules}
+        assert by_id["RULE_100"].logic == "amount > 75000"
+        assert "RULE_003" not in by_id
+        assert version == 3
+        assert [revision.version for revision in history] == [2, 1]
+
+    @pytest.mark.asyncio
+    async def test_invalid_logic_is_not_stored(self, db):
+        store = RuleStore()
+
+        with pytest.raises(RuleCompileError):
+            await store.save_rule(db, _rule(logic="__import__('os')"))
+
+        assert await store.current_version(db) == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_rule_cannot_be_deleted(self, db):
+        assert await RuleStore().delete_rule(db, "RULE_404") is None
+
+    @pytest.mark.asyncio
+    async def test_published_change_invalidates(self, db):
+        store = RuleStore()
+        await store.engine(db)
+        redis = _FakeRedis()
+
+        await store.listen(redis)
+
+        assert redis.pubsub_instance.channels == ["heuristics:rules"]
+        assert store._engine is None
+
+
+class TestRuleEndpoints:
+    """Rule management over the API."""
+
+    @pytest.mark.asyncio
+    async def test_save_list_and_evaluate(self, client: AsyncClient, db):
+        saved = await client.put(f"{RULES_URL}/RULE_100", json=_rule().model_dump())
+        listed = await client.get(RULES_URL)
+        evaluated = await client.post(
+            "/api/v1/analysis/advanced/evaluate/subject-1",
+            json={"amount": 60000.0, "country_tags": []},
+        )
+
+        assert saved.status_code == 200
+        version = saved.json()["version"]
+        assert listed.json()["version"] == version
+        assert evaluated.json()["rule_version"] == version
+        assert "RULE_100" in {r["rule_id"] for r in evaluated.json()["triggered_rules"]}
+
+    @pytest.mark.asyncio
+    async def test_invalid_logic_is_rejected(self, client: AsyncClient, db):
+        response = await client.put(
+            f"{RULES_URL}/RULE_100", json=_rule(logic="amount.real > 1").model_dump()
+        )
+
+        assert response.status_code == 400
@@ -0,0 +1,176 @@
+"""
+Unit tests for upload sessions: sampling, columnar copy and issue text.
+"""
+import os
+import time
+import uuid
+
+import pandas as pd
+import pytest
+
+from app.services.ingestion import IngestionService
+from app.services.upload_session import (
+    HEAD_ROWS,
+    build_session,
+    describe_issues,
+    iter_columnar_chunks,
+    jobs_dir,
+    load_sample,
+    load_session,
+    remove_session,
+    check_file_id,
+    stage_for_job,
+)
+
+# Staged uploads are named by the UUIDs init_upload issues
+F1, F2, F3, F4, MISSING, ABANDONED, QUEUED = (str(uuid.uuid4()) for _ in range(7))
+
+
+def _write_csv(upload_dir, file_id, rows):
+    frame = pd.DataFrame(
+        {
+            "Date": [f"2024-01-{(i % 28) + 1:02d}" for i in range(rows)],
+            "Amount": [str(i) for i in range(rows)],
+            "Memo": [f"row {i}" for i in range(rows)],
+        }
+    )
+    frame.to_csv(upload_dir / f"{file_id}.csv", index=False)
+    return list(frame.columns)
+
+
+class TestBuildSession:
+    """Tests for the single pass at init_upload."""
+
+    def test_counts_rows_and_bounds_sample(self, tmp_path):
+        headers = _write_csv(tmp_path, F1, 250)
+        session = build_session(
+            str(tmp_path), F1, headers, chunk_size=40, sample_size=50, seed=7
+        )
+
+        assert session.row_count == 250
+        assert len(session.head_rows) == HEAD_ROWS
+        assert session.head_rows[0]["Memo"] == "row 0"
+
+        sample = load_sample(str(tmp_path), F1)
+        assert len(sample) == 50
+        assert list(sample.columns) == headers
+        # Sampled from the whole file, not just its first chunk
+        assert sample["Amount"].astype(int).max() >= 40
+
+    def test_small_file_is_sampled_whole(self, tmp_path):
+        headers = _write_csv(tmp_path, F2, 10)
+        build_session(str(tmp_path), F2, headers, chunk_size=4, sample_size=50)
+
+        sample = load_sample(str(tmp_path), F2)
+        assert sample["Memo"].tolist() == [f"row {i}" for i in range(10)]
+
+    def test_remove_session_deletes_files(self, tmp_path):
+        headers = _write_csv(tmp_path, F3, 5)
+        build_session(str(tmp_path), F3, headers, chunk_size=4, sample_size=3)
+        remove_session(str(tmp_path), F3)
+
+        assert load_session(str(tmp_path), F3) is None
+        assert [p.name for p in tmp_path.iterdir()] == [f"{F3}.csv"]
+
+
+class TestStageForJob:
+    """Files handed to import jobs survive the hourly upload cleanup."""
+
+    def test_moves_file_and_session(self, tmp_path):
+        headers = _write_csv(tmp_path, F4, 5)
+        build_session(str(tmp_path), F4, headers, chunk_size=4, sample_size=3)
+
+        staged = stage_for_job(str(tmp_path), F4)
+
+        assert staged == jobs_dir(str(tmp_path))
+        assert load_session(staged, F4).row_count == 5
+        assert not (tmp_path / f"{F4}.csv").exists()
+        # Queuing the same file again finds it in place
+        assert stage_for_job(str(tmp_path), F4) == staged
+        assert stage_for_job(str(tmp_path), MISSING) is None
+
+    def test_cleanup_keeps_staged_job_files(self, tmp_path):
+        _write_csv(tmp_path, ABANDONED, 2)
+        _write_csv(tmp_path, QUEUED, 2)
+        staged = stage_for_job(str(tmp_path), QUEUED)
+        day_ago = time.time() - 24 * 3600
+        abandoned = tmp_path / f"{ABANDONED}.csv"
+        for path in (abandoned, os.path.join(staged, f"{QUEUED}.csv")):
+            os.utime(path, (day_ago, day_ago))
+
+        IngestionService._cleanup_old_uploads(str(tmp_path))
+
+        assert not abandoned.exists()
+        assert os.path.exists(os.path.join(staged, f"{QUEUED}.csv"))
+
+
+class TestFileIds:
+    """Client-sent file ids never reach outside the upload directory."""
+
+    @pytest.mark.parametrize(
+        "file_id", ["../../etc/passwd", "/tmp/x", "f1", F1.upper(), "", None]
+    )
+    def test_only_issued_ids_are_accepted(self, file_id):
+        with pytest.raises(ValueError):
+            check_file_id(file_id)
+
+    def test_no_file_is_moved_or_removed_for_a_bad_id(self, tmp_path):
+        upload_dir = tmp_path / "uploads"
+        upload_dir.mkdir()
+        outside = tmp_path / "secret.csv"
+        outside.write_text("keep me")
+
+        with pytest.raises(ValueError):
+            stage_for_job(str(upload_dir), "../secret")
+        with pytest.raises(ValueError):
+            remove_session(str(upload_dir), "../secret")
+
+        assert outside.read_text() == "keep me"
+        assert check_file_id(F1) == F1
+
+    @pytest.mark.asyncio
+    async def test_endpoints_reject_bad_ids(self, client):
+        mapping = {"date": "Date", "amount": "Amount"}
+
+        preview = await client.post(
+            "/api/v1/ingestion/mapping/preview",
+            json={"file_id": "../jobs/x", "mapping": mapping},
+        )
+        process = await client.post(
+            "/api/v1/ingestion/process-mapped",
+            json={
+                "file_id": "../jobs/x",
+                "mapping": mapping,
+                "subject_id": str(uuid.uuid4()),
+                "bank_name": "chase",
+            },
+        )
+
+        assert preview.status_code == 422
+        assert process.status_code == 422
+
+
+class TestColumnarChunks:
+    """Tests for streaming the columnar copy."""
+
+    def test_chunks_match_batch_size(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        headers = _write_csv(tmp_path, F4, 105)
+        # Row groups of 30 do not line up with batches of 25
+        build_session(str(tmp_path), F4, headers, chunk_size=30, sample_size=10)
+
+        session = load_session(str(tmp_path), F4)
+        assert session.columnar
+
+        chunks = list(iter_columnar_chunks(str(tmp_path), F4, 25))
+        assert [len(chunk) for chunk, _ in chunks] == [25, 25, 25, 25, 5]
+        assert chunks[-1][1] == 105
+        assert chunks[1][0]["Memo"].iloc[0] == "row 25"
+
+
+class TestDescribeIssues:
+    """Tests for preview validation messages."""
+
+    def test_only_nonzero_counts_are_reported(self):
+        issues = describe_issues({"an invalid date": 3, "an invalid amount": 0}, 100)
+        assert issues == ["3 of 100 sampled rows have an invalid date"]